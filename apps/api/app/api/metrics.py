@@ -0,0 +1,17 @@
+"""
+Prometheus/OpenMetrics-Endpunkt für AGENTLAND.SAARLAND
+Liefert die über Redis aggregierten Metriken aller Worker
+"""
+
+from fastapi import APIRouter, Query, Response
+
+from app.core.metrics import OPENMETRICS_CONTENT_TYPE, registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(local: bool = Query(False, description="Nur die Metriken dieses Workers")):
+    """Scrape-Endpunkt im OpenMetrics-Textformat"""
+    body = registry.render() if local else await registry.render_fleet()
+    return Response(body, media_type=OPENMETRICS_CONTENT_TYPE)
@@ -8,12 +8,35 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import asyncio
 import time
-import psutil
 
-from app.core.cache import cache, performance_monitor
+from app.core.cache import ai_cache, cache, performance_monitor
+from app.core.config import settings
+from app.core.metrics import registry as metrics
+from app.core.rate_limiter import limiter
+from app.core.system_sampler import SystemSampler
 from app.core.websocket_manager import connection_manager
-from app.middleware.performance import performance_middleware
-from app.db.database import engine
+from app.middleware.performance import loop_monitor, memory_profiler, performance_middleware
+from app.middleware.compression import get_compression_stats
+from app.db.database import engine, query_stats
+
+# System-Metriken im Hintergrund (Start/Stop im Lifespan); Endpunkte lesen nur Ringpuffer
+system_sampler = SystemSampler(
+    interval=settings.SYSTEM_SAMPLE_INTERVAL,
+    history=settings.SYSTEM_SAMPLE_HISTORY,
+)
+# Hostweite Werte sind in allen Workern gleich (max), Prozesswerte pro Worker
+metrics.register_stats(
+    "agentland_system",
+    lambda: system_sampler.latest,
+    "System",
+    gauges={
+        "cpu_percent": "max", "memory_percent": "max", "memory_used_gb": "max",
+        "memory_available_gb": "max", "disk_usage_percent": "max",
+        "load_1m": "max", "load_5m": "max", "load_15m": "max",
+        "process_cpu_percent": "all", "process_rss_mb": "all", "process_threads": "all",
+        "open_fds": "all", "event_loop_lag_ms": "all",
+    },
+)
 
 router = APIRouter(
     prefix="/api/v1/performance",
@@ -23,7 +46,9 @@ router = APIRouter(
 
 
 @router.get("/metrics")
-async def get_performance_metrics():
+async def get_performance_metrics(
+    history_points: int = Query(12, ge=0, le=720, description="Samples pro System-Zeitreihe"),
+):
     """
     Umfassende Performance-Metriken
     """
@@ -46,19 +71,15 @@ async def get_performance_metrics():
             "status": "healthy" if engine.pool.checkedin() > 0 else "warning"
         }
         
-        # System-Ressourcen
-        system_stats = {
-            "cpu_percent": psutil.cpu_percent(interval=1),
-            "memory_percent": psutil.virtual_memory().percent,
-            "memory_used_gb": psutil.virtual_memory().used / (1024**3),
-            "memory_available_gb": psutil.virtual_memory().available / (1024**3),
-            "disk_usage_percent": psutil.disk_usage('/').percent,
-            "load_average": psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
-        }
+        # System-Ressourcen (letztes Sample des Hintergrund-Samplers)
+        system_stats = _system_stats()
         
         # API-Response-Zeit-Analyse
         response_time_analysis = _analyze_response_times()
         
+        # Latenz-Quantile über alle Worker
+        latency = await performance_monitor.get_fleet_latency()
+        
         # Kosten-Einsparungen
         cost_savings = _calculate_cost_savings(cache_stats, perf_metrics)
         
@@ -67,11 +88,29 @@ async def get_performance_metrics():
             "timestamp": datetime.utcnow().isoformat(),
             "data": {
                 "cache": cache_stats,
+                "ai_cache": ai_cache.get_stats(),
                 "performance": perf_metrics,
                 "websockets": websocket_stats,
                 "database": db_pool_stats,
                 "system": system_stats,
+                "system_history": {
+                    name: system_sampler.get_series(name, history_points)
+                    for name in ("cpu_percent", "memory_percent", "load_1m", "event_loop_lag_ms")
+                } if history_points else {},
                 "response_times": response_time_analysis,
+                "latency": latency,
+                "compression": get_compression_stats(),
+                "rate_limit": limiter.get_stats(),
+                "database_queries": query_stats.get_stats(),
+                "memory_profile": memory_profiler.get_stats(),
+                "event_loop": {
+                    key: value for key, value in loop_monitor.get_stats().items()
+                    if key not in ("recent", "top_sites")
+                },
+                "middleware": (
+                    performance_middleware.current.get_performance_stats()
+                    if performance_middleware.current else {}
+                ),
                 "cost_savings": cost_savings,
                 "health_score": _calculate_health_score(
                     cache_stats, system_stats, db_pool_stats
@@ -136,6 +175,54 @@ async def get_health_status():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/system")
+async def get_system_metrics(
+    points: int = Query(60, ge=1, le=720, description="Samples pro Zeitreihe"),
+):
+    """
+    System-Zeitreihen (CPU, Speicher, Load, FDs, Event-Loop-Lag, Prozess)
+    aus den Ringpuffern des Hintergrund-Samplers
+    """
+    return {
+        "status": "success",
+        "timestamp": datetime.utcnow().isoformat(),
+        "data": system_sampler.snapshot(points),
+    }
+
+
+@router.get("/memory")
+async def get_memory_profile(route: Optional[str] = Query(None, description="Route-Template, z.B. /api/v1/realtime/data")):
+    """
+    Memory-Profil dieses Workers: RSS-Verlauf, Gen-2-GC-Pausen und
+    Top-Allokationsstellen pro Route aus gesampelten Requests
+    """
+    stats = memory_profiler.get_stats()
+    if route:
+        stats["top_allocations"] = memory_profiler.top_allocations(route)
+    return {
+        "status": "success",
+        "timestamp": datetime.utcnow().isoformat(),
+        "data": stats,
+    }
+
+
+@router.get("/event-loop")
+async def get_event_loop_report(
+    limit: int = Query(10, ge=1, le=100, description="Anzahl Top-Blockierstellen"),
+):
+    """
+    Event-Loop dieses Workers: Lag-Verteilung, blockierende Callbacks mit
+    Stack und Route, Top-Stellen nach Gesamt-Blockadedauer
+    """
+    stats = loop_monitor.get_stats()
+    stats["top_sites"] = loop_monitor.top_sites(limit)
+    return {
+        "status": "success",
+        "timestamp": datetime.utcnow().isoformat(),
+        "data": stats,
+    }
+
+
 @router.get("/optimization-recommendations")
 async def get_optimization_recommendations():
     """
@@ -154,7 +241,7 @@ async def get_optimization_recommendations():
                 "description": f"Cache hit rate ist {cache_stats.get('overall_hit_rate', 0):.1f}%. Ziel: >70%",
                 "actions": [
                     "TTL für häufig abgerufene Daten erhöhen",
-                    "L1-Cache-Größe von 1000 auf 2000 erhöhen",
+                    "L1-Speicherbudget verdoppeln (CACHE_L1_MAX_BYTES)",
                     "Pre-warming für populäre Inhalte implementieren"
                 ]
             })
@@ -179,7 +266,7 @@ async def get_optimization_recommendations():
             })
         
         # Memory Usage
-        memory_percent = psutil.virtual_memory().percent
+        memory_percent = system_sampler.get("memory_percent")
         if memory_percent > 80:
             recommendations.append({
                 "type": "memory",
@@ -193,6 +280,20 @@ async def get_optimization_recommendations():
                 ]
             })
         
+        # Blockierende Aufrufe auf dem Event-Loop
+        top_sites = loop_monitor.top_sites(3)
+        if top_sites:
+            recommendations.append({
+                "type": "event_loop",
+                "priority": "high",
+                "title": "Blocking Calls on Event Loop",
+                "description": f"{loop_monitor.stats['slow_callbacks']} Blockaden > {loop_monitor.threshold * 1000:.0f}ms",
+                "actions": [
+                    f"{site['site']} in Threadpool auslagern (asyncio.to_thread)"
+                    for site in top_sites
+                ]
+            })
+        
         # API Response Times
         perf_metrics = performance_monitor.get_performance_metrics()
         avg_response = perf_metrics.get("avg_response_time", 0)
@@ -288,9 +389,13 @@ async def trigger_optimization():
         # Cache-Optimierung
         cache_stats = cache.get_stats()
         if cache_stats.get("overall_hit_rate", 0) < 50:
-            # L1 Cache Size erhöhen
-            cache.l1_max_size = 2000
-            optimizations_applied.append("L1 cache size increased to 2000")
+            # L1-Budget verdoppeln (max. 512MB pro Worker)
+            new_budget = min(cache.l1.max_bytes * 2, 512 * 1024 * 1024)
+            if new_budget > cache.l1.max_bytes:
+                cache.l1.resize(new_budget)
+                optimizations_applied.append(
+                    f"L1 cache budget increased to {new_budget // (1024 * 1024)}MB"
+                )
         
         # Garbage Collection
         import gc
@@ -315,6 +420,30 @@ async def trigger_optimization():
 
 # Helper Functions
 
+def _system_stats() -> Dict[str, Any]:
+    """Letzte Werte des System-Samplers (ohne blockierende psutil-Aufrufe)"""
+    return {
+        "cpu_percent": system_sampler.get("cpu_percent"),
+        "memory_percent": system_sampler.get("memory_percent"),
+        "memory_used_gb": system_sampler.get("memory_used_gb"),
+        "memory_available_gb": system_sampler.get("memory_available_gb"),
+        "disk_usage_percent": system_sampler.get("disk_usage_percent"),
+        "load_average": [
+            system_sampler.get("load_1m"),
+            system_sampler.get("load_5m"),
+            system_sampler.get("load_15m"),
+        ],
+        "open_fds": system_sampler.get("open_fds"),
+        "event_loop_lag_ms": system_sampler.get("event_loop_lag_ms"),
+        "process": {
+            "cpu_percent": system_sampler.get("process_cpu_percent"),
+            "rss_mb": system_sampler.get("process_rss_mb"),
+            "threads": system_sampler.get("process_threads"),
+        },
+        "sample_age_seconds": system_sampler.snapshot(0)["age_seconds"],
+    }
+
+
 async def _check_database_health() -> Dict[str, Any]:
     """Database Health Check"""
     try:
@@ -381,11 +510,11 @@ def _check_cache_health() -> Dict[str, Any]:
 def _check_memory_health() -> Dict[str, Any]:
     """Memory Health Check"""
     try:
-        memory = psutil.virtual_memory()
+        memory_percent = system_sampler.get("memory_percent")
         
-        if memory.percent > 90:
+        if memory_percent > 90:
             status = "critical"
-        elif memory.percent > 80:
+        elif memory_percent > 80:
             status = "warning"
         else:
             status = "healthy"
@@ -393,10 +522,10 @@ def _check_memory_health() -> Dict[str, Any]:
         return {
             "name": "Memory",
             "status": status,
-            "usage_percent": memory.percent,
-            "used_gb": memory.used / (1024**3),
-            "available_gb": memory.available / (1024**3),
-            "details": f"Usage: {memory.percent:.1f}%"
+            "usage_percent": memory_percent,
+            "used_gb": system_sampler.get("memory_used_gb"),
+            "available_gb": system_sampler.get("memory_available_gb"),
+            "details": f"Usage: {memory_percent:.1f}%"
         }
     except Exception as e:
         return {
@@ -465,10 +594,15 @@ def _check_200k_user_readiness() -> Dict[str, Any]:
 def _analyze_response_times() -> Dict[str, Any]:
     """Analysiert Response-Zeit-Trends"""
     perf_metrics = performance_monitor.get_performance_metrics()
+    overall = perf_metrics.get("latency", {}).get("5m", {}).get("overall", {})
     
     return {
         "average_ms": perf_metrics.get("avg_response_time", 0) * 1000,
         "p95_ms": perf_metrics.get("p95_response_time", 0) * 1000,
+        "p50_ms": overall.get("p50_ms", 0),
+        "p90_ms": overall.get("p90_ms", 0),
+        "p99_ms": overall.get("p99_ms", 0),
+        "p999_ms": overall.get("p999_ms", 0),
         "target_api_ms": 300,
         "target_chat_ms": 2000,
         "performance_grade": _calculate_performance_grade(perf_metrics)
@@ -577,10 +711,7 @@ def _calculate_infrastructure_costs() -> Dict[str, Any]:
     }
     
     # Skalierung basierend auf aktueller Last
-    system_stats = {
-        "cpu_percent": psutil.cpu_percent(),
-        "memory_percent": psutil.virtual_memory().percent
-    }
+    system_stats = _system_stats()
     
     scaling_factor = max(
         system_stats["cpu_percent"] / 100,
@@ -661,7 +792,7 @@ def _calculate_200k_readiness_score() -> float:
         score -= (pool_usage - 0.5) * 100
     
     # Memory Usage
-    memory_percent = psutil.virtual_memory().percent
+    memory_percent = system_sampler.get("memory_percent")
     if memory_percent > 50:
         score -= (memory_percent - 50) * 1.5
     
@@ -672,7 +803,7 @@ def _calculate_200k_readiness_score() -> float:
         score -= (70 - hit_rate) * 0.8
     
     # CPU Usage
-    cpu_percent = psutil.cpu_percent()
+    cpu_percent = system_sampler.get("cpu_percent")
     if cpu_percent > 50:
         score -= (cpu_percent - 50) * 1.2
     
@@ -14,6 +14,7 @@ from app.services.real_data import (
     MapsService
 )
 from app.core.config import settings
+from app.core.websocket_manager import real_time_broadcaster
 
 
 router = APIRouter(
@@ -172,6 +173,18 @@ async def get_user_count():
 
 
 
+@router.get("/snapshot/{data_type}")
+async def get_realtime_snapshot(data_type: str):
+    """
+    Voller versionierter Snapshot eines WebSocket-Datentyps (z.B. analytics)
+    für Clients, die eine Lücke in der Delta-Folge erkannt haben
+    """
+    snapshot = await real_time_broadcaster.get_snapshot(data_type)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Kein Snapshot für {data_type}")
+    return snapshot
+
+
 @router.get("/plz/{plz}")
 async def get_plz_info(plz: str):
     """Gibt Informationen und zuständige Behörden für eine PLZ zurück"""
@@ -16,6 +16,8 @@ import backoff
 from circuitbreaker import circuit
 import xml.etree.ElementTree as ET
 
+from app.core.metrics import registry as metrics
+
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -44,6 +46,15 @@ CIRCUIT_FAILURE_THRESHOLD = 5
 CIRCUIT_RECOVERY_TIMEOUT = 60
 CIRCUIT_EXPECTED_EXCEPTION = (aiohttp.ClientError, asyncio.TimeoutError)
 
+# Cache metrics (children bound once, increments stay a plain attribute add)
+CONNECTOR_CACHE_REQUESTS = metrics.counter(
+    "agentland_connector_cache_requests_total",
+    "Connector cache lookups by cache and result",
+    ("cache", "result"),
+)
+_CACHE_HITS = CONNECTOR_CACHE_REQUESTS.labels("saarvv", "hit")
+_CACHE_MISSES = CONNECTOR_CACHE_REQUESTS.labels("saarvv", "miss")
+
 
 class TransitDataCache:
     """Specialized cache for transit data with TTL support"""
@@ -62,6 +73,7 @@ class TransitDataCache:
             
             if datetime.now().timestamp() - timestamp < ttl:
                 self._hit_count += 1
+                _CACHE_HITS.inc()
                 logger.debug(f"Cache hit for key: {key}")
                 return self._cache[key]
             else:
@@ -71,6 +83,7 @@ class TransitDataCache:
                 logger.debug(f"Cache expired for key: {key}")
         
         self._miss_count += 1
+        _CACHE_MISSES.inc()
         return None
     
     def set(self, key: str, value: Any):
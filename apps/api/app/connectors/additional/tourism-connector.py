@@ -17,6 +17,8 @@ from circuitbreaker import circuit
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+from app.core.metrics import registry as metrics
+
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -94,6 +96,16 @@ class OpeningHours:
     special_notes: Optional[str] = None
 
 
+# Cache metrics (children bound once, increments stay a plain attribute add)
+CONNECTOR_CACHE_REQUESTS = metrics.counter(
+    "agentland_connector_cache_requests_total",
+    "Connector cache lookups by cache and result",
+    ("cache", "result"),
+)
+_CACHE_HITS = CONNECTOR_CACHE_REQUESTS.labels("tourism", "hit")
+_CACHE_MISSES = CONNECTOR_CACHE_REQUESTS.labels("tourism", "miss")
+
+
 class TourismCache:
     """Specialized cache for tourism data"""
     
@@ -111,6 +123,7 @@ class TourismCache:
             if datetime.now().timestamp() - timestamp < ttl:
                 # Track popularity
                 self._popularity[key] = self._popularity.get(key, 0) + 1
+                _CACHE_HITS.inc()
                 logger.debug(f"Cache hit for key: {key}")
                 return self._cache[key]
             else:
@@ -121,6 +134,7 @@ class TourismCache:
                     del self._popularity[key]
                 logger.debug(f"Cache expired for key: {key}")
         
+        _CACHE_MISSES.inc()
         return None
     
     def set(self, key: str, value: Any):
@@ -0,0 +1,208 @@
+"""
+Admission Control und Load Shedding für AGENTLAND.SAARLAND
+Getrennte Concurrency-Pools für Chat/LLM-Routen und günstige API-Routen.
+Jeder Pool begrenzt gleichzeitige Requests adaptiv (AIMD auf die
+geglättete Latenz gegen das Ziel), stellt Überhang in eine begrenzte
+Warteschlange und lehnt Requests früh ab, deren erwartete Wartezeit die
+Deadline überschreitet. Routen, deren Latenz nicht von der eigenen Last
+abhängt (bcrypt, externe APIs), laufen in einem Pool mit festem Limit.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pfad-Präfix -> Pool (erster Treffer gewinnt); None = nie abweisen
+ADMISSION_PREFIXES: Tuple[Tuple[str, Optional[str]], ...] = (
+    ("/api/health", None),
+    ("/api/v1/performance", None),
+    ("/metrics", None),
+    ("/api/v1/chat", "chat"),
+    ("/api/v1/agents", "chat"),
+    ("/api/v1/api/agents", "chat"),
+    ("/api/v1/enhanced-agents", "chat"),
+    ("/api/auth", "slow"),
+    ("/api/v1/realtime", "slow"),
+)
+
+
+class _Waiter:
+    __slots__ = ("future", "deadline")
+
+    def __init__(self, future: asyncio.Future, deadline: float):
+        self.future = future
+        self.deadline = deadline
+
+
+class AdmissionPool:
+    """
+    Adaptives Concurrency-Limit mit Warteschlange
+
+    - Signal ist die geglättete Latenz (EWMA), nicht der einzelne Request:
+      einzelne langsame Antworten senken das Limit nicht
+    - Additive Increase: +1/limit pro Request, solange die EWMA unter dem Ziel liegt
+    - Multiplicative Decrease: limit * backoff, wenn die EWMA das Ziel
+      überschreitet (höchstens einmal pro Ziel-Intervall, damit ein Schub
+      langsamer Antworten das Limit nicht auf einen Schlag kollabieren lässt)
+    - adaptive=False: festes Limit (nur Warteschlange und Deadline)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        target_ms: float,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: Optional[int] = None,
+        max_queue: int = 100,
+        queue_timeout: float = 1.0,
+        backoff: float = 0.9,
+        adaptive: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.target = target_ms / 1000
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit if initial_limit is not None else max_limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.adaptive = adaptive
+        self._clock = clock
+
+        self.in_flight = 0
+        self._queue: Deque[_Waiter] = deque()
+        self._last_decrease = 0.0
+        # Geglättete Bearbeitungszeit für die Wartezeit-Schätzung
+        self._avg_latency = self.target / 2
+
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+            "rejected_timeout": 0,
+            "limit_decreases": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    async def acquire(self) -> bool:
+        """True = Slot belegt (release() aufrufen), False = abweisen"""
+        if self.in_flight < int(self.limit) and not self._queue:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return True
+
+        if len(self._queue) >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            return False
+
+        # Deadline-aware: aussichtslose Requests sofort abweisen statt warten
+        if self.expected_wait() > self.queue_timeout:
+            self.stats["rejected_deadline"] += 1
+            return False
+
+        waiter = _Waiter(
+            asyncio.get_running_loop().create_future(),
+            self._clock() + self.queue_timeout,
+        )
+        self._queue.append(waiter)
+        self.stats["queued"] += 1
+
+        try:
+            await asyncio.wait((waiter.future,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Client weg: bereits zugeteilten Slot zurückgeben
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release_slot()
+            else:
+                self._abandon(waiter)
+            raise
+
+        if waiter.future.done() and not waiter.future.cancelled():
+            self.stats["admitted"] += 1
+            return True
+
+        self._abandon(waiter)
+        self.stats["rejected_timeout"] += 1
+        return False
+
+    def _abandon(self, waiter: _Waiter):
+        waiter.future.cancel()
+        try:
+            self._queue.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, latency: float):
+        """Gibt den Slot frei und passt das Limit an die gemessene Latenz an"""
+        self._avg_latency += 0.1 * (latency - self._avg_latency)
+        if not self.adaptive:
+            self._release_slot()
+            return
+
+        now = self._clock()
+        if self._avg_latency > self.target:
+            if now - self._last_decrease >= self.target:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+                self.stats["limit_decreases"] += 1
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        self._release_slot()
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        now = self._clock()
+        while self._queue and self.in_flight < int(self.limit):
+            waiter = self._queue.popleft()
+            if waiter.future.done() or waiter.deadline <= now:
+                continue
+            self.in_flight += 1
+            waiter.future.set_result(True)
+
+    def expected_wait(self) -> float:
+        """Geschätzte Wartezeit (Sekunden) für einen neu eingereihten Request"""
+        return (len(self._queue) + 1) * self._avg_latency / max(1.0, self.limit)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.expected_wait()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "limit": round(self.limit, 2),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queue_length": len(self._queue),
+            "target_ms": self.target * 1000,
+            "adaptive": self.adaptive,
+            "avg_latency_ms": round(self._avg_latency * 1000, 1),
+        }
+
+
+class AdmissionController:
+    """Ordnet Requests per Pfad-Präfix einem Pool zu (Standard: "api")"""
+
+    def __init__(self, pools: Dict[str, AdmissionPool], default_pool: str = "api"):
+        self.pools = pools
+        self.default_pool = default_pool
+
+    def pool_for(self, path: str) -> Optional[AdmissionPool]:
+        for prefix, name in ADMISSION_PREFIXES:
+            if path.startswith(prefix):
+                return self.pools.get(name) if name else None
+        return self.pools.get(self.default_pool)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: pool.get_stats() for name, pool in self.pools.items()}
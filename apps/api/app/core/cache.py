@@ -6,7 +6,9 @@ Optimiert für 200,000 Benutzer mit 74% AI-Kosteneinsparung
 import asyncio
 import json
 import hashlib
-import pickle
+import importlib.util
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Union, Callable
 from functools import wraps
@@ -15,9 +17,58 @@ import logging
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
+from app.core.l1_cache import L1Cache, MISSING
+from app.core.cache_codecs import CacheSerializer
+from app.core.cache_invalidation import InvalidationBus
+from app.core.l3_cache import L3ResultCache
+from app.core.metrics import registry as metrics
+from app.core.latency_sketch import (
+    DEFAULT_WINDOWS, LatencySketch, WindowedSketches, group_by, merge_all, merge_slots
+)
+from app.core.semantic_cache import RedisSemanticStore, SemanticCache, get_embedding_model
 
 logger = logging.getLogger(__name__)
 
+# Redis-Key-Präfixe für Tag-Invalidierung
+TAG_SET_PREFIX = "tag:"      # tag:<tag>      -> Set der Cache-Keys
+KEY_TAGS_PREFIX = "ktags:"   # ktags:<key>    -> Set der Tags eines Keys (für L1-Promotion)
+
+# Setzt Wert und trägt ihn atomar in die Tag-Sets ein
+# KEYS[1]=Cache-Key, KEYS[2]=ktags-Key, KEYS[3..]=Tag-Sets; ARGV[1]=TTL, ARGV[2]=Payload
+_SET_WITH_TAGS_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+redis.call("set", KEYS[1], ARGV[2], "EX", ttl)
+redis.call("del", KEYS[2])
+for i = 3, #KEYS do
+    redis.call("sadd", KEYS[i], KEYS[1])
+    -- Präfix "tag:" abschneiden
+    redis.call("sadd", KEYS[2], string.sub(KEYS[i], 5))
+    if redis.call("ttl", KEYS[i]) < ttl then
+        redis.call("expire", KEYS[i], ttl)
+    end
+end
+redis.call("expire", KEYS[2], ttl)
+return 1
+"""
+
+# Löscht alle Mitglieder eines Tags in O(Mitglieder), ohne den Keyspace zu scannen
+_INVALIDATE_TAG_SCRIPT = """
+local members = redis.call("smembers", KEYS[1])
+for i = 1, #members, 500 do
+    redis.call("unlink", unpack(members, i, math.min(i + 499, #members)))
+end
+redis.call("unlink", KEYS[1])
+return #members
+"""
+
+# Gibt den Lease nur frei, wenn er noch dem eigenen Token gehört
+_RELEASE_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
 
 class MultiLayerCache:
     """
@@ -25,18 +76,41 @@ class MultiLayerCache:
     L1: In-Memory (Local) - Ultraschnell für häufige Abfragen
     L2: Redis (Distributed) - Shared Cache zwischen Instanzen
     L3: Database with Results Cache - Langzeit-Persistierung
+        (opt-in pro Eintrag über layer_config={"l3": True})
     """
     
     def __init__(self):
-        # L1: Local Memory Cache (LRU mit Größenbegrenzung)
-        self.l1_cache = {}
-        self.l1_access_times = {}
-        self.l1_max_size = 1000
+        # L1: Local Memory Cache (O(1)-LRU mit Byte-Budget und TTL pro Eintrag)
+        self.l1 = L1Cache(max_bytes=settings.CACHE_L1_MAX_BYTES)
         
         # L2: Redis Cache
         self.redis_client = None
         self._init_redis()
         
+        # L2-Codec (orjson/msgpack/raw + Kompression, Header pro Eintrag)
+        self.serializer = CacheSerializer(
+            codec=settings.CACHE_CODEC,
+            compression=settings.CACHE_COMPRESSION,
+            compression_threshold=settings.CACHE_COMPRESSION_THRESHOLD
+        )
+        
+        # L3: Persistenter Ergebnis-Cache (Write-Behind in die Datenbank)
+        self.l3 = L3ResultCache(
+            self.serializer,
+            database_url=settings.CACHE_L3_DATABASE_URL,
+            batch_size=settings.CACHE_L3_BATCH_SIZE,
+            flush_interval=settings.CACHE_L3_FLUSH_INTERVAL,
+            sweep_interval=settings.CACHE_L3_SWEEP_INTERVAL
+        )
+        
+        # L1-Kohärenz: Invalidierungen an andere Instanzen verteilen
+        self.invalidation_bus = InvalidationBus(
+            self.l1,
+            self.get_redis_connection,
+            channel=settings.CACHE_INVALIDATION_CHANNEL,
+            batch_window=settings.CACHE_INVALIDATION_BATCH_MS / 1000
+        )
+        
         # Cache-Statistiken für Optimierung
         self.stats = {
             "l1_hits": 0,
@@ -45,8 +119,31 @@ class MultiLayerCache:
             "l2_misses": 0,
             "l3_hits": 0,
             "l3_misses": 0,
-            "total_requests": 0
+            "total_requests": 0,
+            # Stampede-Schutz
+            "singleflight_leaders": 0,
+            "coalesced_calls": 0,
+            "lease_acquired": 0,
+            "lease_waits": 0,
+            "lease_wait_hits": 0,
+            "lease_timeouts": 0,
+            # Stale-While-Revalidate / Refresh-Ahead
+            "stale_served": 0,
+            "refresh_ahead_triggers": 0,
+            "background_refreshes": 0,
+            "background_refresh_errors": 0,
+            # Invalidierung
+            "tag_invalidations": 0,
+            "tag_invalidated_keys": 0,
+            "pattern_invalidations": 0
         }
+        
+        # Laufende Berechnungen pro Key (In-Process Single-Flight)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Referenzen auf Hintergrund-Refreshes, damit Tasks nicht vom GC entsorgt werden
+        self._refresh_tasks: set = set()
+        self.lease_timeout = settings.CACHE_LEASE_TIMEOUT
+        self.lease_poll_interval = settings.CACHE_LEASE_POLL_INTERVAL
     
     def _init_redis(self):
         """Initialisiert Redis-Verbindung mit optimierten Einstellungen"""
@@ -78,120 +175,483 @@ class MultiLayerCache:
         key_hash = hashlib.md5(key_data.encode()).hexdigest()
         return f"cache:{prefix}:{key_hash}"
     
-    def _manage_l1_size(self):
-        """LRU-Eviction für L1-Cache"""
-        if len(self.l1_cache) >= self.l1_max_size:
-            # Entferne 20% der ältesten Einträge
-            sorted_items = sorted(
-                self.l1_access_times.items(),
-                key=lambda x: x[1]
-            )
-            for key, _ in sorted_items[:int(self.l1_max_size * 0.2)]:
-                self.l1_cache.pop(key, None)
-                self.l1_access_times.pop(key, None)
-    
-    async def get(self, cache_key: str, default: Any = None) -> Any:
+    async def get(
+        self,
+        cache_key: str,
+        default: Any = None,
+        layer_config: Dict[str, bool] = None
+    ) -> Any:
         """
         Holt Wert aus Multi-Layer Cache
-        L1 -> L2 -> L3 -> None
+        L1 -> L2 -> L3 (nur mit layer_config["l3"]) -> None
         """
         self.stats["total_requests"] += 1
         
         # L1: Memory Cache
-        if cache_key in self.l1_cache:
-            self.l1_access_times[cache_key] = datetime.now()
+        value = self.l1.get(cache_key)
+        if value is not MISSING:
             self.stats["l1_hits"] += 1
-            return self.l1_cache[cache_key]
+            return value
         
         self.stats["l1_misses"] += 1
         
         # L2: Redis Cache
+        value = await self._get_l2(cache_key)
+        if value is not MISSING:
+            self.stats["l2_hits"] += 1
+            return value
+        
+        self.stats["l2_misses"] += 1
+        
+        # L3: Persistenter Ergebnis-Cache, Treffer werden nach L2/L1 promotet
+        if layer_config and layer_config.get("l3"):
+            value, remaining_ttl = await self.l3.get(cache_key)
+            if value is not MISSING:
+                self.stats["l3_hits"] += 1
+                await self._promote_from_l3(cache_key, value, remaining_ttl)
+                return value
+            self.stats["l3_misses"] += 1
+        
+        return default
+    
+    async def _promote_from_l3(self, cache_key: str, value: Any, remaining_ttl: float):
+        """Schreibt L3-Treffer mit Rest-TTL zurück nach L1 und L2"""
+        ttl = max(int(remaining_ttl), 1)
+        self.l1.set(cache_key, value, ttl=ttl)
         redis_conn = await self.get_redis_connection()
         if redis_conn:
             try:
-                cached_data = await redis_conn.get(cache_key)
-                if cached_data:
-                    value = pickle.loads(cached_data)
-                    # Promote to L1
-                    self._manage_l1_size()
-                    self.l1_cache[cache_key] = value
-                    self.l1_access_times[cache_key] = datetime.now()
-                    self.stats["l2_hits"] += 1
-                    await redis_conn.close()
-                    return value
+                await redis_conn.setex(cache_key, ttl, self.serializer.dumps(value))
                 await redis_conn.close()
             except Exception as e:
-                logger.error(f"Redis get error: {e}")
+                logger.error(f"Redis promote error: {e}")
+    
+    async def _get_l2(self, cache_key: str) -> Any:
+        """Liest aus Redis und promotet nach L1; MISSING wenn nicht vorhanden"""
+        redis_conn = await self.get_redis_connection()
+        if not redis_conn:
+            return MISSING
         
-        self.stats["l2_misses"] += 1
-        return default
+        try:
+            # Wert, Rest-TTL und Tags in einem Roundtrip, damit L1 nicht länger
+            # lebt als L2 und lokal per Tag invalidiert werden kann
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.get(cache_key)
+            pipe.pttl(cache_key)
+            pipe.smembers(f"{KEY_TAGS_PREFIX}{cache_key}")
+            cached_data, pttl, tag_members = await pipe.execute()
+            await redis_conn.close()
+            if cached_data:
+                value = self.serializer.loads(cached_data)
+                # Promote to L1
+                l1_ttl = pttl / 1000 if pttl and pttl > 0 else None
+                tags = [t.decode() if isinstance(t, bytes) else t for t in tag_members or ()]
+                self.l1.set(cache_key, value, ttl=l1_ttl, tags=tags)
+                return value
+        except Exception as e:
+            logger.error(f"Redis get error: {e}")
+        
+        return MISSING
+    
+    async def get_or_compute(
+        self,
+        cache_key: str,
+        compute: Callable[[], Any],
+        ttl: int = 3600,
+        layer_config: Dict[str, bool] = None,
+        distributed_lock: bool = False,
+        lease_timeout: Optional[float] = None,
+        tags: Optional[List[str]] = None
+    ) -> Any:
+        """
+        Holt Wert oder berechnet ihn genau einmal (Stampede-Schutz)
+        
+        - In-Process: gleichzeitige Aufrufer für denselben Key warten auf
+          die Berechnung des ersten Aufrufers statt selbst zu rechnen
+        - distributed_lock: zusätzlich Redis-Lease, damit flottenweit nur
+          ein Worker neu berechnet; die übrigen warten auf den L2-Eintrag
+        """
+        value = await self.get(cache_key, MISSING, layer_config)
+        if value is not MISSING:
+            return value
+        
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            self.stats["coalesced_calls"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # Leader wurde abgebrochen - Berechnung selbst übernehmen
+                return await self.get_or_compute(
+                    cache_key, compute, ttl, layer_config, distributed_lock, lease_timeout, tags
+                )
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        self.stats["singleflight_leaders"] += 1
+        
+        try:
+            if distributed_lock:
+                value = await self._compute_with_lease(
+                    cache_key, compute, ttl, layer_config,
+                    lease_timeout or self.lease_timeout, tags
+                )
+            else:
+                value = await self._compute_and_store(cache_key, compute, ttl, layer_config, tags)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Exception als abgeholt markieren, falls keine Wartenden existieren
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+    
+    async def _compute_and_store(
+        self,
+        cache_key: str,
+        compute: Callable[[], Any],
+        ttl: int,
+        layer_config: Optional[Dict[str, bool]],
+        tags: Optional[List[str]] = None
+    ) -> Any:
+        """Führt Berechnung aus und schreibt das Ergebnis in den Cache"""
+        value = await compute()
+        await self.set(cache_key, value, ttl, layer_config, tags=tags)
+        return value
+    
+    async def _compute_with_lease(
+        self,
+        cache_key: str,
+        compute: Callable[[], Any],
+        ttl: int,
+        layer_config: Optional[Dict[str, bool]],
+        lease_timeout: float,
+        tags: Optional[List[str]] = None
+    ) -> Any:
+        """Berechnung unter Redis-Lease (SET NX PX) mit Warten auf fremden Lease"""
+        redis_conn = await self.get_redis_connection()
+        if not redis_conn:
+            return await self._compute_and_store(cache_key, compute, ttl, layer_config, tags)
+        
+        lease_key = f"lease:{cache_key}"
+        token = uuid.uuid4().hex
+        
+        try:
+            acquired = await redis_conn.set(
+                lease_key, token, nx=True, px=int(lease_timeout * 1000)
+            )
+        except Exception as e:
+            # Ohne Redis kein Lease - lokal berechnen statt zu blockieren
+            logger.error(f"Redis lease error: {e}")
+            await redis_conn.close()
+            return await self._compute_and_store(cache_key, compute, ttl, layer_config, tags)
+        
+        if acquired:
+            self.stats["lease_acquired"] += 1
+            try:
+                return await self._compute_and_store(cache_key, compute, ttl, layer_config, tags)
+            finally:
+                try:
+                    await redis_conn.eval(_RELEASE_LEASE_SCRIPT, 1, lease_key, token)
+                except Exception as e:
+                    logger.error(f"Redis lease release error: {e}")
+                await redis_conn.close()
+        
+        # Ein anderer Worker berechnet - auf dessen Ergebnis in L2 warten
+        self.stats["lease_waits"] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lease_timeout
+        try:
+            while loop.time() < deadline:
+                await asyncio.sleep(self.lease_poll_interval)
+                pipe = redis_conn.pipeline(transaction=False)
+                pipe.exists(cache_key)
+                pipe.exists(lease_key)
+                value_exists, lease_exists = await pipe.execute()
+                if value_exists:
+                    value = await self._get_l2(cache_key)
+                    if value is not MISSING:
+                        self.stats["lease_wait_hits"] += 1
+                        return value
+                if not lease_exists:
+                    # Leader ist ohne Ergebnis ausgestiegen
+                    break
+            else:
+                self.stats["lease_timeouts"] += 1
+        except Exception as e:
+            logger.error(f"Redis lease wait error: {e}")
+        finally:
+            await redis_conn.close()
+        
+        return await self._compute_and_store(cache_key, compute, ttl, layer_config, tags)
+    
+    async def get_or_compute_swr(
+        self,
+        cache_key: str,
+        compute: Callable[[], Any],
+        ttl: int = 3600,
+        soft_ttl: Optional[int] = None,
+        refresh_ahead: Optional[float] = None,
+        layer_config: Dict[str, bool] = None,
+        distributed_lock: bool = False,
+        lease_timeout: Optional[float] = None,
+        tags: Optional[List[str]] = None
+    ) -> Any:
+        """
+        Stale-While-Revalidate mit optionalem Refresh-Ahead
+        
+        - bis soft_ttl: frischer Wert
+        - zwischen soft_ttl und ttl (hard): alter Wert sofort, ein Hintergrund-Refresh
+        - refresh_ahead: Lesezugriffe in den letzten N Sekunden vor soft_ttl
+          stoßen den Refresh schon vor dem Ablauf an
+        - nach ttl: synchrone Neuberechnung (mit Single-Flight)
+        """
+        if soft_ttl is None:
+            soft_ttl = ttl
+        
+        async def compute_entry():
+            return _make_swr_entry(await compute(), soft_ttl)
+        
+        entry = await self.get(cache_key, MISSING, layer_config)
+        if _is_swr_entry(entry):
+            remaining = entry["fresh_until"] - time.time()
+            if remaining <= 0:
+                self.stats["stale_served"] += 1
+                self._schedule_refresh(
+                    cache_key, compute_entry, ttl, layer_config, distributed_lock, lease_timeout, tags
+                )
+            elif refresh_ahead and remaining <= refresh_ahead:
+                self.stats["refresh_ahead_triggers"] += 1
+                self._schedule_refresh(
+                    cache_key, compute_entry, ttl, layer_config, distributed_lock, lease_timeout, tags
+                )
+            return entry["value"]
+        
+        entry = await self.get_or_compute(
+            cache_key, compute_entry, ttl, layer_config,
+            distributed_lock=distributed_lock, lease_timeout=lease_timeout, tags=tags
+        )
+        return entry["value"]
+    
+    def _schedule_refresh(
+        self,
+        cache_key: str,
+        compute: Callable[[], Any],
+        ttl: int,
+        layer_config: Optional[Dict[str, bool]],
+        distributed_lock: bool,
+        lease_timeout: Optional[float],
+        tags: Optional[List[str]] = None
+    ):
+        """Startet genau einen Hintergrund-Refresh pro Key und Prozess"""
+        if cache_key in self._inflight:
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        self.stats["background_refreshes"] += 1
+        
+        task = asyncio.create_task(self._background_refresh(
+            cache_key, future, compute, ttl, layer_config,
+            distributed_lock, lease_timeout or self.lease_timeout, tags
+        ))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+    
+    async def _background_refresh(
+        self,
+        cache_key: str,
+        future: asyncio.Future,
+        compute: Callable[[], Any],
+        ttl: int,
+        layer_config: Optional[Dict[str, bool]],
+        distributed_lock: bool,
+        lease_timeout: float,
+        tags: Optional[List[str]] = None
+    ):
+        """Berechnet Wert im Hintergrund neu; bei Fehler bleibt der alte Wert bestehen"""
+        redis_conn = None
+        lease_key = f"lease:{cache_key}"
+        token = None
+        try:
+            if distributed_lock:
+                redis_conn = await self.get_redis_connection()
+                if redis_conn:
+                    token = uuid.uuid4().hex
+                    acquired = await redis_conn.set(
+                        lease_key, token, nx=True, px=int(lease_timeout * 1000)
+                    )
+                    if not acquired:
+                        # Ein anderer Worker refresht bereits
+                        token = None
+                        future.cancel()
+                        return
+                    self.stats["lease_acquired"] += 1
+            
+            value = await self._compute_and_store(cache_key, compute, ttl, layer_config, tags)
+            future.set_result(value)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.stats["background_refresh_errors"] += 1
+            logger.error(f"Background refresh error for {cache_key}: {e}")
+            future.set_exception(e)
+            future.exception()
+        finally:
+            self._inflight.pop(cache_key, None)
+            if redis_conn:
+                if token:
+                    try:
+                        await redis_conn.eval(_RELEASE_LEASE_SCRIPT, 1, lease_key, token)
+                    except Exception as e:
+                        logger.error(f"Redis lease release error: {e}")
+                await redis_conn.close()
     
     async def set(
         self, 
         cache_key: str, 
         value: Any, 
         ttl: int = 3600,
-        layer_config: Dict[str, bool] = None
+        layer_config: Dict[str, bool] = None,
+        tags: Optional[List[str]] = None
     ):
         """
         Setzt Wert in Multi-Layer Cache
+        tags: Gruppen-Tags für invalidate_tag()
         """
         if layer_config is None:
             layer_config = {"l1": True, "l2": True}
         
-        # L1: Memory Cache
+        # L1: Memory Cache (gleiche TTL wie L2)
         if layer_config.get("l1", True):
-            self._manage_l1_size()
-            self.l1_cache[cache_key] = value
-            self.l1_access_times[cache_key] = datetime.now()
+            self.l1.set(cache_key, value, ttl=ttl, tags=tags)
+        
+        # L3: Persistenter Cache (Write-Behind, nur auf Anforderung)
+        if layer_config.get("l3", False):
+            self.l3.put(cache_key, value, ttl, tags)
         
         # L2: Redis Cache
         if layer_config.get("l2", True):
             redis_conn = await self.get_redis_connection()
             if redis_conn:
                 try:
-                    await redis_conn.setex(
-                        cache_key, 
-                        ttl, 
-                        pickle.dumps(value)
-                    )
+                    payload = self.serializer.dumps(value)
+                    if tags:
+                        await redis_conn.eval(
+                            _SET_WITH_TAGS_SCRIPT,
+                            2 + len(tags),
+                            cache_key,
+                            f"{KEY_TAGS_PREFIX}{cache_key}",
+                            *[f"{TAG_SET_PREFIX}{tag}" for tag in tags],
+                            int(ttl),
+                            payload
+                        )
+                    else:
+                        await redis_conn.setex(cache_key, ttl, payload)
                     await redis_conn.close()
+                    # Andere Instanzen verwerfen ihre veraltete L1-Kopie
+                    self.invalidation_bus.publish_key(cache_key)
                 except Exception as e:
                     logger.error(f"Redis set error: {e}")
     
     async def delete(self, cache_key: str):
         """Löscht aus allen Cache-Layern"""
-        # L1
-        self.l1_cache.pop(cache_key, None)
-        self.l1_access_times.pop(cache_key, None)
+        # L1 (lokal und auf allen anderen Instanzen)
+        self.l1.delete(cache_key)
+        self.invalidation_bus.publish_key(cache_key)
         
-        # L2
+        # L2 (Tag-Zuordnung des Keys gleich mit; verwaiste Mitglieder in
+        # Tag-Sets sind harmlos und verschwinden mit deren TTL)
         redis_conn = await self.get_redis_connection()
         if redis_conn:
             try:
-                await redis_conn.delete(cache_key)
+                await redis_conn.delete(cache_key, f"{KEY_TAGS_PREFIX}{cache_key}")
                 await redis_conn.close()
             except Exception as e:
                 logger.error(f"Redis delete error: {e}")
+        
+        # L3 (Write-Behind; ohne L3-Einträge kein Datenbank-Roundtrip)
+        await self.l3.delete(cache_key)
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """
+        Invalidiert alle Einträge eines Tags in O(Mitglieder)
+        L1 über den Reverse-Index, L2 über das Redis-Set tag:<tag>
+        """
+        removed = self.l1.invalidate_tag(tag)
+        self.invalidation_bus.publish_tag(tag)
+        
+        redis_conn = await self.get_redis_connection()
+        if redis_conn:
+            try:
+                removed = max(
+                    removed,
+                    await redis_conn.eval(_INVALIDATE_TAG_SCRIPT, 1, f"{TAG_SET_PREFIX}{tag}")
+                )
+                await redis_conn.close()
+            except Exception as e:
+                logger.error(f"Redis tag invalidation error: {e}")
+        
+        await self.l3.invalidate_tag(tag)
+        
+        self.stats["tag_invalidations"] += 1
+        self.stats["tag_invalidated_keys"] += removed
+        return removed
     
-    async def clear_pattern(self, pattern: str):
-        """Löscht Cache-Einträge nach Pattern"""
-        # L1: Ineffizient aber notwendig
-        keys_to_delete = [key for key in self.l1_cache.keys() if pattern in key]
+    async def clear_pattern(self, pattern: str, scan_count: int = 1000):
+        """
+        Löscht Cache-Einträge nach Substring-Pattern (Legacy)
+        Neue Aufrufer sollten Tags + invalidate_tag() verwenden
+        """
+        self.stats["pattern_invalidations"] += 1
+        
+        # L1: Linearer Scan - nur für Legacy-Patterns ohne Tag
+        keys_to_delete = [key for key in self.l1.keys() if pattern in key]
         for key in keys_to_delete:
-            self.l1_cache.pop(key, None)
-            self.l1_access_times.pop(key, None)
+            self.l1.delete(key)
+        self.invalidation_bus.publish_pattern(pattern)
         
-        # L2: Redis Pattern Delete
+        # L2: SCAN statt KEYS, damit Redis nicht für den ganzen Keyspace blockiert
         redis_conn = await self.get_redis_connection()
         if redis_conn:
             try:
-                keys = await redis_conn.keys(f"*{pattern}*")
-                if keys:
-                    await redis_conn.delete(*keys)
+                batch = []
+                async for key in redis_conn.scan_iter(match=f"*{pattern}*", count=scan_count):
+                    batch.append(key)
+                    if len(batch) >= 500:
+                        await redis_conn.unlink(*batch)
+                        batch = []
+                if batch:
+                    await redis_conn.unlink(*batch)
                 await redis_conn.close()
             except Exception as e:
                 logger.error(f"Redis pattern delete error: {e}")
+        
+        await self.l3.clear_pattern(pattern)
+    
+    async def start(self):
+        """Startet Hintergrunddienste: Invalidierungs-Bus und L3 (im App-Lifespan aufrufen)"""
+        if settings.CACHE_INVALIDATION_ENABLED and self.redis_client:
+            await self.invalidation_bus.start()
+        if settings.CACHE_L3_ENABLED:
+            try:
+                await self.l3.start()
+            except Exception as e:
+                # Ohne L3 läuft der Cache zweistufig weiter
+                logger.error(f"L3 cache start failed: {e}")
+    
+    async def stop(self):
+        """Stoppt Hintergrunddienste und schreibt ausstehende L3-Einträge"""
+        await self.invalidation_bus.stop()
+        await self.l3.stop()
     
     def get_stats(self) -> Dict[str, Any]:
         """Cache-Performance-Statistiken"""
@@ -203,20 +663,60 @@ class MultiLayerCache:
             **self.stats,
             "l1_hit_rate": (self.stats["l1_hits"] / total) * 100,
             "l2_hit_rate": (self.stats["l2_hits"] / total) * 100,
-            "overall_hit_rate": ((self.stats["l1_hits"] + self.stats["l2_hits"]) / total) * 100,
-            "l1_size": len(self.l1_cache)
+            "l3_hit_rate": (self.stats["l3_hits"] / total) * 100,
+            "overall_hit_rate": (
+                (self.stats["l1_hits"] + self.stats["l2_hits"] + self.stats["l3_hits"]) / total
+            ) * 100,
+            "l1_size": len(self.l1),
+            "l1_bytes": self.l1.current_bytes,
+            "l1_max_bytes": self.l1.max_bytes,
+            "l1_evictions": self.l1.stats["evictions"],
+            "l1_expirations": self.l1.stats["expirations"],
+            "inflight_computations": len(self._inflight),
+            "serialization": self.serializer.get_stats(),
+            "invalidation_bus": self.invalidation_bus.get_stats(),
+            "l3": self.l3.get_stats()
         }
 
 
+def _make_swr_entry(value: Any, soft_ttl: float) -> Dict[str, Any]:
+    """Hüllt Wert mit Frische-Zeitpunkt ein (Wall-Clock, da über Worker geteilt)"""
+    return {"__swr__": 1, "value": value, "fresh_until": time.time() + soft_ttl}
+
+
+def _is_swr_entry(entry: Any) -> bool:
+    return isinstance(entry, dict) and entry.get("__swr__") == 1
+
+
 # Globale Cache-Instanz
 cache = MultiLayerCache()
 
+metrics.register_stats(
+    "agentland_cache",
+    lambda: {
+        **cache.stats,
+        "l1_entries": len(cache.l1),
+        "l1_bytes": cache.l1.current_bytes,
+        "l1_evictions": cache.l1.stats["evictions"],
+        "l1_expirations": cache.l1.stats["expirations"],
+        "inflight_computations": len(cache._inflight),
+    },
+    "Multi-Layer-Cache",
+    gauges={"l1_entries": "sum", "l1_bytes": "sum", "inflight_computations": "sum"},
+)
+
 
 def cached(
     prefix: str = "default",
     ttl: int = 3600,
     key_params: List[str] = None,
-    layer_config: Dict[str, bool] = None
+    layer_config: Dict[str, bool] = None,
+    single_flight: bool = True,
+    distributed_lock: bool = False,
+    lease_timeout: Optional[float] = None,
+    soft_ttl: Optional[int] = None,
+    refresh_ahead: Optional[float] = None,
+    tags: Union[List[str], Callable[..., List[str]], None] = None
 ):
     """
     Decorator für automatisches Caching von Funktionsergebnissen
@@ -226,7 +726,20 @@ def cached(
         ttl: Time-to-Live in Sekunden
         key_params: Parameter für Cache-Key-Generierung
         layer_config: Welche Cache-Layer verwenden
+        single_flight: Gleichzeitige Misses im Prozess zu einer Berechnung bündeln
+        distributed_lock: Redis-Lease, damit nur ein Worker der Flotte neu berechnet
+        lease_timeout: Lease-Dauer in Sekunden (Default: CACHE_LEASE_TIMEOUT)
+        soft_ttl: Frische-Dauer; danach wird bis ttl (hard) der alte Wert geliefert
+            und im Hintergrund neu berechnet (Stale-While-Revalidate)
+        refresh_ahead: Sekunden vor Ablauf von soft_ttl, in denen ein Lesezugriff
+            bereits eine Hintergrund-Neuberechnung auslöst
+        tags: Tags für invalidate_tag(); Liste oder Callable(*args, **kwargs) -> Liste
     """
+    if soft_ttl is not None and soft_ttl > ttl:
+        raise ValueError("soft_ttl darf nicht größer als ttl (hard TTL) sein")
+    
+    use_swr = soft_ttl is not None or refresh_ahead is not None
+    
     def decorator(func: Callable):
         @wraps(func)
         async def wrapper(*args, **kwargs):
@@ -237,6 +750,32 @@ def cached(
                 cache_params = kwargs
             
             cache_key = cache._generate_cache_key(f"{prefix}:{func.__name__}", cache_params)
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            
+            if use_swr:
+                # Eigener Key-Raum, da SWR-Einträge eine Hülle um den Wert tragen
+                return await cache.get_or_compute_swr(
+                    f"{cache_key}:swr",
+                    lambda: func(*args, **kwargs),
+                    ttl,
+                    soft_ttl=soft_ttl,
+                    refresh_ahead=refresh_ahead,
+                    layer_config=layer_config,
+                    distributed_lock=distributed_lock,
+                    lease_timeout=lease_timeout,
+                    tags=entry_tags
+                )
+            
+            if single_flight or distributed_lock:
+                return await cache.get_or_compute(
+                    cache_key,
+                    lambda: func(*args, **kwargs),
+                    ttl,
+                    layer_config,
+                    distributed_lock=distributed_lock,
+                    lease_timeout=lease_timeout,
+                    tags=entry_tags
+                )
             
             # Versuche aus Cache zu holen
             cached_result = await cache.get(cache_key)
@@ -247,27 +786,53 @@ def cached(
             result = await func(*args, **kwargs)
             
             # Speichere in Cache
-            await cache.set(cache_key, result, ttl, layer_config)
+            await cache.set(cache_key, result, ttl, layer_config, tags=entry_tags)
             
             return result
         return wrapper
     return decorator
 
 
+async def _embed_prompt(text: str):
+    """Berechnet normalisiertes Prompt-Embedding im Threadpool (blockiert den Event-Loop nicht)"""
+    model = await asyncio.to_thread(get_embedding_model)
+    return await asyncio.to_thread(model.encode, text, normalize_embeddings=True)
+
+
 class AIResponseCache:
     """
     Spezieller Cache für AI-Responses zur Kosteneinsparung
-    Aggressives Caching für ähnliche Anfragen
+    Semantische Suche über Prompt-Embeddings statt difflib:
+    Paraphrasen treffen den Cache, die Suche kostet eine Matrix-Multiplikation.
+    In Redis liegt jeder Eintrag als eigenes Hash-Feld (atomares Append,
+    LRU/LFU-Eviction im Lua-Skript) statt eines Read-Modify-Write-Blobs;
+    L3 hält jeden Eintrag zusätzlich, damit Responses einen Redis-Flush überleben.
     """
     
     def __init__(self):
-        self.similarity_threshold = 0.85
-        self.context_cache = {}
+        self.similarity_threshold = settings.AI_CACHE_SIMILARITY_THRESHOLD
+        
+        embedder = _embed_prompt if importlib.util.find_spec("sentence_transformers") else None
+        if embedder is None:
+            logger.warning("sentence_transformers nicht installiert - AI-Cache nur mit exakten Treffern")
+        
+        self.semantic = SemanticCache(
+            embedder=embedder,
+            similarity_threshold=self.similarity_threshold,
+            partition_capacity=settings.AI_CACHE_PARTITION_SIZE,
+            store=RedisSemanticStore(
+                cache.get_redis_connection,
+                prefix="ai_semantic",
+                eviction=settings.AI_CACHE_EVICTION,
+                capacity=settings.AI_CACHE_PARTITION_SIZE,
+                persistent=cache.l3,
+            ),
+            sync_interval=settings.AI_CACHE_SYNC_INTERVAL,
+        )
     
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """Berechnet Ähnlichkeit zwischen zwei Texten"""
-        import difflib
-        return difflib.SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
+    @staticmethod
+    def _context_key(context: Optional[str]) -> str:
+        return hashlib.md5(context.encode() if context else b'').hexdigest()
     
     async def get_similar_response(
         self, 
@@ -275,20 +840,9 @@ class AIResponseCache:
         context: str = None
     ) -> Optional[str]:
         """
-        Sucht nach ähnlichen AI-Responses im Cache
+        Sucht nach semantisch ähnlichen AI-Responses im Cache
         """
-        cache_key = f"ai_responses:{hashlib.md5(context.encode() if context else b'').hexdigest()}"
-        
-        # Hole alle Responses für diesen Kontext
-        cached_responses = await cache.get(cache_key, {})
-        
-        for cached_prompt, response in cached_responses.items():
-            similarity = self._calculate_similarity(prompt, cached_prompt)
-            if similarity >= self.similarity_threshold:
-                logger.info(f"AI Cache hit (similarity: {similarity:.2f})")
-                return response
-        
-        return None
+        return await self.semantic.lookup(self._context_key(context), prompt)
     
     async def store_response(
         self, 
@@ -300,61 +854,168 @@ class AIResponseCache:
         """
         Speichert AI-Response mit Kontext
         """
-        cache_key = f"ai_responses:{hashlib.md5(context.encode() if context else b'').hexdigest()}"
-        
-        # Hole existierende Responses
-        cached_responses = await cache.get(cache_key, {})
-        
-        # Füge neue Response hinzu
-        cached_responses[prompt] = response
-        
-        # Begrenze Anzahl der gespeicherten Responses pro Kontext
-        if len(cached_responses) > 50:
-            # Entferne älteste (einfache FIFO-Strategie)
-            oldest_key = next(iter(cached_responses))
-            del cached_responses[oldest_key]
-        
-        await cache.set(cache_key, cached_responses, ttl)
+        await self.semantic.store_response(self._context_key(context), prompt, response, ttl)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return self.semantic.get_stats()
 
 
 # Globale AI-Cache-Instanz
 ai_cache = AIResponseCache()
 
+metrics.register_stats("agentland_ai_cache", lambda: ai_cache.semantic.stats, "Semantischer AI-Response-Cache")
+
 
 class PerformanceMonitor:
     """
     Monitor für Cache-Performance und automatische Optimierung
+    Latenzen laufen in mergebare Quantil-Sketches pro Methode, Route-Template
+    und Status (10s-Scheiben, Rolling-Windows 1m/5m/1h). Abgeschlossene
+    Scheiben werden nach Redis publiziert, damit /metrics die Latenz
+    aller Worker zeigt statt der letzten Samples eines Prozesses.
     """
     
-    def __init__(self):
-        self.response_times = []
+    def __init__(self, slot_seconds: int = 10, retention_seconds: int = 3600):
+        self.sketches = WindowedSketches(slot_seconds=slot_seconds, retention_seconds=retention_seconds)
+        self.worker_id = uuid.uuid4().hex[:12]
         self.cache_efficiency = []
         self.last_optimization = datetime.now()
+        self._publisher_task: Optional[asyncio.Task] = None
     
-    def record_response_time(self, response_time: float):
-        """Zeichnet Response-Zeit auf"""
-        self.response_times.append(response_time)
-        if len(self.response_times) > 1000:
-            self.response_times = self.response_times[-1000:]  # Behalte nur letzte 1000
+    def record_response_time(
+        self,
+        response_time: float,
+        route: str = "unmatched",
+        method: str = "-",
+        status: int = 0,
+    ):
+        """Zeichnet Response-Zeit (Sekunden) für Route-Template/Methode/Status auf"""
+        self.sketches.record((method, route, str(status)), response_time * 1000)
     
     def get_performance_metrics(self) -> Dict[str, Any]:
-        """Gibt Performance-Metriken zurück"""
-        if not self.response_times:
+        """Gibt Performance-Metriken dieses Workers zurück"""
+        recent = merge_all(self.sketches.window(DEFAULT_WINDOWS["5m"]).values())
+        if not recent.count:
             return {}
         
-        avg_response_time = sum(self.response_times) / len(self.response_times)
-        p95_response_time = sorted(self.response_times)[int(len(self.response_times) * 0.95)]
-        
         cache_stats = cache.get_stats()
         
         return {
-            "avg_response_time": avg_response_time,
-            "p95_response_time": p95_response_time,
+            "avg_response_time": recent.sum / recent.count / 1000,
+            "p95_response_time": recent.quantile(0.95) / 1000,
+            "latency": self._report(self.sketches.window),
             "cache_stats": cache_stats,
             "cost_savings": self._calculate_cost_savings(cache_stats),
             "recommendations": self._get_optimization_recommendations(cache_stats)
         }
     
+    @staticmethod
+    def _report(window: Callable[[int], Dict]) -> Dict[str, Any]:
+        """p50/p90/p99/p999 gesamt und pro Route für alle Rolling-Windows"""
+        report = {}
+        for name, seconds in DEFAULT_WINDOWS.items():
+            sketches = window(seconds)
+            routes = group_by(sketches, lambda labels: " ".join(labels))
+            report[name] = {
+                "overall": merge_all(sketches.values()).summary(),
+                "routes": {route: sketch.summary() for route, sketch in sorted(routes.items())},
+            }
+        return report
+    
+    async def get_fleet_latency(self) -> Dict[str, Any]:
+        """
+        Latenz-Report über alle Worker: abgeschlossene Scheiben aus Redis plus
+        die laufende Scheibe dieses Workers (andere Worker bis zu 10s verzögert)
+        """
+        local = self.sketches
+        slot_seconds = local.slot_seconds
+        current = int(time.time() // slot_seconds) * slot_seconds
+        slot_starts = list(range(current - local.retention_seconds, current, slot_seconds))
+        
+        redis_conn = await cache.get_redis_connection()
+        if not redis_conn:
+            return {"workers": 1, "source": "local", **self._report(local.window)}
+        
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            for slot_start in slot_starts:
+                pipe.hgetall(f"perf:latency:{slot_start}")
+            results = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Fleet latency read error: {e}")
+            return {"workers": 1, "source": "local", **self._report(local.window)}
+        finally:
+            await redis_conn.close()
+        
+        slots: Dict[int, List[Dict]] = {}
+        workers = {self.worker_id}
+        for slot_start, fields in zip(slot_starts, results):
+            for worker, payload in (fields or {}).items():
+                workers.add(worker.decode() if isinstance(worker, bytes) else worker)
+                data = json.loads(payload)
+                slots.setdefault(slot_start, []).append({
+                    tuple(labels.split("|")): LatencySketch.from_dict(sketch)
+                    for labels, sketch in data.items()
+                })
+        if current in local.slots:
+            slots.setdefault(current, []).append(local.slots[current])
+        
+        def window(seconds: int) -> Dict:
+            cutoff = current - seconds + slot_seconds
+            return merge_slots(
+                slot
+                for slot_start, worker_slots in slots.items() if slot_start >= cutoff
+                for slot in worker_slots
+            )
+        
+        return {"workers": len(workers), "source": "fleet", **self._report(window)}
+    
+    async def start(self):
+        """Startet die Veröffentlichung abgeschlossener Scheiben nach Redis"""
+        if self._publisher_task is None:
+            self._publisher_task = asyncio.create_task(self._publish_loop())
+    
+    async def stop(self):
+        if self._publisher_task is not None:
+            self._publisher_task.cancel()
+            try:
+                await self._publisher_task
+            except asyncio.CancelledError:
+                pass
+            self._publisher_task = None
+    
+    async def _publish_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.sketches.slot_seconds)
+                await self.publish_closed_slots()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Latency sketch publish error: {e}")
+    
+    async def publish_closed_slots(self):
+        """Schreibt abgeschlossene Scheiben als ein Hash-Feld pro Worker"""
+        closed = self.sketches.drain_closed()
+        if not closed:
+            return
+        redis_conn = await cache.get_redis_connection()
+        if not redis_conn:
+            return
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            for slot_start, slot in closed:
+                payload = json.dumps(
+                    {"|".join(labels): sketch.to_dict() for labels, sketch in slot.items()},
+                    separators=(",", ":"),
+                )
+                key = f"perf:latency:{slot_start}"
+                pipe.hset(key, self.worker_id, payload)
+                pipe.expire(key, self.sketches.retention_seconds + self.sketches.slot_seconds)
+            await pipe.execute()
+        finally:
+            await redis_conn.close()
+    
     def _calculate_cost_savings(self, cache_stats: Dict[str, Any]) -> Dict[str, Any]:
         """Berechnet AI-Kosteneinsparungen durch Caching"""
         hit_rate = cache_stats.get("overall_hit_rate", 0)
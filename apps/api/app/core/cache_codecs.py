@@ -0,0 +1,282 @@
+"""
+Serialisierung und Kompression für L2-Cache-Werte
+Schnelle Codecs (orjson/msgpack) statt pickle, Roh-Bytes für HTTP-Bodies
+und transparente Kompression (zstd/lz4/zlib) oberhalb eines Schwellwerts
+
+Optionale Pakete: orjson, msgpack, zstandard, lz4 - fehlt eines,
+wird automatisch auf den nächsten verfügbaren Codec ausgewichen.
+"""
+
+import json
+import logging
+import pickle
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+# Header: MAGIC | Codec-ID | Kompressions-ID
+# pickle-Daten ohne Header beginnen mit 0x80 und bleiben so lesbar (Rollout)
+MAGIC = 0xCA
+HEADER_SIZE = 3
+
+CODEC_PICKLE = 0
+CODEC_RAW = 1
+CODEC_ORJSON = 2
+CODEC_MSGPACK = 3
+CODEC_JSON = 4
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_LZ4 = 3
+
+CODEC_NAMES = {
+    CODEC_PICKLE: "pickle",
+    CODEC_RAW: "raw",
+    CODEC_ORJSON: "orjson",
+    CODEC_MSGPACK: "msgpack",
+    CODEC_JSON: "json",
+}
+
+COMPRESSION_NAMES = {
+    COMPRESSION_NONE: "none",
+    COMPRESSION_ZLIB: "zlib",
+    COMPRESSION_ZSTD: "zstd",
+    COMPRESSION_LZ4: "lz4",
+}
+
+
+def _is_json_shaped(value: Any, allow_bytes: bool = False, _depth: int = 0) -> bool:
+    """Prüft, ob ein Wert verlustfrei als JSON (bzw. msgpack mit Bytes) abbildbar ist"""
+    if value is None or isinstance(value, (str, bool, float)):
+        return True
+    if isinstance(value, int):
+        # orjson unterstützt nur 64-Bit-Integer
+        return -(2 ** 63) <= value < 2 ** 64
+    if allow_bytes and isinstance(value, bytes):
+        return True
+    if _depth > 32:
+        return False
+    if isinstance(value, dict):
+        return all(
+            isinstance(k, str) and _is_json_shaped(v, allow_bytes, _depth + 1)
+            for k, v in value.items()
+        )
+    # Tupel würden als Liste zurückkommen - daher nur echte Listen
+    if isinstance(value, list):
+        return all(_is_json_shaped(v, allow_bytes, _depth + 1) for v in value)
+    return False
+
+
+def _build_codecs() -> Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    codecs = {
+        CODEC_PICKLE: (
+            lambda v: pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL),
+            pickle.loads,
+        ),
+        CODEC_RAW: (bytes, bytes),
+        CODEC_JSON: (
+            lambda v: json.dumps(v, separators=(",", ":"), ensure_ascii=False).encode(),
+            json.loads,
+        ),
+    }
+    if orjson is not None:
+        codecs[CODEC_ORJSON] = (orjson.dumps, orjson.loads)
+    if msgpack is not None:
+        codecs[CODEC_MSGPACK] = (
+            lambda v: msgpack.packb(v, use_bin_type=True),
+            lambda b: msgpack.unpackb(b, raw=False),
+        )
+    return codecs
+
+
+def _build_compressors(level: Optional[int]) -> Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    compressors = {
+        COMPRESSION_ZLIB: (
+            lambda b: zlib.compress(b, 6 if level is None else level),
+            zlib.decompress,
+        ),
+    }
+    if zstandard is not None:
+        zstd_compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        zstd_decompressor = zstandard.ZstdDecompressor()
+        compressors[COMPRESSION_ZSTD] = (
+            zstd_compressor.compress,
+            zstd_decompressor.decompress,
+        )
+    if lz4_frame is not None:
+        compressors[COMPRESSION_LZ4] = (
+            lambda b: lz4_frame.compress(b, compression_level=0 if level is None else level),
+            lz4_frame.decompress,
+        )
+    return compressors
+
+
+class CacheSerializer:
+    """
+    Pluggable Codec-Layer für L2-Werte
+
+    - bytes            -> raw (Durchreichen ohne Kopie in pickle)
+    - JSON-förmig      -> orjson (Fallback: msgpack, json)
+    - JSON + bytes     -> msgpack (falls installiert)
+    - alles andere     -> pickle
+    Ab compression_threshold Bytes wird komprimiert, sofern es >10% spart.
+    """
+
+    def __init__(
+        self,
+        codec: str = "auto",
+        compression: str = "auto",
+        compression_threshold: int = 1024,
+        compression_level: Optional[int] = None,
+    ):
+        self._codecs = _build_codecs()
+        self._compressors = _build_compressors(compression_level)
+        self.compression_threshold = compression_threshold
+
+        self.preferred_json_codec = self._resolve_codec(codec)
+        self.compression_id = self._resolve_compression(compression)
+
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def _resolve_codec(self, codec: str) -> int:
+        by_name = {name: cid for cid, name in CODEC_NAMES.items()}
+        if codec != "auto":
+            cid = by_name.get(codec)
+            if cid is None or cid not in self._codecs:
+                logger.warning(f"Cache codec '{codec}' nicht verfügbar - verwende auto")
+            else:
+                return cid
+        for cid in (CODEC_ORJSON, CODEC_MSGPACK, CODEC_JSON):
+            if cid in self._codecs:
+                return cid
+        return CODEC_PICKLE
+
+    def _resolve_compression(self, compression: str) -> int:
+        by_name = {name: cid for cid, name in COMPRESSION_NAMES.items()}
+        if compression != "auto":
+            cid = by_name.get(compression)
+            if cid == COMPRESSION_NONE:
+                return COMPRESSION_NONE
+            if cid is None or cid not in self._compressors:
+                logger.warning(f"Cache compression '{compression}' nicht verfügbar - verwende auto")
+            else:
+                return cid
+        for cid in (COMPRESSION_ZSTD, COMPRESSION_LZ4, COMPRESSION_ZLIB):
+            if cid in self._compressors:
+                return cid
+        return COMPRESSION_NONE
+
+    def _select_codec(self, value: Any) -> int:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return CODEC_RAW
+        if self.preferred_json_codec == CODEC_PICKLE:
+            return CODEC_PICKLE
+        if _is_json_shaped(value):
+            return self.preferred_json_codec
+        if CODEC_MSGPACK in self._codecs and _is_json_shaped(value, allow_bytes=True):
+            return CODEC_MSGPACK
+        return CODEC_PICKLE
+
+    def _record(self, name: str, field: str, elapsed_ns: int, raw_bytes: int = 0, stored_bytes: int = 0):
+        entry = self.stats.get(name)
+        if entry is None:
+            entry = self.stats[name] = {
+                "encodes": 0, "encode_ns": 0, "decodes": 0, "decode_ns": 0,
+                "raw_bytes": 0, "stored_bytes": 0,
+            }
+        entry[field + "s"] += 1
+        entry[field + "_ns"] += elapsed_ns
+        entry["raw_bytes"] += raw_bytes
+        entry["stored_bytes"] += stored_bytes
+
+    def dumps(self, value: Any) -> bytes:
+        """Kodiert Wert inkl. 3-Byte-Header"""
+        start = time.perf_counter_ns()
+        codec_id = self._select_codec(value)
+        encode = self._codecs[codec_id][0]
+        try:
+            payload = encode(value)
+        except (TypeError, ValueError, OverflowError):
+            codec_id = CODEC_PICKLE
+            payload = self._codecs[CODEC_PICKLE][0](value)
+
+        raw_size = len(payload)
+        compression_id = COMPRESSION_NONE
+        if self.compression_id != COMPRESSION_NONE and raw_size >= self.compression_threshold:
+            compressed = self._compressors[self.compression_id][0](payload)
+            if len(compressed) < raw_size * 0.9:
+                payload = compressed
+                compression_id = self.compression_id
+
+        data = bytes((MAGIC, codec_id, compression_id)) + payload
+        self._record(
+            CODEC_NAMES[codec_id], "encode", time.perf_counter_ns() - start,
+            raw_bytes=raw_size, stored_bytes=len(data)
+        )
+        return data
+
+    def loads(self, data: bytes) -> Any:
+        """Dekodiert Wert anhand des Headers; Daten ohne Header gelten als pickle"""
+        start = time.perf_counter_ns()
+        if len(data) < HEADER_SIZE or data[0] != MAGIC:
+            value = pickle.loads(data)
+            self._record("legacy_pickle", "decode", time.perf_counter_ns() - start)
+            return value
+
+        codec_id, compression_id = data[1], data[2]
+        payload = memoryview(data)[HEADER_SIZE:]
+        if compression_id != COMPRESSION_NONE:
+            compressor = self._compressors.get(compression_id)
+            if compressor is None:
+                raise ValueError(
+                    f"Kompression {COMPRESSION_NAMES.get(compression_id, compression_id)} nicht installiert"
+                )
+            payload = compressor[1](payload)
+
+        codec = self._codecs.get(codec_id)
+        if codec is None:
+            raise ValueError(f"Codec {CODEC_NAMES.get(codec_id, codec_id)} nicht installiert")
+        value = codec[1](bytes(payload) if isinstance(payload, memoryview) else payload)
+
+        self._record(CODEC_NAMES[codec_id], "decode", time.perf_counter_ns() - start)
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Encode/Decode-Zeiten und Byte-Einsparung pro Codec"""
+        codecs = {}
+        for name, entry in self.stats.items():
+            codecs[name] = {
+                **entry,
+                "avg_encode_us": entry["encode_ns"] / entry["encodes"] / 1000 if entry["encodes"] else 0,
+                "avg_decode_us": entry["decode_ns"] / entry["decodes"] / 1000 if entry["decodes"] else 0,
+                "bytes_saved": entry["raw_bytes"] - entry["stored_bytes"],
+            }
+        return {
+            "json_codec": CODEC_NAMES[self.preferred_json_codec],
+            "compression": COMPRESSION_NAMES[self.compression_id],
+            "compression_threshold": self.compression_threshold,
+            "codecs": codecs,
+        }
@@ -0,0 +1,272 @@
+"""
+Invalidierungs-Bus für L1-Kohärenz zwischen API-Workern
+Deletes, Tag-Invalidierungen und Writes werden gebündelt über Redis Pub/Sub
+verteilt; jede Instanz wendet sie auf ihren lokalen L1-Cache an.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.l1_cache import L1Cache
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """
+    Redis-Pub/Sub-Bus für L1-Invalidierungen
+
+    - Batching: Invalidierungen werden für batch_window Sekunden gesammelt
+      und als eine kompakte Nachricht veröffentlicht
+    - Sequenznummern pro Instanz: eine Lücke (verlorene Nachricht,
+      fehlgeschlagenes Publish) führt beim Empfänger zu einem L1-Flush;
+      Publishes laufen seriell, damit die Reihenfolge erhalten bleibt
+    - Nach einem Reconnect des Subscribers wird L1 ebenfalls geleert,
+      da Nachrichten verpasst worden sein können
+    """
+
+    def __init__(
+        self,
+        l1: L1Cache,
+        connection_factory: Callable[[], Awaitable[Any]],
+        channel: str = "cache:invalidation",
+        batch_window: float = 0.01,
+        max_batch: int = 256,
+    ):
+        self.l1 = l1
+        self._connection_factory = connection_factory
+        self.channel = channel
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._last_seq: Dict[str, int] = {}
+
+        self._pending_keys: set = set()
+        self._pending_tags: set = set()
+        self._pending_patterns: set = set()
+        self._pending_flush = False
+        self._flush_task: Optional[asyncio.Task] = None
+        # Vergabe der Sequenz bis zum Publish exklusiv, sonst können sich
+        # parallele Flushes auf eigenen Verbindungen überholen
+        self._publish_lock = asyncio.Lock()
+        self._background_tasks: set = set()
+
+        self._listener_task: Optional[asyncio.Task] = None
+        self.running = False
+
+        self.stats = {
+            "published_messages": 0,
+            "published_ops": 0,
+            "publish_errors": 0,
+            "received_messages": 0,
+            "applied_ops": 0,
+            "gaps_detected": 0,
+            "full_flushes": 0,
+            "reconnects": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Senden
+    # ------------------------------------------------------------------
+
+    def publish_key(self, key: str):
+        if self.running:
+            self._pending_keys.add(key)
+            self._schedule_flush()
+
+    def publish_tag(self, tag: str):
+        if self.running:
+            self._pending_tags.add(tag)
+            self._schedule_flush()
+
+    def publish_pattern(self, pattern: str):
+        if self.running:
+            self._pending_patterns.add(pattern)
+            self._schedule_flush()
+
+    def publish_flush(self):
+        if self.running:
+            self._pending_flush = True
+            self._schedule_flush()
+
+    def _pending_count(self) -> int:
+        return (
+            len(self._pending_keys) + len(self._pending_tags)
+            + len(self._pending_patterns) + int(self._pending_flush)
+        )
+
+    def _schedule_flush(self):
+        if self._pending_count() >= self.max_batch:
+            # Volles Batch sofort senden, laufendes Zeitfenster bleibt bestehen
+            task = asyncio.create_task(self.flush())
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.batch_window)
+        await self.flush()
+
+    async def flush(self):
+        """Veröffentlicht alle gesammelten Invalidierungen als eine Nachricht"""
+        async with self._publish_lock:
+            if not self._pending_count():
+                return
+
+            message = {"o": self.instance_id}
+            op_count = self._pending_count()
+            if self._pending_flush:
+                # Ein Flush macht Einzel-Invalidierungen überflüssig
+                message["f"] = 1
+            else:
+                if self._pending_keys:
+                    message["k"] = list(self._pending_keys)
+                if self._pending_tags:
+                    message["t"] = list(self._pending_tags)
+                if self._pending_patterns:
+                    message["p"] = list(self._pending_patterns)
+            self._pending_keys = set()
+            self._pending_tags = set()
+            self._pending_patterns = set()
+            self._pending_flush = False
+
+            # Sequenz vor dem Publish vergeben: schlägt es fehl, sehen die
+            # Empfänger beim nächsten Mal eine Lücke und leeren ihren L1
+            self._seq += 1
+            message["s"] = self._seq
+
+            conn = await self._connection_factory()
+            if not conn:
+                self.stats["publish_errors"] += 1
+                return
+            try:
+                await conn.publish(self.channel, json.dumps(message, separators=(",", ":")))
+                self.stats["published_messages"] += 1
+                self.stats["published_ops"] += op_count
+            except Exception as e:
+                self.stats["publish_errors"] += 1
+                logger.error(f"Cache invalidation publish error: {e}")
+            finally:
+                await conn.close()
+
+    # ------------------------------------------------------------------
+    # Empfangen
+    # ------------------------------------------------------------------
+
+    def handle_message(self, raw: Any):
+        """Wendet eine empfangene Nachricht auf L1 an"""
+        try:
+            message = json.loads(raw)
+            origin = message["o"]
+            seq = int(message["s"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid cache invalidation message: {e}")
+            return
+
+        if origin == self.instance_id:
+            return
+        self.stats["received_messages"] += 1
+
+        last = self._last_seq.get(origin)
+        if last is not None and seq <= last:
+            # Duplikat bzw. veraltete Nachricht
+            return
+        self._last_seq[origin] = seq
+
+        if message.get("f") or (last is not None and seq != last + 1):
+            if not message.get("f"):
+                self.stats["gaps_detected"] += 1
+                logger.warning(
+                    f"Cache invalidation gap from {origin}: {last} -> {seq}, flushing L1"
+                )
+            self._full_flush()
+            return
+
+        applied = 0
+        for key in message.get("k", ()):
+            self.l1.delete(key)
+            applied += 1
+        for tag in message.get("t", ()):
+            self.l1.invalidate_tag(tag)
+            applied += 1
+        patterns = message.get("p", ())
+        if patterns:
+            for key in self.l1.keys():
+                if any(pattern in key for pattern in patterns):
+                    self.l1.delete(key)
+            applied += len(patterns)
+        self.stats["applied_ops"] += applied
+
+    def _full_flush(self):
+        self.l1.clear()
+        self.stats["full_flushes"] += 1
+
+    async def start(self):
+        """Startet den Subscriber"""
+        if self.running:
+            return
+        self.running = True
+        self._listener_task = asyncio.create_task(self._listen())
+        logger.info(f"Cache invalidation bus started (instance {self.instance_id})")
+
+    async def stop(self):
+        """Sendet ausstehende Invalidierungen und stoppt den Subscriber"""
+        if not self.running:
+            return
+        await self.flush()
+        self.running = False
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+    async def _listen(self):
+        connected_before = False
+        while self.running:
+            pubsub = None
+            try:
+                conn = await self._connection_factory()
+                if not conn:
+                    await asyncio.sleep(5)
+                    continue
+                pubsub = conn.pubsub()
+                await pubsub.subscribe(self.channel)
+
+                if connected_before:
+                    # Während der Trennung verpasste Nachrichten -> L1 verwerfen
+                    self.stats["reconnects"] += 1
+                    self._full_flush()
+                connected_before = True
+
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.handle_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation subscriber error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.reset()
+                    except Exception:
+                        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "running": self.running,
+            "instance_id": self.instance_id,
+            "known_peers": len(self._last_seq),
+            "pending_ops": self._pending_count(),
+        }
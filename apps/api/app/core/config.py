@@ -27,6 +27,10 @@ class Settings(BaseSettings):
     MAX_REQUESTS_PER_MINUTE: int = 100
     MAX_LOGIN_ATTEMPTS: int = 5
     LOGIN_LOCKOUT_MINUTES: int = 15
+    RATE_LIMIT_MODE: str = "hybrid"  # redis | hybrid | local
+    RATE_LIMIT_LEASE_SIZE: int = 10  # Tokens pro Worker-Lease (Hybrid-Modus)
+    RATE_LIMIT_LEASE_TTL: float = 1.0  # Sekunden; ungenutzte Lease-Tokens gehen danach an Redis zurück
+    RATE_LIMIT_TRUST_PROXY: bool = False  # X-Forwarded-For nur hinter eigenem Proxy auswerten
     
     # Datenbank - WARNUNG: Schwache Standardpasswörter in Produktion ändern
     POSTGRES_SERVER: str = "localhost"
@@ -54,6 +58,105 @@ class Settings(BaseSettings):
     # Redis Cache
     REDIS_URL: str = "redis://localhost:6379"
     
+    # L1 In-Memory-Cache (pro Worker)
+    CACHE_L1_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB
+    
+    # Stampede-Schutz: Redis-Lease für verteilte Neuberechnung
+    CACHE_LEASE_TIMEOUT: float = 30.0  # Sekunden
+    CACHE_LEASE_POLL_INTERVAL: float = 0.05  # Sekunden
+    
+    # L2-Serialisierung: auto|orjson|msgpack|json|pickle und auto|zstd|lz4|zlib|none
+    CACHE_CODEC: str = "auto"
+    CACHE_COMPRESSION: str = "auto"
+    CACHE_COMPRESSION_THRESHOLD: int = 1024  # Bytes
+    
+    # L1-Kohärenz zwischen Instanzen über Redis Pub/Sub
+    CACHE_INVALIDATION_ENABLED: bool = True
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidation"
+    CACHE_INVALIDATION_BATCH_MS: int = 10
+    
+    # L3 Persistenter Ergebnis-Cache (leer = Haupt-Datenbank, sonst z.B. sqlite+aiosqlite:///./cache_l3.db)
+    CACHE_L3_ENABLED: bool = True
+    CACHE_L3_DATABASE_URL: str = ""
+    CACHE_L3_BATCH_SIZE: int = 200
+    CACHE_L3_FLUSH_INTERVAL: float = 1.0  # Sekunden
+    CACHE_L3_SWEEP_INTERVAL: int = 600  # Sekunden
+    
+    # Semantischer AI-Response-Cache (Cosinus-Ähnlichkeit der Prompt-Embeddings)
+    AI_CACHE_SIMILARITY_THRESHOLD: float = 0.9
+    AI_CACHE_PARTITION_SIZE: int = 512
+    AI_CACHE_EVICTION: str = "lru"  # lru | lfu
+    AI_CACHE_SYNC_INTERVAL: float = 30.0  # Sekunden, Index-Abgleich mit anderen Workern
+    
+    # Request-Coalescing identischer GETs im Response-Cache
+    RESPONSE_COALESCE_MAX_WAITERS: int = 100
+    RESPONSE_COALESCE_TIMEOUT: float = 10.0  # Sekunden
+    
+    # Admission Control: getrennte Pools für Chat/LLM und API, Limit passt sich dem Latenzziel an
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_CHAT_MAX_CONCURRENCY: int = 32
+    ADMISSION_API_MAX_CONCURRENCY: int = 256
+    ADMISSION_SLOW_MAX_CONCURRENCY: int = 64  # /api/auth, /api/v1/realtime (festes Limit)
+    ADMISSION_MIN_CONCURRENCY: int = 4
+    ADMISSION_QUEUE_SIZE: int = 100  # pro Pool
+    ADMISSION_QUEUE_TIMEOUT: float = 1.0  # Sekunden bis zur 503-Antwort
+    
+    # Datenbank-Monitoring pro Request
+    DB_SLOW_QUERY_THRESHOLD: float = 1.0  # Sekunden
+    DB_N_PLUS_ONE_THRESHOLD: int = 10  # gleiches Statement so oft in einem Request
+    
+    # Memory-Profiling: tracemalloc für einen Bruchteil der Requests, GC außerhalb des Request-Pfads
+    MEMORY_PROFILE_SAMPLE_RATE: float = 0.01
+    MEMORY_PROFILE_TOP_N: int = 10
+    MEMORY_RSS_INTERVAL: float = 10.0  # Sekunden
+    MEMORY_GC_INTERVAL: float = 300.0  # Sekunden zwischen vollen Collections (0 = nur Schwelle)
+    MEMORY_GC_RSS_GROWTH_MB: int = 100  # volle Collection, wenn RSS seit der letzten so stark wächst
+    
+    # System-Metriken: Hintergrund-Sampling in Ringpuffer
+    SYSTEM_SAMPLE_INTERVAL: float = 5.0  # Sekunden
+    SYSTEM_SAMPLE_HISTORY: int = 120  # Samples pro Metrik (10 Minuten bei 5s)
+    
+    # Prometheus-Metriken: Snapshot pro Worker in Redis, /metrics aggregiert
+    METRICS_PUBLISH_INTERVAL: float = 5.0  # Sekunden (TTL = 3 Intervalle)
+    
+    # Event-Loop-Monitor: Scheduling-Delay und blockierende Callbacks mit Stack
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.05  # Sekunden zwischen Lag-Messungen
+    LOOP_SLOW_CALLBACK_THRESHOLD: float = 0.1  # Sekunden Blockade bis zur Erfassung
+    LOOP_MONITOR_STACK_DEPTH: int = 20
+    LOOP_MONITOR_MAX_EVENTS: int = 100
+    
+    # WebSocket-Fan-out zwischen Instanzen (Redis Pub/Sub)
+    WEBSOCKET_FANOUT_ENABLED: bool = True
+    WEBSOCKET_FANOUT_PREFIX: str = "ws:fanout:"
+    
+    # WebSocket-Send-Pipeline: begrenzte Queue + Writer-Task pro Verbindung
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 256  # Frames pro Verbindung
+    WEBSOCKET_SLOW_CONSUMER_POLICY: str = "drop_oldest"  # drop_oldest | coalesce | disconnect
+    WEBSOCKET_SEND_TIMEOUT: float = 10.0  # Sekunden pro Frame, danach Trennung
+    # State-Channels: nur der neueste ausstehende Snapshot zählt (Events: volle Reihenfolge)
+    WEBSOCKET_STATE_CHANNELS: List[str] = ["analytics", "user_count", "weather", "traffic"]
+    # Heartbeat: Server-Pings + Idle-Reaper über Timer Wheel (0 = deaktiviert)
+    WEBSOCKET_PING_INTERVAL: float = 25.0  # Sekunden ohne eingehenden Frame bis zum Ping
+    WEBSOCKET_PING_JITTER: float = 0.1  # +/-10% verteilt Pings über die Ticks
+    # Pong- und Idle-Timeout sehen nur Frames, die über connection_manager.receive_message
+    # bzw. record_activity laufen; beide erst aktivieren, wenn alle Endpoints das tun,
+    # sonst werden reine Broadcast-Empfänger getrennt. Tote Sockets fallen über Send-Fehler raus
+    WEBSOCKET_PONG_TIMEOUT: float = 0.0  # Sekunden bis zum Pong, sonst Trennung (0 = aus)
+    WEBSOCKET_IDLE_TIMEOUT: float = 0.0  # Sekunden ohne eingehenden Frame (0 = aus)
+    WEBSOCKET_TIMER_TICK: float = 1.0  # Auflösung des Timer Wheels
+    
+    # Delta-Updates im RealTimeDataBroadcaster (JSON Patch mit Version)
+    REALTIME_KEYFRAME_INTERVAL: int = 50  # voller Snapshot alle N Versionen
+    REALTIME_MAX_DELTA_RATIO: float = 0.7  # Patch >= 70% des Snapshots -> voller Snapshot
+    
+    # Streaming-Kompression (br/zstd/gzip)
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Bytes
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_OFFLOAD_THRESHOLD: int = 64 * 1024  # Bytes, darüber im Threadpool
+    
     # External APIs
     OPENWEATHER_API_KEY: str = ""
     
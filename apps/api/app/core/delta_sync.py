@@ -0,0 +1,230 @@
+"""
+Delta-Encoding für Echtzeit-Updates
+- Versionierter Snapshot pro Datentyp, Änderungserkennung über Content-Hash
+  (kanonisches JSON) statt String-Vergleich
+- Änderungen als JSON Patch (RFC 6902: add/remove/replace) mit Version
+- Volle Snapshots als Keyframe alle keyframe_interval Versionen und wenn der
+  Patch fast so groß wäre wie der Snapshot
+- Mehrere Worker: Version, Epoche und Vorgänger-Zustand kommen aus einem
+  gemeinsamen Zähler (commit_shared), sodass alle dieselbe Versionsfolge senden
+
+Client-Protokoll:
+- "<typ>_update" (full=True): Zustand = data, Version = version
+- "<typ>_delta": anwenden, wenn base_version == eigene Version und epoch
+  gleich; version <= eigene Version ignorieren; sonst Lücke -> Resync über
+  den vollen Snapshot (GET /api/v1/realtime/snapshot/<typ>)
+"""
+
+import copy
+import hashlib
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def canonical_json(data: Any) -> str:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _digest(encoded: str) -> str:
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def content_hash(data: Any) -> str:
+    return _digest(canonical_json(data))
+
+
+def _escape(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def json_diff(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """
+    Strukturelles Diff als JSON Patch. Dicts feldweise, Listen gleicher Länge
+    elementweise, sonst wird der Wert ersetzt
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Dict[str, Any]] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(json_diff(old[key], value, child))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for index, (before, after) in enumerate(zip(old, new)):
+            ops.extend(json_diff(before, after, f"{path}/{index}"))
+        return ops
+    if type(old) is not type(new) or old != new:
+        return [{"op": "replace", "path": path, "value": new}]
+    return []
+
+
+def apply_patch(document: Any, patch: List[Dict[str, Any]]) -> Any:
+    """Wendet einen Patch aus json_diff auf eine Kopie an"""
+    document = copy.deepcopy(document)
+    for op in patch:
+        if op["path"] == "":
+            document = copy.deepcopy(op["value"])
+            continue
+        tokens = [_unescape(token) for token in op["path"].split("/")[1:]]
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            last = int(last)
+        if op["op"] == "remove":
+            del parent[last]
+        else:
+            parent[last] = copy.deepcopy(op["value"])
+    return document
+
+
+class _Snapshot:
+    __slots__ = ("version", "hash", "data", "size", "epoch")
+
+    def __init__(self, version: int, digest: str, data: Any, size: int, epoch: str):
+        self.version = version
+        self.hash = digest
+        self.data = data
+        self.size = size
+        self.epoch = epoch
+
+
+class DeltaEncoder:
+    """
+    Hält pro Datentyp den zuletzt gesendeten Zustand und erzeugt die
+    nächste Nachricht (Snapshot oder Delta). epoch wechselt mit jedem
+    Encoder (Neustart/anderer Worker) und erzwingt beim Client einen Resync;
+    mit commit_shared gilt stattdessen die gemeinsame Epoche pro Datentyp
+    """
+
+    def __init__(self, keyframe_interval: int = 50, max_delta_ratio: float = 0.7, epoch: Optional[str] = None):
+        self.keyframe_interval = keyframe_interval
+        self.max_delta_ratio = max_delta_ratio
+        self.epoch = epoch or uuid.uuid4().hex[:8]
+        self.snapshots: Dict[str, _Snapshot] = {}
+        self.stats = {
+            "unchanged": 0,
+            "deltas": 0,
+            "snapshots": 0,
+            "bytes_full": 0,  # Größe der vollen Snapshots aller Änderungen
+            "bytes_encoded": 0,  # tatsächlich kodierte Nutzdaten
+        }
+
+    def update(self, data_type: str, data: Any) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Neuer Zustand -> (Nachricht, ist_delta); (None, False), wenn sich der
+        Inhalt nicht geändert hat
+        """
+        prepared = self.prepare(data_type, data)
+        if prepared is None:
+            return None, False
+        previous = self.snapshots.get(data_type)
+        return self._commit(
+            data_type, *prepared, previous.version + 1 if previous else 1, self.epoch, previous
+        )
+
+    def prepare(self, data_type: str, data: Any) -> Optional[Tuple[str, str]]:
+        """(kanonisches JSON, Hash); None, wenn der Inhalt dem zuletzt gesendeten entspricht"""
+        encoded = canonical_json(data)
+        digest = _digest(encoded)
+        previous = self.snapshots.get(data_type)
+        if previous is not None and previous.hash == digest:
+            self.stats["unchanged"] += 1
+            return None
+        return encoded, digest
+
+    def commit_shared(
+        self,
+        data_type: str,
+        encoded: str,
+        digest: str,
+        version: int,
+        epoch: str,
+        previous_encoded: Optional[str],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Versionsschritt aus einem gemeinsamen Zähler (z.B. Redis);
+        previous_encoded ist der Zustand von version - 1 (None = erste Version)
+        """
+        previous = None
+        if previous_encoded is not None:
+            previous = _Snapshot(
+                version - 1, _digest(previous_encoded), json.loads(previous_encoded),
+                len(previous_encoded), epoch,
+            )
+        return self._commit(data_type, encoded, digest, version, epoch, previous)
+
+    def remember(self, data_type: str, encoded: str, digest: str, version: int, epoch: str):
+        """Übernimmt einen Stand, den bereits ein anderer Worker gesendet hat"""
+        self.snapshots[data_type] = _Snapshot(version, digest, json.loads(encoded), len(encoded), epoch)
+        self.stats["unchanged"] += 1
+
+    def _commit(
+        self,
+        data_type: str,
+        encoded: str,
+        digest: str,
+        version: int,
+        epoch: str,
+        previous: Optional[_Snapshot],
+    ) -> Tuple[Dict[str, Any], bool]:
+        # Eigene Kopie, damit spätere Mutationen des Aufrufers das Diff nicht verfälschen
+        snapshot = _Snapshot(version, digest, json.loads(encoded), len(encoded), epoch)
+        self.snapshots[data_type] = snapshot
+        self.stats["bytes_full"] += snapshot.size
+
+        if previous is not None and snapshot.version % self.keyframe_interval:
+            patch = json_diff(previous.data, snapshot.data)
+            patch_size = len(canonical_json(patch))
+            if patch_size < snapshot.size * self.max_delta_ratio:
+                self.stats["deltas"] += 1
+                self.stats["bytes_encoded"] += patch_size
+                return {
+                    "type": f"{data_type}_delta",
+                    "data_type": data_type,
+                    "epoch": snapshot.epoch,
+                    "version": snapshot.version,
+                    "base_version": previous.version,
+                    "patch": patch,
+                }, True
+
+        self.stats["snapshots"] += 1
+        self.stats["bytes_encoded"] += snapshot.size
+        return self.snapshot_message(data_type), False
+
+    def snapshot_message(self, data_type: str) -> Optional[Dict[str, Any]]:
+        """Voller Snapshot für (Re-)Sync"""
+        snapshot = self.snapshots.get(data_type)
+        if snapshot is None:
+            return None
+        return {
+            "type": f"{data_type}_update",
+            "data_type": data_type,
+            "epoch": snapshot.epoch,
+            "version": snapshot.version,
+            "full": True,
+            "data": snapshot.data,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        full = self.stats["bytes_full"]
+        return {
+            **self.stats,
+            "epoch": self.epoch,
+            "versions": {name: snapshot.version for name, snapshot in self.snapshots.items()},
+            "bandwidth_saved_percent": (
+                round((1 - self.stats["bytes_encoded"] / full) * 100, 1) if full else 0.0
+            ),
+        }
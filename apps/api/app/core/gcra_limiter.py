@@ -0,0 +1,335 @@
+"""
+GCRA-Rate-Limiting-Engine (Generic Cell Rate Algorithm)
+Atomar in einem Lua-Skript: pro Request höchstens ein Redis-Roundtrip. Im
+Hybrid-Modus least ein Worker kleine Token-Batches nur für Keys, die er
+innerhalb von lease_ttl mehrfach sieht, und bedient Folge-Requests lokal.
+Ungenutzte Tokens eines abgelaufenen Leases gehen beim nächsten Aufruf an
+Redis zurück (TAT wird zurückgesetzt).
+"""
+
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+# GCRA mit Teil-Zuteilung für Leases
+# KEYS[1]=TAT-Key; ARGV: Intervall (ms), Toleranz (ms), angefragte Tokens,
+# zurückgegebene Tokens eines abgelaufenen Leases
+# Rückgabe: {gewährte Tokens, Retry-After (ms), verbleibende Tokens}
+_GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local refund = tonumber(ARGV[4] or 0)
+local now_parts = redis.call("time")
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+local tat = tonumber(redis.call("get", KEYS[1]))
+if tat and refund > 0 then
+    tat = tat - refund * interval
+end
+if not tat or tat < now then
+    tat = now
+end
+
+local available = math.floor((now + tolerance - tat) / interval)
+if available < 1 then
+    return {0, math.ceil(tat - tolerance + interval - now), 0}
+end
+
+local granted = math.min(requested, available)
+local new_tat = tat + granted * interval
+redis.call("set", KEYS[1], new_tat, "PX", math.ceil(new_tat - now))
+return {granted, 0, available - granted}
+"""
+_GCRA_SCRIPT_SHA = hashlib.sha1(_GCRA_SCRIPT.encode()).hexdigest()
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimitPolicy:
+    """Limit pro Zeitraum, z.B. RateLimitPolicy.parse("100/minute")"""
+
+    __slots__ = ("limit", "period")
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateLimitPolicy":
+        count, _, unit = spec.strip().partition("/")
+        unit = unit.strip().lower().rstrip("s")
+        if unit not in _PERIODS:
+            raise ValueError(f"Unbekannter Zeitraum in Rate-Limit '{spec}'")
+        return cls(int(count), _PERIODS[unit])
+
+    @property
+    def interval_ms(self) -> int:
+        # Ganze Millisekunden wie im Lua-Skript (aufgerundet, nie mehr als limit pro period)
+        return math.ceil(self.period * 1000 / self.limit)
+
+    @property
+    def tolerance_ms(self) -> int:
+        # Burst bis zum vollen Limit, danach gleichmäßig verteilt
+        return self.interval_ms * self.limit
+
+    def __repr__(self) -> str:
+        return f"RateLimitPolicy({self.limit}/{self.period}s)"
+
+
+# Policies pro Routen-Kategorie
+RATE_LIMIT_CATEGORIES: Dict[str, RateLimitPolicy] = {
+    "auth": RateLimitPolicy.parse("5/minute"),
+    "chat": RateLimitPolicy.parse("10/minute"),
+    "realtime": RateLimitPolicy.parse("60/minute"),
+    "api": RateLimitPolicy.parse("100/minute"),
+    "default": RateLimitPolicy.parse("100/minute"),
+}
+
+# Pfad-Präfix -> Kategorie (erster Treffer gewinnt)
+RATE_LIMIT_PREFIXES: Tuple[Tuple[str, str], ...] = (
+    ("/api/auth", "auth"),
+    ("/api/v1/chat", "chat"),
+    ("/api/v1/agents", "chat"),
+    ("/api/v1/realtime", "realtime"),
+    ("/api/", "api"),
+)
+
+
+class RateLimitDecision:
+    __slots__ = ("allowed", "limit", "remaining", "retry_after", "source")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, retry_after: float, source: str):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+        self.source = source
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at")
+
+    def __init__(self, tokens: int, expires_at: float):
+        self.tokens = tokens
+        self.expires_at = expires_at
+
+
+class RateLimiter:
+    """
+    Rate-Limiting-Engine
+
+    mode:
+    - "redis":  jeder Request ein atomarer GCRA-Aufruf
+    - "hybrid": Token-Leases pro Worker, Redis nur beim Nachladen
+    - "local":  GCRA nur im Prozess (Entwicklung, Single-Worker)
+    Ist Redis nicht erreichbar, wird lokal weiter limitiert.
+    """
+
+    def __init__(
+        self,
+        connection_factory: Optional[Callable[[], Any]] = None,
+        mode: str = "hybrid",
+        lease_size: int = 10,
+        lease_ttl: float = 1.0,
+        key_prefix: str = "rl",
+        max_local_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if mode not in ("redis", "hybrid", "local"):
+            raise ValueError(f"Unbekannter Rate-Limit-Modus: {mode}")
+        self._connection_factory = connection_factory
+        self.mode = mode
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self.key_prefix = key_prefix
+        self.max_local_keys = max_local_keys
+        self._clock = clock
+
+        self._leases: "OrderedDict[str, _Lease]" = OrderedDict()
+        # Letzter Redis-Aufruf pro Key: Leases nur für Keys mit mehreren Hits pro lease_ttl
+        self._last_seen: "OrderedDict[str, float]" = OrderedDict()
+        self._local_tat: "OrderedDict[str, float]" = OrderedDict()
+        self.redis_rtt = LatencySketch()
+
+        self.stats = {
+            "checks": 0,
+            "allowed": 0,
+            "rejected": 0,
+            "lease_hits": 0,
+            "lease_tokens_refunded": 0,
+            "redis_calls": 0,
+            "redis_errors": 0,
+            "local_fallbacks": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Policies
+    # ------------------------------------------------------------------
+
+    def limit(self, spec: str):
+        """
+        Decorator für Routen mit eigenem Limit (statt Kategorie), z.B.
+        @limiter.limit("30/minute"); ausgewertet von der PerformanceMiddleware
+        """
+        policy = RateLimitPolicy.parse(spec)
+
+        def decorator(endpoint):
+            endpoint.__rate_limit__ = policy
+            return endpoint
+
+        return decorator
+
+    @staticmethod
+    def category_for(path: str) -> str:
+        for prefix, category in RATE_LIMIT_PREFIXES:
+            if path.startswith(prefix):
+                return category
+        return "default"
+
+    # ------------------------------------------------------------------
+    # Prüfung
+    # ------------------------------------------------------------------
+
+    async def hit(self, key: str, policy: RateLimitPolicy) -> RateLimitDecision:
+        """Verbraucht ein Token für key unter policy"""
+        self.stats["checks"] += 1
+        redis_key = f"{self.key_prefix}:{key}"
+
+        if self.mode == "hybrid":
+            lease = self._leases.get(redis_key)
+            if lease is not None and lease.tokens > 0 and lease.expires_at > self._clock():
+                lease.tokens -= 1
+                self.stats["lease_hits"] += 1
+                self.stats["allowed"] += 1
+                return RateLimitDecision(True, policy.limit, lease.tokens, 0, "lease")
+
+        decision = None
+        if self.mode != "local" and self._connection_factory is not None:
+            decision = await self._hit_redis(redis_key, policy)
+        if decision is None:
+            if self.mode != "local":
+                self.stats["local_fallbacks"] += 1
+            decision = self._hit_local(redis_key, policy)
+
+        self.stats["allowed" if decision.allowed else "rejected"] += 1
+        return decision
+
+    def _lease_request(self, redis_key: str, policy: RateLimitPolicy) -> int:
+        if self.mode != "hybrid":
+            return 1
+        now = self._clock()
+        last_seen = self._last_seen.get(redis_key)
+        self._last_seen[redis_key] = now
+        self._last_seen.move_to_end(redis_key)
+        while len(self._last_seen) > self.max_local_keys:
+            self._last_seen.popitem(last=False)
+        # Kalter Key (seltene Requests): Lease würde nur verfallen
+        if last_seen is None or now - last_seen > self.lease_ttl:
+            return 1
+        # Kleine Limits nicht leasen: ungenutzte Tokens würden das Budget verfälschen
+        return max(1, min(self.lease_size, policy.limit // 20))
+
+    def _take_refund(self, redis_key: str) -> int:
+        """Ungenutzte Tokens eines abgelaufenen Leases (gehen mit dem nächsten Aufruf zurück)"""
+        lease = self._leases.pop(redis_key, None)
+        return lease.tokens if lease is not None else 0
+
+    def _restore_refund(self, redis_key: str, tokens: int):
+        """Redis-Aufruf fehlgeschlagen: Refund bleibt für den nächsten Aufruf liegen"""
+        if not tokens:
+            return
+        lease = self._leases.get(redis_key)
+        if lease is not None:
+            # Parallel neu geleast: Tokens gehören zum selben Budget
+            lease.tokens += tokens
+        else:
+            # Bereits abgelaufen -> nicht lokal ausgeben, nur zurückgeben
+            self._store_lease(redis_key, tokens, expires_at=0.0)
+
+    async def _hit_redis(self, redis_key: str, policy: RateLimitPolicy) -> Optional[RateLimitDecision]:
+        conn = await self._connection_factory()
+        if not conn:
+            return None
+
+        requested = self._lease_request(redis_key, policy)
+        refund = self._take_refund(redis_key)
+        args = (policy.interval_ms, policy.tolerance_ms, requested, refund)
+        start = time.perf_counter()
+        try:
+            try:
+                result = await conn.evalsha(_GCRA_SCRIPT_SHA, 1, redis_key, *args)
+            except Exception as e:
+                if "NOSCRIPT" not in str(e):
+                    raise
+                result = await conn.eval(_GCRA_SCRIPT, 1, redis_key, *args)
+        except Exception as e:
+            self.stats["redis_errors"] += 1
+            logger.error(f"Rate limit Redis error: {e}")
+            self._restore_refund(redis_key, refund)
+            return None
+        finally:
+            self.stats["redis_calls"] += 1
+            self.redis_rtt.add((time.perf_counter() - start) * 1000)
+            await conn.close()
+
+        self.stats["lease_tokens_refunded"] += refund
+        granted, retry_after_ms, remaining = (int(value) for value in result)
+        if granted < 1:
+            return RateLimitDecision(False, policy.limit, 0, retry_after_ms / 1000, "redis")
+
+        if granted > 1:
+            self._store_lease(redis_key, granted - 1)
+        return RateLimitDecision(True, policy.limit, remaining + granted - 1, 0, "redis")
+
+    def _store_lease(self, redis_key: str, tokens: int, expires_at: Optional[float] = None):
+        if expires_at is None:
+            expires_at = self._clock() + self.lease_ttl
+        self._leases[redis_key] = _Lease(tokens, expires_at)
+        self._leases.move_to_end(redis_key)
+        while len(self._leases) > self.max_local_keys:
+            self._leases.popitem(last=False)
+
+    def _hit_local(self, redis_key: str, policy: RateLimitPolicy) -> RateLimitDecision:
+        """GCRA im Prozess (gleiche Semantik wie das Lua-Skript)"""
+        now = math.floor(self._clock() * 1000)
+        interval = policy.interval_ms
+        tat = max(self._local_tat.get(redis_key, now), now)
+
+        if now + policy.tolerance_ms - tat < interval:
+            retry_after = (tat - policy.tolerance_ms + interval - now) / 1000
+            return RateLimitDecision(False, policy.limit, 0, retry_after, "local")
+
+        new_tat = tat + interval
+        self._local_tat[redis_key] = new_tat
+        self._local_tat.move_to_end(redis_key)
+        while len(self._local_tat) > self.max_local_keys:
+            self._local_tat.popitem(last=False)
+        remaining = (now + policy.tolerance_ms - new_tat) // interval
+        return RateLimitDecision(True, policy.limit, remaining, 0, "local")
+
+    def get_stats(self) -> Dict[str, Any]:
+        checks = self.stats["checks"]
+        return {
+            **self.stats,
+            "mode": self.mode,
+            "active_leases": len(self._leases),
+            "redis_round_trips_per_request": (self.stats["redis_calls"] / checks) if checks else 0,
+            "redis_rtt_ms": self.redis_rtt.summary(),
+        }
@@ -0,0 +1,272 @@
+"""
+L1 In-Memory-Cache für AGENTLAND.SAARLAND
+O(1)-LRU mit Byte-Budget und TTL pro Eintrag
+"""
+
+import heapq
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Sentinel für "nicht gefunden" - None ist ein gültiger Cache-Wert
+MISSING = object()
+
+# Geschätzter Overhead pro Eintrag (OrderedDict-Knoten, Entry-Objekt, Key)
+ENTRY_OVERHEAD = 120
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Schätzt den Speicherbedarf eines Wertes in Bytes
+    Günstig statt exakt: Container werden ab 64 Elementen hochgerechnet
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value) + 33
+    if isinstance(value, str):
+        return len(value) + 49
+    if value is None or isinstance(value, (bool, int, float)):
+        return 28
+    if _depth >= 4:
+        return sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        items = value.items()
+        count = len(value)
+        sample = 0
+        for i, (k, v) in enumerate(items):
+            if i >= 64:
+                break
+            sample += estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1)
+        sampled = min(count, 64)
+        total = sample * count // sampled if sampled else 0
+        return sys.getsizeof(value) + total
+    if isinstance(value, (list, tuple, set, frozenset)):
+        count = len(value)
+        sample = 0
+        for i, item in enumerate(value):
+            if i >= 64:
+                break
+            sample += estimate_size(item, _depth + 1)
+        sampled = min(count, 64)
+        total = sample * count // sampled if sampled else 0
+        return sys.getsizeof(value) + total
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "tags")
+
+    def __init__(self, value: Any, expires_at: Optional[float], size: int, tags: Optional[Tuple[str, ...]] = None):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+
+
+class L1Cache:
+    """
+    Lokaler LRU-Cache mit konstanter Zugriffszeit
+    - Reihenfolge über OrderedDict (move_to_end / popitem in O(1))
+    - Speicherbudget in Bytes statt Anzahl Einträge
+    - TTL pro Eintrag; Ablauf lazy beim Zugriff und amortisiert über einen Min-Heap
+    - Eviction einzeln statt 20%-Blöcke, damit keine Latenzspitzen entstehen
+    - Tag -> Keys Reverse-Index für Invalidierung ohne Scan über alle Keys
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: Optional[float] = None,
+        max_entry_bytes: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # Einzelne Einträge dürfen das Budget nicht dominieren
+        self.max_entry_bytes = max_entry_bytes or max(max_bytes // 8, 1)
+        self._clock = clock
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, int, Hashable]] = []
+        self._heap_seq = 0
+        self._tag_index: Dict[str, Set[Hashable]] = {}
+        self.current_bytes = 0
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "rejected_oversize": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        return entry.expires_at is None or entry.expires_at > self._clock()
+
+    def keys(self) -> Iterator[Hashable]:
+        """Iteriert über alle (auch evtl. abgelaufene) Keys, LRU zuerst"""
+        return iter(list(self._entries.keys()))
+
+    def get(self, key: Hashable, default: Any = MISSING, touch: bool = True) -> Any:
+        """Holt Wert, markiert ihn als zuletzt benutzt; abgelaufene Einträge zählen als Miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return default
+
+        if entry.expires_at is not None and entry.expires_at <= self._clock():
+            self._remove(key)
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return default
+
+        if touch:
+            self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry.value
+
+    def ttl_remaining(self, key: Hashable) -> Optional[float]:
+        """Rest-TTL in Sekunden (None = unbegrenzt, 0 = nicht vorhanden/abgelaufen)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0
+        if entry.expires_at is None:
+            return None
+        return max(0.0, entry.expires_at - self._clock())
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        size: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None,
+    ) -> bool:
+        """
+        Setzt Wert mit optionaler TTL (Sekunden) und Tags
+        Gibt False zurück, wenn der Eintrag das Einzelbudget übersteigt
+        """
+        if size is None:
+            size = estimate_size(value)
+        size += ENTRY_OVERHEAD
+
+        if size > self.max_entry_bytes:
+            self.stats["rejected_oversize"] += 1
+            self._remove(key)
+            return False
+
+        if ttl is None:
+            ttl = self.default_ttl
+        now = self._clock()
+        expires_at = now + ttl if ttl is not None and ttl > 0 else None
+
+        self._remove(key)
+
+        tag_tuple = tuple(tags) if tags else None
+        self._entries[key] = _Entry(value, expires_at, size, tag_tuple)
+        self.current_bytes += size
+        if tag_tuple:
+            for tag in tag_tuple:
+                self._tag_index.setdefault(tag, set()).add(key)
+
+        if expires_at is not None:
+            self._heap_seq += 1
+            heapq.heappush(self._expiry_heap, (expires_at, self._heap_seq, key))
+
+        self._expire(now)
+        self._evict()
+        return True
+
+    def delete(self, key: Hashable) -> bool:
+        """Entfernt Eintrag; True wenn vorhanden"""
+        return self._remove(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Entfernt alle Einträge mit diesem Tag; Kosten O(Mitglieder)"""
+        keys = self._tag_index.pop(tag, None)
+        if not keys:
+            return 0
+        removed = 0
+        for key in list(keys):
+            if self._remove(key):
+                removed += 1
+        return removed
+
+    def clear(self):
+        """Leert den Cache vollständig"""
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self._tag_index.clear()
+        self.current_bytes = 0
+
+    def resize(self, max_bytes: int):
+        """Ändert das Byte-Budget zur Laufzeit"""
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max(max_bytes // 8, 1)
+        self._evict()
+
+    def purge_expired(self) -> int:
+        """Entfernt alle abgelaufenen Einträge; Kosten O(abgelaufen · log n)"""
+        return self._expire(self._clock())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """L1-Statistiken"""
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "tags": len(self._tag_index),
+            "utilization": (self.current_bytes / self.max_bytes * 100) if self.max_bytes else 0,
+        }
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._drop(key, entry)
+        return True
+
+    def _drop(self, key: Hashable, entry: _Entry):
+        self.current_bytes -= entry.size
+        if entry.tags:
+            for tag in entry.tags:
+                keys = self._tag_index.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tag_index[tag]
+
+    def _expire(self, now: float) -> int:
+        heap = self._expiry_heap
+        expired = 0
+        while heap and heap[0][0] <= now:
+            expires_at, _, key = heapq.heappop(heap)
+            entry = self._entries.get(key)
+            # Heap-Einträge von überschriebenen/gelöschten Keys ignorieren
+            if entry is not None and entry.expires_at == expires_at:
+                self._remove(key)
+                expired += 1
+        self.stats["expirations"] += expired
+
+        # Heap kompaktieren, wenn er durch veraltete Einträge stark angewachsen ist
+        if len(heap) > 2 * len(self._entries) + 1024:
+            self._expiry_heap = [
+                item for item in heap
+                if (e := self._entries.get(item[2])) is not None and e.expires_at == item[0]
+            ]
+            heapq.heapify(self._expiry_heap)
+        return expired
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._drop(key, entry)
+            self.stats["evictions"] += 1
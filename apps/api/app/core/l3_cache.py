@@ -0,0 +1,398 @@
+"""
+L3 Persistenter Ergebnis-Cache für AGENTLAND.SAARLAND
+Große, langlebige und teure Werte (AI-Responses, Crawl-Ergebnisse) überleben
+einen Redis-Flush oder -Neustart. Basis ist die async SQLAlchemy-Engine aus
+app/db/database.py oder - für Single-Node-Setups - eine eigene SQLite-Datei
+(CACHE_L3_DATABASE_URL=sqlite+aiosqlite:///./cache_l3.db).
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.cache_codecs import CacheSerializer
+from app.core.l1_cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+
+class L3ResultCache:
+    """
+    Datenbank-Tier mit
+    - Write-Behind: put() reiht nur ein, ein Hintergrund-Task schreibt gebündelt
+    - Batched Upserts (ON CONFLICT DO UPDATE auf PostgreSQL/SQLite)
+    - Write-Behind auch für delete/invalidate_tag/clear_pattern; ausstehende
+      Löschungen werden vor den Upserts geschrieben und beim Lesen beachtet
+    - in_use: solange die Tabelle leer ist und nichts geschrieben wurde,
+      kosten Invalidierungen keinen Datenbank-Roundtrip
+    - periodischem TTL-Sweep abgelaufener Zeilen
+    """
+
+    def __init__(
+        self,
+        serializer: CacheSerializer,
+        database_url: str = "",
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        sweep_interval: float = 600,
+        max_pending: int = 10000,
+        model_cls=None,
+    ):
+        self.serializer = serializer
+        self.database_url = database_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+        self.max_pending = max_pending
+        self.model_cls = model_cls
+
+        self.engine = None
+        self.session_maker = None
+        self._owns_engine = False
+
+        # Write-Behind-Puffer: Key -> (Payload, Tags, expires_at); letzter Wert gewinnt
+        self._pending: Dict[str, Tuple[bytes, Optional[str], float]] = {}
+        # Ausstehende Löschungen; werden vor den Upserts geschrieben
+        self._pending_deletes: Set[str] = set()
+        self._pending_tags: Set[str] = set()
+        self._pending_patterns: Set[str] = set()
+        self._flush_event: Optional[asyncio.Event] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._last_sweep = time.time()
+        self.running = False
+        # True, sobald die Tabelle Zeilen enthalten kann (eigener put() oder Zeilen beim Start)
+        self.in_use = False
+
+        self.stats = {
+            "reads": 0,
+            "read_errors": 0,
+            "queued_writes": 0,
+            "flushed_rows": 0,
+            "flush_batches": 0,
+            "queued_deletes": 0,
+            "skipped_deletes": 0,
+            "flushed_deletes": 0,
+            "write_errors": 0,
+            "swept_rows": 0,
+        }
+
+    async def start(self):
+        """Initialisiert Engine, Tabelle und Write-Behind-Task"""
+        if self.running:
+            return
+
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+        from sqlalchemy.orm import sessionmaker
+
+        if self.model_cls is None:
+            from app.models.cache_result import CacheResult as model_cls  # type: ignore
+            self.model_cls = model_cls
+
+        if self.database_url:
+            self.engine = create_async_engine(self.database_url, future=True)
+            self._owns_engine = True
+        else:
+            from app.db.database import engine
+            self.engine = engine
+
+        self.session_maker = sessionmaker(
+            self.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+        async with self.engine.begin() as conn:
+            await conn.run_sync(self.model_cls.__table__.create, checkfirst=True)
+
+        self._flush_event = asyncio.Event()
+        self.running = True
+        await self._check_in_use()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+        logger.info(f"L3 result cache started ({self.engine.dialect.name})")
+
+    async def stop(self):
+        """Schreibt ausstehende Einträge und beendet den Writer"""
+        if not self.running:
+            return
+        self.running = False
+        if self._writer_task:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        await self.flush()
+        if self._owns_engine:
+            await self.engine.dispose()
+
+    async def get(self, key: str) -> Tuple[Any, Optional[float]]:
+        """Liefert (Wert, Rest-TTL) oder (MISSING, None)"""
+        if not self.running:
+            return MISSING, None
+
+        now = time.time()
+        pending = self._pending.get(key)
+        if pending is not None:
+            payload, _, expires_at = pending
+            if expires_at > now:
+                return self.serializer.loads(payload), expires_at - now
+            return MISSING, None
+        if not self.in_use:
+            return MISSING, None
+
+        from sqlalchemy import select
+
+        model = self.model_cls
+        self.stats["reads"] += 1
+        try:
+            async with self.session_maker() as session:
+                row = (await session.execute(
+                    select(model.value, model.tags, model.expires_at)
+                    .where(model.key == key, model.expires_at > now)
+                )).first()
+        except Exception as e:
+            self.stats["read_errors"] += 1
+            logger.error(f"L3 get error: {e}")
+            return MISSING, None
+
+        if row is None or self._deletion_pending(key, row.tags):
+            return MISSING, None
+        return self.serializer.loads(row.value), row.expires_at - now
+
+    def _deletion_pending(self, key: str, tag_column: Optional[str]) -> bool:
+        """Zeile ist durch eine noch nicht geschriebene Löschung bereits ungültig"""
+        if key in self._pending_deletes:
+            return True
+        if any(pattern in key for pattern in self._pending_patterns):
+            return True
+        return bool(tag_column) and any(f",{tag}," in tag_column for tag in self._pending_tags)
+
+    async def scan_prefix(self, prefix: str, limit: int) -> List[Tuple[str, Any, float]]:
+        """
+        Neueste nicht abgelaufene Einträge mit Key-Präfix als (Key, Wert, Rest-TTL).
+        Für seltene Wiederherstellungen (z.B. nach Redis-Flush), nicht für den Request-Pfad
+        """
+        if not self.running or not (self.in_use or self._pending):
+            return []
+
+        now = time.time()
+        found: Dict[str, Tuple[Any, float]] = {}
+        # Ausstehende Writes sind neuer als die Datenbank
+        for key, (payload, _, expires_at) in self._pending.items():
+            if key.startswith(prefix) and expires_at > now:
+                found[key] = (self.serializer.loads(payload), expires_at - now)
+
+        from sqlalchemy import select
+
+        model = self.model_cls
+        self.stats["reads"] += 1
+        try:
+            async with self.session_maker() as session:
+                rows = (await session.execute(
+                    select(model.key, model.value, model.tags, model.expires_at)
+                    .where(model.key.startswith(prefix, autoescape=True), model.expires_at > now)
+                    .order_by(model.updated_at.desc())
+                    .limit(limit)
+                )).all()
+        except Exception as e:
+            self.stats["read_errors"] += 1
+            logger.error(f"L3 scan error: {e}")
+            rows = []
+
+        for row in rows:
+            if row.key not in found and not self._deletion_pending(row.key, row.tags):
+                found[row.key] = (self.serializer.loads(row.value), row.expires_at - now)
+        return [(key, value, ttl) for key, (value, ttl) in found.items()][:limit]
+
+    def put(self, key: str, value: Any, ttl: float, tags: Optional[Iterable[str]] = None):
+        """Reiht Schreibvorgang ein (Write-Behind)"""
+        if not self.running:
+            return
+        tag_column = f",{','.join(tags)}," if tags else None
+        self._pending[key] = (self.serializer.dumps(value), tag_column, time.time() + ttl)
+        # Neuer Wert überholt eine ausstehende Löschung desselben Keys
+        self._pending_deletes.discard(key)
+        self.in_use = True
+        self.stats["queued_writes"] += 1
+        if len(self._pending) >= self.batch_size:
+            self._flush_event.set()
+
+    def _queue_delete(self, target: Set[str], item: str):
+        if not self.running or not self.in_use:
+            self.stats["skipped_deletes"] += 1
+            return
+        target.add(item)
+        self.stats["queued_deletes"] += 1
+        if len(self._pending_deletes) >= self.batch_size:
+            self._flush_event.set()
+
+    async def delete(self, key: str):
+        """Löscht Eintrag (ausstehender Write sofort, Zeile per Write-Behind)"""
+        self._pending.pop(key, None)
+        self._queue_delete(self._pending_deletes, key)
+
+    async def invalidate_tag(self, tag: str):
+        """Löscht alle Einträge mit Tag (Sekundär-Tier, daher LIKE statt Index)"""
+        needle = f",{tag},"
+        for key in [k for k, (_, tags, _) in self._pending.items() if tags and needle in tags]:
+            self._pending.pop(key, None)
+        self._queue_delete(self._pending_tags, tag)
+
+    async def clear_pattern(self, pattern: str):
+        """Löscht Einträge, deren Key das Pattern enthält"""
+        for key in [k for k in self._pending if pattern in k]:
+            self._pending.pop(key, None)
+        self._queue_delete(self._pending_patterns, pattern)
+
+    async def _flush_deletes(self):
+        """Schreibt ausstehende Löschungen: Keys gebündelt per IN, Tags/Patterns per LIKE"""
+        from sqlalchemy import delete, or_
+
+        model = self.model_cls
+        # Snapshot bleibt bis nach dem DELETE in den Sets, damit get() keine alten Zeilen liefert
+        keys, tags, patterns = set(self._pending_deletes), set(self._pending_tags), set(self._pending_patterns)
+        key_list = list(keys)
+
+        statements = [
+            delete(model).where(model.key.in_(key_list[i:i + self.batch_size]))
+            for i in range(0, len(key_list), self.batch_size)
+        ]
+        if tags:
+            statements.append(delete(model).where(
+                or_(*(model.tags.contains(f",{tag},", autoescape=True) for tag in tags))
+            ))
+        if patterns:
+            statements.append(delete(model).where(
+                or_(*(model.key.contains(pattern, autoescape=True) for pattern in patterns))
+            ))
+        for stmt in statements:
+            if await self._execute(stmt) is not None:
+                self.stats["flushed_deletes"] += 1
+
+        self._pending_deletes -= keys
+        self._pending_tags -= tags
+        self._pending_patterns -= patterns
+
+    async def flush(self):
+        """Schreibt ausstehende Löschungen und danach alle ausstehenden Einträge in Batches"""
+        if self._pending_deletes or self._pending_tags or self._pending_patterns:
+            await self._flush_deletes()
+        while self._pending:
+            batch = []
+            for key in list(self._pending)[:self.batch_size]:
+                payload, tags, expires_at = self._pending.pop(key)
+                batch.append({
+                    "key": key,
+                    "value": payload,
+                    "tags": tags,
+                    "expires_at": expires_at,
+                    "updated_at": time.time(),
+                })
+            try:
+                await self._upsert(batch)
+                self.stats["flushed_rows"] += len(batch)
+                self.stats["flush_batches"] += 1
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"L3 write-behind error ({len(batch)} rows dropped): {e}")
+
+    async def sweep_expired(self) -> int:
+        """Entfernt abgelaufene Zeilen"""
+        from sqlalchemy import delete
+
+        result = await self._execute(
+            delete(self.model_cls).where(self.model_cls.expires_at <= time.time())
+        )
+        removed = result.rowcount if result is not None and result.rowcount else 0
+        self.stats["swept_rows"] += removed
+        self._last_sweep = time.time()
+        return removed
+
+    async def _check_in_use(self):
+        """Prüft, ob (z.B. von anderen Workern) Zeilen existieren"""
+        from sqlalchemy import select
+
+        try:
+            async with self.session_maker() as session:
+                row = (await session.execute(select(self.model_cls.key).limit(1))).first()
+        except Exception as e:
+            logger.error(f"L3 in-use check error: {e}")
+            # Im Zweifel Löschungen nicht überspringen
+            row = True
+        self.in_use = self.in_use or row is not None
+
+    async def _writer_loop(self):
+        while self.running:
+            try:
+                try:
+                    await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_event.clear()
+                if not self.in_use:
+                    await self._check_in_use()
+                await self.flush()
+
+                if len(self._pending) > self.max_pending:
+                    logger.warning(f"L3 write-behind backlog: {len(self._pending)} entries")
+
+                if time.time() - self._last_sweep > self.sweep_interval:
+                    await self.sweep_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"L3 writer error: {e}")
+                await asyncio.sleep(1)
+
+    async def _upsert(self, rows):
+        table = self.model_cls.__table__
+        dialect = self.engine.dialect.name
+
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={
+                    "value": stmt.excluded.value,
+                    "tags": stmt.excluded.tags,
+                    "expires_at": stmt.excluded.expires_at,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            async with self.session_maker() as session:
+                await session.execute(stmt)
+                await session.commit()
+            return
+
+        # Generischer Fallback ohne natives Upsert
+        async with self.session_maker() as session:
+            for row in rows:
+                await session.merge(self.model_cls(**row))
+            await session.commit()
+
+    async def _execute(self, stmt):
+        try:
+            async with self.session_maker() as session:
+                result = await session.execute(stmt)
+                await session.commit()
+                return result
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            logger.error(f"L3 statement error: {e}")
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "running": self.running,
+            "backend": self.engine.dialect.name if self.engine is not None else None,
+            "pending_writes": len(self._pending),
+            "pending_deletes": (
+                len(self._pending_deletes) + len(self._pending_tags) + len(self._pending_patterns)
+            ),
+            "in_use": self.in_use,
+        }
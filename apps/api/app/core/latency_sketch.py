@@ -0,0 +1,232 @@
+"""
+Streaming-Latenz-Sketches für AGENTLAND.SAARLAND
+Log-Bucket-Histogramm (DDSketch-Prinzip, relative Genauigkeit 1%) statt
+sortierter Sample-Listen: Aufzeichnen in O(1), Quantile ohne Sortieren,
+und Sketches mehrerer Worker lassen sich durch Addition der Buckets mergen.
+"""
+
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Standard-Quantile für Reports
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Rolling-Windows in Sekunden
+DEFAULT_WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+
+
+class LatencySketch:
+    """
+    Mergebares Quantil-Sketch für Latenzen in Millisekunden
+    Bucket i deckt (gamma^(i-1), gamma^i] ab; der Schätzwert liegt höchstens
+    relative_accuracy vom echten Wert entfernt.
+    """
+
+    __slots__ = ("relative_accuracy", "_log_gamma", "_gamma", "buckets", "count", "sum", "min", "max")
+
+    MIN_VALUE_MS = 0.001
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value_ms: float, count: int = 1):
+        """Zeichnet einen Wert auf (O(1))"""
+        value_ms = max(value_ms, self.MIN_VALUE_MS)
+        index = math.ceil(math.log(value_ms) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.sum += value_ms * count
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other: "LatencySketch"):
+        """Addiert ein anderes Sketch gleicher Genauigkeit"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Sketches mit unterschiedlicher Genauigkeit sind nicht mergebar")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Quantil in ms (0 bei leerem Sketch)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                estimate = 2 * self._gamma ** index / (self._gamma + 1)
+                # Extremwerte sind exakt bekannt
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, float]:
+        """Mehrere Quantile in einem Durchlauf, z.B. {"p50": ..., "p999": ...}"""
+        qs = sorted(qs)
+        result = {}
+        if self.count == 0:
+            return {_quantile_name(q): 0.0 for q in qs}
+        ordered = sorted(self.buckets.items())
+        seen = 0
+        position = 0
+        for q in qs:
+            rank = q * (self.count - 1)
+            while position < len(ordered) and seen + ordered[position][1] <= rank:
+                seen += ordered[position][1]
+                position += 1
+            if position >= len(ordered):
+                value = self.max
+            else:
+                estimate = 2 * self._gamma ** ordered[position][0] / (self._gamma + 1)
+                value = min(max(estimate, self.min), self.max)
+            result[_quantile_name(q)] = value
+        return result
+
+    def summary(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": self.sum / self.count if self.count else 0.0,
+            "min_ms": self.min if self.count else 0.0,
+            "max_ms": self.max,
+            **{f"{name}_ms": value for name, value in self.quantiles(qs).items()},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Kompakte, JSON-taugliche Darstellung (für den Austausch zwischen Workern)"""
+        return {
+            "a": self.relative_accuracy,
+            "c": self.count,
+            "s": self.sum,
+            "mn": self.min if self.count else 0.0,
+            "mx": self.max,
+            "b": {str(index): count for index, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencySketch":
+        sketch = cls(data["a"])
+        sketch.buckets = {int(index): count for index, count in data["b"].items()}
+        sketch.count = data["c"]
+        sketch.sum = data["s"]
+        sketch.min = data["mn"] if sketch.count else math.inf
+        sketch.max = data["mx"]
+        return sketch
+
+
+def _quantile_name(q: float) -> str:
+    """0.5 -> p50, 0.99 -> p99, 0.999 -> p999"""
+    digits = f"{q:.6f}".rstrip("0").split(".")[1]
+    return "p" + (digits if len(digits) > 1 else digits + "0")
+
+
+class WindowedSketches:
+    """
+    Sketches pro Label-Tupel in Zeitscheiben (Ringpuffer)
+    Ein Rolling-Window ist der Merge aller Scheiben, die es überdeckt.
+    Abgeschlossene Scheiben können über drain_closed() an andere Worker
+    weitergereicht werden.
+    """
+
+    def __init__(
+        self,
+        slot_seconds: int = 10,
+        retention_seconds: int = 3600,
+        relative_accuracy: float = 0.01,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.slot_seconds = slot_seconds
+        self.retention_seconds = retention_seconds
+        self.relative_accuracy = relative_accuracy
+        self._clock = clock
+        # Scheibenbeginn -> Labels -> Sketch
+        self.slots: Dict[int, Dict[Tuple[str, ...], LatencySketch]] = {}
+        self._drained_until = self._slot_start(clock())
+
+    def _slot_start(self, now: float) -> int:
+        return int(now // self.slot_seconds) * self.slot_seconds
+
+    def record(self, labels: Tuple[str, ...], value_ms: float):
+        now = self._clock()
+        slot_start = self._slot_start(now)
+        slot = self.slots.get(slot_start)
+        if slot is None:
+            slot = self.slots[slot_start] = {}
+            self._prune(now)
+        sketch = slot.get(labels)
+        if sketch is None:
+            sketch = slot[labels] = LatencySketch(self.relative_accuracy)
+        sketch.add(value_ms)
+
+    def _prune(self, now: float):
+        oldest = now - self.retention_seconds - self.slot_seconds
+        for slot_start in [s for s in self.slots if s < oldest]:
+            del self.slots[slot_start]
+
+    def window(self, seconds: int) -> Dict[Tuple[str, ...], LatencySketch]:
+        """Gemergte Sketches pro Labels über die letzten `seconds` Sekunden"""
+        cutoff = self._slot_start(self._clock()) - seconds + self.slot_seconds
+        return merge_slots(
+            slot for slot_start, slot in self.slots.items() if slot_start >= cutoff
+        )
+
+    def drain_closed(self) -> List[Tuple[int, Dict[Tuple[str, ...], LatencySketch]]]:
+        """Liefert alle seit dem letzten Aufruf abgeschlossenen Scheiben"""
+        current = self._slot_start(self._clock())
+        closed = [
+            (slot_start, self.slots[slot_start])
+            for slot_start in sorted(self.slots)
+            if self._drained_until <= slot_start < current
+        ]
+        self._drained_until = current
+        return closed
+
+
+def merge_slots(slots: Iterable[Dict[Tuple[str, ...], LatencySketch]]) -> Dict[Tuple[str, ...], LatencySketch]:
+    """Merged mehrere Scheiben (oder Worker) pro Labels zu je einem Sketch"""
+    merged: Dict[Tuple[str, ...], LatencySketch] = {}
+    for slot in slots:
+        for labels, sketch in slot.items():
+            target = merged.get(labels)
+            if target is None:
+                target = merged[labels] = LatencySketch(sketch.relative_accuracy)
+            target.merge(sketch)
+    return merged
+
+
+def merge_all(sketches: Iterable[LatencySketch], relative_accuracy: float = 0.01) -> LatencySketch:
+    """Fasst Sketches zu einem Gesamt-Sketch zusammen"""
+    total = LatencySketch(relative_accuracy)
+    for sketch in sketches:
+        total.merge(sketch)
+    return total
+
+
+def group_by(
+    sketches: Dict[Tuple[str, ...], LatencySketch],
+    key: Callable[[Tuple[str, ...]], Optional[str]],
+) -> Dict[str, LatencySketch]:
+    """Gruppiert Sketches nach einer aus den Labels abgeleiteten Kennung"""
+    groups: Dict[str, LatencySketch] = {}
+    for labels, sketch in sketches.items():
+        name = key(labels)
+        if name is None:
+            continue
+        target = groups.get(name)
+        if target is None:
+            target = groups[name] = LatencySketch(sketch.relative_accuracy)
+        target.merge(sketch)
+    return groups
@@ -0,0 +1,230 @@
+"""
+Event-Loop-Lag-Monitor und Slow-Callback-Erkennung
+- Ein Task misst laufend die Verspätung, mit der er nach sleep(interval)
+  aufwacht (Scheduling-Delay des Loops)
+- Ein Watchdog-Thread erkennt einen hängenden Loop und liest währenddessen
+  den Stack des Loop-Threads mit (die blockierende Stelle selbst)
+- Zuordnung zur Route über den aktuellen Task, den die PerformanceMiddleware
+  pro Request markiert
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+# Blockierende Stelle = innerster Frame aus dem eigenen Code (sonst innerster überhaupt)
+_APP_ROOT = str(Path(__file__).resolve().parents[1])
+
+
+class _Capture:
+    __slots__ = ("heartbeat", "stack", "site", "task", "route")
+
+    def __init__(self, heartbeat: float, stack: List[str], site: Optional[str], task: Optional[str], route: Optional[str]):
+        self.heartbeat = heartbeat
+        self.stack = stack
+        self.site = site
+        self.task = task
+        self.route = route
+
+
+class LoopLagMonitor:
+    """
+    Dauerhaft aktiver Monitor mit geringem Overhead: ein Timer pro interval
+    auf dem Loop, ein schlafender Thread, der nur bei Stillstand > threshold
+    einen Stack zieht. Stalls zwischen threshold und threshold + interval
+    werden erfasst, können aber ohne Stack bleiben.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        threshold: float = 0.1,
+        stack_depth: int = 20,
+        max_events: int = 100,
+        max_sites: int = 200,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_depth = stack_depth
+        self.max_sites = max_sites
+
+        self.lag = LatencySketch()
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.by_route: Counter = Counter()
+        # Stelle -> [Anzahl, Gesamtdauer ms, Beispiel-Stack]
+        self.sites: Dict[str, List[Any]] = {}
+        self._task_routes: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._pending: Optional[_Capture] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+        self.stats = {
+            "samples": 0,
+            "slow_callbacks": 0,
+            "captured_stacks": 0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Route-Zuordnung
+    # ------------------------------------------------------------------
+
+    def tag_current_task(self, route: str):
+        """Markiert den laufenden Task mit der Route des aktuellen Requests"""
+        task = asyncio.current_task()
+        if task is not None:
+            self._task_routes[task] = route
+
+    # ------------------------------------------------------------------
+    # Start/Stop
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._lag_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    # ------------------------------------------------------------------
+    # Messung (Loop) und Stack-Erfassung (Watchdog-Thread)
+    # ------------------------------------------------------------------
+
+    async def _lag_loop(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.record_lag(max(0.0, now - expected))
+            self._heartbeat = now
+
+    def record_lag(self, lag: float):
+        lag_ms = lag * 1000
+        self.stats["samples"] += 1
+        self.stats["last_lag_ms"] = lag_ms
+        if lag_ms > self.stats["max_lag_ms"]:
+            self.stats["max_lag_ms"] = lag_ms
+        self.lag.add(lag_ms)
+        if lag < self.threshold:
+            return
+
+        capture, self._pending = self._pending, None
+        if capture is not None and capture.heartbeat != self._heartbeat:
+            capture = None
+        self._record_event(lag_ms, capture)
+
+    def _watch(self):
+        check = max(0.005, self.threshold / 4)
+        captured_for = None
+        while not self._stopping.wait(check):
+            heartbeat = self._heartbeat
+            if heartbeat == captured_for:
+                continue
+            if time.monotonic() - heartbeat - self.interval < self.threshold:
+                continue
+            captured_for = heartbeat
+            try:
+                self._pending = self._capture(heartbeat)
+            except Exception as e:
+                logger.debug(f"Loop stack capture failed: {e}")
+
+    def _capture(self, heartbeat: float) -> Optional[_Capture]:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        summary = traceback.extract_stack(frame, limit=self.stack_depth)
+        del frame
+        stack = [f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in summary]
+        site = None
+        for entry in reversed(summary):
+            if entry.filename.startswith(_APP_ROOT):
+                site = f"{entry.filename}:{entry.lineno} in {entry.name}"
+                break
+        if site is None and stack:
+            site = stack[-1]
+
+        task = asyncio.current_task(self._loop)
+        route = self._task_routes.get(task) if task is not None else None
+        self.stats["captured_stacks"] += 1
+        return _Capture(heartbeat, stack, site, task.get_name() if task is not None else None, route)
+
+    def _record_event(self, lag_ms: float, capture: Optional[_Capture]):
+        self.stats["slow_callbacks"] += 1
+        route = capture.route if capture and capture.route else "unknown"
+        self.by_route[route] += 1
+        event = {
+            "timestamp": time.time(),
+            "duration_ms": round(lag_ms, 2),
+            "route": route,
+            "task": capture.task if capture else None,
+            "site": capture.site if capture else None,
+            "stack": capture.stack if capture else None,
+        }
+        self.events.append(event)
+        if capture is not None and capture.site is not None:
+            entry = self.sites.get(capture.site)
+            if entry is None and len(self.sites) < self.max_sites:
+                entry = self.sites[capture.site] = [0, 0.0, capture.stack]
+            if entry is not None:
+                entry[0] += 1
+                entry[1] += lag_ms
+        logger.warning(
+            f"Event loop blocked for {lag_ms:.0f}ms (route={route}, site={event['site']})"
+        )
+
+    # ------------------------------------------------------------------
+    # Report
+    # ------------------------------------------------------------------
+
+    def top_sites(self, limit: int = 10) -> List[Dict[str, Any]]:
+        ranked = sorted(self.sites.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {"site": site, "count": count, "total_ms": round(total, 2), "stack": stack}
+            for site, (count, total, stack) in ranked[:limit]
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag": self.lag.summary(),
+            "by_route": dict(self.by_route.most_common()),
+            "top_sites": self.top_sites(),
+            "recent": list(self.events),
+        }
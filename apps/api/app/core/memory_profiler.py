@@ -0,0 +1,251 @@
+"""
+Gesampeltes Memory-Profiling für AGENTLAND.SAARLAND
+- tracemalloc nur während einzelner gesampelter Requests (kein Dauer-Overhead)
+- Top-Allokationsstellen pro Route-Template
+- RSS dieses Workers als Zeitreihe
+- Pausen der Gen-2-Collections über gc.callbacks
+- Volle Collections zeitgesteuert bzw. bei RSS-Wachstum, nie im Request-Pfad
+"""
+
+import asyncio
+import gc
+import logging
+import os
+import random
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+# Frames des Profilers selbst und des Import-Systems verfälschen die Top-Liste
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+def current_rss() -> int:
+    """Resident Set Size dieses Prozesses in Bytes (0, falls nicht ermittelbar)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _Sample:
+    __slots__ = ("owns_tracing", "baseline")
+
+    def __init__(self, owns_tracing: bool, baseline: Optional[tracemalloc.Snapshot]):
+        self.owns_tracing = owns_tracing
+        self.baseline = baseline
+
+
+class MemoryProfiler:
+    """
+    Sampling-Profiler: höchstens ein gesampelter Request gleichzeitig, damit
+    die Allokationen einer Route zugeordnet werden können (parallele Requests
+    im selben Zeitfenster fließen trotzdem mit ein).
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.01,
+        top_n: int = 10,
+        frames: int = 1,
+        rss_interval: float = 10.0,
+        rss_history: int = 360,
+        gc_interval: float = 300.0,
+        gc_rss_growth: int = 100 * 1024 * 1024,
+        max_routes: int = 500,
+        rss_reader: Callable[[], int] = current_rss,
+    ):
+        self.sample_rate = sample_rate
+        self.top_n = top_n
+        self.frames = frames
+        self.rss_interval = rss_interval
+        self.gc_interval = gc_interval
+        self.gc_rss_growth = gc_rss_growth
+        self.max_routes = max_routes
+        self._rss_reader = rss_reader
+        self._random = random.random
+
+        self._active: Optional[_Sample] = None
+        # Route -> (Samples, Allokationsstelle -> Bytes)
+        self.routes: Dict[str, Tuple[int, Counter]] = {}
+        self.rss: Deque[Tuple[float, int]] = deque(maxlen=rss_history)
+        self.gc_pauses = LatencySketch()
+        self._gc_started: Optional[float] = None
+        self._gc_last_pause_ms = 0.0
+        self._last_full_collect = time.monotonic()
+        self._rss_at_collect = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "sampled_requests": 0,
+            "skipped_samples": 0,  # anderer Request wurde gerade gesampelt
+            "scheduled_collections": 0,
+            "threshold_collections": 0,
+            "gen2_collections": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Request-Sampling
+    # ------------------------------------------------------------------
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and self._random() < self.sample_rate
+
+    def begin_sample(self) -> Optional[_Sample]:
+        """Startet tracemalloc für diesen Request; None, wenn bereits gesampelt wird"""
+        if self._active is not None:
+            self.stats["skipped_samples"] += 1
+            return None
+        if tracemalloc.is_tracing():
+            # Von außen aktiviert (PYTHONTRACEMALLOC): Differenz zum Ausgangsstand
+            sample = _Sample(False, tracemalloc.take_snapshot())
+        else:
+            tracemalloc.start(self.frames)
+            sample = _Sample(True, None)
+        self._active = sample
+        return sample
+
+    def end_sample(self, sample: _Sample, route: str):
+        """Beendet das Sampling und ordnet lebende Allokationen der Route zu"""
+        if sample is not self._active:
+            return
+        self._active = None
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if sample.owns_tracing:
+                tracemalloc.stop()
+
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, name) for name in _IGNORED_FILES])
+        if sample.baseline is not None:
+            baseline = sample.baseline.filter_traces([tracemalloc.Filter(False, name) for name in _IGNORED_FILES])
+            sites = [(diff.traceback, diff.size_diff) for diff in snapshot.compare_to(baseline, "lineno")]
+        else:
+            sites = [(stat.traceback, stat.size) for stat in snapshot.statistics("lineno")]
+
+        self.stats["sampled_requests"] += 1
+        entry = self.routes.get(route)
+        if entry is None:
+            if len(self.routes) >= self.max_routes:
+                return
+            entry = self.routes[route] = (0, Counter())
+        samples, allocations = entry
+        for traceback, size in sites[: self.top_n]:
+            if size > 0:
+                frame = traceback[0]
+                allocations[f"{frame.filename}:{frame.lineno}"] += size
+        self.routes[route] = (samples + 1, allocations)
+
+    # ------------------------------------------------------------------
+    # GC-Pausen
+    # ------------------------------------------------------------------
+
+    def _gc_callback(self, phase: str, info: Dict[str, Any]):
+        if info.get("generation") != 2:
+            return
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif phase == "stop" and self._gc_started is not None:
+            pause_ms = (time.perf_counter() - self._gc_started) * 1000
+            self._gc_started = None
+            self.stats["gen2_collections"] += 1
+            self.gc_pauses.add(pause_ms)
+            self._gc_last_pause_ms = pause_ms
+
+    # ------------------------------------------------------------------
+    # Hintergrund: RSS-Zeitreihe und geplante Collections
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        if self._gc_callback not in gc.callbacks:
+            gc.callbacks.append(self._gc_callback)
+        self._rss_at_collect = self._rss_reader()
+        if self._task is None:
+            self._task = asyncio.create_task(self._monitor_loop())
+
+    async def stop(self):
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _monitor_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.rss_interval)
+                self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Memory monitor error: {e}")
+
+    def tick(self):
+        """Ein RSS-Sample; volle Collection, wenn Intervall oder Wachstum erreicht"""
+        rss = self._rss_reader()
+        self.rss.append((time.time(), rss))
+
+        reason = None
+        if rss - self._rss_at_collect > self.gc_rss_growth:
+            reason = "threshold_collections"
+        elif self.gc_interval and time.monotonic() - self._last_full_collect > self.gc_interval:
+            reason = "scheduled_collections"
+        if reason is None:
+            return
+
+        gc.collect()
+        self.stats[reason] += 1
+        self._last_full_collect = time.monotonic()
+        self._rss_at_collect = self._rss_reader()
+        if reason == "threshold_collections":
+            logger.info(
+                f"Full GC after RSS growth: {rss / 1024 / 1024:.1f}MB -> "
+                f"{self._rss_at_collect / 1024 / 1024:.1f}MB"
+            )
+
+    # ------------------------------------------------------------------
+    # Report
+    # ------------------------------------------------------------------
+
+    def top_allocations(self, route: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        routes = {route: self.routes[route]} if route in self.routes else (
+            {} if route else self.routes
+        )
+        return {
+            name: [
+                {"site": site, "avg_bytes": size // samples}
+                for site, size in allocations.most_common(self.top_n)
+            ]
+            for name, (samples, allocations) in routes.items()
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        rss_mb = [(timestamp, round(rss / 1024 / 1024, 1)) for timestamp, rss in self.rss]
+        return {
+            **self.stats,
+            "sample_rate": self.sample_rate,
+            "pid": os.getpid(),
+            "rss_mb": rss_mb[-1][1] if rss_mb else round(self._rss_reader() / 1024 / 1024, 1),
+            "rss_history_mb": rss_mb,
+            "gc": {
+                "counts": gc.get_count(),
+                "thresholds": gc.get_threshold(),
+                "gen2_pauses": {**self.gc_pauses.summary(), "last_ms": self._gc_last_pause_ms},
+            },
+            "top_allocations": self.top_allocations(),
+        }
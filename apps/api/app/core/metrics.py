@@ -0,0 +1,468 @@
+"""
+Zentrale Metrik-Registry für AGENTLAND.SAARLAND
+Counter, Gauges und Histogramme mit Labels. Subsysteme mit eigenen
+Statistik-Dicts registrieren Collector, die erst beim Scrape gelesen werden
+(kein Overhead im Request-Pfad). Jeder Worker legt periodisch einen
+Snapshot in Redis ab; /metrics aggregiert alle Worker und liefert
+OpenMetrics-Text.
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import math
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Aggregation von Gauges über Worker: sum | max | min | all (Label "worker")
+GAUGE_MODES = ("sum", "max", "min", "all")
+
+# Snapshot-Format pro Metrik-Familie (JSON-tauglich, so auch in Redis):
+# {"type": ..., "help": ..., "labels": [...], "mode": ..., "buckets": [...],
+#  "samples": [[[Label-Werte], Wert]]}; Histogramm-Wert = [[Bucket-Zähler], Summe]
+Family = Dict[str, Any]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # letzter Bucket = +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    """
+    Basis mit Label-Kindern. Hot Paths holen sich das Kind einmal
+    (metric.labels(...)) und inkrementieren danach nur ein Attribut - ohne
+    Lock; alle Aufrufer laufen auf dem Event-Loop.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = "sum"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.mode = mode
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._default = None if self.labelnames else self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: Any, **labelvalues: Any):
+        if labelvalues:
+            values = tuple(labelvalues[name] for name in self.labelnames)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} erwartet Labels {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _sample_value(self, child) -> Any:
+        return child.value
+
+    def collect(self) -> Family:
+        family = {
+            "type": self.kind,
+            "help": self.documentation,
+            "labels": list(self.labelnames),
+            "samples": [[list(key), self._sample_value(child)] for key, child in self._children.items()],
+        }
+        if self.kind == "gauge":
+            family["mode"] = self.mode
+        return family
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = "all"):
+        if mode not in GAUGE_MODES:
+            raise ValueError(f"Unbekannter Gauge-Modus: {mode}")
+        super().__init__(name, documentation, labelnames, mode)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if not math.isinf(bound)))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _sample_value(self, child) -> Any:
+        return [list(child.counts), child.sum]
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def collect(self) -> Family:
+        family = super().collect()
+        family["buckets"] = list(self.buckets)
+        return family
+
+
+class StatsCollector:
+    """
+    Macht ein bestehendes Statistik-Dict scrapebar: jeder numerische
+    Top-Level-Wert wird zu {prefix}_{key} - als Counter, außer er ist in
+    gauges (Schlüssel -> Aggregationsmodus) aufgeführt
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        getter: Callable[[], Dict[str, Any]],
+        documentation: str = "",
+        gauges: Optional[Dict[str, str]] = None,
+    ):
+        self.prefix = prefix
+        self.getter = getter
+        self.documentation = documentation
+        self.gauges = gauges or {}
+
+    def __call__(self) -> Dict[str, Family]:
+        families: Dict[str, Family] = {}
+        for key, value in self.getter().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            help_text = f"{self.documentation} {key}".strip()
+            if key in self.gauges:
+                families[name] = {
+                    "type": "gauge", "help": help_text, "labels": [],
+                    "mode": self.gauges[key], "samples": [[[], value]],
+                }
+            else:
+                families[name] = {"type": "counter", "help": help_text, "labels": [], "samples": [[[], value]]}
+        return families
+
+
+class MetricsRegistry:
+    """
+    Registry für Metriken und Collector eines Workers plus Redis-Austausch
+    der Snapshots zwischen Workern
+    """
+
+    def __init__(self, key_prefix: str = "metrics"):
+        self.key_prefix = key_prefix
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Family]]] = {}
+        self._connection_factory: Optional[Callable[[], Awaitable[Any]]] = None
+        self._publish_interval = 5.0
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"publishes": 0, "publish_errors": 0, "scrapes": 0}
+
+    # ------------------------------------------------------------------
+    # Registrierung
+    # ------------------------------------------------------------------
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if existing.kind != metric.kind or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metrik {metric.name} bereits mit anderem Typ/Labels registriert")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = "all") -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, mode))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, key: str, collector: Callable[[], Dict[str, Family]]):
+        """Collector unter key (ersetzt einen früheren, z.B. neue Middleware-Instanz)"""
+        self._collectors[key] = collector
+
+    def register_stats(
+        self,
+        prefix: str,
+        getter: Callable[[], Dict[str, Any]],
+        documentation: str = "",
+        gauges: Optional[Dict[str, str]] = None,
+    ):
+        self.register_collector(prefix, StatsCollector(prefix, getter, documentation, gauges))
+
+    # ------------------------------------------------------------------
+    # Sammeln und Aggregieren
+    # ------------------------------------------------------------------
+
+    def collect(self) -> Dict[str, Family]:
+        families = {name: metric.collect() for name, metric in self._metrics.items()}
+        for key, collector in list(self._collectors.items()):
+            try:
+                families.update(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector {key} failed: {e}")
+        return families
+
+    def render(self) -> str:
+        """OpenMetrics-Text nur für diesen Worker"""
+        self.stats["scrapes"] += 1
+        return render_openmetrics(merge_snapshots([(self.worker_id, self.collect())]))
+
+    async def render_fleet(self) -> str:
+        """OpenMetrics-Text über alle Worker, deren Snapshot in Redis liegt"""
+        self.stats["scrapes"] += 1
+        snapshots = [(self.worker_id, self.collect())]
+        snapshots.extend(await self._fetch_peer_snapshots())
+        return render_openmetrics(merge_snapshots(snapshots))
+
+    # ------------------------------------------------------------------
+    # Redis-Austausch
+    # ------------------------------------------------------------------
+
+    def _worker_key(self, worker_id: str) -> str:
+        return f"{self.key_prefix}:worker:{worker_id}"
+
+    async def start(self, connection_factory: Callable[[], Awaitable[Any]], interval: float = 5.0):
+        self._connection_factory = connection_factory
+        self._publish_interval = interval
+        if self._task is None:
+            self._task = asyncio.create_task(self._publish_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Snapshot bleibt bis zum TTL sichtbar; danach zählt der Worker nicht mehr mit
+
+    async def _publish_loop(self):
+        while True:
+            try:
+                await self.publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["publish_errors"] += 1
+                logger.error(f"Metrics publish error: {e}")
+            await asyncio.sleep(self._publish_interval)
+
+    async def publish(self):
+        conn = await self._connection_factory() if self._connection_factory else None
+        if not conn:
+            return
+        payload = json.dumps(self.collect(), separators=(",", ":"))
+        ttl = max(1, math.ceil(self._publish_interval * 3))
+        try:
+            pipe = conn.pipeline(transaction=False)
+            pipe.set(self._worker_key(self.worker_id), payload, ex=ttl)
+            pipe.sadd(f"{self.key_prefix}:workers", self.worker_id)
+            await pipe.execute()
+            self.stats["publishes"] += 1
+        finally:
+            await conn.close()
+
+    async def _fetch_peer_snapshots(self) -> List[Tuple[str, Dict[str, Family]]]:
+        conn = await self._connection_factory() if self._connection_factory else None
+        if not conn:
+            return []
+        try:
+            workers = [
+                worker.decode() if isinstance(worker, bytes) else worker
+                for worker in await conn.smembers(f"{self.key_prefix}:workers")
+            ]
+            peers = [worker for worker in workers if worker != self.worker_id]
+            if not peers:
+                return []
+            payloads = await conn.mget([self._worker_key(worker) for worker in peers])
+            expired = [worker for worker, payload in zip(peers, payloads) if payload is None]
+            if expired:
+                await conn.srem(f"{self.key_prefix}:workers", *expired)
+            return [
+                (worker, json.loads(payload))
+                for worker, payload in zip(peers, payloads) if payload is not None
+            ]
+        except Exception as e:
+            logger.error(f"Metrics fleet read error: {e}")
+            return []
+        finally:
+            await conn.close()
+
+
+def merge_snapshots(snapshots: Iterable[Tuple[str, Dict[str, Family]]]) -> Dict[str, Family]:
+    """
+    Fasst Worker-Snapshots zusammen: Counter und Histogramme werden summiert,
+    Gauges je nach Modus summiert, Max/Min gebildet oder mit Label worker getrennt
+    """
+    merged: Dict[str, Family] = {}
+    values: Dict[str, Dict[Tuple[str, ...], Any]] = {}
+
+    for worker_id, families in snapshots:
+        for name, family in families.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {key: value for key, value in family.items() if key != "samples"}
+                if family["type"] == "gauge" and family.get("mode") == "all":
+                    target["labels"] = list(family["labels"]) + ["worker"]
+                values[name] = {}
+            elif target["type"] != family["type"] or target.get("buckets") != family.get("buckets"):
+                continue
+            samples = values[name]
+            kind = family["type"]
+            mode = family.get("mode", "sum")
+            for labelvalues, value in family["samples"]:
+                key = tuple(labelvalues)
+                if kind == "gauge" and mode == "all":
+                    key = key + (worker_id,)
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = [list(value[0]), value[1]] if kind == "histogram" else value
+                elif kind == "histogram":
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                elif kind == "gauge" and mode == "max":
+                    samples[key] = max(current, value)
+                elif kind == "gauge" and mode == "min":
+                    samples[key] = min(current, value)
+                else:
+                    samples[key] = current + value
+
+    for name, target in merged.items():
+        target["samples"] = [[list(key), value] for key, value in values[name].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def render_openmetrics(families: Dict[str, Family]) -> str:
+    """Rendert Familien im OpenMetrics-Textformat (inkl. abschließendem # EOF)"""
+    lines: List[str] = []
+    for name in sorted(families):
+        family = families[name]
+        kind = family["type"]
+        base = name[:-6] if kind == "counter" and name.endswith("_total") else name
+        if family.get("help"):
+            lines.append(f"# HELP {base} {_escape(family['help'])}")
+        lines.append(f"# TYPE {base} {kind}")
+        labelnames = family.get("labels", [])
+
+        for labelvalues, value in family["samples"]:
+            if kind == "counter":
+                lines.append(f"{base}_total{_labels(labelnames, labelvalues)} {_number(value)}")
+            elif kind == "gauge":
+                lines.append(f"{base}{_labels(labelnames, labelvalues)} {_number(value)}")
+            else:
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(family["buckets"]) + [math.inf], counts):
+                    cumulative += count
+                    le = _number(float(bound)) if not math.isinf(bound) else "+Inf"
+                    if "." not in le and le != "+Inf":
+                        le += ".0"
+                    lines.append(f"{base}_bucket{_labels(labelnames, labelvalues, ('le', le))} {cumulative}")
+                lines.append(f"{base}_count{_labels(labelnames, labelvalues)} {cumulative}")
+                lines.append(f"{base}_sum{_labels(labelnames, labelvalues)} {_number(total)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+# Globale Registry (Subsysteme registrieren sich beim Import)
+registry = MetricsRegistry()
@@ -1,7 +1,56 @@
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+"""
+Einheitliches Rate Limiting für AGENTLAND.SAARLAND
+Ersetzt slowapi sowie die getrennten Limiter in PerformanceMiddleware und
+SecurityMiddleware; die Engine liegt in app.core.gcra_limiter.
+"""
 
-limiter = Limiter(key_func=get_remote_address)
+from typing import Optional, Tuple
 
-__all__ = ["limiter", "RateLimitExceeded", "_rate_limit_exceeded_handler"]
+from app.core.config import settings
+from app.core.metrics import registry as metrics
+from app.core.gcra_limiter import (
+    RATE_LIMIT_CATEGORIES,
+    RateLimitDecision,
+    RateLimitPolicy,
+    RateLimiter,
+)
+
+
+def client_identifier(headers, client: Optional[Tuple[str, int]]) -> str:
+    """
+    Client-Kennung für Rate-Limit-Keys
+    X-Forwarded-For/X-Real-IP nur hinter vertrauenswürdigem Proxy (sonst fälschbar)
+    """
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        forwarded_for = headers.get("x-forwarded-for")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+        real_ip = headers.get("x-real-ip")
+        if real_ip:
+            return real_ip
+    return client[0] if client else "unknown"
+
+
+def _redis_connection_factory():
+    # Spät importiert: app.core.cache benötigt redis, dieses Modul nicht
+    from app.core.cache import cache
+    return cache.get_redis_connection()
+
+
+limiter = RateLimiter(
+    connection_factory=_redis_connection_factory,
+    mode=settings.RATE_LIMIT_MODE,
+    lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+    lease_ttl=settings.RATE_LIMIT_LEASE_TTL,
+)
+
+metrics.register_stats("agentland_rate_limit", lambda: limiter.stats, "Rate Limiter")
+
+__all__ = [
+    "RATE_LIMIT_CATEGORIES",
+    "RateLimitDecision",
+    "RateLimitPolicy",
+    "RateLimiter",
+    "client_identifier",
+    "limiter",
+]
@@ -0,0 +1,559 @@
+"""
+Semantischer Cache für AI-Responses
+Prompt-Embeddings liegen pro Kontext-Partition in einer zusammenhängenden
+NumPy-Matrix; die Suche ist ein vektorisiertes Cosinus-Top-1 (Matrix · Query)
+statt difflib über alle Prompts. Dadurch treffen auch paraphrasierte
+deutsche/französische Fragen den Cache.
+
+Persistenz pro Eintrag in Redis (RedisSemanticStore) statt eines Blobs pro
+Kontext: Schreiben ist ein atomares Append, gelesen wird nur der Kandidat.
+Optional geht jeder Eintrag zusätzlich per Write-Behind in den L3-Cache;
+ist der Redis-Index eines Kontexts leer (Flush/Neustart), wird er daraus
+wiederhergestellt.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Gleiches Modell wie SaarlandRAGService (mehrsprachig, 384 Dimensionen)
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_DIM = 384
+
+_embedding_model = None
+
+
+def get_embedding_model():
+    """
+    Lädt das Embedding-Modell einmal pro Prozess
+    Wird auch von SaarlandRAGService genutzt, damit das Modell nur einmal im Speicher liegt
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        from sentence_transformers import SentenceTransformer
+        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalisiert Prompt für exakte Treffer (Groß/Klein, Whitespace)"""
+    return re.sub(r"\s+", " ", prompt.strip().lower())
+
+
+def prompt_fingerprint(normalized_prompt: str) -> str:
+    """Feld-ID eines Eintrags (Hash-Feld in Redis, Zeilen-Key lokal)"""
+    return hashlib.md5(normalized_prompt.encode()).hexdigest()
+
+
+# Speichert einen Eintrag atomar und verdrängt überzählige Einträge
+# KEYS[1]=Responses-Hash, KEYS[2]=Embedding-Hash, KEYS[3]=Index-ZSET
+# ARGV: fid, response, embedding, Modus (lru|lfu), now, Kapazität, TTL
+_STORE_ENTRY_SCRIPT = """
+local fid = ARGV[1]
+redis.call("hset", KEYS[1], fid, ARGV[2])
+redis.call("hset", KEYS[2], fid, ARGV[3])
+if ARGV[4] == "lfu" then
+    redis.call("zincrby", KEYS[3], 1, fid)
+else
+    redis.call("zadd", KEYS[3], ARGV[5], fid)
+end
+
+local evicted = {}
+local excess = redis.call("zcard", KEYS[3]) - tonumber(ARGV[6])
+if excess > 0 then
+    -- Den gerade geschriebenen Eintrag nie selbst verdrängen (LFU: Score 1)
+    for _, victim in ipairs(redis.call("zrange", KEYS[3], 0, excess)) do
+        if #evicted < excess and victim ~= fid then
+            table.insert(evicted, victim)
+        end
+    end
+    for _, victim in ipairs(evicted) do
+        redis.call("zrem", KEYS[3], victim)
+        redis.call("hdel", KEYS[1], victim)
+        redis.call("hdel", KEYS[2], victim)
+    end
+end
+
+local ttl = tonumber(ARGV[7])
+for i = 1, 3 do
+    redis.call("expire", KEYS[i], ttl)
+end
+return evicted
+"""
+
+
+class RedisSemanticStore:
+    """
+    Redis-Layout pro Kontext
+    - {prefix}:{ctx}:r  HASH  fid -> Response
+    - {prefix}:{ctx}:v  HASH  fid -> Embedding (float32-Bytes)
+    - {prefix}:{ctx}:u  ZSET  fid -> Zeitpunkt (LRU) bzw. Zugriffe (LFU)
+    Gleichzeitige Writer verlieren keine Einträge mehr, da nie der ganze
+    Kontext zurückgeschrieben wird.
+
+    persistent: optionaler L3ResultCache; Einträge liegen dort einzeln unter
+    {prefix}:{ctx}:e:{fid} und füllen einen leeren Redis-Index wieder auf
+    """
+
+    def __init__(
+        self,
+        connection_factory: Callable[[], Awaitable[Any]],
+        prefix: str = "ai",
+        eviction: str = "lru",
+        capacity: int = 512,
+        persistent: Any = None,
+        rehydrate_interval: float = 300.0,
+    ):
+        if eviction not in ("lru", "lfu"):
+            raise ValueError(f"Unbekannte Eviction-Strategie: {eviction}")
+        self._connection_factory = connection_factory
+        self.prefix = prefix
+        self.eviction = eviction
+        self.capacity = capacity
+        self.persistent = persistent
+        self.rehydrate_interval = rehydrate_interval
+        # Kontext -> letzter Wiederherstellungsversuch (leere Kontexte nicht bei jedem Sync scannen)
+        self._rehydrated: "OrderedDict[str, float]" = OrderedDict()
+
+        self.stats = {
+            "stores": 0,
+            "persisted": 0,
+            "rehydrated": 0,
+            "fetches": 0,
+            "index_syncs": 0,
+            "embeddings_loaded": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    def _keys(self, context_key: str) -> Tuple[str, str, str]:
+        base = f"{self.prefix}:{context_key}"
+        return f"{base}:r", f"{base}:v", f"{base}:u"
+
+    async def _run(self, operation: Callable[[Any], Awaitable[Any]], default: Any = None) -> Any:
+        conn = await self._connection_factory()
+        if not conn:
+            return default
+        try:
+            return await operation(conn)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Semantic store Redis error: {e}")
+            return default
+        finally:
+            await conn.close()
+
+    def _entry_key(self, context_key: str, fid: str = "") -> str:
+        return f"{self.prefix}:{context_key}:e:{fid}"
+
+    async def index(self, context_key: str) -> Optional[List[str]]:
+        """Alle fids des Kontexts (nur der kleine Index, keine Responses)"""
+        _, _, index_key = self._keys(context_key)
+        fids = await self._run(lambda conn: conn.zrange(index_key, 0, -1))
+        if fids is None:
+            return None
+        self.stats["index_syncs"] += 1
+        if not fids and self.persistent is not None:
+            return await self._rehydrate(context_key)
+        return [fid.decode() if isinstance(fid, bytes) else fid for fid in fids]
+
+    async def _rehydrate(self, context_key: str) -> List[str]:
+        """Schreibt die neuesten L3-Einträge eines Kontexts zurück nach Redis"""
+        now = time.monotonic()
+        last_attempt = self._rehydrated.get(context_key)
+        if last_attempt is not None and now - last_attempt < self.rehydrate_interval:
+            return []
+        self._rehydrated[context_key] = now
+        self._rehydrated.move_to_end(context_key)
+        while len(self._rehydrated) > 4096:
+            self._rehydrated.popitem(last=False)
+
+        entries = await self.persistent.scan_prefix(self._entry_key(context_key), self.capacity)
+        fids = []
+        # Älteste zuerst, damit die LRU-Reihenfolge in Redis erhalten bleibt
+        for key, value, remaining_ttl in reversed(entries):
+            fid = key.rsplit(":", 1)[1]
+            await self.store(
+                context_key, fid, value["response"], value["embedding"],
+                max(1, int(remaining_ttl)), persist=False,
+            )
+            fids.append(fid)
+        self.stats["rehydrated"] += len(fids)
+        return fids
+
+    async def embeddings(self, context_key: str, fids: List[str]) -> List[Optional[bytes]]:
+        """Embeddings für die angegebenen fids (HMGET)"""
+        if not fids:
+            return []
+        _, vectors_key, _ = self._keys(context_key)
+        blobs = await self._run(lambda conn: conn.hmget(vectors_key, fids), [None] * len(fids))
+        self.stats["embeddings_loaded"] += sum(1 for blob in blobs if blob is not None)
+        return blobs
+
+    async def fetch(self, context_key: str, fid: str) -> Optional[str]:
+        """Holt genau eine Response und markiert sie als benutzt"""
+        responses_key, _, index_key = self._keys(context_key)
+
+        async def operation(conn):
+            pipe = conn.pipeline(transaction=False)
+            pipe.hget(responses_key, fid)
+            self._queue_touch(pipe, index_key, fid)
+            response, _ = await pipe.execute()
+            return response
+
+        response = await self._run(operation)
+        self.stats["fetches"] += 1
+        if response is None:
+            return None
+        return response.decode() if isinstance(response, bytes) else response
+
+    async def touch(self, context_key: str, fid: str):
+        """Aktualisiert LRU-Zeitpunkt bzw. LFU-Zähler eines Treffers"""
+        _, _, index_key = self._keys(context_key)
+
+        async def operation(conn):
+            pipe = conn.pipeline(transaction=False)
+            self._queue_touch(pipe, index_key, fid)
+            await pipe.execute()
+
+        await self._run(operation)
+
+    def _queue_touch(self, pipe, index_key: str, fid: str):
+        # XX: bereits verdrängte Einträge nicht wiederbeleben
+        if self.eviction == "lfu":
+            pipe.zadd(index_key, {fid: 1}, xx=True, incr=True)
+        else:
+            pipe.zadd(index_key, {fid: time.time()}, xx=True)
+
+    async def store(
+        self, context_key: str, fid: str, response: str, embedding: bytes, ttl: int, persist: bool = True
+    ) -> List[str]:
+        """Speichert Eintrag atomar; gibt die in Redis verdrängten fids zurück"""
+        if persist and self.persistent is not None:
+            # Write-Behind: überlebt Redis-Flush/-Neustart, verdrängte Einträge laufen per TTL aus
+            self.persistent.put(
+                self._entry_key(context_key, fid), {"response": response, "embedding": embedding}, ttl
+            )
+            self.stats["persisted"] += 1
+
+        keys = self._keys(context_key)
+        evicted = await self._run(
+            lambda conn: conn.eval(
+                _STORE_ENTRY_SCRIPT, 3, *keys,
+                fid, response, embedding, self.eviction, time.time(), self.capacity, int(ttl),
+            ),
+            [],
+        )
+        self.stats["stores"] += 1
+        self.stats["evictions"] += len(evicted)
+        return [victim.decode() if isinstance(victim, bytes) else victim for victim in evicted]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "eviction": self.eviction, "capacity": self.capacity}
+
+
+class SemanticPartition:
+    """
+    Embeddings einer Kontext-Partition
+    - Zeilen der Matrix sind L2-normalisiert, Cosinus = Skalarprodukt
+    - LRU-Eviction über einen last_used-Vektor (argmin, vektorisiert)
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, capacity: int = 512):
+        self.dim = dim
+        self.capacity = capacity
+        self.embeddings = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.keys: List[Optional[str]] = [None] * capacity
+        self.responses: List[Optional[str]] = [None] * capacity
+        self.row_of: Dict[str, int] = {}
+        self.size = 0
+        # Zeitpunkt des letzten Index-Abgleichs mit dem Store (0 = nie)
+        self.synced_at = 0.0
+        self.syncing = False
+
+    def __len__(self) -> int:
+        return self.size
+
+    def search(self, query: np.ndarray) -> Tuple[int, float]:
+        """Top-1 nach Cosinus-Ähnlichkeit; (-1, 0.0) bei leerer Partition"""
+        if self.size == 0:
+            return -1, 0.0
+        scores = self.embeddings[:self.size] @ query
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def lookup_exact(self, key: str) -> int:
+        return self.row_of.get(key, -1)
+
+    def touch(self, row: int):
+        self.last_used[row] = time.monotonic()
+
+    def add(self, key: str, embedding: np.ndarray, response: Optional[str]) -> Optional[str]:
+        """Fügt Eintrag hinzu; gibt ggf. den verdrängten Key zurück"""
+        evicted = None
+        row = self.row_of.get(key)
+        if row is None:
+            if self.size < self.capacity:
+                row = self.size
+                self.size += 1
+            else:
+                row = int(np.argmin(self.last_used[:self.size]))
+                evicted = self.keys[row]
+                del self.row_of[evicted]
+            self.row_of[key] = row
+            self.keys[row] = key
+
+        self.embeddings[row] = embedding
+        # None = Response liegt nur im Store und wird erst beim Treffer geholt
+        self.responses[row] = response
+        self.touch(row)
+        return evicted
+
+    def remove(self, key: str) -> bool:
+        """Entfernt Eintrag; letzte Zeile rückt nach, Matrix bleibt zusammenhängend"""
+        row = self.row_of.pop(key, None)
+        if row is None:
+            return False
+        last = self.size - 1
+        if row != last:
+            moved_key = self.keys[last]
+            self.embeddings[row] = self.embeddings[last]
+            self.last_used[row] = self.last_used[last]
+            self.keys[row] = moved_key
+            self.responses[row] = self.responses[last]
+            self.row_of[moved_key] = row
+        self.keys[last] = None
+        self.responses[last] = None
+        self.last_used[last] = 0
+        self.size -= 1
+        return True
+
+
+class SemanticCache:
+    """
+    Partitionierter semantischer Cache (eine Partition pro Kontext)
+
+    embedder: async Callable[str] -> normalisierter np.ndarray; None = nur exakte Treffer
+    store: optionaler RedisSemanticStore; lokal liegen dann nur fids und Embeddings,
+           Responses werden erst für den gefundenen Kandidaten geholt
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Callable[[str], Any]] = None,
+        similarity_threshold: float = 0.9,
+        partition_capacity: int = 512,
+        max_partitions: int = 256,
+        dim: int = EMBEDDING_DIM,
+        store: Optional[RedisSemanticStore] = None,
+        sync_interval: float = 30.0,
+    ):
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.partition_capacity = partition_capacity
+        self.max_partitions = max_partitions
+        self.dim = dim
+        self.store = store
+        self.sync_interval = sync_interval
+
+        self.partitions: "OrderedDict[str, SemanticPartition]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._background_tasks: set = set()
+
+        self.stats = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "searches": 0,
+            "stores": 0,
+            "evictions": 0,
+            "stale_candidates": 0,
+            "embed_errors": 0,
+            "lookup_ns": 0,
+            "embed_ns": 0,
+            "embeds": 0,
+        }
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embedder is None:
+            return None
+        start = time.perf_counter_ns()
+        try:
+            embedding = await self.embedder(text)
+        except Exception as e:
+            self.stats["embed_errors"] += 1
+            logger.error(f"Semantic cache embedding error: {e}")
+            return None
+        self.stats["embeds"] += 1
+        self.stats["embed_ns"] += time.perf_counter_ns() - start
+        return np.asarray(embedding, dtype=np.float32)
+
+    async def _partition(self, partition_key: str) -> SemanticPartition:
+        partition = self.partitions.get(partition_key)
+        if partition is not None:
+            self.partitions.move_to_end(partition_key)
+            if (
+                self.store is not None
+                and not partition.syncing
+                and time.monotonic() - partition.synced_at > self.sync_interval
+            ):
+                await self._sync(partition_key, partition)
+            return partition
+
+        # Gleichzeitige erste Zugriffe laden die Partition nur einmal
+        loading = self._loading.get(partition_key)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[partition_key] = future
+        try:
+            partition = SemanticPartition(self.dim, self.partition_capacity)
+            if self.store is not None:
+                await self._sync(partition_key, partition)
+
+            self.partitions[partition_key] = partition
+            while len(self.partitions) > self.max_partitions:
+                self.partitions.popitem(last=False)
+            future.set_result(partition)
+            return partition
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(partition_key, None)
+
+    async def _sync(self, partition_key: str, partition: SemanticPartition):
+        """
+        Gleicht den lokalen Index mit dem Store ab: verdrängte fids entfernen,
+        nur die Embeddings neuer fids nachladen (andere Worker)
+        """
+        partition.syncing = True
+        try:
+            fids = await self.store.index(partition_key)
+            if fids is None:
+                return
+            remote = set(fids)
+            for fid in [fid for fid in partition.row_of if fid not in remote]:
+                partition.remove(fid)
+
+            missing = [fid for fid in fids if fid not in partition.row_of]
+            blobs = await self.store.embeddings(partition_key, missing)
+            for fid, blob in zip(missing, blobs):
+                if blob is not None and len(blob) == self.dim * 4:
+                    partition.add(fid, np.frombuffer(blob, dtype=np.float32), None)
+        finally:
+            partition.synced_at = time.monotonic()
+            partition.syncing = False
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _response(self, partition_key: str, partition: SemanticPartition, row: int) -> Optional[str]:
+        """Response des Kandidaten - lokal oder als einzelnes Hash-Feld aus dem Store"""
+        fid = partition.keys[row]
+        partition.touch(row)
+        response = partition.responses[row]
+        if response is not None:
+            if self.store is not None:
+                self._spawn(self.store.touch(partition_key, fid))
+            return response
+        if self.store is None:
+            return None
+
+        response = await self.store.fetch(partition_key, fid)
+        if response is None:
+            # Zwischenzeitlich von einem anderen Worker verdrängt
+            self.stats["stale_candidates"] += 1
+            partition.remove(fid)
+            return None
+        # Zeile kann sich während des Awaits verschoben haben
+        row = partition.lookup_exact(fid)
+        if row >= 0:
+            partition.responses[row] = response
+        return response
+
+    async def lookup(self, partition_key: str, prompt: str) -> Optional[str]:
+        """Exakter Treffer auf normalisiertem Prompt, sonst semantisches Top-1"""
+        self.stats["lookups"] += 1
+        partition = await self._partition(partition_key)
+        normalized = normalize_prompt(prompt)
+
+        row = partition.lookup_exact(prompt_fingerprint(normalized))
+        if row >= 0:
+            response = await self._response(partition_key, partition, row)
+            if response is not None:
+                self.stats["exact_hits"] += 1
+                return response
+
+        if len(partition) == 0:
+            self.stats["misses"] += 1
+            return None
+
+        query = await self._embed(normalized)
+        if query is None:
+            self.stats["misses"] += 1
+            return None
+
+        start = time.perf_counter_ns()
+        row, score = partition.search(query)
+        self.stats["lookup_ns"] += time.perf_counter_ns() - start
+        self.stats["searches"] += 1
+
+        if row >= 0 and score >= self.similarity_threshold:
+            response = await self._response(partition_key, partition, row)
+            if response is not None:
+                self.stats["semantic_hits"] += 1
+                logger.info(f"AI Cache hit (similarity: {score:.2f})")
+                return response
+
+        self.stats["misses"] += 1
+        return None
+
+    async def store_response(self, partition_key: str, prompt: str, response: str, ttl: int = 86400):
+        """Speichert Response samt Prompt-Embedding (lokal und atomar im Store)"""
+        normalized = normalize_prompt(prompt)
+        fid = prompt_fingerprint(normalized)
+        embedding = await self._embed(normalized)
+        if embedding is None:
+            # Ohne Modell nur exakte Treffer - Null-Vektor matcht nie semantisch
+            embedding = np.zeros(self.dim, dtype=np.float32)
+
+        partition = await self._partition(partition_key)
+        if partition.add(fid, embedding, response) is not None:
+            self.stats["evictions"] += 1
+        self.stats["stores"] += 1
+
+        if self.store is not None:
+            evicted = await self.store.store(partition_key, fid, response, embedding.tobytes(), ttl)
+            for victim in evicted:
+                partition.remove(victim)
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        lookups = self.stats["lookups"]
+        searches = self.stats["searches"]
+        return {
+            **self.stats,
+            "hit_rate": (hits / lookups * 100) if lookups else 0,
+            "avg_search_us": (self.stats["lookup_ns"] / searches / 1000) if searches else 0,
+            "avg_embed_ms": (self.stats["embed_ns"] / self.stats["embeds"] / 1e6) if self.stats["embeds"] else 0,
+            "partitions": len(self.partitions),
+            "entries": sum(len(p) for p in self.partitions.values()),
+            "similarity_threshold": self.similarity_threshold,
+            "embedder": self.embedder is not None,
+            "store": self.store.get_stats() if self.store is not None else None,
+        }
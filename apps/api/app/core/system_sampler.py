@@ -0,0 +1,167 @@
+"""
+Hintergrund-Sampler für System-Metriken
+CPU, Speicher, Load Average, offene File-Deskriptoren, Event-Loop-Lag und
+Prozesswerte werden in festem Intervall im Threadpool gelesen und in
+Ringpuffern abgelegt. Endpunkte lesen nur noch aus dem Speicher.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PsutilReader:
+    """
+    Liest System- und Prozesswerte ohne zu blockieren: cpu_percent(interval=None)
+    liefert die Auslastung seit dem vorigen Aufruf, also seit dem letzten Sample
+    """
+
+    def __init__(self, disk_path: str = "/"):
+        import psutil
+
+        self._psutil = psutil
+        self._process = psutil.Process()
+        self.disk_path = disk_path
+        # Erster Aufruf setzt nur den Referenzpunkt
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+
+    def __call__(self) -> Dict[str, float]:
+        psutil = self._psutil
+        memory = psutil.virtual_memory()
+        process = self._process
+        with process.oneshot():
+            sample = {
+                "cpu_percent": psutil.cpu_percent(interval=None),
+                "memory_percent": memory.percent,
+                "memory_used_gb": memory.used / (1024**3),
+                "memory_available_gb": memory.available / (1024**3),
+                "disk_usage_percent": psutil.disk_usage(self.disk_path).percent,
+                "process_cpu_percent": process.cpu_percent(interval=None),
+                "process_rss_mb": process.memory_info().rss / (1024**2),
+                "process_threads": process.num_threads(),
+            }
+            if hasattr(process, "num_fds"):
+                sample["open_fds"] = process.num_fds()
+        sample.update(_load_average())
+        return sample
+
+
+def _load_average() -> Dict[str, float]:
+    try:
+        load_1m, load_5m, load_15m = os.getloadavg()
+    except (AttributeError, OSError):
+        return {}
+    return {"load_1m": load_1m, "load_5m": load_5m, "load_15m": load_15m}
+
+
+def _minimal_reader() -> Dict[str, float]:
+    """Ersatz ohne psutil: Load Average und File-Deskriptoren aus /proc"""
+    sample = _load_average()
+    try:
+        sample["open_fds"] = len(os.listdir("/proc/self/fd"))
+    except OSError:
+        pass
+    return sample
+
+
+def default_reader() -> Callable[[], Dict[str, float]]:
+    try:
+        return PsutilReader()
+    except ImportError:
+        logger.warning("psutil nicht installiert - System-Metriken eingeschränkt")
+        return _minimal_reader
+
+
+class SystemSampler:
+    """
+    Ringpuffer pro Metrik mit (Zeitstempel, Wert); history Samples je Metrik.
+    Event-Loop-Lag ist die Verspätung, mit der der Sampler selbst aufwacht.
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        history: int = 120,
+        reader: Optional[Callable[[], Dict[str, float]]] = None,
+    ):
+        self.interval = interval
+        self.history = history
+        self._reader = reader
+        self.series: Dict[str, Deque[Tuple[float, float]]] = {}
+        self.latest: Dict[str, float] = {}
+        self.last_sample_at: Optional[float] = None
+        self.samples = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, sample: Dict[str, float], timestamp: Optional[float] = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        for name, value in sample.items():
+            buffer = self.series.get(name)
+            if buffer is None:
+                buffer = self.series[name] = deque(maxlen=self.history)
+            buffer.append((timestamp, value))
+            self.latest[name] = value
+        self.last_sample_at = timestamp
+        self.samples += 1
+
+    async def sample_once(self, loop_lag: Optional[float] = None):
+        if self._reader is None:
+            self._reader = default_reader()
+        try:
+            sample = await asyncio.to_thread(self._reader)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"System sampler error: {e}")
+            sample = {}
+        if loop_lag is not None:
+            sample["event_loop_lag_ms"] = loop_lag * 1000
+        self.record(sample)
+
+    async def start(self):
+        if self._task is None:
+            await self.sample_once()
+            self._task = asyncio.create_task(self._sample_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample_loop(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            await self.sample_once(max(0.0, time.monotonic() - expected))
+
+    # ------------------------------------------------------------------
+    # Lesen (nur Speicher)
+    # ------------------------------------------------------------------
+
+    def get(self, name: str, default: float = 0.0) -> float:
+        return self.latest.get(name, default)
+
+    def get_series(self, name: str, points: Optional[int] = None) -> List[Tuple[float, float]]:
+        buffer = self.series.get(name, ())
+        values = list(buffer)
+        return values[-points:] if points else values
+
+    def snapshot(self, points: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "errors": self.errors,
+            "age_seconds": (time.time() - self.last_sample_at) if self.last_sample_at else None,
+            "latest": dict(self.latest),
+            "series": {name: self.get_series(name, points) for name in sorted(self.series)},
+        }
@@ -0,0 +1,62 @@
+"""
+Hashed Timer Wheel
+Timer liegen im Slot ihres Deadline-Ticks (Tick mod Slots). Schedule und
+Cancel sind O(1); advance besucht nur die seit dem letzten Aufruf
+vergangenen Slots. Solange alle Deadlines innerhalb einer Umdrehung
+(slots * tick Sekunden) liegen, kostet der Ablauf O(abgelaufene Timer).
+"""
+
+import time
+from typing import Callable, Dict, Hashable, List
+
+
+class HashedTimerWheel:
+    """Timer mit Tick-Granularität: ein Timer feuert höchstens einen Tick zu spät"""
+
+    def __init__(self, tick: float = 1.0, slots: int = 512, clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self.slots = slots
+        self._clock = clock
+        # Slot -> (Key -> Deadline-Tick)
+        self._wheel: List[Dict[Hashable, int]] = [{} for _ in range(slots)]
+        self._index: Dict[Hashable, int] = {}  # Key -> Slot
+        self._current = int(clock() / tick)  # erster noch nicht abgearbeiteter Tick
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Setzt (oder verschiebt) den Timer key auf deadline (Uhrzeit von clock)"""
+        self.cancel(key)
+        deadline_tick = max(int(deadline / self.tick), self._current)
+        slot = deadline_tick % self.slots
+        self._wheel[slot][key] = deadline_tick
+        self._index[key] = slot
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self._index.pop(key, None)
+        if slot is None:
+            return False
+        del self._wheel[slot][key]
+        return True
+
+    def advance(self, now: float = None) -> List[Hashable]:
+        """Entfernt und liefert alle Timer, deren Deadline-Tick vollständig verstrichen ist"""
+        now = self._clock() if now is None else now
+        target = int(now / self.tick)
+        expired: List[Hashable] = []
+        # Nach langem Stillstand reicht eine Umdrehung: jeder Slot wird einmal besucht
+        for tick in range(max(self._current, target - self.slots), target):
+            slot = self._wheel[tick % self.slots]
+            if not slot:
+                continue
+            due = [key for key, deadline_tick in slot.items() if deadline_tick < target]
+            for key in due:
+                del slot[key]
+                del self._index[key]
+            expired.extend(due)
+        self._current = max(self._current, target)
+        return expired
@@ -7,19 +7,83 @@ import asyncio
 import json
 import logging
 import time
+import uuid
 from typing import Dict, List, Optional, Set, Any
 from collections import defaultdict
 from datetime import datetime, timedelta
 import weakref
 
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import WebSocket
 import redis.asyncio as redis
 
 from app.core.config import settings
 from app.core.cache import cache
+from app.core.metrics import registry as metrics
+from app.core.delta_sync import DeltaEncoder
+from app.core.ws_fanout import ClusterFanout
+from app.core.ws_heartbeat import HeartbeatScheduler
+from app.core.ws_outbox import (
+    SLOW_CONSUMER_CLOSE_CODE,
+    ConnectionWriter,
+    Frame,
+    collapse_state_updates,
+    new_send_stats,
+)
 
 logger = logging.getLogger(__name__)
 
+# Heartbeat-Trennung: "Going Away" statt Slow-Consumer-Code
+HEARTBEAT_CLOSE_CODE = 1001
+
+# Gemeinsamer Realtime-Zustand pro Datentyp (Hash: hash, version, epoch, data)
+REALTIME_STATE_PREFIX = "realtime:state:"
+
+# Vergibt atomar die nächste Version, sofern sich der Inhalt geändert hat
+# KEYS[1]=State-Hash; ARGV: Content-Hash, kanonisches JSON, Epoche (falls neu), TTL
+# -> {0, version, epoch} unverändert | {1, version, epoch[, vorheriges JSON]}
+_CLAIM_VERSION_SCRIPT = """
+local current = redis.call("hmget", KEYS[1], "hash", "version", "epoch", "data")
+if current[1] == ARGV[1] then
+    redis.call("expire", KEYS[1], ARGV[4])
+    return {0, tonumber(current[2]), current[3]}
+end
+local epoch = current[3] or ARGV[3]
+local version = redis.call("hincrby", KEYS[1], "version", 1)
+redis.call("hset", KEYS[1], "hash", ARGV[1], "data", ARGV[2], "epoch", epoch)
+redis.call("expire", KEYS[1], ARGV[4])
+if current[4] then
+    return {1, version, epoch, current[4]}
+end
+return {1, version, epoch}
+"""
+
+
+# Verbindungen pro Worker für den clusterweiten User-Count
+CONNECTION_COUNT_KEY = "ws:connections"
+
+# Meldet die eigene Anzahl und summiert alle nicht abgelaufenen Meldungen
+# KEYS[1]=Hash Instanz -> "anzahl:ablauf"; ARGV: Instanz, Anzahl, now, TTL
+_REPORT_CONNECTIONS_SCRIPT = """
+local now = tonumber(ARGV[3])
+redis.call("hset", KEYS[1], ARGV[1], ARGV[2] .. ":" .. (now + tonumber(ARGV[4])))
+redis.call("expire", KEYS[1], ARGV[4])
+local total = 0
+local entries = redis.call("hgetall", KEYS[1])
+for i = 1, #entries, 2 do
+    local count, expires = string.match(entries[i + 1], "^(%d+):(.+)$")
+    if count == nil or tonumber(expires) < now then
+        redis.call("hdel", KEYS[1], entries[i])
+    else
+        total = total + tonumber(count)
+    end
+end
+return total
+"""
+
+
+def _text(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
 
 class ConnectionManager:
     """
@@ -34,26 +98,51 @@ class ConnectionManager:
         # Connection-Metadaten
         self.connection_data: Dict[WebSocket, Dict[str, Any]] = {}
         
+        # Outbound-Queue + Writer-Task pro Verbindung
+        self.writers: Dict[WebSocket, ConnectionWriter] = {}
+        self.send_stats = new_send_stats()
+        
         # Performance-Tracking
         self.connection_stats = {
             "total_connections": 0,
             "peak_connections": 0,
             "messages_sent": 0,
             "messages_received": 0,
-            "connection_errors": 0
+            "connection_errors": 0,
+            "state_updates_collapsed": 0,  # im Queue-Batch durch neuere ersetzt
         }
         
+        # Channels mit Latest-Value-Wins-Semantik
+        self.state_channels: Set[str] = set(settings.WEBSOCKET_STATE_CHANNELS)
+        
         # Redis für Multi-Instance-Synchronisation
         self.redis_client = None
         self._init_redis()
+        self.instance_id = uuid.uuid4().hex[:12]
+        
+        # Broadcasts an Verbindungen auf anderen Instanzen (ein PUBLISH pro Broadcast)
+        self.fanout: Optional[ClusterFanout] = None
+        if self.redis_client and settings.WEBSOCKET_FANOUT_ENABLED:
+            self.fanout = ClusterFanout(
+                self.redis_client,
+                self._deliver_local,
+                prefix=settings.WEBSOCKET_FANOUT_PREFIX,
+                instance_id=self.instance_id,
+            )
         
         # Message Queue für Burst-Handling
         self.message_queue = asyncio.Queue(maxsize=10000)
         self.queue_worker_task = None
         
-        # Connection Cleanup
-        self.cleanup_interval = 60  # Sekunden
-        self.last_cleanup = time.time()
+        # Ping/Pong- und Idle-Deadlines im Timer Wheel: Ablauf O(fällig) statt Scan
+        self.heartbeat = HeartbeatScheduler(
+            ping_interval=settings.WEBSOCKET_PING_INTERVAL,
+            pong_timeout=settings.WEBSOCKET_PONG_TIMEOUT,
+            idle_timeout=settings.WEBSOCKET_IDLE_TIMEOUT,
+            jitter=settings.WEBSOCKET_PING_JITTER,
+            tick=settings.WEBSOCKET_TIMER_TICK,
+        )
+        self.heartbeat_task = None
         
     def _init_redis(self):
         """Redis für horizontale Skalierung"""
@@ -73,23 +162,41 @@ class ConnectionManager:
             await websocket.accept()
             
             # Verbindung hinzufügen
+            first_in_channel = channel not in self.connections
             self.connections[channel].add(websocket)
             self.connection_data[websocket] = {
                 "channel": channel,
                 "user_id": user_id,
                 "connected_at": datetime.now(),
-                "last_ping": time.time(),
-                "message_count": 0
             }
+            writer = ConnectionWriter(
+                websocket.send,
+                lambda reason, websocket=websocket: self._evict(websocket, reason),
+                maxsize=settings.WEBSOCKET_SEND_QUEUE_SIZE,
+                policy=settings.WEBSOCKET_SLOW_CONSUMER_POLICY,
+                send_timeout=settings.WEBSOCKET_SEND_TIMEOUT,
+                stats=self.send_stats,
+            )
+            self.writers[websocket] = writer
+            writer.start()
+            self.heartbeat.add(websocket)
             
-            # Statistiken aktualisieren
-            self.connection_stats["total_connections"] = len(self._get_all_connections())
+            # Statistiken aktualisieren (Zähler statt Liste aller Verbindungen)
+            self.connection_stats["total_connections"] += 1
             if self.connection_stats["total_connections"] > self.connection_stats["peak_connections"]:
                 self.connection_stats["peak_connections"] = self.connection_stats["total_connections"]
             
             # Queue Worker starten falls nötig
             if self.queue_worker_task is None:
                 self.queue_worker_task = asyncio.create_task(self._process_message_queue())
+            if self.heartbeat_task is None:
+                self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+            
+            # Channel auf dieser Instanz neu belegt -> Redis-Channel abonnieren
+            if self.fanout:
+                await self.fanout.start()
+                if first_in_channel:
+                    await self.fanout.join(channel)
             
             logger.info(f"WebSocket connected: {channel} (Total: {self.connection_stats['total_connections']})")
             
@@ -119,12 +226,18 @@ class ConnectionManager:
                     self.connections[channel].discard(websocket)
                     if not self.connections[channel]:
                         del self.connections[channel]
+                        if self.fanout:
+                            await self.fanout.leave(channel)
                 
-                # Metadaten entfernen
+                # Metadaten und Timer entfernen, Writer beenden
                 del self.connection_data[websocket]
+                self.heartbeat.remove(websocket)
+                writer = self.writers.pop(websocket, None)
+                if writer is not None:
+                    await writer.stop()
                 
                 # Statistiken aktualisieren
-                self.connection_stats["total_connections"] = len(self._get_all_connections())
+                self.connection_stats["total_connections"] -= 1
                 
                 logger.info(f"WebSocket disconnected: {channel} (Total: {self.connection_stats['total_connections']})")
                 
@@ -140,29 +253,71 @@ class ConnectionManager:
         except Exception as e:
             logger.error(f"WebSocket disconnect error: {e}")
     
-    def _get_all_connections(self) -> List[WebSocket]:
-        """Alle aktiven Verbindungen"""
-        all_connections = []
-        for channel_connections in self.connections.values():
-            all_connections.extend(channel_connections)
-        return all_connections
+    def record_activity(self, websocket: WebSocket, pong: bool = False):
+        """Eingehender Frame (für Endpoints mit eigenem receive): verschiebt Ping/Idle"""
+        self.connection_stats["messages_received"] += 1
+        self.heartbeat.activity(websocket, pong)
     
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        """Nachricht an spezifische Verbindung"""
+    async def receive_message(self, websocket: WebSocket) -> Optional[str]:
+        """
+        Empfängt den nächsten Text-Frame und vermerkt die Aktivität.
+        Pong-Antworten auf Server-Pings werden verbraucht (Rückgabe None)
+        """
+        text = await websocket.receive_text()
+        pong = len(text) < 64 and '"pong"' in text and self._is_pong(text)
+        self.record_activity(websocket, pong)
+        return None if pong else text
+    
+    @staticmethod
+    def _is_pong(text: str) -> bool:
         try:
-            await websocket.send_text(message)
+            return json.loads(text).get("type") == "pong"
+        except (ValueError, AttributeError):
+            return False
+    
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        """Nachricht an spezifische Verbindung (über deren Outbound-Queue)"""
+        writer = self.writers.get(websocket)
+        if writer is None:
+            return
+        if writer.enqueue(Frame(message)):
             self.connection_stats["messages_sent"] += 1
-            
-            if websocket in self.connection_data:
-                self.connection_data[websocket]["message_count"] += 1
-                
-        except WebSocketDisconnect:
-            await self.disconnect(websocket)
-        except Exception as e:
-            logger.error(f"Send personal message error: {e}")
+        else:
+            await writer.evict("queue_full")
+    
+    async def broadcast_to_channel(
+        self, message: str, channel: str, state_key: Optional[str] = None, event: bool = False
+    ):
+        """
+        Optimiertes Broadcast an Channel (alle Instanzen). State-Channels bzw.
+        ein state_key: ausstehende ältere Updates desselben Keys entfallen;
+        event=True erzwingt volle Reihenfolge (z.B. Deltas)
+        """
+        if state_key is None and not event and channel in self.state_channels:
+            state_key = channel
+        if self.fanout:
+            await self.fanout.publish(channel, message, state_key)
+        await self._deliver_local(channel, message, state_key)
+    
+    async def broadcast_to_all(self, message: str, state_key: Optional[str] = None):
+        """Broadcast an alle Verbindungen (alle Instanzen)"""
+        if self.fanout:
+            await self.fanout.publish(None, message, state_key)
+        await self._deliver_local(None, message, state_key)
     
-    async def broadcast_to_channel(self, message: str, channel: str):
-        """Optimiertes Broadcast an Channel"""
+    async def _deliver_local(self, channel: Optional[str], message: str, state_key: Optional[str] = None):
+        """Broadcast an die Verbindungen dieser Instanz (channel None = alle)"""
+        if channel is None:
+            if not self.connection_data:
+                return
+            await self.message_queue.put({
+                "type": "global_broadcast",
+                "message": message,
+                "state_key": state_key,
+                "timestamp": time.time()
+            })
+            return
+        
         if channel not in self.connections:
             return
         
@@ -171,14 +326,7 @@ class ConnectionManager:
             "type": "channel_broadcast",
             "message": message,
             "channel": channel,
-            "timestamp": time.time()
-        })
-    
-    async def broadcast_to_all(self, message: str):
-        """Broadcast an alle Verbindungen"""
-        await self.message_queue.put({
-            "type": "global_broadcast",
-            "message": message,
+            "state_key": state_key,
             "timestamp": time.time()
         })
     
@@ -216,109 +364,111 @@ class ConnectionManager:
                 # Messages verarbeiten
                 await self._process_message_batch(messages)
                 
-                # Cleanup durchführen falls nötig
-                if time.time() - self.last_cleanup > self.cleanup_interval:
-                    await self._cleanup_connections()
-                    self.last_cleanup = time.time()
-                
             except Exception as e:
                 logger.error(f"Message queue error: {e}")
                 await asyncio.sleep(1)
     
     async def _process_message_batch(self, messages: List[Dict[str, Any]]):
-        """Verarbeitet Message-Batch"""
+        """Verarbeitet Message-Batch (überholte State-Updates entfallen)"""
+        messages, collapsed = collapse_state_updates(messages)
+        self.connection_stats["state_updates_collapsed"] += collapsed
         for message_data in messages:
             try:
                 if message_data["type"] == "channel_broadcast":
                     await self._broadcast_channel_internal(
                         message_data["message"], 
-                        message_data["channel"]
+                        message_data["channel"],
+                        message_data.get("state_key"),
                     )
                 elif message_data["type"] == "global_broadcast":
-                    await self._broadcast_global_internal(message_data["message"])
+                    await self._broadcast_global_internal(
+                        message_data["message"],
+                        message_data.get("state_key"),
+                    )
                     
             except Exception as e:
                 logger.error(f"Message batch processing error: {e}")
     
-    async def _broadcast_channel_internal(self, message: str, channel: str):
-        """Internes Channel-Broadcast"""
+    async def _broadcast_channel_internal(self, message: str, channel: str, state_key: Optional[str] = None):
+        """Internes Channel-Broadcast: ein Frame, O(Verbindungen) Enqueues"""
         if channel not in self.connections:
             return
-        
-        dead_connections = []
-        
-        # Paralleles Senden für bessere Performance
-        tasks = []
-        for websocket in self.connections[channel]:
-            tasks.append(self._send_safe(websocket, message))
-        
-        # Maximal 50 gleichzeitige Sends
-        for i in range(0, len(tasks), 50):
-            batch = tasks[i:i+50]
-            results = await asyncio.gather(*batch, return_exceptions=True)
-            
-            # Tote Verbindungen sammeln
-            for j, result in enumerate(results):
-                if isinstance(result, Exception):
-                    websocket = list(self.connections[channel])[i+j]
-                    dead_connections.append(websocket)
-        
-        # Tote Verbindungen entfernen
-        for websocket in dead_connections:
-            await self.disconnect(websocket)
+        await self._enqueue_frame(self._frame(message, channel, state_key), self.connections[channel])
     
-    async def _broadcast_global_internal(self, message: str):
+    async def _broadcast_global_internal(self, message: str, state_key: Optional[str] = None):
         """Internes Global-Broadcast"""
-        all_connections = self._get_all_connections()
-        dead_connections = []
-        
-        # Batch-Processing für bessere Performance
-        for i in range(0, len(all_connections), 100):
-            batch = all_connections[i:i+100]
-            tasks = [self._send_safe(ws, message) for ws in batch]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Tote Verbindungen sammeln
-            for j, result in enumerate(results):
-                if isinstance(result, Exception):
-                    dead_connections.append(batch[j])
-        
-        # Cleanup
-        for websocket in dead_connections:
-            await self.disconnect(websocket)
+        await self._enqueue_frame(self._frame(message, "__all__", state_key), self.writers)
     
-    async def _send_safe(self, websocket: WebSocket, message: str):
-        """Sicheres Senden mit Error-Handling"""
-        try:
-            await websocket.send_text(message)
-            self.connection_stats["messages_sent"] += 1
-            return True
-        except WebSocketDisconnect:
-            raise  # Will be handled in batch processing
-        except Exception as e:
-            logger.error(f"Send error: {e}")
-            raise
+    @staticmethod
+    def _frame(message: str, channel: str, state_key: Optional[str]) -> Frame:
+        """State-Frames ersetzen in jeder Connection-Queue ihren Vorgänger"""
+        if state_key is None:
+            return Frame(message, key=channel)
+        return Frame(message, key=f"{channel}:{state_key}", state=True)
     
-    async def _cleanup_connections(self):
-        """Periodische Bereinigung toter Verbindungen"""
-        current_time = time.time()
-        dead_connections = []
+    async def _enqueue_frame(self, frame: Frame, websockets):
+        """Reiht den geteilten Frame ein; Sends laufen in den Writer-Tasks"""
+        rejected = []
+        for websocket in websockets:
+            writer = self.writers.get(websocket)
+            if writer is None:
+                continue
+            if writer.enqueue(frame):
+                self.connection_stats["messages_sent"] += 1
+            else:
+                rejected.append(writer)
         
-        for websocket, data in self.connection_data.items():
-            # Ping-Test für inaktive Verbindungen
-            if current_time - data["last_ping"] > 300:  # 5 Minuten
-                try:
-                    await websocket.ping()
-                    data["last_ping"] = current_time
-                except:
-                    dead_connections.append(websocket)
-        
-        # Tote Verbindungen entfernen
-        for websocket in dead_connections:
-            await self.disconnect(websocket)
-        
-        if dead_connections:
-            logger.info(f"Cleaned up {len(dead_connections)} dead connections")
+        # Policy disconnect: volle Queue -> Verbindung aufgeben
+        for writer in rejected:
+            await writer.evict("queue_full")
+    
+    async def _evict(self, websocket: WebSocket, reason: str):
+        """Langsame oder tote Verbindung trennen (aus Writer oder Heartbeat heraus)"""
+        if reason != "send_error":
+            heartbeat = reason in ("pong_timeout", "idle_timeout")
+            if not heartbeat:
+                logger.warning(f"Evicting slow WebSocket consumer ({reason})")
+            try:
+                # Close-Frame kann bei vollem Socket-Puffer ebenfalls hängen
+                async with asyncio.timeout(1.0):
+                    await websocket.close(
+                        code=HEARTBEAT_CLOSE_CODE if heartbeat else SLOW_CONSUMER_CLOSE_CODE
+                    )
+            except Exception:
+                pass
+        await self.disconnect(websocket)
+    
+    async def _heartbeat_loop(self):
+        """Timer-Wheel-Tick: pingt und trennt nur die fälligen Verbindungen"""
+        while True:
+            try:
+                await asyncio.sleep(settings.WEBSOCKET_TIMER_TICK)
+                to_ping, to_evict = self.heartbeat.poll()
+                
+                if to_ping:
+                    # Ein Frame für alle im Tick fälligen Pings; ausstehender Ping wird ersetzt
+                    frame = Frame(
+                        json.dumps({"type": "ping", "timestamp": time.time()}),
+                        key="__heartbeat__",
+                        state=True,
+                    )
+                    for websocket in to_ping:
+                        writer = self.writers.get(websocket)
+                        if writer is not None and not writer.enqueue(frame):
+                            to_evict.append((websocket, "queue_full"))
+                
+                if to_evict:
+                    # Parallel: jedes Close darf bis zu 1s hängen
+                    await asyncio.gather(
+                        *(self._evict(websocket, reason) for websocket, reason in to_evict),
+                        return_exceptions=True,
+                    )
+                    logger.info(f"Heartbeat closed {len(to_evict)} WebSocket connections")
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket heartbeat error: {e}")
     
     async def get_channel_stats(self, channel: str) -> Dict[str, Any]:
         """Channel-Statistiken"""
@@ -326,14 +476,13 @@ class ConnectionManager:
             return {"active_connections": 0}
         
         connections = self.connections[channel]
-        total_messages = sum(
-            self.connection_data.get(ws, {}).get("message_count", 0)
-            for ws in connections
-        )
+        writers = [self.writers[ws] for ws in connections if ws in self.writers]
         
         return {
             "active_connections": len(connections),
-            "total_messages": total_messages,
+            "total_messages": sum(writer.sent for writer in writers),
+            "queued_messages": sum(writer.depth for writer in writers),
+            "dropped_messages": sum(writer.dropped for writer in writers),
             "channel": channel
         }
     
@@ -343,25 +492,83 @@ class ConnectionManager:
             **self.connection_stats,
             "active_channels": len(self.connections),
             "queue_size": self.message_queue.qsize(),
-            "memory_usage": len(self.connection_data)
+            "memory_usage": len(self.connection_data),
+            "send_queues": self.get_send_queue_stats(),
+            "heartbeat": self.heartbeat.get_stats(),
+            "fanout": self.fanout.get_stats() if self.fanout else None,
         }
     
-    async def broadcast_user_count_update(self):
-        """Sendet User-Count-Updates an alle Clients"""
-        stats = self.get_global_stats()
+    def get_send_queue_stats(self) -> Dict[str, Any]:
+        """Queue-Tiefe über alle Writer und Drop-/Evict-Zähler"""
+        depths = [writer.depth for writer in self.writers.values()]
+        return {
+            **self.send_stats,
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "queue_limit": settings.WEBSOCKET_SEND_QUEUE_SIZE,
+            "policy": settings.WEBSOCKET_SLOW_CONSUMER_POLICY,
+        }
+    
+    async def cluster_connection_count(self, ttl: int = 90) -> int:
+        """
+        Verbindungen über alle Instanzen: jede meldet ihre Anzahl (mit Ablauf)
+        in einen gemeinsamen Redis-Hash; ohne Redis nur die lokale Anzahl
+        """
+        local_count = self.connection_stats["total_connections"]
+        if not self.redis_client:
+            return local_count
+        try:
+            total = await self.redis_client.eval(
+                _REPORT_CONNECTIONS_SCRIPT, 1, CONNECTION_COUNT_KEY,
+                self.instance_id, local_count, time.time(), ttl,
+            )
+            return int(total)
+        except Exception as e:
+            logger.error(f"Connection count report error: {e}")
+            return local_count
+    
+    async def broadcast_user_count_update(self, ttl: int = 90):
+        """
+        Sendet den clusterweiten User-Count an die Clients dieser Instanz;
+        jede Instanz bedient ihre eigenen Clients (kein Fan-out widersprüchlicher Zahlen)
+        """
         update_message = json.dumps({
             "type": "user_count_update",
             "data": {
-                "active_users": stats["total_connections"],
+                "active_users": await self.cluster_connection_count(ttl),
                 "timestamp": datetime.now().isoformat()
             }
         })
         
-        await self.broadcast_to_all(update_message)
+        await self._deliver_local(None, update_message, state_key="user_count")
 
 
 # Globale Instanz
 connection_manager = ConnectionManager()
+metrics.register_stats(
+    "agentland_websocket",
+    lambda: connection_manager.connection_stats,
+    "WebSocket",
+    gauges={"total_connections": "sum", "peak_connections": "max"},
+)
+metrics.register_stats(
+    "agentland_websocket_send",
+    connection_manager.get_send_queue_stats,
+    "WebSocket-Send-Pipeline",
+    gauges={"queued_frames": "sum", "max_queue_depth": "max", "queue_limit": "max"},
+)
+metrics.register_stats(
+    "agentland_websocket_heartbeat",
+    connection_manager.heartbeat.get_stats,
+    "WebSocket-Heartbeat",
+    gauges={"connections": "sum", "awaiting_pong": "sum", "timers": "sum"},
+)
+if connection_manager.fanout:
+    metrics.register_stats(
+        "agentland_websocket_fanout",
+        lambda: connection_manager.fanout.stats,
+        "WebSocket-Fan-out",
+    )
 
 
 class RealTimeDataBroadcaster:
@@ -372,7 +579,12 @@ class RealTimeDataBroadcaster:
     
     def __init__(self, manager: ConnectionManager):
         self.manager = manager
-        self.last_data = {}
+        # Versionierter Snapshot pro Datentyp, Deltas als JSON Patch; Version und
+        # Epoche vergibt Redis, damit alle Worker dieselbe Versionsfolge senden
+        self.encoder = DeltaEncoder(
+            keyframe_interval=settings.REALTIME_KEYFRAME_INTERVAL,
+            max_delta_ratio=settings.REALTIME_MAX_DELTA_RATIO,
+        )
         self.update_intervals = {
             "user_count": 30,  # 30 Sekunden
             "analytics": 60,   # 1 Minute
@@ -396,7 +608,8 @@ class RealTimeDataBroadcaster:
         """Periodisches User-Count-Broadcast"""
         while True:
             try:
-                await self.manager.broadcast_user_count_update()
+                # Meldung lebt drei Intervalle, danach zählt eine ausgefallene Instanz nicht mehr
+                await self.manager.broadcast_user_count_update(ttl=self.update_intervals["user_count"] * 3)
                 await asyncio.sleep(self.update_intervals["user_count"])
             except Exception as e:
                 logger.error(f"User count broadcast error: {e}")
@@ -411,13 +624,7 @@ class RealTimeDataBroadcaster:
                 analytics_service = AnalyticsService()
                 
                 stats = await analytics_service.get_real_time_stats()
-                
-                if self._data_changed("analytics", stats):
-                    message = json.dumps({
-                        "type": "analytics_update",
-                        "data": stats
-                    })
-                    await self.manager.broadcast_to_channel(message, "analytics")
+                await self.publish("analytics", stats)
                 
                 await asyncio.sleep(self.update_intervals["analytics"])
                 
@@ -445,19 +652,86 @@ class RealTimeDataBroadcaster:
                 logger.error(f"Traffic broadcast error: {e}")
                 await asyncio.sleep(30)
     
-    def _data_changed(self, data_type: str, new_data: Any) -> bool:
-        """Prüft ob sich Daten geändert haben"""
-        if data_type not in self.last_data:
-            self.last_data[data_type] = new_data
-            return True
-        
-        # Einfacher Vergleich für Demo
-        changed = str(self.last_data[data_type]) != str(new_data)
-        if changed:
-            self.last_data[data_type] = new_data
-        
-        return changed
+    async def publish(self, data_type: str, data: Any, channel: Optional[str] = None):
+        """
+        Sendet nur bei geändertem Content-Hash: Delta (JSON Patch) als Event,
+        voller Snapshot (erstes Update, Keyframe, großer Patch) als State
+        """
+        prepared = self.encoder.prepare(data_type, data)
+        if prepared is None:
+            return
+        encoded, digest = prepared
+
+        claim = await self._claim_version(data_type, encoded, digest)
+        if claim is None:
+            # Ohne Redis: lokale Versionsfolge (Single-Worker-Betrieb)
+            message, is_delta = self.encoder.update(data_type, data)
+        else:
+            changed, version, epoch, previous_encoded = claim
+            if not changed:
+                # Gleicher Inhalt wurde bereits von einem anderen Worker gesendet
+                self.encoder.remember(data_type, encoded, digest, version, epoch)
+                return
+            message, is_delta = self.encoder.commit_shared(
+                data_type, encoded, digest, version, epoch, previous_encoded
+            )
+        if message is None:
+            return
+        channel = channel or data_type
+        await self.manager.broadcast_to_channel(json.dumps(message), channel, event=is_delta)
+    
+    async def _claim_version(self, data_type: str, encoded: str, digest: str):
+        """
+        Nächste Version aus dem gemeinsamen Redis-Zustand (der zugleich den
+        Snapshot für Resyncs hält) -> (geändert, Version, Epoche, vorheriges JSON);
+        None ohne Redis
+        """
+        redis_conn = await cache.get_redis_connection()
+        if not redis_conn:
+            return None
+        try:
+            ttl = self.update_intervals.get(data_type, 60) * 10
+            result = await redis_conn.eval(
+                _CLAIM_VERSION_SCRIPT, 1, f"{REALTIME_STATE_PREFIX}{data_type}",
+                # Eigene Epoche für neuen gemeinsamen Zustand, nie die lokale des Fallbacks
+                digest, encoded, uuid.uuid4().hex[:8], ttl,
+            )
+        except Exception as e:
+            logger.error(f"Realtime version claim error: {e}")
+            return None
+        finally:
+            await redis_conn.close()
+        previous_encoded = _text(result[3]) if len(result) > 3 else None
+        return bool(int(result[0])), int(result[1]), _text(result[2]), previous_encoded
+    
+    async def get_snapshot(self, data_type: str) -> Optional[Dict[str, Any]]:
+        """Voller Snapshot für Clients mit Versionslücke (Redis, sonst lokal)"""
+        redis_conn = await cache.get_redis_connection()
+        if redis_conn:
+            try:
+                version, epoch, stored = await redis_conn.hmget(
+                    f"{REALTIME_STATE_PREFIX}{data_type}", ["version", "epoch", "data"]
+                )
+                if stored:
+                    return {
+                        "type": f"{data_type}_update",
+                        "data_type": data_type,
+                        "epoch": _text(epoch),
+                        "version": int(version),
+                        "full": True,
+                        "data": json.loads(stored),
+                    }
+            except Exception as e:
+                logger.error(f"Snapshot read error: {e}")
+            finally:
+                await redis_conn.close()
+        return self.encoder.snapshot_message(data_type)
 
 
 # Globaler Broadcaster
-real_time_broadcaster = RealTimeDataBroadcaster(connection_manager)
\ No newline at end of file
+real_time_broadcaster = RealTimeDataBroadcaster(connection_manager)
+metrics.register_stats(
+    "agentland_realtime_delta",
+    lambda: real_time_broadcaster.encoder.stats,
+    "Realtime-Delta-Encoding",
+)
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Cluster-Fan-out für WebSocket-Broadcasts über Redis Pub/Sub
+- Ein Broadcast geht genau einmal an Redis (PUBLISH), Redis verteilt an die
+  Instanzen, die den Channel abonniert haben
+- Jede Instanz abonniert nur Channels mit lokalen Verbindungen
+  (Subscribe bei 0 -> 1, Unsubscribe bei 1 -> 0)
+- Die sendende Instanz liefert lokal direkt aus und verwirft das Echo
+  ihrer eigenen Nachricht anhand der Origin-ID
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Channel für broadcast_to_all (von jeder Instanz abonniert)
+ALL_CHANNELS = "__all__"
+
+# deliver(channel, payload, state_key) - channel None = alle Verbindungen
+Deliver = Callable[[Optional[str], str, Optional[str]], Awaitable[None]]
+
+
+class ClusterFanout:
+    """
+    Nachrichten-Format auf Redis: "<origin>|<state_key>|<message>" - Origin-ID
+    (Hex) und State-Key enthalten kein "|", die Nachricht wird nicht erneut
+    kodiert; leerer State-Key = Event mit voller Reihenfolge
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        deliver: Deliver,
+        prefix: str = "ws:fanout:",
+        instance_id: Optional[str] = None,
+        reconnect_delay: float = 1.0,
+    ):
+        self.client = client
+        self.deliver = deliver
+        self.prefix = prefix
+        self.instance_id = instance_id or uuid.uuid4().hex[:12]
+        self.reconnect_delay = reconnect_delay
+
+        self.channels: Set[str] = set()  # Soll: Channels mit lokalen Verbindungen
+        self._subscribed: Set[str] = set()  # Ist: auf der Pub/Sub-Verbindung
+        self._pubsub = None
+        self._sync_lock = asyncio.Lock()
+        self._has_subscriptions = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "published": 0,
+            "received": 0,
+            "delivered": 0,
+            "echo_dropped": 0,
+            "subscribes": 0,
+            "unsubscribes": 0,
+            "subscribe_errors": 0,
+            "publish_errors": 0,
+            "receive_errors": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Start/Stop
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._pubsub = self.client.pubsub()
+        self.channels.add(ALL_CHANNELS)
+        await self._sync()
+        self._task = asyncio.create_task(self._reader_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.close()
+            except Exception as e:
+                logger.debug(f"Fan-out pubsub close failed: {e}")
+            self._pubsub = None
+        self._subscribed.clear()
+        self._has_subscriptions.clear()
+
+    # ------------------------------------------------------------------
+    # Channel-Belegung
+    # ------------------------------------------------------------------
+
+    async def join(self, channel: str):
+        """Erste lokale Verbindung im Channel"""
+        if channel not in self.channels:
+            self.channels.add(channel)
+            await self._sync()
+
+    async def leave(self, channel: str):
+        """Letzte lokale Verbindung im Channel getrennt"""
+        if channel in self.channels:
+            self.channels.discard(channel)
+            await self._sync()
+
+    async def _sync(self):
+        """Gleicht Abonnements mit der Belegung ab (serialisiert, idempotent)"""
+        if self._pubsub is None:
+            return
+        async with self._sync_lock:
+            wanted = set(self.channels)
+            added = wanted - self._subscribed
+            removed = self._subscribed - wanted
+            try:
+                if added:
+                    await self._pubsub.subscribe(*(self.prefix + channel for channel in added))
+                    self._subscribed |= added
+                    self.stats["subscribes"] += len(added)
+                if removed:
+                    await self._pubsub.unsubscribe(*(self.prefix + channel for channel in removed))
+                    self._subscribed -= removed
+                    self.stats["unsubscribes"] += len(removed)
+            except Exception as e:
+                # Nächster Abgleich (Join/Leave oder Reconnect) holt es nach
+                self.stats["subscribe_errors"] += 1
+                logger.error(f"Fan-out subscribe error: {e}")
+            if self._subscribed:
+                self._has_subscriptions.set()
+            else:
+                self._has_subscriptions.clear()
+
+    # ------------------------------------------------------------------
+    # Senden und Empfangen
+    # ------------------------------------------------------------------
+
+    async def publish(self, channel: Optional[str], message: str, state_key: Optional[str] = None) -> bool:
+        """Ein PUBLISH pro Broadcast; channel None = an alle Verbindungen"""
+        target = self.prefix + (channel if channel is not None else ALL_CHANNELS)
+        try:
+            await self.client.publish(target, f"{self.instance_id}|{state_key or ''}|{message}")
+            self.stats["published"] += 1
+            return True
+        except Exception as e:
+            self.stats["publish_errors"] += 1
+            logger.error(f"Fan-out publish error: {e}")
+            return False
+
+    async def _reader_loop(self):
+        while True:
+            try:
+                await self._has_subscriptions.wait()
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    await self.handle_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["receive_errors"] += 1
+                logger.error(f"Fan-out receive error: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+                await self._reconnect()
+
+    async def _reconnect(self):
+        """Neue Pub/Sub-Verbindung und alle Soll-Channels erneut abonnieren"""
+        old, self._pubsub = self._pubsub, self.client.pubsub()
+        self._subscribed = set()
+        try:
+            await old.close()
+        except Exception:
+            pass
+        await self._sync()
+
+    async def handle_message(self, message: dict):
+        if message.get("type") != "message":
+            return
+        self.stats["received"] += 1
+        raw_channel = message["channel"]
+        data = message["data"]
+        if isinstance(raw_channel, bytes):
+            raw_channel = raw_channel.decode()
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        origin, _, rest = data.partition("|")
+        if origin == self.instance_id:
+            self.stats["echo_dropped"] += 1
+            return
+        channel = raw_channel[len(self.prefix):]
+        # Abo kann nach dem letzten Disconnect noch kurz nachlaufen
+        if channel != ALL_CHANNELS and channel not in self.channels:
+            return
+        state_key, _, payload = rest.partition("|")
+        await self.deliver(None if channel == ALL_CHANNELS else channel, payload, state_key or None)
+        self.stats["delivered"] += 1
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "instance_id": self.instance_id,
+            "running": self._task is not None,
+            "subscribed_channels": len(self._subscribed),
+        }
@@ -0,0 +1,126 @@
+"""
+WebSocket-Heartbeat über ein Hashed Timer Wheel
+- Pro Verbindung höchstens drei Timer: nächster Ping, Pong-Deadline, Idle
+- Eingehende Frames (inkl. Pong) verschieben Ping und Idle und löschen die
+  Pong-Deadline, jeweils O(1)
+- Ping-Intervalle mit Jitter, damit nicht alle Verbindungen im selben Tick
+  gepingt werden
+- poll() liefert nur fällige Verbindungen: O(abgelaufen) statt Scan über alle
+
+ASGI kennt keine Protokoll-Pings; gepingt wird auf Anwendungsebene
+({"type": "ping"}), der Client antwortet mit {"type": "pong"}.
+"""
+
+import random
+import time
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from app.core.timer_wheel import HashedTimerWheel
+
+PING = "ping"
+PONG = "pong"
+IDLE = "idle"
+
+
+class HeartbeatScheduler:
+    """
+    Verwaltet nur Deadlines; Senden und Trennen übernimmt der Aufrufer.
+    pong_timeout=0 verzichtet auf Pong-Pflicht (dann greift nur Idle),
+    ping_interval=0 bzw. idle_timeout=0 deaktivieren Ping bzw. Idle
+    """
+
+    def __init__(
+        self,
+        ping_interval: float = 25.0,
+        pong_timeout: float = 10.0,
+        idle_timeout: float = 300.0,
+        jitter: float = 0.1,
+        tick: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.ping_interval = ping_interval
+        self.pong_timeout = pong_timeout
+        self.idle_timeout = idle_timeout
+        self.jitter = jitter
+        self._clock = clock
+        self._rng = rng
+        # Eine Umdrehung deckt die längste Deadline ab -> kein Timer überlebt einen Slot-Besuch
+        horizon = max(ping_interval * (1 + jitter), pong_timeout, idle_timeout, tick)
+        self.wheel = HashedTimerWheel(tick=tick, slots=int(horizon / tick) + 2, clock=clock)
+        self.awaiting_pong: Dict[Hashable, bool] = {}
+        self.pending_pongs = 0  # Zähler statt Summe über alle Verbindungen
+        self.stats = {
+            "pings_sent": 0,
+            "pongs_received": 0,
+            "pong_timeouts": 0,
+            "idle_timeouts": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.awaiting_pong)
+
+    def _next_ping(self, connection: Hashable, now: float):
+        if self.ping_interval:
+            spread = 1 + self.jitter * (2 * self._rng() - 1)
+            self.wheel.schedule((connection, PING), now + self.ping_interval * spread)
+
+    def _reset(self, connection: Hashable, now: float):
+        self._next_ping(connection, now)
+        if self.idle_timeout:
+            self.wheel.schedule((connection, IDLE), now + self.idle_timeout)
+
+    def add(self, connection: Hashable):
+        self.awaiting_pong[connection] = False
+        self._reset(connection, self._clock())
+
+    def remove(self, connection: Hashable):
+        awaiting = self.awaiting_pong.pop(connection, None)
+        if awaiting is None:
+            return
+        self.pending_pongs -= awaiting
+        for kind in (PING, PONG, IDLE):
+            self.wheel.cancel((connection, kind))
+
+    def activity(self, connection: Hashable, pong: bool = False):
+        """Eingehender Frame: die Verbindung lebt"""
+        if connection not in self.awaiting_pong:
+            return
+        if pong:
+            self.stats["pongs_received"] += 1
+        if self.awaiting_pong[connection]:
+            self.awaiting_pong[connection] = False
+            self.pending_pongs -= 1
+            self.wheel.cancel((connection, PONG))
+        self._reset(connection, self._clock())
+
+    def poll(self) -> Tuple[List[Hashable], List[Tuple[Hashable, str]]]:
+        """Fällige Timer -> (zu pingen, [(zu trennen, Grund)])"""
+        now = self._clock()
+        to_ping: List[Hashable] = []
+        to_evict: List[Tuple[Hashable, str]] = []
+        for connection, kind in self.wheel.advance(now):
+            if connection not in self.awaiting_pong:
+                continue
+            if kind == PING:
+                to_ping.append(connection)
+                self.stats["pings_sent"] += 1
+                if self.pong_timeout and not self.awaiting_pong[connection]:
+                    self.awaiting_pong[connection] = True
+                    self.pending_pongs += 1
+                    self.wheel.schedule((connection, PONG), now + self.pong_timeout)
+                self._next_ping(connection, now)
+            else:
+                reason = "pong_timeout" if kind == PONG else "idle_timeout"
+                self.stats[f"{reason}s"] += 1
+                to_evict.append((connection, reason))
+                self.remove(connection)
+        return to_ping, to_evict
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "connections": len(self.awaiting_pong),
+            "awaiting_pong": self.pending_pongs,
+            "timers": len(self.wheel),
+        }
@@ -0,0 +1,211 @@
+"""
+Send-Pipeline für WebSocket-Broadcasts
+- Eine Nachricht wird einmal zum ASGI-Send-Frame gebaut und von allen
+  Verbindungen geteilt (keine Kopie pro Socket)
+- Jede Verbindung hat eine begrenzte Outbound-Queue und einen eigenen
+  Writer-Task: ein langsamer Client bremst nur sich selbst
+- Bei voller Queue greift die Policy: drop_oldest, coalesce (gleicher Key
+  wird ersetzt) oder disconnect; hängende Sends führen zur Trennung
+- State-Frames (latest value wins): pro Key höchstens ein ausstehender Frame,
+  ein neuerer ersetzt ihn an seiner Queue-Position
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Close-Code für getrennte langsame Clients ("Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class Frame:
+    """
+    Geteilter, unveränderlicher Send-Frame; key für coalesce (z.B. Channel),
+    state=True: nur der neueste ausstehende Frame pro key wird gesendet
+    """
+
+    __slots__ = ("message", "key", "state")
+
+    def __init__(self, text: str, key: Optional[str] = None, state: bool = False):
+        if state and key is None:
+            raise ValueError("State-Frames brauchen einen Key")
+        self.message = {"type": "websocket.send", "text": text}
+        self.key = key
+        self.state = state
+
+
+def collapse_state_updates(messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Latest value wins innerhalb eines Queue-Batches: pro (Channel, state_key)
+    bleibt nur die letzte Nachricht, Events (ohne state_key) bleiben in
+    voller Reihenfolge. Liefert (Nachrichten, Anzahl verworfener)
+    """
+    latest: Dict[Tuple[Optional[str], str], int] = {}
+    for index, message in enumerate(messages):
+        key = message.get("state_key")
+        if key is not None:
+            latest[(message.get("channel"), key)] = index
+    if not latest:
+        return messages, 0
+    kept = [
+        message for index, message in enumerate(messages)
+        if message.get("state_key") is None
+        or latest[(message.get("channel"), message["state_key"])] == index
+    ]
+    return kept, len(messages) - len(kept)
+
+
+def new_send_stats() -> Dict[str, int]:
+    """Gemeinsame Zähler aller Writer einer Instanz"""
+    return {
+        "frames_enqueued": 0,
+        "frames_sent": 0,
+        "frames_dropped": 0,
+        "frames_coalesced": 0,
+        "frames_superseded": 0,  # State-Update durch neueres ersetzt
+        "slow_consumer_evictions": 0,
+        "send_errors": 0,
+    }
+
+
+class ConnectionWriter:
+    """
+    Outbound-Queue einer Verbindung. send ist das ASGI-send des Sockets
+    (bzw. websocket.send), on_evict wird einmalig aufgerufen, wenn die
+    Verbindung als langsam/tot aufgegeben wird.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+        on_evict: Callable[[str], Awaitable[None]],
+        maxsize: int = 256,
+        policy: str = "drop_oldest",
+        send_timeout: Optional[float] = 10.0,
+        stats: Optional[Dict[str, int]] = None,
+    ):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unbekannte Slow-Consumer-Policy: {policy}")
+        self._send = send
+        self._on_evict = on_evict
+        self.maxsize = maxsize
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.stats = stats if stats is not None else new_send_stats()
+
+        self.queue: Deque[Frame] = deque()
+        # Neuester ausstehender State-Frame pro Key (Queue hält den Platz)
+        self._state: Dict[str, Frame] = {}
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self.queue)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer_loop())
+
+    async def stop(self):
+        """Beendet den Writer; ausstehende Frames werden verworfen"""
+        self.closed = True
+        self.queue.clear()
+        self._state.clear()
+        task, self._task = self._task, None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Einreihen (synchron, O(1) pro Verbindung)
+    # ------------------------------------------------------------------
+
+    def enqueue(self, frame: Frame) -> bool:
+        """False, wenn die Verbindung nach Policy getrennt werden muss"""
+        if self.closed:
+            return False
+        if frame.state and frame.key in self._state:
+            # Latest value wins: Platz in der Queue bleibt, Inhalt wird ersetzt
+            self._state[frame.key] = frame
+            self.stats["frames_superseded"] += 1
+            return True
+        if len(self.queue) >= self.maxsize and not self._make_room(frame):
+            return False
+        self.queue.append(frame)
+        if frame.state:
+            self._state[frame.key] = frame
+        self.stats["frames_enqueued"] += 1
+        self._wakeup.set()
+        return True
+
+    def _make_room(self, frame: Frame) -> bool:
+        if self.policy == "disconnect":
+            return False
+        if self.policy == "coalesce" and frame.key is not None:
+            for index, queued in enumerate(self.queue):
+                if queued.key == frame.key:
+                    del self.queue[index]
+                    self._forget(queued)
+                    self.stats["frames_coalesced"] += 1
+                    return True
+        self._forget(self.queue.popleft())
+        self.dropped += 1
+        self.stats["frames_dropped"] += 1
+        return True
+
+    def _forget(self, queued: Frame):
+        if queued.state:
+            self._state.pop(queued.key, None)
+
+    # ------------------------------------------------------------------
+    # Writer-Task
+    # ------------------------------------------------------------------
+
+    async def _writer_loop(self):
+        while not self.closed:
+            if not self.queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            frame = self.queue.popleft()
+            if frame.state:
+                frame = self._state.pop(frame.key, frame)
+            try:
+                # asyncio.timeout statt wait_for: kein zusätzlicher Task pro Frame
+                async with asyncio.timeout(self.send_timeout):
+                    await self._send(frame.message)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                await self.evict("send_timeout")
+                return
+            except Exception as e:
+                self.stats["send_errors"] += 1
+                logger.debug(f"WebSocket send failed: {e}")
+                await self.evict("send_error")
+                return
+            self.sent += 1
+            self.stats["frames_sent"] += 1
+
+    async def evict(self, reason: str):
+        """Gibt die Verbindung auf (Queue voll bei disconnect, Timeout, Fehler)"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self._state.clear()
+        if reason != "send_error":
+            self.stats["slow_consumer_evictions"] += 1
+        await self._on_evict(reason)
@@ -2,13 +2,29 @@
 Datenbankverbindung und -konfiguration
 """
 
+import time
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import DeclarativeMeta, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 # Import models so that Base.metadata is populated when creating tables
 from app.models import Agent, Feedback, User, analytics  # noqa: F401
 
 from app.core.config import settings
+from app.core.metrics import registry as metrics
+from app.db.query_stats import instrument_engine, query_stats
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Misst die Wartezeit auf eine freie Pool-Connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            query_stats.record_pool_wait(time.perf_counter() - start)
 
 # Async Engine erstellen - OPTIMIERT FÜR 200K USERS
 engine = create_async_engine(
@@ -16,6 +32,7 @@ engine = create_async_engine(
     echo=False,
     future=True,
     pool_pre_ping=True,
+    poolclass=InstrumentedAsyncPool,
     pool_size=50,  # Erhöht von 10 auf 50 für hohe Last
     max_overflow=100,  # Erhöht von 20 auf 100 für Spitzenlasten
     pool_timeout=30,  # Timeout für Pool-Connections
@@ -32,6 +49,19 @@ engine = create_async_engine(
     }
 )
 
+instrument_engine(engine, query_stats)
+metrics.register_stats("agentland_db", lambda: query_stats.stats, "Datenbank")
+metrics.register_stats(
+    "agentland_db_pool",
+    lambda: {
+        "size": engine.pool.size(),
+        "checked_out": engine.pool.checkedout(),
+        "overflow": engine.pool.overflow(),
+    },
+    "Connection-Pool",
+    gauges={"size": "sum", "checked_out": "sum", "overflow": "sum"},
+)
+
 # Async Session Factory
 async_session_maker = sessionmaker(
     engine,
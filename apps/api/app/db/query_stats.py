@@ -0,0 +1,239 @@
+"""
+Query-Accounting pro Request für AGENTLAND.SAARLAND
+Zählt über SQLAlchemy-Engine-Events Queries, DB-Zeit und Pool-Wartezeit
+des laufenden Requests (ContextVar), führt ein Slow-Query-Log mit
+normalisierten Statements und erkennt N+1-Muster.
+"""
+
+import logging
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"(?:\$\d+|%\(\w+\)s|%s|:\w+|\?)")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+# Statements werden für Log und Zählung gekürzt
+MAX_STATEMENT_LENGTH = 500
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Ersetzt Literale und Bind-Parameter durch ?, fasst IN-Listen und
+    Whitespace zusammen; gleiche Query-Form -> gleicher String
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _BIND_PARAM.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("(?...)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return normalized[:MAX_STATEMENT_LENGTH]
+
+
+class RequestQueryStats:
+    """DB-Kennzahlen eines einzelnen Requests"""
+
+    __slots__ = ("route", "queries", "db_time", "pool_wait", "checkouts", "statements")
+
+    def __init__(self, route: Optional[str] = None):
+        self.route = route
+        self.queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.checkouts = 0
+        self.statements: Counter = Counter()
+
+    def repeated_statements(self, threshold: int) -> List[Dict[str, Any]]:
+        return [
+            {"statement": statement, "count": count}
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        """Wert für den Server-Timing-Header"""
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f"db-pool;dur={self.pool_wait * 1000:.1f}"
+        )
+
+
+class QueryStatsCollector:
+    """
+    Prozessweite Aggregation: Summen pro Route, Slow-Query-Log und N+1-Funde
+    """
+
+    def __init__(
+        self,
+        slow_query_threshold: float = 1.0,
+        n_plus_one_threshold: int = 10,
+        max_log_entries: int = 100,
+        max_routes: int = 1000,
+    ):
+        self.slow_query_threshold = slow_query_threshold
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_routes = max_routes
+        self._current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+        self.slow_queries: Deque[Dict[str, Any]] = deque(maxlen=max_log_entries)
+        self.n_plus_one: Deque[Dict[str, Any]] = deque(maxlen=max_log_entries)
+        self.routes: Dict[str, Dict[str, float]] = {}
+
+        self.stats = {
+            "queries": 0,
+            "untracked_queries": 0,  # außerhalb eines Requests (Hintergrund-Tasks)
+            "db_time_ms": 0.0,
+            "pool_checkouts": 0,
+            "pool_wait_ms": 0.0,
+            "slow_queries": 0,
+            "n_plus_one_requests": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Request-Scope
+    # ------------------------------------------------------------------
+
+    def begin_request(self, route: Optional[str] = None) -> RequestQueryStats:
+        request_stats = RequestQueryStats(route)
+        self._current.set(request_stats)
+        return request_stats
+
+    def current(self) -> Optional[RequestQueryStats]:
+        return self._current.get()
+
+    def end_request(self, request_stats: RequestQueryStats, route: Optional[str] = None):
+        """Übernimmt die Request-Werte in die Routen-Summen"""
+        self._current.set(None)
+        route = route or request_stats.route or "unmatched"
+        request_stats.route = route
+
+        repeated = request_stats.repeated_statements(self.n_plus_one_threshold)
+        if repeated:
+            self.stats["n_plus_one_requests"] += 1
+            self.n_plus_one.append({
+                "route": route,
+                "statements": repeated[:5],
+                "timestamp": time.time(),
+            })
+            logger.warning(
+                f"Possible N+1 on {route}: {repeated[0]['count']}x {repeated[0]['statement'][:120]}"
+            )
+
+        if request_stats.queries == 0 and request_stats.checkouts == 0:
+            return
+
+        entry = self.routes.get(route)
+        if entry is None:
+            if len(self.routes) >= self.max_routes:
+                return
+            entry = self.routes[route] = {
+                "requests": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "db_time_ms": 0.0,
+                "pool_wait_ms": 0.0,
+                "n_plus_one": 0,
+            }
+        entry["requests"] += 1
+        entry["queries"] += request_stats.queries
+        entry["max_queries"] = max(entry["max_queries"], request_stats.queries)
+        entry["db_time_ms"] += request_stats.db_time * 1000
+        entry["pool_wait_ms"] += request_stats.pool_wait * 1000
+        if repeated:
+            entry["n_plus_one"] += 1
+
+    # ------------------------------------------------------------------
+    # Event-Hooks
+    # ------------------------------------------------------------------
+
+    def record_query(self, statement: str, duration: float):
+        self.stats["queries"] += 1
+        self.stats["db_time_ms"] += duration * 1000
+
+        request_stats = self._current.get()
+        normalized = None
+        if request_stats is None:
+            self.stats["untracked_queries"] += 1
+        else:
+            normalized = normalize_statement(statement)
+            request_stats.queries += 1
+            request_stats.db_time += duration
+            request_stats.statements[normalized] += 1
+
+        if duration >= self.slow_query_threshold:
+            normalized = normalized or normalize_statement(statement)
+            route = request_stats.route if request_stats else None
+            self.stats["slow_queries"] += 1
+            self.slow_queries.append({
+                "statement": normalized,
+                "duration_ms": round(duration * 1000, 1),
+                "route": route,
+                "timestamp": time.time(),
+            })
+            logger.warning(f"Slow query ({duration * 1000:.1f}ms) on {route or '-'}: {normalized[:200]}")
+
+    def record_pool_wait(self, duration: float):
+        self.stats["pool_checkouts"] += 1
+        self.stats["pool_wait_ms"] += duration * 1000
+        request_stats = self._current.get()
+        if request_stats is not None:
+            request_stats.checkouts += 1
+            request_stats.pool_wait += duration
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        by_db_time = sorted(self.routes.items(), key=lambda item: item[1]["db_time_ms"], reverse=True)
+        return {
+            **self.stats,
+            "top_routes_by_db_time": [
+                {
+                    "route": route,
+                    **entry,
+                    "avg_queries": entry["queries"] / entry["requests"],
+                    "avg_db_time_ms": entry["db_time_ms"] / entry["requests"],
+                }
+                for route, entry in by_db_time[:top]
+            ],
+            "slow_queries": list(self.slow_queries)[-top:],
+            "n_plus_one": list(self.n_plus_one)[-top:],
+        }
+
+
+# Prozessweiter Collector für Engine (app.db.database) und Middleware; hier statt
+# in database.py, damit die Middleware nicht Engine und Modelle importieren muss
+query_stats = QueryStatsCollector(
+    slow_query_threshold=settings.DB_SLOW_QUERY_THRESHOLD,
+    n_plus_one_threshold=settings.DB_N_PLUS_ONE_THRESHOLD,
+)
+
+
+def instrument_engine(engine, collector: "QueryStatsCollector"):
+    """Registriert die Cursor-Events auf einer (Async-)Engine"""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            collector.record_query(statement, time.perf_counter() - starts.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts:
+            collector.record_query(exception_context.statement or "", time.perf_counter() - starts.pop())
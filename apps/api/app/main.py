@@ -7,8 +7,7 @@ from typing import AsyncGenerator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi.middleware import SlowAPIMiddleware
-from app.core.rate_limiter import limiter, RateLimitExceeded, _rate_limit_exceeded_handler
+from app.core.rate_limiter import limiter
 
 from app.core.config import settings
 from app.db.database import create_db_and_tables, engine
@@ -21,8 +20,19 @@ from app.api import (
     realtime,
     performance,
     cross_border,
+    metrics,
 )
-from app.middleware.performance import PerformanceMiddleware, MemoryOptimizationMiddleware
+from app.middleware.performance import (
+    DatabaseOptimizationMiddleware,
+    MemoryOptimizationMiddleware,
+    PerformanceMiddleware,
+    loop_monitor,
+    memory_profiler,
+)
+from app.middleware.compression import CompressionMiddleware
+from app.api.performance import system_sampler
+from app.core.cache import cache, performance_monitor
+from app.core.metrics import registry as metrics_registry
 
 
 @asynccontextmanager
@@ -34,11 +44,24 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     print("🚀 Starte AGENTLAND.SAARLAND API...")
     await create_db_and_tables()
     print("✅ Datenbank initialisiert")
+    await cache.start()
+    await performance_monitor.start()
+    await memory_profiler.start()
+    await system_sampler.start()
+    if settings.LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    await metrics_registry.start(cache.get_redis_connection, settings.METRICS_PUBLISH_INTERVAL)
     
     yield
     
     # Shutdown
     print("👋 Fahre AGENTLAND.SAARLAND API herunter...")
+    await metrics_registry.stop()
+    await loop_monitor.stop()
+    await system_sampler.stop()
+    await memory_profiler.stop()
+    await performance_monitor.stop()
+    await cache.stop()
     await engine.dispose()
 
 
@@ -51,10 +74,13 @@ app = FastAPI(
     redoc_url="/api/redoc",
 )
 
-# Rate Limiting mit SlowAPI
+# Rate Limiting: app.core.rate_limiter, durchgesetzt in der PerformanceMiddleware
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
+
+# PERFORMANCE MIDDLEWARE - OPTIMIERT FÜR 200K USERS
+# Innerhalb von CORS: Cache-Treffer, koaleszierte Antworten und 429/503 erhalten
+# CORS-Header pro Origin, der Cache speichert Responses ohne Vary: Origin
+app.add_middleware(PerformanceMiddleware)
 
 # SICHERHEITS-KONFIGURATION für regionale Zugriffe
 # KRITISCH: Restriktive CORS-Policy für Produktionsumgebung
@@ -75,12 +101,14 @@ app.add_middleware(
         "Authorization",
         "X-Requested-With"
     ],  # Spezifische Headers
-    expose_headers=["X-RateLimit-Remaining", "X-RateLimit-Reset"]
+    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "Retry-After"]
 )
 
-# PERFORMANCE MIDDLEWARE - OPTIMIERT FÜR 200K USERS
-app.add_middleware(PerformanceMiddleware)
+# Außerhalb des Response-Caches, damit Server-Timing nicht mitgecacht wird
+app.add_middleware(DatabaseOptimizationMiddleware)
 app.add_middleware(MemoryOptimizationMiddleware)
+# Streaming-Kompression außerhalb des Response-Caches (Cache hält unkomprimierte Bytes)
+app.add_middleware(CompressionMiddleware)
 
 # API-Router einbinden
 app.include_router(health.router, prefix="/api/health", tags=["Gesundheit"])
@@ -91,6 +119,7 @@ app.include_router(enhanced_agents.router, tags=["Enhanced KI-Agenten"])
 app.include_router(realtime.router, tags=["Echtzeit-Daten"])
 app.include_router(performance.router, tags=["Performance-Monitoring"])
 app.include_router(cross_border.router, tags=["Cross-Border"])
+app.include_router(metrics.router)
 
 
 @app.get("/", tags=["Root"])
@@ -0,0 +1,332 @@
+"""
+Streaming-Kompression für AGENTLAND.SAARLAND
+Reines ASGI-Middleware: br/zstd/gzip werden aus Accept-Encoding ausgehandelt
+und Chunk für Chunk komprimiert, ohne den Body vollständig zu puffern.
+SSE/NDJSON-Streams werden nach jedem Chunk geflusht; große Chunks werden
+im Threadpool komprimiert, damit der Event-Loop frei bleibt.
+
+Optionale Pakete: brotli, zstandard - fehlt eines, wird nur gzip angeboten.
+"""
+
+import asyncio
+import logging
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import registry as metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Content-Types, die bereits komprimiert sind
+_INCOMPRESSIBLE_PREFIXES = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/x-gzip",
+    "application/zstd", "application/x-bzip2", "application/x-7z-compressed",
+    "application/pdf", "application/octet-stream",
+)
+
+# Streams, bei denen jeder Chunk sofort beim Client ankommen muss
+_FLUSH_PER_CHUNK_PREFIXES = ("text/event-stream", "application/x-ndjson")
+
+# Große Bodies werden in Scheiben komprimiert und gesendet
+_SLICE_BYTES = 256 * 1024
+
+# Prozessweite Statistiken über alle Middleware-Instanzen
+compression_stats: Dict[str, int] = {
+    "compressed_responses": 0,
+    "skipped_small": 0,
+    "skipped_encoded": 0,
+    "skipped_content_type": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "offloaded_chunks": 0,
+    "flushes": 0,
+}
+metrics.register_stats("agentland_compression", lambda: compression_stats, "Response-Kompression")
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encodings() -> List[str]:
+    """Unterstützte Encodings in Server-Präferenz"""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """
+    Wählt das Encoding mit höchstem q-Wert; bei Gleichstand entscheidet die
+    Server-Präferenz (Reihenfolge von supported). None = unkomprimiert.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _strip_etag_suffixes(if_none_match: str, encodings: List[str]) -> str:
+    """Entfernt "-<encoding>" aus ETags, damit der Response-Cache sie wiedererkennt"""
+    for encoding in encodings:
+        if_none_match = if_none_match.replace(f'-{encoding}"', '"')
+    return if_none_match
+
+
+def _encoded_etag(etag: str, encoding: str) -> str:
+    """Starker ETag pro Repräsentation: "abc" -> "abc-gzip" """
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+class CompressionMiddleware:
+    """
+    Streaming-Kompression mit Encoding-Aushandlung
+    - überspringt kleine Bodies, bereits kodierte Responses und komprimierte Medientypen
+    - SSE/NDJSON: Sync-Flush nach jedem Chunk
+    - Chunks ab offload_threshold werden in asyncio.to_thread komprimiert
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level: int = settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = settings.COMPRESSION_BROTLI_QUALITY,
+        zstd_level: int = settings.COMPRESSION_ZSTD_LEVEL,
+        offload_threshold: int = settings.COMPRESSION_OFFLOAD_THRESHOLD,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_threshold = offload_threshold
+        self.encodings = available_encodings()
+        self._factories: Dict[str, Callable[[], object]] = {
+            "gzip": lambda: _GzipEncoder(gzip_level),
+            "br": lambda: _BrotliEncoder(brotli_quality),
+            "zstd": lambda: _ZstdEncoder(zstd_level),
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = headers.get("if-none-match")
+        client_has_encoded = False
+        if if_none_match:
+            # ETags der komprimierten Repräsentation auf die des Response-Caches abbilden
+            stripped = _strip_etag_suffixes(if_none_match, self.encodings)
+            client_has_encoded = stripped != if_none_match
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, stripped.encode("latin-1") if name == b"if-none-match" else value)
+                for name, value in scope["headers"]
+            ]
+
+        responder = _CompressionResponder(self, encoding, send, client_has_encoded)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Zustand einer einzelnen Response"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send, client_has_encoded: bool):
+        self.middleware = middleware
+        self.encoding = encoding
+        # Client hält die komprimierte Repräsentation -> 304 mit deren ETag beantworten
+        self.client_has_encoded = client_has_encoded
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.encoder = None
+        self.flush_per_chunk = False
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self._decide_on_headers(message)
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            # Erster Body-Chunk: kleine Einzel-Bodies unkomprimiert senden
+            if not more_body and len(body) < self.middleware.minimum_size:
+                compression_stats["skipped_small"] += 1
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+            self._begin()
+            await self._send(self.start_message)
+
+        compression_stats["bytes_in"] += len(body)
+        for index in range(0, max(len(body), 1), _SLICE_BYTES):
+            piece = body[index:index + _SLICE_BYTES]
+            last_piece = index + _SLICE_BYTES >= len(body)
+            output = await self._compress(piece) if piece else b""
+            if last_piece:
+                if not more_body:
+                    output += self.encoder.finish()
+                elif self.flush_per_chunk:
+                    output += self.encoder.flush()
+                    compression_stats["flushes"] += 1
+            if output or (last_piece and not more_body):
+                compression_stats["bytes_out"] += len(output)
+                await self._send({
+                    "type": "http.response.body",
+                    "body": output,
+                    "more_body": more_body or not last_piece,
+                })
+
+    def _decide_on_headers(self, message: Message):
+        headers = Headers(raw=message.get("headers", []))
+        status = message["status"]
+
+        if status < 200 or status in (204, 304):
+            if status == 304 and self.client_has_encoded:
+                self._rewrite_etag(message)
+            self.passthrough = True
+            return
+        if "content-encoding" in headers:
+            compression_stats["skipped_encoded"] += 1
+            self.passthrough = True
+            return
+
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith(_INCOMPRESSIBLE_PREFIXES):
+            compression_stats["skipped_content_type"] += 1
+            self.passthrough = True
+            return
+
+        content_length = headers.get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) < self.middleware.minimum_size:
+            compression_stats["skipped_small"] += 1
+            self.passthrough = True
+            return
+
+        self.flush_per_chunk = content_type.startswith(_FLUSH_PER_CHUNK_PREFIXES)
+
+    def _begin(self):
+        self.encoder = self.middleware._factories[self.encoding]()
+        compression_stats["compressed_responses"] += 1
+
+        self.start_message["headers"] = list(self.start_message.get("headers", []))
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["content-encoding"] = self.encoding
+        if "content-length" in headers:
+            del headers["content-length"]
+        headers.add_vary_header("Accept-Encoding")
+        self._rewrite_etag(self.start_message)
+
+    def _rewrite_etag(self, message: Message):
+        message["headers"] = list(message.get("headers", []))
+        headers = MutableHeaders(raw=message["headers"])
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = _encoded_etag(etag, self.encoding)
+
+    async def _compress(self, data: bytes) -> bytes:
+        if len(data) >= self.middleware.offload_threshold:
+            compression_stats["offloaded_chunks"] += 1
+            return await asyncio.to_thread(self.encoder.compress, data)
+        return self.encoder.compress(data)
+
+
+def get_compression_stats() -> Dict[str, float]:
+    """Kompressions-Statistiken inkl. Einsparung"""
+    stats = dict(compression_stats)
+    stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+    stats["ratio"] = (stats["bytes_out"] / stats["bytes_in"]) if stats["bytes_in"] else 0
+    stats["encodings"] = available_encodings()
+    return stats
@@ -4,44 +4,164 @@ Ziel: <300ms API Response Zeit, <2s Chat Response Zeit
 """
 
 import asyncio
-import time
+import hashlib
 import json
-import gzip
 import logging
-from typing import Callable, Dict, Any, Optional
-from starlette.middleware.base import BaseHTTPMiddleware
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.requests import Request
-from starlette.responses import Response, JSONResponse
-from starlette.types import ASGIApp
-import redis.asyncio as redis
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.admission import AdmissionController, AdmissionPool
 from app.core.config import settings
 from app.core.cache import cache, performance_monitor
+from app.core.l1_cache import MISSING
+from app.core.loop_monitor import LoopLagMonitor
+from app.core.memory_profiler import MemoryProfiler
+from app.core.metrics import registry as metrics
+from app.core.rate_limiter import RATE_LIMIT_CATEGORIES, RateLimitPolicy, client_identifier, limiter
+from app.db.query_stats import QueryStatsCollector, query_stats
 
 logger = logging.getLogger(__name__)
 
 
-class PerformanceMiddleware(BaseHTTPMiddleware):
+class ResponseCachePolicy:
+    """TTL (Sekunden) und zusätzliche Vary-Request-Header für eine Route"""
+
+    __slots__ = ("ttl", "vary")
+
+    def __init__(self, ttl: int, vary: Tuple[str, ...] = ()):
+        self.ttl = ttl
+        self.vary = tuple(header.lower() for header in vary)
+
+
+# Response-Cache pro Route-Template; nur gelistete GET-Routen werden gecacht.
+# Die Response kann die TTL per Cache-Control (s-maxage/max-age) verkürzen
+# oder das Caching verbieten (no-store/private).
+RESPONSE_CACHE_POLICIES: Dict[str, ResponseCachePolicy] = {
+    "/api/v1/realtime/data": ResponseCachePolicy(60),
+    "/api/v1/realtime/tourism": ResponseCachePolicy(60),
+    "/api/v1/realtime/business": ResponseCachePolicy(300),
+    "/api/v1/realtime/admin": ResponseCachePolicy(60),
+    "/api/v1/realtime/analytics": ResponseCachePolicy(60),
+    "/api/v1/realtime/user-count": ResponseCachePolicy(60),
+    "/api/v1/realtime/plz/{plz}": ResponseCachePolicy(3600),
+    "/api/v1/realtime/plz/{plz}/behoerde/{service_type}": ResponseCachePolicy(3600),
+    "/api/v1/realtime/maps/config": ResponseCachePolicy(3600),
+    "/api/v1/realtime/maps/pois": ResponseCachePolicy(600),
+    "/api/v1/realtime/maps/event/{event_id}": ResponseCachePolicy(300),
+    "/api/v1/realtime/maps/parking": ResponseCachePolicy(60),
+    "/api/v1/realtime/maps/emergency": ResponseCachePolicy(300),
+}
+
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "agentland_http_request_duration_seconds",
+    "HTTP-Response-Zeit pro Route-Template",
+    ("method", "route", "status"),
+)
+
+# Größere Bodies werden durchgestreamt statt gepuffert und gecacht
+MAX_CACHEABLE_BODY_BYTES = 1024 * 1024
+
+# Header, die eine 304-Antwort tragen darf (RFC 9110 15.4.5)
+_NOT_MODIFIED_HEADERS = {b"etag", b"cache-control", b"vary", b"expires", b"content-location", b"date", b"age"}
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """'public, max-age=60' -> {"public": None, "max-age": "60"}"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Schwacher Vergleich wie für If-None-Match vorgeschrieben"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _strong_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class _InFlight:
+    """Laufende Leader-Anfrage; Ergebnis ist (Metadaten, Body) oder None"""
+
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.waiters = 0
+
+
+class PerformanceMiddleware:
     """
-    Umfassendes Performance-Middleware mit:
+    Umfassendes Performance-Middleware (reines ASGI, kein BaseHTTPMiddleware) mit:
     - Response-Zeit-Tracking
-    - Automatische Kompression
-    - Request-Deduplication
-    - Rate Limiting
-    - Memory-Optimierung
+    - Geteiltem HTTP-Response-Cache mit Cache-Control/Vary und TTL pro Route
+    - Starken ETags und 304 auf If-None-Match ohne Aufruf der Route
+    - Request-Coalescing: identische GETs auf cachebare Routen warten auf
+      einen Leader und erhalten dessen Body-Bytes
+    - Rate Limiting über app.core.rate_limiter (Kategorie oder @limiter.limit pro Route)
+    - Admission Control: Cache-Misses belegen einen Slot im Chat- bzw.
+      API-Pool; bei Überlast schnelle 503 mit Retry-After
     """
     
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self.redis_client = None
-        self._init_redis()
+    # Zuletzt erzeugte Instanz (Starlette baut den Middleware-Stack selbst)
+    current: Optional["PerformanceMiddleware"] = None
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        policies: Optional[Dict[str, ResponseCachePolicy]] = None,
+        max_body_bytes: int = MAX_CACHEABLE_BODY_BYTES,
+        coalesce_max_waiters: int = settings.RESPONSE_COALESCE_MAX_WAITERS,
+        coalesce_timeout: float = settings.RESPONSE_COALESCE_TIMEOUT,
+        admission: Optional[AdmissionController] = None,
+    ):
+        self.app = app
+        self.policies = RESPONSE_CACHE_POLICIES if policies is None else policies
+        self.max_body_bytes = max_body_bytes
+        self.coalesce_max_waiters = coalesce_max_waiters
+        self.coalesce_timeout = coalesce_timeout
         
         # Performance-Ziele
         self.api_target_ms = 300  # 300ms für API
         self.chat_target_ms = 2000  # 2s für Chat
         
-        # Request-Deduplication
-        self.pending_requests = {}
+        # Admission Control: Limits sinken, wenn die Ziele verfehlt werden
+        if admission is None and settings.ADMISSION_ENABLED:
+            admission = self._build_admission()
+        self.admission = admission
+        
+        # Pfad -> Route-Template (begrenzt, da Pfade Parameter enthalten)
+        self._route_templates: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._route_cache_size = 4096
+        # Route-Template -> Limit aus @limiter.limit
+        self._route_rate_limits: Dict[str, RateLimitPolicy] = {}
+        
+        # Cache-Key -> laufende Leader-Anfrage
+        self._inflight: Dict[str, _InFlight] = {}
         
         # Statistiken
         self.stats = {
@@ -49,272 +169,541 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
             "fast_requests": 0,  # <300ms
             "slow_requests": 0,  # >300ms
             "cached_responses": 0,
-            "compressed_responses": 0
+            "not_modified": 0,
+            "cache_stores": 0,
+            "uncacheable_responses": 0,
+            "coalesce_leaders": 0,
+            "coalesced_requests": 0,
+            "coalesce_fallbacks": 0,  # Leader-Response nicht teilbar
+            "coalesce_overflow": 0,   # Waiter-Limit erreicht
+            "coalesce_timeouts": 0,
+            "shed_requests": 0,  # 503 durch Admission Control
         }
+        PerformanceMiddleware.current = self
+        metrics.register_stats("agentland_http", lambda: self.stats, "PerformanceMiddleware")
+        if self.admission is not None:
+            metrics.register_collector("agentland_admission", self._admission_metrics)
     
-    def _init_redis(self):
-        """Redis für verteiltes Rate Limiting"""
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        request = Request(scope)
+        
+        template = self._resolve_route(scope)
+        # Blockaden des Loops während dieses Requests der Route zuordnen
+        loop_monitor.tag_current_task(template or "unmatched")
+        
+        # Rate Limiting prüfen
+        decision = await self._check_rate_limit(scope, request, template)
+        if not decision.allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"error": "Rate limit exceeded", "retry_after": math.ceil(decision.retry_after)},
+                headers=decision.headers(),
+            )
+            await response(scope, receive, send)
+            self._record_metrics(scope, time.perf_counter() - start_time, False, 429)
+            return
+        
+        policy = None
+        if scope["method"] in ("GET", "HEAD") and template:
+            policy = self.policies.get(template)
+        
+        if policy is None:
+            await self._call_admitted(
+                scope, receive, send, start_time,
+                lambda send: self._call_uncached(scope, receive, send, start_time),
+            )
+            return
+        
+        request_cc = _parse_cache_control(request.headers.get("cache-control", ""))
+        cache_key = self._cache_key(scope, request.headers, policy)
+        
+        # Cache-Check (Client kann per no-cache/no-store eine frische Antwort erzwingen)
+        if "no-cache" not in request_cc and "no-store" not in request_cc:
+            cached = await self._get_cached_response(cache_key)
+            if cached is not None:
+                meta, body = cached
+                status = await self._send_cached(scope, send, request.headers, meta, body)
+                self._record_metrics(scope, time.perf_counter() - start_time, True, status)
+                return
+        
+        if scope["method"] == "HEAD":
+            # HEAD-Bodies sind leer - ETag/Cache nur über GET
+            await self._call_admitted(
+                scope, receive, send, start_time,
+                lambda send: self._call_uncached(scope, receive, send, start_time),
+            )
+            return
+        
+        # Identische Anfrage läuft bereits -> auf deren Ergebnis warten
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            shared = await self._wait_for_leader(inflight)
+            if shared is not None:
+                meta, body = shared
+                status = await self._send_cached(scope, send, request.headers, meta, body, "COALESCED")
+                self._record_metrics(scope, time.perf_counter() - start_time, True, status)
+                return
+            # Sonst selbst ausführen (ohne erneut Leader zu werden)
+            store = "no-store" not in request_cc
+            await self._call_admitted(
+                scope, receive, send, start_time,
+                lambda send: self._call_cacheable(
+                    scope, receive, send, start_time, request.headers, policy, cache_key, store
+                ),
+            )
+            return
+        
+        inflight = self._inflight[cache_key] = _InFlight()
+        self.stats["coalesce_leaders"] += 1
+        store = "no-store" not in request_cc
         try:
-            self.redis_client = redis.from_url(
-                settings.REDIS_URL,
-                decode_responses=True,
-                max_connections=10
+            await self._call_admitted(
+                scope, receive, send, start_time,
+                lambda send: self._call_cacheable(
+                    scope, receive, send, start_time, request.headers, policy, cache_key, store,
+                    on_complete=inflight.future.set_result,
+                ),
             )
-        except Exception as e:
-            logger.error(f"Performance middleware Redis error: {e}")
+        finally:
+            if self._inflight.get(cache_key) is inflight:
+                del self._inflight[cache_key]
+            if not inflight.future.done():
+                inflight.future.set_result(None)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Hauptverarbeitung mit Performance-Optimierungen"""
-        start_time = time.time()
+    def _build_admission(self) -> AdmissionController:
+        pool_settings = dict(
+            min_limit=settings.ADMISSION_MIN_CONCURRENCY,
+            max_queue=settings.ADMISSION_QUEUE_SIZE,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+        )
+        return AdmissionController({
+            "chat": AdmissionPool(
+                "chat", self.chat_target_ms, settings.ADMISSION_CHAT_MAX_CONCURRENCY, **pool_settings
+            ),
+            "api": AdmissionPool(
+                "api", self.api_target_ms, settings.ADMISSION_API_MAX_CONCURRENCY, **pool_settings
+            ),
+            # bcrypt/externe APIs: Latenz sagt nichts über die eigene Last -> festes Limit
+            "slow": AdmissionPool(
+                "slow", self.chat_target_ms, settings.ADMISSION_SLOW_MAX_CONCURRENCY,
+                adaptive=False, **pool_settings
+            ),
+        })
+    
+    async def _call_admitted(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        start_time: float,
+        call: Callable[[Send], Awaitable[None]],
+    ):
+        """
+        Führt call(send) nur mit freiem Slot im Pool der Route aus, sonst 503.
+        Das Limit folgt der Zeit bis zum Response-Start (nicht der Stream-Dauer).
+        """
+        pool = self.admission.pool_for(scope["path"]) if self.admission else None
+        if pool is None:
+            await call(send)
+            return
+        
+        if not await pool.acquire():
+            self.stats["shed_requests"] += 1
+            response = JSONResponse(
+                status_code=503,
+                content={"error": "Service overloaded", "retry_after": pool.retry_after()},
+                headers={"Retry-After": str(pool.retry_after())},
+            )
+            await response(scope, receive, send)
+            self._record_metrics(scope, time.perf_counter() - start_time, False, 503)
+            return
+        
+        admitted_at = time.perf_counter()
+        latency: Optional[float] = None
         
-        # Request-Fingerprint für Deduplication
-        request_key = self._generate_request_key(request)
+        async def send_wrapper(message: Message):
+            nonlocal latency
+            if message["type"] == "http.response.start" and latency is None:
+                latency = time.perf_counter() - admitted_at
+            await send(message)
         
         try:
-            # Rate Limiting prüfen
-            if await self._check_rate_limit(request):
-                return JSONResponse(
-                    status_code=429,
-                    content={"error": "Rate limit exceeded"}
-                )
-            
-            # Request Deduplication für identische Anfragen
-            if request_key in self.pending_requests:
-                logger.info(f"Request deduplication: {request_key}")
-                # Warte auf bereits laufende Anfrage
-                return await self.pending_requests[request_key]
-            
-            # Cache-Check für GET-Requests
-            if request.method == "GET":
-                cached_response = await self._get_cached_response(request)
-                if cached_response:
-                    response_time = time.time() - start_time
-                    self._record_metrics(response_time, True)
-                    return cached_response
-            
-            # Request ausführen
-            future = asyncio.Future()
-            self.pending_requests[request_key] = future
-            
-            try:
-                response = await call_next(request)
-                
-                # Response optimieren
-                response = await self._optimize_response(request, response)
-                
-                # Cache für GET-Requests
-                if request.method == "GET" and response.status_code == 200:
-                    await self._cache_response(request, response)
-                
-                future.set_result(response)
-                
-            except Exception as e:
-                future.set_exception(e)
-                raise
-            finally:
-                self.pending_requests.pop(request_key, None)
-            
-            # Metriken aufzeichnen
-            response_time = time.time() - start_time
-            self._record_metrics(response_time, False)
+            await call(send_wrapper)
+        finally:
+            pool.release(latency if latency is not None else time.perf_counter() - admitted_at)
+    
+    async def _wait_for_leader(self, inflight: _InFlight) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """Wartet begrenzt auf den Leader; None = selbst ausführen"""
+        if inflight.waiters >= self.coalesce_max_waiters:
+            self.stats["coalesce_overflow"] += 1
+            return None
+        inflight.waiters += 1
+        try:
+            shared = await asyncio.wait_for(asyncio.shield(inflight.future), self.coalesce_timeout)
+        except asyncio.TimeoutError:
+            self.stats["coalesce_timeouts"] += 1
+            return None
+        finally:
+            inflight.waiters -= 1
+        if shared is None:
+            self.stats["coalesce_fallbacks"] += 1
+            return None
+        self.stats["coalesced_requests"] += 1
+        return shared
+    
+    async def _call_uncached(self, scope: Scope, receive: Receive, send: Send, start_time: float):
+        """Durchreichen mit Zeitmessung; Body wird nicht gepuffert"""
+        status = 500
+        
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self._add_timing_headers(message, start_time, None)
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._finish(scope, start_time, status)
+    
+    async def _call_cacheable(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        start_time: float,
+        request_headers: Headers,
+        policy: ResponseCachePolicy,
+        cache_key: str,
+        store: bool,
+        on_complete: Optional[Callable[[Tuple[Dict[str, Any], bytes]], None]] = None,
+    ):
+        """
+        Puffert den Body einer cachebaren Response, berechnet den ETag,
+        speichert sie und beantwortet If-None-Match ggf. mit 304.
+        on_complete erhält (Metadaten, Body) für wartende identische Anfragen.
+        """
+        status = 500
+        start_message: Optional[Message] = None
+        chunks: List[bytes] = []
+        buffered = 0
+        passthrough = False
+        ttl = 0
+        
+        async def begin_passthrough():
+            nonlocal passthrough
+            passthrough = True
+            self.stats["uncacheable_responses"] += 1
+            self._add_timing_headers(start_message, start_time, "BYPASS")
+            await send(start_message)
+            if chunks:
+                await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                chunks.clear()
+        
+        async def send_wrapper(message: Message):
+            nonlocal status, start_message, buffered, ttl
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                start_message = message
+                ttl = self._storable_ttl(message, policy)
+                if ttl is None:
+                    await begin_passthrough()
+                return
             
-            # Performance-Warnung bei langsamen Requests
-            target_time = self._get_target_time(request)
-            if response_time > target_time:
-                logger.warning(
-                    f"Slow request: {request.url.path} took {response_time*1000:.1f}ms "
-                    f"(target: {target_time*1000:.1f}ms)"
-                )
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
             
-            return response
+            body = message.get("body", b"")
+            if body:
+                chunks.append(body)
+                buffered += len(body)
+            if message.get("more_body", False):
+                if buffered > self.max_body_bytes:
+                    await begin_passthrough()
+                return
             
-        except Exception as e:
-            response_time = time.time() - start_time
-            self._record_metrics(response_time, False)
-            logger.error(f"Request error: {e}")
-            raise
+            await self._complete_cacheable(
+                send, start_message, b"".join(chunks), start_time,
+                request_headers, scope, cache_key, ttl, store, on_complete
+            )
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._finish(scope, start_time, status)
+    
+    async def _complete_cacheable(
+        self,
+        send: Send,
+        start_message: Message,
+        body: bytes,
+        start_time: float,
+        request_headers: Headers,
+        scope: Scope,
+        cache_key: str,
+        ttl: int,
+        store: bool,
+        on_complete: Optional[Callable[[Tuple[Dict[str, Any], bytes]], None]],
+    ):
+        headers = MutableHeaders(raw=start_message["headers"])
+        etag = headers.get("etag") or _strong_etag(body)
+        headers["etag"] = etag
+        if "cache-control" not in headers:
+            headers["cache-control"] = f"public, max-age={ttl}"
+        
+        meta = self._response_meta(start_message, etag)
+        if on_complete is not None:
+            on_complete((meta, body))
+        if store and ttl > 0:
+            await self._cache_response(scope, cache_key, meta, body, ttl)
+        
+        if _etag_matches(request_headers.get("if-none-match", ""), etag):
+            self.stats["not_modified"] += 1
+            start_message = self._not_modified(start_message)
+            body = b""
+        
+        self._add_timing_headers(start_message, start_time, "MISS")
+        await send(start_message)
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
     
-    def _generate_request_key(self, request: Request) -> str:
-        """Generiert eindeutigen Request-Key für Deduplication"""
-        import hashlib
-        
-        key_data = {
-            "method": request.method,
-            "url": str(request.url),
-            "headers": dict(request.headers)
+    def _storable_ttl(self, message: Message, policy: ResponseCachePolicy) -> Optional[int]:
+        """TTL für eine Response oder None, wenn sie nicht gecacht werden darf"""
+        if message["status"] != 200:
+            return None
+        message["headers"] = list(message.get("headers", []))
+        headers = Headers(raw=message["headers"])
+        if "set-cookie" in headers:
+            return None
+        if headers.get("content-type", "").startswith("text/event-stream"):
+            return None
+        
+        response_cc = _parse_cache_control(headers.get("cache-control", ""))
+        if "no-store" in response_cc or "private" in response_cc or "no-cache" in response_cc:
+            return None
+        
+        # Vary muss vollständig im Cache-Key abgebildet sein
+        for vary in headers.getlist("vary"):
+            for name in vary.split(","):
+                name = name.strip().lower()
+                if name and name not in policy.vary:
+                    return None
+        
+        for directive in ("s-maxage", "max-age"):
+            value = response_cc.get(directive)
+            if value is not None:
+                try:
+                    return max(0, int(value))
+                except ValueError:
+                    return None
+        return policy.ttl
+    
+    @staticmethod
+    def _not_modified(start_message: Message) -> Message:
+        return {
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [
+                (name, value) for name, value in start_message["headers"]
+                if name.lower() in _NOT_MODIFIED_HEADERS
+            ],
         }
+    
+    def _add_timing_headers(self, message: Message, start_time: float, cache_status: Optional[str]):
+        message["headers"] = list(message.get("headers", []))
+        headers = MutableHeaders(raw=message["headers"])
+        headers["x-response-time"] = f"{(time.perf_counter() - start_time) * 1000:.1f}ms"
+        if cache_status:
+            headers["x-cache-status"] = cache_status
+    
+    def _finish(self, scope: Scope, start_time: float, status: int):
+        response_time = time.perf_counter() - start_time
+        self._record_metrics(scope, response_time, False, status)
         
-        key_string = json.dumps(key_data, sort_keys=True)
-        return hashlib.md5(key_string.encode()).hexdigest()
+        # Performance-Warnung bei langsamen Requests
+        target_time = self._get_target_time(scope)
+        if response_time > target_time:
+            logger.warning(
+                f"Slow request: {scope['path']} took {response_time*1000:.1f}ms "
+                f"(target: {target_time*1000:.1f}ms)"
+            )
     
-    async def _check_rate_limit(self, request: Request) -> bool:
-        """Überprüft Rate Limiting"""
-        if not self.redis_client:
-            return False
+    def _resolve_route(self, scope: Scope) -> Optional[str]:
+        """Ermittelt das Route-Template vor dem Routing (für Cache- und Rate-Limit-Policy)"""
+        path = scope["path"]
+        template = self._route_templates.get(path, MISSING)
+        if template is not MISSING:
+            self._route_templates.move_to_end(path)
+            return template
         
-        try:
-            client_ip = request.client.host
-            
-            # Verschiedene Limits je nach Endpoint
-            if "/api/v1/chat" in request.url.path:
-                limit = 10  # 10 Chat-Requests pro Minute
-                window = 60
-            elif "/api/v1/realtime" in request.url.path:
-                limit = 60  # 60 Realtime-Requests pro Minute
-                window = 60
-            else:
-                limit = 100  # 100 normale Requests pro Minute
-                window = 60
-            
-            key = f"rate_limit:{client_ip}:{request.url.path.split('/')[1]}"
-            
-            # Current count
-            current = await self.redis_client.get(key)
-            if current and int(current) >= limit:
-                return True
-            
-            # Increment
-            pipe = self.redis_client.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, window)
-            await pipe.execute()
-            
-            return False
-            
-        except Exception as e:
-            logger.error(f"Rate limit check error: {e}")
-            return False
+        template = None
+        router = getattr(scope.get("app"), "router", None)
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                template = getattr(route, "path", None)
+                rate_limit = getattr(getattr(route, "endpoint", None), "__rate_limit__", None)
+                if template and rate_limit is not None:
+                    self._route_rate_limits[template] = rate_limit
+                break
+        
+        self._route_templates[path] = template
+        if len(self._route_templates) > self._route_cache_size:
+            self._route_templates.popitem(last=False)
+        return template
+    
+    def _cache_key(self, scope: Scope, headers: Headers, policy: ResponseCachePolicy) -> str:
+        """Key aus Pfad, normalisierter Query und den Vary-Headern der Policy"""
+        query = scope.get("query_string", b"").decode("latin-1")
+        normalized_query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+        parts = [scope["path"], normalized_query]
+        parts.extend(f"{name}={headers.get(name, '')}" for name in policy.vary)
+        digest = hashlib.sha1("\x00".join(parts).encode()).hexdigest()
+        return f"response:{digest}"
+    
+    async def _check_rate_limit(self, scope: Scope, request: Request, template: Optional[str]):
+        """Ein Token pro Request; Limit der Route (@limiter.limit) vor Kategorie"""
+        client = client_identifier(request.headers, scope.get("client"))
+        policy = self._route_rate_limits.get(template) if template else None
+        if policy is not None:
+            key = f"{client}:route:{template}"
+        else:
+            category = limiter.category_for(scope["path"])
+            policy = RATE_LIMIT_CATEGORIES[category]
+            key = f"{client}:{category}"
+        return await limiter.hit(key, policy)
     
-    async def _get_cached_response(self, request: Request) -> Optional[Response]:
-        """Holt gecachte Response"""
+    async def _get_cached_response(self, cache_key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """Holt gecachte Response als (Metadaten, Body)"""
         try:
-            cache_key = f"response:{self._generate_request_key(request)}"
             cached_data = await cache.get(cache_key)
             
-            if cached_data:
-                self.stats["cached_responses"] += 1
-                return Response(
-                    content=cached_data["content"],
-                    status_code=cached_data["status_code"],
-                    headers=cached_data["headers"],
-                    media_type=cached_data["media_type"]
-                )
+            # Alt-Einträge (dict-Format, ohne ETag) werden ignoriert und laufen per TTL aus
+            if isinstance(cached_data, bytes):
+                meta, body = _unpack_cached_response(cached_data)
+                if "etag" in meta:
+                    return meta, body
             
         except Exception as e:
             logger.error(f"Cache get error: {e}")
         
         return None
     
-    async def _cache_response(self, request: Request, response: Response):
-        """Cached Response für spätere Verwendung"""
-        try:
-            # Nur bestimmte Responses cachen
-            if response.status_code != 200:
-                return
-            
-            # Response-Body lesen
+    async def _send_cached(
+        self,
+        scope: Scope,
+        send: Send,
+        request_headers: Headers,
+        meta: Dict[str, Any],
+        body: bytes,
+        cache_status: str = "HIT",
+    ) -> int:
+        """Sendet Cache-Treffer bzw. 304, ohne die Route aufzurufen; liefert den Status"""
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in meta["headers"]]
+        headers.append((b"age", str(int(max(0, time.time() - meta["stored_at"]))).encode()))
+        message = {"type": "http.response.start", "status": meta["status_code"], "headers": headers}
+        
+        if _etag_matches(request_headers.get("if-none-match", ""), meta["etag"]):
+            self.stats["not_modified"] += 1
+            message = self._not_modified(message)
             body = b""
-            async for chunk in response.body_iterator:
-                body += chunk
-            
-            # Cache-TTL basierend auf Endpoint
-            ttl = 300  # 5 Minuten default
-            if "/api/v1/realtime" in request.url.path:
-                ttl = 60  # 1 Minute für Realtime
-            elif "/api/v1/analytics" in request.url.path:
-                ttl = 120  # 2 Minuten für Analytics
-            
-            cache_key = f"response:{self._generate_request_key(request)}"
-            cache_data = {
-                "content": body.decode() if body else "",
-                "status_code": response.status_code,
-                "headers": dict(response.headers),
-                "media_type": response.media_type
-            }
-            
-            await cache.set(cache_key, cache_data, ttl)
-            
-            # Response neu erstellen
-            response = Response(
-                content=body,
-                status_code=response.status_code,
-                headers=response.headers,
-                media_type=response.media_type
-            )
-            
-        except Exception as e:
-            logger.error(f"Cache set error: {e}")
+        
+        MutableHeaders(raw=message["headers"])["x-cache-status"] = cache_status
+        await send(message)
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+        return message["status"]
     
-    async def _optimize_response(self, request: Request, response: Response) -> Response:
-        """Optimiert Response (Kompression, Headers, etc.)"""
+    @staticmethod
+    def _response_meta(start_message: Message, etag: str) -> Dict[str, Any]:
+        return {
+            "status_code": start_message["status"],
+            "headers": [
+                (name.decode("latin-1"), value.decode("latin-1"))
+                for name, value in start_message["headers"]
+            ],
+            "etag": etag,
+            "stored_at": time.time(),
+        }
+    
+    async def _cache_response(
+        self,
+        scope: Scope,
+        cache_key: str,
+        meta: Dict[str, Any],
+        body: bytes,
+        ttl: int,
+    ):
+        """Cached Response für spätere Verwendung"""
         try:
-            # Accept-Encoding prüfen
-            accept_encoding = request.headers.get("accept-encoding", "")
-            
-            # Gzip-Kompression für große Responses
-            if ("gzip" in accept_encoding and 
-                response.status_code == 200 and
-                hasattr(response, 'body')):
-                
-                # Response-Body lesen
-                body = b""
-                if hasattr(response, 'body_iterator'):
-                    async for chunk in response.body_iterator:
-                        body += chunk
-                else:
-                    body = response.body if isinstance(response.body, bytes) else response.body.encode()
-                
-                # Komprimieren wenn größer als 1KB
-                if len(body) > 1024:
-                    compressed_body = gzip.compress(body)
-                    
-                    # Nur verwenden wenn Kompression sinnvoll
-                    if len(compressed_body) < len(body) * 0.9:
-                        self.stats["compressed_responses"] += 1
-                        
-                        headers = dict(response.headers)
-                        headers["content-encoding"] = "gzip"
-                        headers["content-length"] = str(len(compressed_body))
-                        
-                        response = Response(
-                            content=compressed_body,
-                            status_code=response.status_code,
-                            headers=headers,
-                            media_type=response.media_type
-                        )
-            
-            # Performance-Headers hinzufügen
-            response.headers["X-Response-Time"] = str(int(time.time() * 1000))
-            response.headers["X-Cache-Status"] = "MISS"
+            # Body bleibt bytes: Metadaten-Header + Roh-Body, vom Cache-Codec
+            # ohne pickle durchgereicht und ggf. komprimiert
+            cache_data = _pack_cached_response(meta, body)
             
-            return response
+            # Tag pro Route, damit sich z.B. alle Karten-Responses gezielt invalidieren lassen
+            template = self._route_templates.get(scope["path"])
+            tags = [f"route:{template}"] if template else None
+            await cache.set(cache_key, cache_data, ttl, tags=tags)
+            self.stats["cache_stores"] += 1
             
         except Exception as e:
-            logger.error(f"Response optimization error: {e}")
-            return response
+            logger.error(f"Cache set error: {e}")
     
-    def _get_target_time(self, request: Request) -> float:
+    def _get_target_time(self, scope: Scope) -> float:
         """Gibt Ziel-Response-Zeit für Request zurück"""
-        if "/api/v1/chat" in request.url.path:
+        if "/api/v1/chat" in scope["path"]:
             return self.chat_target_ms / 1000
         else:
             return self.api_target_ms / 1000
     
-    def _record_metrics(self, response_time: float, from_cache: bool):
+    def _record_metrics(self, scope: Scope, response_time: float, from_cache: bool, status: int):
         """Zeichnet Performance-Metriken auf"""
         self.stats["total_requests"] += 1
         
+        # Route-Template statt Pfad, damit die Label-Kardinalität begrenzt bleibt
+        route = (
+            getattr(scope.get("route"), "path", None)
+            or self._route_templates.get(scope["path"])
+            or "unmatched"
+        )
+        performance_monitor.record_response_time(response_time, route, scope["method"], status)
+        HTTP_REQUEST_DURATION.labels(scope["method"], route, f"{status // 100}xx").observe(response_time)
+        
         if from_cache:
             self.stats["cached_responses"] += 1
             self.stats["fast_requests"] += 1
         else:
-            performance_monitor.record_response_time(response_time)
-            
             if response_time < self.api_target_ms / 1000:
                 self.stats["fast_requests"] += 1
             else:
                 self.stats["slow_requests"] += 1
     
+    def _admission_metrics(self) -> Dict[str, Any]:
+        """Admission-Pools als Metrik-Familien mit Label pool"""
+        pools = self.admission.pools
+        families = {}
+        for key in ("admitted", "queued", "rejected_queue_full", "rejected_deadline", "rejected_timeout"):
+            families[f"agentland_admission_{key}"] = {
+                "type": "counter", "help": f"Admission Control {key}", "labels": ["pool"],
+                "samples": [[[name], pool.stats[key]] for name, pool in pools.items()],
+            }
+        gauges = {
+            "limit": lambda pool: pool.limit,
+            "in_flight": lambda pool: pool.in_flight,
+            "queue_length": lambda pool: len(pool._queue),
+        }
+        for key, read in gauges.items():
+            families[f"agentland_admission_{key}"] = {
+                "type": "gauge", "help": f"Admission Control {key}", "labels": ["pool"], "mode": "sum",
+                "samples": [[[name], read(pool)] for name, pool in pools.items()],
+            }
+        return families
+    
     def get_performance_stats(self) -> Dict[str, Any]:
         """Performance-Statistiken"""
         total = self.stats["total_requests"]
@@ -325,64 +714,120 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
             **self.stats,
             "fast_request_percentage": (self.stats["fast_requests"] / total) * 100,
             "cache_hit_rate": (self.stats["cached_responses"] / total) * 100,
-            "compression_rate": (self.stats["compressed_responses"] / total) * 100
+            "coalesce_rate": (self.stats["coalesced_requests"] / total) * 100,
+            "inflight_keys": len(self._inflight),
+            "admission": self.admission.get_stats() if self.admission else {},
         }
 
 
-class MemoryOptimizationMiddleware(BaseHTTPMiddleware):
+def _pack_cached_response(meta: Dict[str, Any], body: bytes) -> bytes:
+    """Packt Response als <len><JSON-Metadaten><Body> in einen Byte-String"""
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode()
+    return len(meta_bytes).to_bytes(4, "big") + meta_bytes + body
+
+
+def _unpack_cached_response(data: bytes):
+    """Gegenstück zu _pack_cached_response"""
+    meta_len = int.from_bytes(data[:4], "big")
+    meta = json.loads(data[4:4 + meta_len])
+    return meta, data[4 + meta_len:]
+
+
+# Prozessweiter Profiler (Start/Stop im Lifespan, Report über die Performance-API)
+memory_profiler = MemoryProfiler(
+    sample_rate=settings.MEMORY_PROFILE_SAMPLE_RATE,
+    top_n=settings.MEMORY_PROFILE_TOP_N,
+    rss_interval=settings.MEMORY_RSS_INTERVAL,
+    gc_interval=settings.MEMORY_GC_INTERVAL,
+    gc_rss_growth=settings.MEMORY_GC_RSS_GROWTH_MB * 1024 * 1024,
+)
+metrics.register_stats("agentland_memory", lambda: memory_profiler.stats, "Memory-Profiler")
+
+# Event-Loop-Monitor (Start/Stop im Lifespan, Report über die Performance-API)
+loop_monitor = LoopLagMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL,
+    threshold=settings.LOOP_SLOW_CALLBACK_THRESHOLD,
+    stack_depth=settings.LOOP_MONITOR_STACK_DEPTH,
+    max_events=settings.LOOP_MONITOR_MAX_EVENTS,
+)
+
+
+def _loop_monitor_metrics() -> Dict[str, Any]:
+    """Lag-Quantile pro Worker und blockierende Callbacks pro Route"""
+    lag = loop_monitor.lag.quantiles((0.5, 0.99))
+    return {
+        "agentland_event_loop_lag_seconds": {
+            "type": "gauge", "help": "Scheduling-Delay des Event-Loops", "labels": ["quantile"], "mode": "max",
+            "samples": [[["0.5"], lag["p50"] / 1000], [["0.99"], lag["p99"] / 1000]],
+        },
+        "agentland_event_loop_lag_max_seconds": {
+            "type": "gauge", "help": "Maximaler Scheduling-Delay seit Start", "labels": [], "mode": "max",
+            "samples": [[[], loop_monitor.stats["max_lag_ms"] / 1000]],
+        },
+        "agentland_event_loop_slow_callbacks": {
+            "type": "counter", "help": "Blockaden des Event-Loops über dem Schwellwert", "labels": ["route"],
+            "samples": [[[route], count] for route, count in loop_monitor.by_route.items()],
+        },
+    }
+
+
+metrics.register_collector("agentland_event_loop", _loop_monitor_metrics)
+
+
+class MemoryOptimizationMiddleware:
     """
-    Memory-Optimierung für große Datenmengen
+    Memory-Profiling (reines ASGI): tracemalloc nur für gesampelte Requests;
+    volle Collections übernimmt der Hintergrund-Task des MemoryProfilers
     """
     
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self.memory_threshold = 100 * 1024 * 1024  # 100MB
+    def __init__(self, app: ASGIApp, profiler: Optional[MemoryProfiler] = None):
+        self.app = app
+        self.profiler = memory_profiler if profiler is None else profiler
         
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Memory-optimierte Verarbeitung"""
-        import psutil
-        import gc
-        
-        # Memory-Check vor Request
-        memory_before = psutil.virtual_memory().used
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.profiler.should_sample():
+            await self.app(scope, receive, send)
+            return
         
+        sample = self.profiler.begin_sample()
         try:
-            response = await call_next(request)
-            
-            # Memory-Check nach Request
-            memory_after = psutil.virtual_memory().used
-            memory_used = memory_after - memory_before
-            
-            # Garbage Collection bei hohem Memory-Verbrauch
-            if memory_used > self.memory_threshold:
-                logger.info(f"High memory usage detected: {memory_used/1024/1024:.1f}MB")
-                gc.collect()
-            
-            return response
-            
-        except Exception as e:
-            # Cleanup bei Fehler
-            gc.collect()
-            raise
+            await self.app(scope, receive, send)
+        finally:
+            if sample is not None:
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                self.profiler.end_sample(sample, route)
 
 
-class DatabaseOptimizationMiddleware(BaseHTTPMiddleware):
+class DatabaseOptimizationMiddleware:
     """
-    Database-Performance-Optimierung
+    Database-Performance-Monitoring (reines ASGI)
+    - Queries, DB-Zeit und Pool-Wartezeit pro Request über Engine-Events
+    - Slow-Query-Log und N+1-Erkennung (app.db.query_stats)
+    - Server-Timing-Header mit DB-Anteil der Response
     """
     
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self.slow_query_threshold = 1.0  # 1 Sekunde
+    def __init__(self, app: ASGIApp, collector: Optional[QueryStatsCollector] = None):
+        self.app = app
+        self.collector = query_stats if collector is None else collector
         
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Database-optimierte Verarbeitung"""
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Query-Performance-Tracking würde hier implementiert
-        # Momentan Placeholder für spätere Implementierung
+        request_stats = self.collector.begin_request()
         
-        response = await call_next(request)
-        return response
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                # Queries nach dem Response-Start (Streaming) fehlen im Header
+                message["headers"] = list(message.get("headers", []))
+                MutableHeaders(raw=message["headers"]).append("server-timing", request_stats.server_timing())
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.collector.end_request(request_stats, getattr(scope.get("route"), "path", None))
 
 
 # Globale Middleware-Instanzen
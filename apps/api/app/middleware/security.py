@@ -14,6 +14,7 @@ import hashlib
 import json
 import asyncio
 
+from app.core.rate_limiter import RATE_LIMIT_CATEGORIES, client_identifier, limiter
 from app.services import audit_log
 
 logger = logging.getLogger(__name__)
@@ -27,12 +28,8 @@ class SecurityMiddleware:
     def __init__(self, redis_client: redis.Redis, config: dict):
         self.redis = redis_client
         self.config = config
-        self.rate_limits = {
-            'default': {'requests': 100, 'window': 60},  # 100 req/min
-            'auth': {'requests': 5, 'window': 60},       # 5 login attempts/min
-            'chat': {'requests': 30, 'window': 60},      # 30 chat req/min
-            'api_key': {'requests': 1000, 'window': 60}, # 1000 req/min für API keys
-        }
+        # Limits pro Kategorie kommen aus app.core.rate_limiter
+        self.enforce_rate_limit = config.get('enforce_rate_limit', False)
         
     async def __call__(self, request: Request, call_next):
         """
@@ -63,7 +60,8 @@ class SecurityMiddleware:
                     "error": e.detail,
                     "timestamp": datetime.utcnow().isoformat(),
                     "path": str(request.url.path)
-                }
+                },
+                headers=e.headers
             )
         except Exception as e:
             logger.error(f"Security middleware error: {str(e)}")
@@ -77,40 +75,29 @@ class SecurityMiddleware:
     
     async def _check_rate_limit(self, request: Request):
         """
-        Rate Limiting basierend auf IP und Endpoint
+        Rate Limiting über die gemeinsame Engine (app.core.rate_limiter)
+        Standardmäßig limitiert bereits die PerformanceMiddleware; nur mit
+        config['enforce_rate_limit'] zählt diese Middleware selbst, damit
+        ein Request nicht doppelt Tokens verbraucht.
         """
-        client_ip = self._get_client_ip(request)
-        endpoint = request.url.path
-        
-        # Rate Limit Kategorie bestimmen
-        category = self._get_rate_limit_category(endpoint)
-        limit_config = self.rate_limits.get(category, self.rate_limits['default'])
+        if not self.enforce_rate_limit:
+            return
         
-        # Redis Key für Rate Limiting
-        key = f"rate_limit:{client_ip}:{category}"
+        client_ip = self._get_client_ip(request)
+        category = limiter.category_for(request.url.path)
+        decision = await limiter.hit(f"{client_ip}:{category}", RATE_LIMIT_CATEGORIES[category])
         
-        try:
-            # Aktuelle Anfragen zählen
-            current_requests = await self._get_request_count(key, limit_config['window'])
-            
-            if current_requests >= limit_config['requests']:
-                logger.warning(f"Rate limit exceeded for {client_ip} on {endpoint}")
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail={
-                        "message": "Rate limit exceeded",
-                        "limit": limit_config['requests'],
-                        "window": limit_config['window'],
-                        "retry_after": await self._get_retry_after(key, limit_config['window'])
-                    }
-                )
-            
-            # Request zählen
-            await self._increment_request_count(key, limit_config['window'])
-            
-        except redis.RedisError as e:
-            logger.error(f"Redis error in rate limiting: {str(e)}")
-            # Bei Redis-Fehler: Request durchlassen aber loggen
+        if not decision.allowed:
+            logger.warning(f"Rate limit exceeded for {client_ip} on {request.url.path}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail={
+                    "message": "Rate limit exceeded",
+                    "limit": decision.limit,
+                    "retry_after": decision.headers()["Retry-After"],
+                },
+                headers=decision.headers(),
+            )
             
     async def _validate_request(self, request: Request):
         """
@@ -142,65 +129,10 @@ class SecurityMiddleware:
     
     def _get_client_ip(self, request: Request) -> str:
         """
-        Echte Client IP ermitteln (hinter Proxy/Load Balancer)
-        """
-        # Prüfe X-Forwarded-For Header (Proxy)
-        forwarded_for = request.headers.get('x-forwarded-for')
-        if forwarded_for:
-            return forwarded_for.split(',')[0].strip()
-        
-        # Prüfe X-Real-IP Header (Nginx)
-        real_ip = request.headers.get('x-real-ip')
-        if real_ip:
-            return real_ip
-        
-        # Fallback: Direkte IP
-        return request.client.host if request.client else 'unknown'
-    
-    def _get_rate_limit_category(self, endpoint: str) -> str:
-        """
-        Rate Limit Kategorie basierend auf Endpoint
-        """
-        if '/auth/' in endpoint:
-            return 'auth'
-        elif '/chat' in endpoint or '/agents/' in endpoint:
-            return 'chat'
-        elif '/api/v1/' in endpoint:
-            return 'api_key'
-        else:
-            return 'default'
-    
-    async def _get_request_count(self, key: str, window: int) -> int:
-        """
-        Aktuelle Request-Anzahl aus Redis
-        """
-        try:
-            count = self.redis.get(key)
-            return int(count) if count else 0
-        except:
-            return 0
-    
-    async def _increment_request_count(self, key: str, window: int):
-        """
-        Request-Counter in Redis erhöhen
-        """
-        try:
-            pipe = self.redis.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, window)
-            pipe.execute()
-        except:
-            pass  # Redis Fehler ignorieren für Verfügbarkeit
-    
-    async def _get_retry_after(self, key: str, window: int) -> int:
-        """
-        Retry-After Zeit für Rate Limiting
+        Client IP (Proxy-Header nur bei RATE_LIMIT_TRUST_PROXY)
         """
-        try:
-            ttl = self.redis.ttl(key)
-            return max(ttl, 1) if ttl > 0 else window
-        except:
-            return window
+        client = (request.client.host, request.client.port) if request.client else None
+        return client_identifier(request.headers, client)
     
     def _add_security_headers(self, response: Response):
         """
@@ -3,6 +3,7 @@ from .feedback import Feedback
 from .agent import Agent
 from .user import User
 from .audit import AuditLog
+from .cache_result import CacheResult
 
 __all__ = [
     'UserActivity',
@@ -12,4 +13,5 @@ __all__ = [
     'Agent',
     'User',
     'AuditLog',
+    'CacheResult',
 ]
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Float, LargeBinary
+
+from app.db.database import Base
+
+class CacheResult(Base):
+    """L3-Ergebnis-Cache: große, langlebige und teure Werte (AI-Responses, Crawls)"""
+    __tablename__ = "cache_results"
+
+    key = Column(String(512), primary_key=True)
+    value = Column(LargeBinary, nullable=False)
+    # Komma-umschlossene Tag-Liste (",ai,analytics,") für Tag-Invalidierung
+    tags = Column(String, nullable=True)
+    # Unix-Zeit statt DateTime, damit Vergleiche auf PostgreSQL und SQLite identisch sind
+    expires_at = Column(Float, nullable=False, index=True)
+    updated_at = Column(Float, nullable=False)
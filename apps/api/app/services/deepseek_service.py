@@ -13,9 +13,17 @@ import backoff
 import time
 
 from app.core.cache import ai_cache, cached, performance_monitor
+from app.core.metrics import registry as metrics
 
 logger = logging.getLogger(__name__)
 
+LLM_REQUEST_DURATION = metrics.histogram(
+    "agentland_llm_request_duration_seconds",
+    "Dauer von LLM-Anfragen nach Provider und Ergebnis",
+    ("provider", "outcome"),
+    buckets=(0.005, 0.05, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
 
 class DeepSeekService:
     """
@@ -122,7 +130,8 @@ class DeepSeekService:
             )
             if cached_response:
                 response_time = time.time() - start_time
-                performance_monitor.record_response_time(response_time)
+                performance_monitor.record_response_time(response_time, "deepseek:cache", "LLM", 200)
+                LLM_REQUEST_DURATION.labels("deepseek", "cache").observe(response_time)
                 return cached_response
         
         # Prepare messages
@@ -189,14 +198,16 @@ class DeepSeekService:
                     
                     # Record performance
                     response_time = time.time() - start_time
-                    performance_monitor.record_response_time(response_time)
+                    performance_monitor.record_response_time(response_time, "deepseek", "LLM", 200)
+                    LLM_REQUEST_DURATION.labels("deepseek", "success").observe(response_time)
                     
                     return result
                     
         except Exception as e:
             logger.error(f"Error calling DeepSeek API: {str(e)}")
             response_time = time.time() - start_time
-            performance_monitor.record_response_time(response_time)
+            performance_monitor.record_response_time(response_time, "deepseek", "LLM", 500)
+            LLM_REQUEST_DURATION.labels("deepseek", "error").observe(response_time)
             raise
             
     async def _handle_stream(self, response):
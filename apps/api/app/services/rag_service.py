@@ -7,11 +7,12 @@ import asyncio
 import asyncpg
 from typing import List, Dict, Optional, Any
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import logging
 from datetime import datetime
 import json
 
+from app.core.semantic_cache import EMBEDDING_DIM, get_embedding_model
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,9 +26,9 @@ class SaarlandRAGService:
         self.db_config = db_config
         self.pool = None
         
-        # Initialize multilingual embedding model
-        self.embedding_model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
-        self.embedding_dim = 384  # Dimension for this model
+        # Initialize multilingual embedding model (shared with the AI response cache)
+        self.embedding_model = get_embedding_model()
+        self.embedding_dim = EMBEDDING_DIM
         
         # Categories for filtering
         self.categories = [
@@ -98,7 +98,11 @@ class AnalyticsService:
             print(f"Error tracking activity: {e}")
             return False
     
-    @cached(prefix="analytics", ttl=60, key_params=[])  # Cache für 1 Minute
+    # 1 Minute frisch, danach bis 5 Minuten stale ausliefern und im Hintergrund aktualisieren
+    @cached(
+        prefix="analytics", ttl=300, soft_ttl=60, refresh_ahead=10,
+        key_params=[], distributed_lock=True, lease_timeout=10, tags=["analytics"]
+    )
     async def get_real_time_stats(self) -> Dict[str, Any]:
         """
         Holt echte Echtzeit-Statistiken
@@ -275,7 +279,11 @@ class AnalyticsService:
         
         return analytics
     
-    @cached(prefix="regional_analytics", ttl=3600, key_params=[])  # Cache für 1 Stunde
+    # 1 Stunde frisch, danach bis 2 Stunden stale ausliefern und im Hintergrund aktualisieren
+    @cached(
+        prefix="regional_analytics", ttl=7200, soft_ttl=3600, refresh_ahead=300,
+        key_params=[], distributed_lock=True, tags=["analytics"]
+    )
     async def get_regional_analytics(self) -> Dict[str, Any]:
         """
         Regionale Analysen für das Saarland
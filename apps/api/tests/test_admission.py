@@ -0,0 +1,179 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.admission import AdmissionController, AdmissionPool
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_admits_up_to_limit_then_rejects_when_queue_full():
+    async def scenario():
+        pool = AdmissionPool("api", target_ms=300, max_limit=2, max_queue=0)
+        assert await pool.acquire()
+        assert await pool.acquire()
+        assert not await pool.acquire()
+        assert pool.stats["rejected_queue_full"] == 1
+        pool.release(0.01)
+        assert await pool.acquire()
+
+    run(scenario())
+
+
+def test_queued_request_gets_released_slot_in_fifo_order():
+    async def scenario():
+        pool = AdmissionPool("api", target_ms=300, max_limit=1, queue_timeout=1.0)
+        assert await pool.acquire()
+        first = asyncio.ensure_future(pool.acquire())
+        second = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        assert pool.get_stats()["queue_length"] == 2
+
+        pool.release(0.01)
+        assert await first
+        assert not second.done()
+        pool.release(0.01)
+        assert await second
+        assert pool.in_flight == 1
+
+    run(scenario())
+
+
+def test_queue_timeout_rejects_and_leaves_queue():
+    async def scenario():
+        pool = AdmissionPool("api", target_ms=300, max_limit=1, queue_timeout=0.2)
+        assert await pool.acquire()
+        assert not await pool.acquire()
+        assert pool.stats["rejected_timeout"] == 1
+        assert pool.get_stats()["queue_length"] == 0
+
+    run(scenario())
+
+
+def test_deadline_aware_rejection_without_waiting():
+    async def scenario():
+        pool = AdmissionPool("chat", target_ms=2000, max_limit=1, queue_timeout=0.5)
+        assert await pool.acquire()
+        # Erwartete Wartezeit (1s Durchschnitt) liegt über der Deadline
+        assert not await pool.acquire()
+        assert pool.stats["rejected_deadline"] == 1
+        assert pool.stats["queued"] == 0
+        assert pool.retry_after() == 1
+
+    run(scenario())
+
+
+def test_cancelled_waiter_is_removed():
+    async def scenario():
+        pool = AdmissionPool("api", target_ms=300, max_limit=1, queue_timeout=1.0)
+        assert await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert pool.get_stats()["queue_length"] == 0
+        pool.release(0.01)
+        assert pool.in_flight == 0
+
+    run(scenario())
+
+
+def test_aimd_decreases_on_sustained_slow_responses_and_recovers():
+    async def scenario():
+        clock = FakeClock()
+        pool = AdmissionPool("chat", target_ms=2000, max_limit=10, min_limit=2, clock=clock)
+        for _ in range(3):
+            await pool.acquire()
+
+        # Einzelner Ausreißer: EWMA (1.4s) bleibt unter dem Ziel
+        pool.release(5.0)
+        assert pool.limit == 10
+        await pool.acquire()
+        pool.release(5.0)
+        assert pool.limit == 10
+        # Dritte langsame Antwort: EWMA über 2s -> Absenkung
+        pool.release(5.0)
+        assert pool.limit == 9
+        # Innerhalb desselben Ziel-Intervalls keine weitere Absenkung
+        await pool.acquire()
+        pool.release(5.0)
+        assert pool.limit == 9
+        clock.now += 2
+        await pool.acquire()
+        pool.release(5.0)
+        assert pool.limit == 9 * 0.9
+        assert pool.stats["limit_decreases"] == 2
+
+        for _ in range(50):
+            clock.now += 2
+            await pool.acquire()
+            pool.release(5.0)
+        assert pool.limit == 2
+
+        for _ in range(20):
+            await pool.acquire()
+            pool.release(0.1)
+        assert pool.limit > 2
+
+    run(scenario())
+
+
+def test_occasional_slow_requests_do_not_shrink_limit():
+    async def scenario():
+        clock = FakeClock()
+        pool = AdmissionPool("api", target_ms=300, max_limit=100, min_limit=4, clock=clock)
+        # Jeder fünfte Request (z.B. bcrypt) dauert 1s, der Rest 20ms
+        for i in range(500):
+            clock.now += 0.1
+            await pool.acquire()
+            pool.release(1.0 if i % 5 == 0 else 0.02)
+        assert pool.limit == 100
+        assert pool.stats["limit_decreases"] == 0
+
+    run(scenario())
+
+
+def test_fixed_pool_ignores_latency():
+    async def scenario():
+        clock = FakeClock()
+        pool = AdmissionPool("slow", target_ms=2000, max_limit=8, adaptive=False, clock=clock)
+        for _ in range(20):
+            clock.now += 3
+            await pool.acquire()
+            pool.release(10.0)
+        stats = pool.get_stats()
+        assert stats["limit"] == 8 and not stats["adaptive"]
+        assert stats["avg_latency_ms"] > 2000
+
+    run(scenario())
+
+
+def test_controller_routes_paths_to_pools():
+    chat = AdmissionPool("chat", target_ms=2000, max_limit=4)
+    api = AdmissionPool("api", target_ms=300, max_limit=16)
+    controller = AdmissionController({"chat": chat, "api": api})
+
+    assert controller.pool_for("/api/v1/chat/stream") is chat
+    assert controller.pool_for("/api/v1/enhanced-agents/query") is chat
+    assert controller.pool_for("/api/users/me") is api
+    assert controller.pool_for("/api/v1/realtime/data") is None
+    assert controller.pool_for("/api/health/ready") is None
+    assert set(controller.get_stats()) == {"chat", "api"}
+
+    slow = AdmissionPool("slow", target_ms=2000, max_limit=8, adaptive=False)
+    controller.pools["slow"] = slow
+    assert controller.pool_for("/api/v1/realtime/data") is slow
+    assert controller.pool_for("/api/auth/login") is slow
@@ -0,0 +1,53 @@
+import pickle
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.cache_codecs import (
+    CODEC_PICKLE,
+    CODEC_RAW,
+    COMPRESSION_NONE,
+    CacheSerializer,
+    MAGIC,
+)
+
+
+def test_roundtrip_preserves_types():
+    serializer = CacheSerializer()
+    values = [
+        {"active_users": 12, "regions": ["Saarbrücken", "Homburg"], "ratio": 0.5},
+        b"\x00raw body",
+        ("tuple", 1),
+        {"created": datetime(2025, 6, 1)},
+        None,
+    ]
+    for value in values:
+        assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_bytes_and_non_json_codec_selection():
+    serializer = CacheSerializer()
+    assert serializer.dumps(b"body")[1] == CODEC_RAW
+    # datetime würde als JSON zu str werden - daher pickle
+    assert serializer.dumps({"created": datetime(2025, 6, 1)})[1] == CODEC_PICKLE
+
+
+def test_compression_above_threshold():
+    serializer = CacheSerializer(compression_threshold=256)
+    small = serializer.dumps(b"x" * 100)
+    large = serializer.dumps(b"x" * 10_000)
+
+    assert small[0] == MAGIC and small[2] == COMPRESSION_NONE
+    assert large[2] != COMPRESSION_NONE
+    assert len(large) < 10_000
+    assert serializer.loads(large) == b"x" * 10_000
+    assert serializer.get_stats()["codecs"]["raw"]["bytes_saved"] > 0
+
+
+def test_legacy_pickle_without_header_is_readable():
+    serializer = CacheSerializer()
+    legacy = pickle.dumps({"content": "alt"})
+    assert serializer.loads(legacy) == {"content": "alt"}
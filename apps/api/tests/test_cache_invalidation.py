@@ -0,0 +1,112 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.cache_invalidation import InvalidationBus
+from app.core.l1_cache import L1Cache
+
+
+async def no_connection():
+    return None
+
+
+def make_bus():
+    l1 = L1Cache(max_bytes=100_000)
+    return l1, InvalidationBus(l1, no_connection)
+
+
+def message(seq, origin="peer", **ops):
+    return json.dumps({"o": origin, "s": seq, **ops})
+
+
+def test_applies_keys_and_tags_from_peer():
+    l1, bus = make_bus()
+    l1.set("cache:a", 1)
+    l1.set("cache:b", 2, tags=["analytics"])
+    l1.set("cache:c", 3)
+
+    bus.handle_message(message(1, k=["cache:a"], t=["analytics"]))
+
+    assert "cache:a" not in l1
+    assert "cache:b" not in l1
+    assert "cache:c" in l1
+
+
+def test_sequence_gap_flushes_l1():
+    l1, bus = make_bus()
+    bus.handle_message(message(1, k=["x"]))
+    l1.set("cache:a", 1)
+
+    # Nachricht 2 ging verloren
+    bus.handle_message(message(3, k=["y"]))
+
+    assert len(l1) == 0
+    assert bus.stats["gaps_detected"] == 1
+
+
+def test_ignores_own_messages_and_duplicates():
+    l1, bus = make_bus()
+    l1.set("cache:a", 1)
+
+    bus.handle_message(message(1, origin=bus.instance_id, k=["cache:a"]))
+    assert "cache:a" in l1
+
+    bus.handle_message(message(1, k=["other"]))
+    bus.handle_message(message(1, k=["cache:a"]))
+    assert "cache:a" in l1
+    assert bus.stats["full_flushes"] == 0
+
+
+class SlowConnection:
+    """Redis-Verbindung, deren Publish eine vorgegebene Zeit braucht"""
+
+    def __init__(self, delay, published):
+        self.delay = delay
+        self.published = published
+
+    async def publish(self, channel, data):
+        await asyncio.sleep(self.delay)
+        self.published.append(data)
+
+    async def close(self):
+        pass
+
+
+def test_full_batches_are_published_in_sequence_order():
+    async def scenario():
+        published = []
+        # Erstes volles Batch bekommt die langsamste Verbindung
+        delays = iter([0.0, 0.03, 0.0, 0.0])
+
+        async def connection():
+            return SlowConnection(next(delays, 0.0), published)
+
+        sender = InvalidationBus(L1Cache(max_bytes=100_000), connection, batch_window=0.05, max_batch=2)
+        sender.running = True
+        sender.publish_key("cache:seed")
+        await sender.flush()
+
+        # Zeitfenster läuft, während zweimal max_batch erreicht wird
+        sender.publish_key("cache:a")
+        sender.publish_key("cache:b")
+        # Erster Batch-Flush hängt im langsamen Publish
+        await asyncio.sleep(0.01)
+        sender.publish_key("cache:c")
+        sender.publish_key("cache:d")
+        await asyncio.sleep(0.1)
+        await asyncio.gather(*sender._background_tasks)
+        return published
+
+    published = asyncio.run(scenario())
+    l1, receiver = make_bus()
+    for data in published:
+        receiver.handle_message(data)
+
+    assert [json.loads(data)["s"] for data in published] == [1, 2, 3]
+    assert receiver.stats["gaps_detected"] == 0
+    assert receiver.stats["full_flushes"] == 0
+    assert receiver.stats["applied_ops"] == 5
@@ -0,0 +1,226 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from app.core.cache import MultiLayerCache
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def get(self, key):
+        self.ops.append(lambda: self.redis.value(key))
+
+    def pttl(self, key):
+        self.ops.append(lambda: self.redis.pttl(key))
+
+    def smembers(self, key):
+        self.ops.append(lambda: set())
+
+    def exists(self, key):
+        self.ops.append(lambda: int(self.redis.value(key) is not None))
+
+    async def execute(self):
+        return [op() for op in self.ops]
+
+
+class FakeRedis:
+    """Gemeinsamer Redis mehrerer Worker: SET NX PX, SETEX, Release-Skript, Pipeline"""
+
+    def __init__(self):
+        self.data = {}  # Key -> (Wert, Ablauf oder None)
+
+    def value(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def pttl(self, key):
+        if self.value(key) is None:
+            return -2
+        expires_at = self.data[key][1]
+        return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and self.value(key) is not None:
+            return None
+        self.data[key] = (value, time.monotonic() + px / 1000 if px else None)
+        return True
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = (value, time.monotonic() + ttl)
+
+    async def eval(self, script, numkeys, key, token):
+        # Nur _RELEASE_LEASE_SCRIPT: löschen, wenn der Lease noch dem Token gehört
+        if self.value(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def close(self):
+        pass
+
+
+def make_worker(redis):
+    worker = MultiLayerCache()
+
+    async def connection():
+        return redis
+
+    worker.get_redis_connection = connection
+    worker.lease_poll_interval = 0.005
+    return worker
+
+
+class Computation:
+    """Zählt Aufrufe; wartet optional auf release"""
+
+    def __init__(self, value="frisch", fail=False):
+        self.value = value
+        self.fail = fail
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.released.wait()
+        if self.fail:
+            raise RuntimeError("Upstream nicht erreichbar")
+        return f"{self.value}-{self.calls}"
+
+
+async def settle(*workers):
+    for worker in workers:
+        while worker._refresh_tasks:
+            await asyncio.gather(*worker._refresh_tasks)
+
+
+def test_concurrent_callers_in_one_worker_compute_once():
+    async def scenario():
+        worker = make_worker(FakeRedis())
+        compute = Computation()
+        callers = [asyncio.create_task(worker.get_or_compute("cache:plz", compute, ttl=60)) for _ in range(20)]
+        await asyncio.sleep(0.01)
+        compute.released.set()
+        return await asyncio.gather(*callers), compute.calls, worker.stats
+
+    values, calls, stats = asyncio.run(scenario())
+    assert values == ["frisch-1"] * 20
+    assert calls == 1
+    assert (stats["singleflight_leaders"], stats["coalesced_calls"]) == (1, 19)
+
+
+def test_lease_lets_one_worker_compute_for_the_fleet():
+    async def scenario():
+        redis = FakeRedis()
+        workers = [make_worker(redis), make_worker(redis)]
+        compute = Computation()
+        callers = [
+            asyncio.create_task(worker.get_or_compute("cache:plz", compute, ttl=60, distributed_lock=True))
+            for worker in workers
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0.02)
+        compute.released.set()
+        values = await asyncio.gather(*callers)
+        return values, compute.calls, [worker.stats for worker in workers], redis
+
+    values, calls, (leader, follower), redis = asyncio.run(scenario())
+    assert values == ["frisch-1"] * 10
+    assert calls == 1
+    assert leader["lease_acquired"] == 1
+    assert (follower["lease_waits"], follower["lease_wait_hits"]) == (1, 1)
+    # Lease ist nach der Berechnung wieder frei
+    assert redis.value("lease:cache:plz") is None
+
+
+def test_lease_waiter_times_out_and_computes_itself():
+    async def scenario():
+        redis = FakeRedis()
+        # Lease eines abgestürzten Workers, der nie ein Ergebnis schreibt
+        await redis.set("lease:cache:plz", "fremd", nx=True, px=60_000)
+        worker = make_worker(redis)
+        compute = Computation()
+        compute.released.set()
+        value = await worker.get_or_compute(
+            "cache:plz", compute, ttl=60, distributed_lock=True, lease_timeout=0.05
+        )
+        return value, compute.calls, worker.stats, redis
+
+    value, calls, stats, redis = asyncio.run(scenario())
+    assert value == "frisch-1"
+    assert calls == 1
+    assert (stats["lease_waits"], stats["lease_timeouts"], stats["lease_wait_hits"]) == (1, 1, 0)
+    # Fremder Lease bleibt unangetastet
+    assert redis.value("lease:cache:plz") == "fremd"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_stale_value_is_served_while_exactly_one_refresh_runs(workers):
+    async def scenario():
+        redis = FakeRedis()
+        fleet = [make_worker(redis) for _ in range(workers)]
+        initial = Computation("alt")
+        initial.released.set()
+        # soft_ttl=0: Eintrag ist sofort veraltet, aber bis zur harten TTL lieferbar
+        await fleet[0].get_or_compute_swr("cache:events", initial, ttl=60, soft_ttl=0)
+
+        refresh = Computation("neu")
+        stale = await asyncio.gather(*(
+            worker.get_or_compute_swr("cache:events", refresh, ttl=60, soft_ttl=0, distributed_lock=True)
+            for worker in fleet
+            for _ in range(10)
+        ))
+        await asyncio.sleep(0.01)
+        refresh.released.set()
+        await settle(*fleet)
+        return stale, refresh.calls, fleet, redis
+
+    stale, refresh_calls, fleet, redis = asyncio.run(scenario())
+    assert stale == ["alt-1"] * (10 * workers)
+    assert refresh_calls == 1
+    assert sum(worker.stats["stale_served"] for worker in fleet) == 10 * workers
+    assert sum(worker.stats["lease_acquired"] for worker in fleet) == 1
+    assert fleet[0].l1.get("cache:events")["value"] == "neu-1"
+    assert all(not worker._inflight for worker in fleet)
+    assert redis.value("lease:cache:events") is None
+
+
+def test_refresh_errors_are_counted_and_keep_stale_value():
+    async def scenario():
+        worker = make_worker(FakeRedis())
+        initial = Computation("alt")
+        initial.released.set()
+        await worker.get_or_compute_swr("cache:weather", initial, ttl=60, soft_ttl=0)
+
+        failing = Computation(fail=True)
+        failing.released.set()
+        first = await worker.get_or_compute_swr("cache:weather", failing, ttl=60, soft_ttl=0)
+        await settle(worker)
+        second = await worker.get_or_compute_swr("cache:weather", failing, ttl=60, soft_ttl=0)
+        await settle(worker)
+        return first, second, failing.calls, worker
+
+    first, second, calls, worker = asyncio.run(scenario())
+    assert first == second == "alt-1"
+    # Jeder veraltete Lesezugriff nach einem Fehler darf erneut refreshen
+    assert calls == 2
+    assert worker.stats["background_refreshes"] == 2
+    assert worker.stats["background_refresh_errors"] == 2
+    assert worker._inflight == {}
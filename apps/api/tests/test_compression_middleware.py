@@ -0,0 +1,179 @@
+import asyncio
+import gzip
+import sys
+import zlib
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest
+from starlette.datastructures import Headers
+
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, negotiate_encoding
+
+BODY = b'{"gemeinde": "Saarbr\xc3\xbccken", "events": [' + b'{"titel": "Altstadtfest"},' * 200 + b"{}]}"
+
+
+class RawRoute:
+    """ASGI-Endpoint, der vorgegebene Chunks sendet und die gesehenen Request-Header merkt"""
+
+    def __init__(self, chunks, headers=None, status=200):
+        self.chunks = chunks
+        self.headers = headers or {}
+        self.status = status
+        self.request_headers = None
+
+    async def __call__(self, scope, receive, send):
+        self.request_headers = Headers(scope=scope)
+        await send({
+            "type": "http.response.start",
+            "status": self.status,
+            "headers": [(name.lower().encode(), value.encode()) for name, value in self.headers.items()],
+        })
+        for index, chunk in enumerate(self.chunks):
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": index < len(self.chunks) - 1,
+            })
+
+
+def request(route, accept_encoding=None, **headers):
+    """Schickt einen GET durch die Middleware -> (Start-Nachricht, Body-Nachrichten)"""
+    if accept_encoding is not None:
+        headers["accept-encoding"] = accept_encoding
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(CompressionMiddleware(route, minimum_size=500)(scope, receive, send))
+    return sent[0], sent[1:]
+
+
+def decode(encoding, data):
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        return pytest.importorskip("brotli").decompress(data)
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def test_negotiation_prefers_highest_q_then_server_order():
+    supported = ["br", "zstd", "gzip"]
+    assert negotiate_encoding("gzip, zstd, br", supported) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", supported) == "gzip"
+    assert negotiate_encoding("zstd, gzip", supported) == "zstd"
+    assert negotiate_encoding("br", ["gzip"]) is None
+    assert negotiate_encoding("*", ["gzip"]) == "gzip"
+    assert negotiate_encoding("gzip;q=0, *;q=0", supported) is None
+    assert negotiate_encoding("identity", supported) is None
+    assert negotiate_encoding("", supported) is None
+
+
+@pytest.mark.parametrize("encoding", ["br", "zstd", "gzip"])
+def test_response_is_compressed_with_negotiated_encoding(encoding):
+    if encoding not in compression.available_encodings():
+        pytest.skip(f"{encoding} nicht installiert")
+    route = RawRoute([BODY], headers={
+        "Content-Type": "application/json",
+        "Content-Length": str(len(BODY)),
+        "ETag": '"abc"',
+    })
+
+    start, messages = request(route, f"{encoding}, identity;q=0.5")
+    headers = Headers(raw=start["headers"])
+    body = b"".join(message["body"] for message in messages)
+    assert headers["content-encoding"] == encoding
+    assert "content-length" not in headers
+    assert "accept-encoding" in headers["vary"].lower()
+    # Starker ETag pro Repräsentation
+    assert headers["etag"] == f'"abc-{encoding}"'
+    assert len(body) < len(BODY)
+    assert decode(encoding, body) == BODY
+
+
+def test_identity_or_missing_accept_encoding_passes_through():
+    for accept_encoding in (None, "identity"):
+        route = RawRoute([BODY], headers={"Content-Type": "application/json", "ETag": '"abc"'})
+        start, messages = request(route, accept_encoding)
+        headers = Headers(raw=start["headers"])
+        assert "content-encoding" not in headers
+        assert headers["etag"] == '"abc"'
+        assert b"".join(message["body"] for message in messages) == BODY
+
+
+def test_event_stream_is_flushed_per_chunk():
+    events = [f"data: Ereignis {index}\n\n".encode() * 60 for index in range(3)]
+    route = RawRoute(events, headers={"Content-Type": "text/event-stream"})
+
+    start, messages = request(route, "gzip")
+    assert Headers(raw=start["headers"])["content-encoding"] == "gzip"
+    assert [message["more_body"] for message in messages] == [True, True, False]
+
+    # Jeder Chunk ist für sich dekodierbar, ohne auf das Stream-Ende zu warten
+    decoder = zlib.decompressobj(31)
+    for event, message in zip(events, messages):
+        assert decoder.decompress(message["body"]) == event
+    assert decoder.flush() == b""
+
+
+def test_chunked_json_stream_is_compressed_without_buffering():
+    chunks = [BODY[:100], BODY[100:200], BODY[200:]]
+    route = RawRoute(chunks, headers={"Content-Type": "application/json"})
+
+    start, messages = request(route, "gzip")
+    body = b"".join(message["body"] for message in messages)
+    assert Headers(raw=start["headers"])["content-encoding"] == "gzip"
+    assert messages[-1]["more_body"] is False
+    assert gzip.decompress(body) == BODY
+
+
+@pytest.mark.parametrize("headers,chunks,counter", [
+    # Bereits kodiert (z.B. vorkomprimierte Datei)
+    ({"Content-Type": "application/json", "Content-Encoding": "gzip"}, [gzip.compress(BODY)], "skipped_encoded"),
+    # Komprimierter Medientyp
+    ({"Content-Type": "image/png"}, [BODY], "skipped_content_type"),
+    # Klein laut Content-Length
+    ({"Content-Type": "application/json", "Content-Length": "12"}, [b'{"value": 1}'], "skipped_small"),
+    # Klein ohne Content-Length, ein einzelner Body-Chunk
+    ({"Content-Type": "application/json"}, [b'{"value": 1}'], "skipped_small"),
+])
+def test_encoded_incompressible_and_small_responses_are_skipped(headers, chunks, counter):
+    before = compression.compression_stats[counter]
+    route = RawRoute(chunks, headers=headers)
+
+    start, messages = request(route, "gzip")
+    response_headers = Headers(raw=start["headers"])
+    assert response_headers.get("content-encoding") == headers.get("Content-Encoding")
+    assert b"".join(message["body"] for message in messages) == b"".join(chunks)
+    assert compression.compression_stats[counter] == before + 1
+
+
+def test_weak_etag_is_left_unchanged():
+    route = RawRoute([BODY], headers={"Content-Type": "application/json", "ETag": 'W/"abc"'})
+    start, _ = request(route, "gzip")
+    assert Headers(raw=start["headers"])["etag"] == 'W/"abc"'
+
+
+def test_encoded_etag_in_if_none_match_is_mapped_back():
+    route = RawRoute([], headers={"ETag": '"abc"'}, status=304)
+
+    start, _ = request(route, "gzip", if_none_match='"abc-gzip"')
+    # Response-Cache sieht den ETag der unkomprimierten Repräsentation ...
+    assert route.request_headers["if-none-match"] == '"abc"'
+    # ... der Client bekommt den ETag zurück, den er geschickt hat
+    assert start["status"] == 304
+    assert Headers(raw=start["headers"])["etag"] == '"abc-gzip"'
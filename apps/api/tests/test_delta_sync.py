@@ -0,0 +1,135 @@
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.delta_sync import DeltaEncoder, apply_patch, content_hash, json_diff
+
+
+def realtime_payload(active_users=120, temperature=18.5):
+    return {
+        "active_users": active_users,
+        "weather": {"temperature": temperature, "condition": "cloudy"},
+        "top_pages": ["/", "/chat", "/events"],
+        "regions": [{"name": "Saarbrücken", "users": 80}, {"name": "Homburg", "users": 40}],
+        "description": "x" * 500,
+    }
+
+
+def test_json_diff_roundtrip_with_nested_changes():
+    old = {"a": 1, "b": {"c": [1, 2, 3], "d": "x"}, "gone": True, "a/b": {"~": 1}}
+    new = {"a": 2, "b": {"c": [1, 5, 3], "d": "x", "e": None}, "a/b": {"~": 2}, "list": [1, 2]}
+    patch = json_diff(old, new)
+
+    assert {"op": "replace", "path": "/a", "value": 2} in patch
+    assert {"op": "replace", "path": "/b/c/1", "value": 5} in patch
+    assert {"op": "add", "path": "/b/e", "value": None} in patch
+    assert {"op": "remove", "path": "/gone"} in patch
+    assert {"op": "replace", "path": "/a~1b/~0", "value": 2} in patch
+    assert apply_patch(old, patch) == new
+    assert old["a"] == 1
+
+
+def test_list_length_change_and_type_change_replace_value():
+    assert json_diff({"l": [1, 2]}, {"l": [1, 2, 3]}) == [{"op": "replace", "path": "/l", "value": [1, 2, 3]}]
+    assert json_diff({"v": 1}, {"v": 1.0}) == [{"op": "replace", "path": "/v", "value": 1.0}]
+    assert json_diff([1], {"a": 1}) == [{"op": "replace", "path": "", "value": {"a": 1}}]
+    assert apply_patch([1], json_diff([1], {"a": 1})) == {"a": 1}
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": 2}) == content_hash({"b": 2, "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_encoder_sends_snapshot_then_versioned_deltas():
+    encoder = DeltaEncoder(epoch="e1")
+    first, is_delta = encoder.update("analytics", realtime_payload())
+    assert not is_delta
+    assert first["type"] == "analytics_update" and first["full"] and first["version"] == 1
+
+    assert encoder.update("analytics", realtime_payload()) == (None, False)
+    assert encoder.stats["unchanged"] == 1
+
+    delta, is_delta = encoder.update("analytics", realtime_payload(active_users=121))
+    assert is_delta
+    assert delta["type"] == "analytics_delta"
+    assert (delta["epoch"], delta["base_version"], delta["version"]) == ("e1", 1, 2)
+    assert delta["patch"] == [{"op": "replace", "path": "/active_users", "value": 121}]
+
+    # Client-Sicht: Snapshot + Delta ergibt den aktuellen Zustand
+    assert apply_patch(first["data"], delta["patch"]) == realtime_payload(active_users=121)
+    assert encoder.get_stats()["bandwidth_saved_percent"] > 40
+
+
+def test_caller_mutation_does_not_leak_into_snapshot():
+    encoder = DeltaEncoder()
+    payload = realtime_payload()
+    encoder.update("analytics", payload)
+    payload["active_users"] = 999
+    delta, _ = encoder.update("analytics", payload)
+    assert delta["patch"] == [{"op": "replace", "path": "/active_users", "value": 999}]
+
+
+def test_keyframes_and_large_patches_fall_back_to_snapshot():
+    encoder = DeltaEncoder(keyframe_interval=3)
+    encoder.update("analytics", realtime_payload(active_users=1))
+    _, is_delta = encoder.update("analytics", realtime_payload(active_users=2))
+    assert is_delta
+    keyframe, is_delta = encoder.update("analytics", realtime_payload(active_users=3))
+    assert not is_delta and keyframe["version"] == 3
+
+    small = DeltaEncoder()
+    small.update("traffic", {"level": 1})
+    message, is_delta = small.update("traffic", {"level": 2})
+    assert not is_delta and message["data"] == {"level": 2}
+    assert small.snapshot_message("unknown") is None
+
+
+class SharedState:
+    """Emuliert _CLAIM_VERSION_SCRIPT (ein Datentyp)"""
+
+    def __init__(self):
+        self.state = {}
+
+    def claim(self, digest, encoded, epoch):
+        if self.state.get("hash") == digest:
+            return False, self.state["version"], self.state["epoch"], None
+        previous = self.state.get("data")
+        self.state = {
+            "hash": digest,
+            "data": encoded,
+            "epoch": self.state.get("epoch", epoch),
+            "version": self.state.get("version", 0) + 1,
+        }
+        return True, self.state["version"], self.state["epoch"], previous
+
+
+def test_workers_sharing_a_counter_send_one_version_sequence():
+    shared = SharedState()
+    workers = [DeltaEncoder(epoch="w1"), DeltaEncoder(epoch="w2")]
+    sent = []
+    for step, users in enumerate([100, 100, 101, 102, 102, 103]):
+        worker = workers[step % 2]
+        prepared = worker.prepare("analytics", realtime_payload(active_users=users))
+        if prepared is None:
+            continue
+        encoded, digest = prepared
+        changed, version, epoch, previous = shared.claim(digest, encoded, "shared")
+        if not changed:
+            worker.remember("analytics", *prepared, version, epoch)
+            continue
+        message, _ = worker.commit_shared("analytics", *prepared, version, epoch, previous)
+        sent.append(message)
+
+    assert [m["version"] for m in sent] == [1, 2, 3, 4]
+    assert {m["epoch"] for m in sent} == {"shared"}
+    assert all(m["base_version"] == m["version"] - 1 for m in sent[1:])
+
+    # Client wendet alle Deltas lückenlos an, egal welcher Worker sie erzeugt hat
+    state = sent[0]["data"]
+    for message in sent[1:]:
+        state = apply_patch(state, message["patch"])
+    assert state == realtime_payload(active_users=103)
+    assert workers[1].snapshot_message("analytics")["version"] == 4
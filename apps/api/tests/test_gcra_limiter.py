@@ -0,0 +1,264 @@
+import asyncio
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.gcra_limiter import RateLimitPolicy, RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """Führt das GCRA-Skript nicht aus, sondern liefert vorgegebene Antworten"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def evalsha(self, sha, numkeys, key, *args):
+        self.calls.append((key, args))
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    async def eval(self, script, numkeys, key, *args):
+        return await self.evalsha(None, numkeys, key, *args)
+
+    async def close(self):
+        pass
+
+
+def factory_for(conn):
+    async def factory():
+        return conn
+    return factory
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_policy_parse():
+    policy = RateLimitPolicy.parse("30/minute")
+    assert policy.limit == 30
+    assert policy.period == 60
+    assert policy.interval_ms == 2000
+    assert RateLimitPolicy.parse("3/second").tolerance_ms == 1002
+    assert RateLimitPolicy.parse("5 / seconds").period == 1
+    with pytest.raises(ValueError):
+        RateLimitPolicy.parse("5/fortnight")
+
+
+def test_local_gcra_allows_burst_then_rejects_until_interval():
+    clock = FakeClock()
+    limiter = RateLimiter(mode="local", clock=clock)
+    policy = RateLimitPolicy.parse("3/second")
+
+    decisions = [run(limiter.hit("ip", policy)) for _ in range(3)]
+    assert all(d.allowed for d in decisions)
+    assert [d.remaining for d in decisions] == [2, 1, 0]
+
+    rejected = run(limiter.hit("ip", policy))
+    assert not rejected.allowed
+    assert rejected.headers()["Retry-After"] == "1"
+    assert rejected.retry_after == 0.334
+
+    clock.now += 0.334
+    assert run(limiter.hit("ip", policy)).allowed
+    assert not run(limiter.hit("ip", policy)).allowed
+    assert limiter.stats["rejected"] == 2
+
+
+def test_keys_are_independent():
+    limiter = RateLimiter(mode="local", clock=FakeClock())
+    policy = RateLimitPolicy.parse("1/minute")
+    assert run(limiter.hit("a", policy)).allowed
+    assert run(limiter.hit("b", policy)).allowed
+    assert not run(limiter.hit("a", policy)).allowed
+
+
+def test_redis_mode_one_round_trip_per_request():
+    conn = FakeRedis([[1, 0, 99], [0, 1500, 0]])
+    limiter = RateLimiter(factory_for(conn), mode="redis")
+    policy = RateLimitPolicy.parse("100/minute")
+
+    allowed = run(limiter.hit("ip:api", policy))
+    assert allowed.allowed and allowed.remaining == 99 and allowed.source == "redis"
+    rejected = run(limiter.hit("ip:api", policy))
+    assert not rejected.allowed
+    assert rejected.retry_after == 1.5
+
+    assert conn.calls[0] == ("rl:ip:api", (600, 60000, 1, 0))
+    stats = limiter.get_stats()
+    assert stats["redis_calls"] == 2
+    assert stats["redis_round_trips_per_request"] == 1
+    assert stats["redis_rtt_ms"]["count"] == 2
+
+
+def test_hybrid_serves_leased_tokens_locally():
+    clock = FakeClock()
+    conn = FakeRedis([[1, 0, 99], [5, 0, 94], [5, 0, 89]])
+    limiter = RateLimiter(factory_for(conn), mode="hybrid", lease_size=10, lease_ttl=1.0, clock=clock)
+    policy = RateLimitPolicy.parse("100/minute")
+
+    decisions = [run(limiter.hit("ip", policy)) for _ in range(6)]
+    assert all(d.allowed for d in decisions)
+    assert [d.source for d in decisions] == ["redis", "redis", "lease", "lease", "lease", "lease"]
+    # Kalter Key: nur ein Token; zweiter Hit innerhalb lease_ttl least 1/20 des Limits
+    assert [call[1][2] for call in conn.calls] == [1, 5]
+
+    assert run(limiter.hit("ip", policy)).source == "redis"
+    assert limiter.get_stats()["redis_round_trips_per_request"] == pytest.approx(3 / 7)
+
+
+def test_hybrid_lease_expires_and_refunds_unused_tokens():
+    clock = FakeClock()
+    conn = FakeRedis([[1, 0, 99], [5, 0, 94], [1, 0, 97]])
+    limiter = RateLimiter(factory_for(conn), mode="hybrid", lease_ttl=1.0, clock=clock)
+    policy = RateLimitPolicy.parse("100/minute")
+
+    run(limiter.hit("ip", policy))
+    run(limiter.hit("ip", policy))
+    run(limiter.hit("ip", policy))
+    clock.now += 2
+    assert run(limiter.hit("ip", policy)).source == "redis"
+    # 4 Lease-Tokens, davon 1 genutzt -> 3 zurück; Key ist wieder kalt
+    assert conn.calls[2][1] == (600, 60000, 1, 3)
+    assert limiter.stats["lease_tokens_refunded"] == 3
+
+
+def test_refund_survives_redis_error():
+    clock = FakeClock()
+    conn = FakeRedis([[1, 0, 99], [5, 0, 94], ConnectionError("down"), [1, 0, 97]])
+    limiter = RateLimiter(factory_for(conn), mode="hybrid", lease_ttl=1.0, clock=clock)
+    policy = RateLimitPolicy.parse("100/minute")
+
+    run(limiter.hit("ip", policy))
+    run(limiter.hit("ip", policy))
+    clock.now += 2
+    assert run(limiter.hit("ip", policy)).source == "local"
+    assert limiter.stats["lease_tokens_refunded"] == 0
+
+    # Abgelaufener Lease wird nicht lokal ausgegeben, sondern beim nächsten Aufruf erstattet
+    assert run(limiter.hit("ip", policy)).source == "redis"
+    assert [call[1][3] for call in conn.calls] == [0, 0, 4, 4]
+    assert limiter.stats["lease_tokens_refunded"] == 4
+
+
+class GcraRedis:
+    """Führt die GCRA-Logik des Lua-Skripts mit einer Fake-Uhr aus"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.tat = {}
+        self.calls = 0
+
+    async def evalsha(self, sha, numkeys, key, interval, tolerance, requested, refund=0):
+        self.calls += 1
+        now = math.floor(self.clock() * 1000)
+        tat = self.tat.get(key)
+        if tat is not None and refund > 0:
+            tat -= refund * interval
+        if tat is None or tat < now:
+            tat = now
+        available = (now + tolerance - tat) // interval
+        if available < 1:
+            return [0, math.ceil(tat - tolerance + interval - now), 0]
+        granted = min(requested, available)
+        self.tat[key] = tat + granted * interval
+        return [granted, 0, available - granted]
+
+    async def close(self):
+        pass
+
+
+def test_hybrid_client_with_gaps_gets_full_limit():
+    clock = FakeClock()
+    conn = GcraRedis(clock)
+    workers = [
+        RateLimiter(factory_for(conn), mode="hybrid", lease_ttl=1.0, clock=clock) for _ in range(2)
+    ]
+    policy = RateLimitPolicy.parse("100/minute")
+
+    # Paare im Abstand von 0.3s, dazwischen 1.5s Pause: 100 Requests pro Minute,
+    # Round-Robin über zwei Worker
+    allowed = 0
+    for i in range(50):
+        for j in range(2):
+            worker = workers[(2 * i + j) % 2] if i % 2 else workers[0]
+            allowed += run(worker.hit("ip", policy)).allowed
+            clock.now += 0.3
+        clock.now += 0.9
+    assert allowed == 100
+
+    # Ein Request pro 1.2s über mehrere Minuten: nie abgelehnt, Budget bleibt voll
+    for _ in range(200):
+        decision = run(workers[0].hit("slow", policy))
+        assert decision.allowed
+        clock.now += 1.2
+    assert decision.remaining >= 98
+
+
+def test_small_limits_are_not_leased():
+    conn = FakeRedis([[1, 0, 4]])
+    limiter = RateLimiter(factory_for(conn), mode="hybrid")
+    run(limiter.hit("ip", RateLimitPolicy.parse("5/minute")))
+    assert conn.calls[0][1][2] == 1
+
+
+def test_falls_back_to_local_on_redis_error_and_without_connection():
+    conn = FakeRedis([ConnectionError("down")])
+    limiter = RateLimiter(factory_for(conn), mode="redis", clock=FakeClock())
+    policy = RateLimitPolicy.parse("1/minute")
+
+    first = run(limiter.hit("ip", policy))
+    assert first.allowed and first.source == "local"
+    assert limiter.stats["redis_errors"] == 1
+
+    async def no_connection():
+        return None
+
+    limiter._connection_factory = no_connection
+    assert not run(limiter.hit("ip", policy)).allowed
+    assert limiter.stats["local_fallbacks"] == 2
+
+
+def test_noscript_falls_back_to_eval():
+    class NoScriptRedis(FakeRedis):
+        async def evalsha(self, sha, numkeys, key, *args):
+            raise Exception("NOSCRIPT No matching script")
+
+        async def eval(self, script, numkeys, key, *args):
+            return await FakeRedis.evalsha(self, None, numkeys, key, *args)
+
+    conn = NoScriptRedis([[1, 0, 9]])
+    limiter = RateLimiter(factory_for(conn), mode="redis")
+    assert run(limiter.hit("ip", RateLimitPolicy.parse("10/minute"))).allowed
+    assert len(conn.calls) == 1
+
+
+def test_limit_decorator_and_categories():
+    limiter = RateLimiter(mode="local")
+
+    @limiter.limit("30/minute")
+    async def endpoint():
+        return None
+
+    assert endpoint.__rate_limit__.limit == 30
+    assert limiter.category_for("/api/auth/login") == "auth"
+    assert limiter.category_for("/api/v1/chat/stream") == "chat"
+    assert limiter.category_for("/api/v1/realtime/data") == "realtime"
+    assert limiter.category_for("/api/health") == "api"
+    assert limiter.category_for("/") == "default"
@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.l1_cache import L1Cache, MISSING
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_by_bytes():
+    l1 = L1Cache(max_bytes=1300, max_entry_bytes=1300)
+    for i in range(5):
+        l1.set(f"k{i}", b"x" * 100)
+    # k0 anfassen, damit k1 der älteste Eintrag ist
+    assert l1.get("k0") == b"x" * 100
+    for i in range(5, 8):
+        l1.set(f"k{i}", b"x" * 100)
+
+    assert l1.current_bytes <= 1300
+    assert "k0" in l1
+    assert "k1" not in l1
+    assert l1.stats["evictions"] > 0
+
+
+def test_per_entry_ttl():
+    clock = FakeClock()
+    l1 = L1Cache(max_bytes=10_000, clock=clock)
+    l1.set("short", "a", ttl=60)
+    l1.set("long", "b", ttl=3600)
+    l1.set("forever", "c")
+
+    clock.now = 61
+    assert l1.get("short") is MISSING
+    assert l1.get("long") == "b"
+    assert l1.get("forever") == "c"
+    assert l1.stats["expirations"] == 1
+
+
+def test_overwrite_and_delete_keep_byte_accounting():
+    clock = FakeClock()
+    l1 = L1Cache(max_bytes=10_000, clock=clock)
+    l1.set("k", b"x" * 500, ttl=10)
+    l1.set("k", b"x" * 100, ttl=100)
+    clock.now = 50
+    # Veralteter Heap-Eintrag des ersten set() darf den neuen Wert nicht löschen
+    assert l1.purge_expired() == 0
+    assert l1.get("k") == b"x" * 100
+
+    l1.delete("k")
+    assert l1.current_bytes == 0
+    assert len(l1) == 0
+
+
+def test_oversize_entry_rejected():
+    l1 = L1Cache(max_bytes=800)
+    assert not l1.set("big", b"x" * 500)
+    assert l1.get("big") is MISSING
+    assert l1.stats["rejected_oversize"] == 1
+
+
+def test_tag_index_invalidation():
+    l1 = L1Cache(max_bytes=10_000)
+    l1.set("a", 1, tags=["analytics"])
+    l1.set("b", 2, tags=["analytics", "region:saarbruecken"])
+    l1.set("c", 3)
+
+    assert l1.invalidate_tag("analytics") == 2
+    assert "a" not in l1 and "b" not in l1 and "c" in l1
+    # Reverse-Index wird beim Entfernen mit aufgeräumt
+    assert l1.invalidate_tag("region:saarbruecken") == 0
+    assert l1.get_stats()["tags"] == 0
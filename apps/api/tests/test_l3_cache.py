@@ -0,0 +1,256 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import Column, Float, LargeBinary, String, func, select
+from sqlalchemy.orm import declarative_base
+
+from app.core.cache import MultiLayerCache
+from app.core.cache_codecs import CacheSerializer
+from app.core.l1_cache import MISSING
+from app.core.l3_cache import L3ResultCache
+
+Base = declarative_base()
+
+
+class CacheRow(Base):
+    """Wie app.models.cache_result.CacheResult, aber ohne die App-Datenbank"""
+
+    __tablename__ = "cache_results_test"
+
+    key = Column(String(512), primary_key=True)
+    value = Column(LargeBinary, nullable=False)
+    tags = Column(String, nullable=True)
+    expires_at = Column(Float, nullable=False, index=True)
+    updated_at = Column(Float, nullable=False)
+
+
+def make_l3(tmp_path, **kwargs):
+    # Writer-Task praktisch inaktiv: Tests flushen explizit
+    kwargs.setdefault("flush_interval", 3600)
+    return L3ResultCache(
+        CacheSerializer(),
+        database_url=f"sqlite+aiosqlite:///{tmp_path / 'l3.db'}",
+        model_cls=CacheRow,
+        **kwargs,
+    )
+
+
+async def stored_keys(l3):
+    async with l3.session_maker() as session:
+        rows = (await session.execute(select(CacheRow.key))).all()
+    return sorted(row.key for row in rows)
+
+
+def test_put_is_write_behind_and_pending_values_are_readable(tmp_path):
+    async def scenario():
+        l3 = make_l3(tmp_path)
+        await l3.start()
+        l3.put("ai:1", {"answer": "Saarbrücken"}, ttl=60, tags=["ai"])
+
+        before_flush = await stored_keys(l3)
+        value, remaining = await l3.get("ai:1")
+        await l3.flush()
+        after_flush = await stored_keys(l3)
+        flushed_value, _ = await l3.get("ai:1")
+        await l3.stop()
+        return before_flush, value, remaining, after_flush, flushed_value, l3.stats
+
+    before_flush, value, remaining, after_flush, flushed_value, stats = asyncio.run(scenario())
+    assert before_flush == []
+    assert value == {"answer": "Saarbrücken"}
+    assert 0 < remaining <= 60
+    assert after_flush == ["ai:1"]
+    assert flushed_value == value
+    assert stats["flushed_rows"] == 1
+
+
+def test_invalidations_skip_database_while_unused(tmp_path):
+    async def scenario():
+        l3 = make_l3(tmp_path)
+        await l3.start()
+        executed = []
+        original = l3._execute
+
+        async def counting_execute(stmt):
+            executed.append(stmt)
+            return await original(stmt)
+
+        l3._execute = counting_execute
+        await l3.delete("cache:a")
+        await l3.invalidate_tag("analytics")
+        await l3.clear_pattern("weather")
+        await l3.flush()
+        await l3.stop()
+        return executed, l3.get_stats()
+
+    executed, stats = asyncio.run(scenario())
+    assert executed == []
+    assert stats["in_use"] is False
+    assert stats["skipped_deletes"] == 3
+    assert stats["pending_deletes"] == 0
+
+
+def test_existing_rows_mark_cache_in_use_on_start(tmp_path):
+    async def scenario():
+        first = make_l3(tmp_path)
+        await first.start()
+        first.put("ai:1", "x", ttl=60)
+        await first.stop()
+
+        second = make_l3(tmp_path)
+        await second.start()
+        in_use = second.in_use
+        await second.delete("ai:1")
+        await second.flush()
+        remaining = await stored_keys(second)
+        await second.stop()
+        return in_use, remaining
+
+    in_use, remaining = asyncio.run(scenario())
+    assert in_use is True
+    assert remaining == []
+
+
+def test_deletes_are_queued_and_hidden_until_flushed(tmp_path):
+    async def scenario():
+        l3 = make_l3(tmp_path)
+        await l3.start()
+        l3.put("cache:weather:1", "sonnig", ttl=60)
+        l3.put("cache:traffic:1", "frei", ttl=60, tags=["traffic"])
+        l3.put("cache:news:1", "neu", ttl=60)
+        await l3.flush()
+
+        await l3.clear_pattern("weather")
+        await l3.invalidate_tag("traffic")
+        await l3.delete("cache:news:1")
+        rows_before = await stored_keys(l3)
+        reads = [await l3.get(key) for key in ("cache:weather:1", "cache:traffic:1", "cache:news:1")]
+
+        await l3.flush()
+        rows_after = await stored_keys(l3)
+        await l3.stop()
+        return rows_before, reads, rows_after, l3.stats
+
+    rows_before, reads, rows_after, stats = asyncio.run(scenario())
+    assert len(rows_before) == 3
+    assert all(value is MISSING for value, _ in reads)
+    assert rows_after == []
+    assert stats["queued_deletes"] == 3
+
+
+def test_put_after_queued_invalidation_survives_flush(tmp_path):
+    async def scenario():
+        l3 = make_l3(tmp_path)
+        await l3.start()
+        l3.put("cache:a", "alt", ttl=60, tags=["analytics"])
+        await l3.flush()
+
+        await l3.invalidate_tag("analytics")
+        await l3.delete("cache:a")
+        l3.put("cache:a", "neu", ttl=60, tags=["analytics"])
+        await l3.flush()
+        value, _ = await l3.get("cache:a")
+        await l3.stop()
+        return value
+
+    assert asyncio.run(scenario()) == "neu"
+
+
+def test_sweep_removes_only_expired_rows(tmp_path):
+    async def scenario():
+        l3 = make_l3(tmp_path)
+        await l3.start()
+        l3.put("cache:old", "x", ttl=60)
+        l3.put("cache:new", "y", ttl=60)
+        # Abgelaufenen Eintrag direkt im Puffer zurückdatieren
+        payload, tags, _ = l3._pending["cache:old"]
+        l3._pending["cache:old"] = (payload, tags, time.time() - 1)
+        await l3.flush()
+
+        expired_read, _ = await l3.get("cache:old")
+        removed = await l3.sweep_expired()
+        async with l3.session_maker() as session:
+            count = (await session.execute(select(func.count()).select_from(CacheRow))).scalar()
+        await l3.stop()
+        return expired_read, removed, count, l3.stats["swept_rows"]
+
+    expired_read, removed, count, swept = asyncio.run(scenario())
+    assert expired_read is MISSING
+    assert removed == 1
+    assert count == 1
+    assert swept == 1
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def get(self, key):
+        self.ops.append(self.redis.data.get(key))
+
+    def pttl(self, key):
+        self.ops.append(-2 if key not in self.redis.data else 60000)
+
+    def smembers(self, key):
+        self.ops.append(set())
+
+    async def execute(self):
+        return self.ops
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.setex_calls = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def setex(self, key, ttl, value):
+        self.setex_calls.append((key, ttl))
+        self.data[key] = value
+
+    async def close(self):
+        pass
+
+
+def test_l3_hit_is_promoted_to_l1_and_l2(tmp_path):
+    redis = FakeRedis()
+
+    async def connection():
+        return redis
+
+    async def scenario():
+        cache = MultiLayerCache()
+        cache.get_redis_connection = connection
+        cache.l3 = L3ResultCache(
+            cache.serializer,
+            database_url=f"sqlite+aiosqlite:///{tmp_path / 'l3.db'}",
+            flush_interval=3600,
+            model_cls=CacheRow,
+        )
+        await cache.l3.start()
+        cache.l3.put("cache:ai:1", {"answer": "Völklingen"}, ttl=120)
+        await cache.l3.flush()
+
+        without_opt_in = await cache.get("cache:ai:1")
+        promoted = await cache.get("cache:ai:1", layer_config={"l3": True})
+        from_l1 = await cache.get("cache:ai:1")
+        await cache.l3.stop()
+        return cache, without_opt_in, promoted, from_l1
+
+    cache, without_opt_in, promoted, from_l1 = asyncio.run(scenario())
+    assert without_opt_in is None
+    assert promoted == {"answer": "Völklingen"}
+    assert from_l1 == promoted
+    assert cache.stats["l3_hits"] == 1
+    assert cache.stats["l1_hits"] == 1
+    key, ttl = redis.setex_calls[0]
+    assert key == "cache:ai:1"
+    assert 110 <= ttl <= 120
@@ -0,0 +1,63 @@
+import random
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.latency_sketch import LatencySketch, WindowedSketches, merge_all
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(42)
+    values = [rng.lognormvariate(3, 1) for _ in range(20000)]
+    sketch = LatencySketch()
+    for value in values:
+        sketch.add(value)
+
+    ordered = sorted(values)
+    result = sketch.quantiles()
+    for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999)):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(result[name] - exact) / exact < 0.03
+    assert sketch.quantile(0.99) == result["p99"]
+
+
+def test_merge_matches_single_sketch_and_roundtrips():
+    combined = LatencySketch()
+    workers = [LatencySketch() for _ in range(3)]
+    for i in range(3000):
+        value = (i % 500) + 0.5
+        combined.add(value)
+        workers[i % 3].add(value)
+
+    restored = [LatencySketch.from_dict(w.to_dict()) for w in workers]
+    merged = merge_all(restored)
+    assert merged.count == combined.count
+    assert merged.buckets == combined.buckets
+    assert merged.quantiles() == combined.quantiles()
+
+
+def test_rolling_windows_and_drain():
+    clock = FakeClock()
+    sketches = WindowedSketches(slot_seconds=10, retention_seconds=3600, clock=clock)
+    labels = ("GET", "/api/items/{id}", "200")
+
+    sketches.record(labels, 100.0)
+    clock.now += 120
+    sketches.record(labels, 5.0)
+
+    assert sketches.window(60)[labels].count == 1
+    assert sketches.window(300)[labels].count == 2
+
+    closed = sketches.drain_closed()
+    assert [slot[labels].count for _, slot in closed] == [1]
+    assert sketches.drain_closed() == []
@@ -0,0 +1,78 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.loop_monitor import LoopLagMonitor
+
+
+def blocking_handler():
+    time.sleep(0.25)
+
+
+def test_blocking_call_is_captured_with_stack_and_route():
+    async def request():
+        monitor.tag_current_task("/api/v1/blocking")
+        await asyncio.sleep(0.03)
+        blocking_handler()
+
+    async def scenario():
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        await asyncio.create_task(request())
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    asyncio.run(scenario())
+
+    assert monitor.stats["slow_callbacks"] == 1
+    event = monitor.events[0]
+    assert event["duration_ms"] >= 150
+    assert event["route"] == "/api/v1/blocking"
+    assert event["site"].endswith("in blocking_handler")
+    assert any("in request" in frame for frame in event["stack"])
+    assert monitor.by_route["/api/v1/blocking"] == 1
+    assert monitor.top_sites()[0]["count"] == 1
+
+
+def test_lag_below_threshold_only_feeds_histogram():
+    monitor = LoopLagMonitor(threshold=0.1)
+    for lag in (0.001, 0.002, 0.05):
+        monitor.record_lag(lag)
+
+    stats = monitor.get_stats()
+    assert stats["samples"] == 3
+    assert stats["slow_callbacks"] == 0
+    assert stats["max_lag_ms"] == 50.0
+    assert stats["lag"]["count"] == 3
+
+
+def test_slow_event_without_capture_is_still_counted():
+    monitor = LoopLagMonitor(threshold=0.1)
+    monitor.record_lag(0.2)
+
+    assert monitor.stats["slow_callbacks"] == 1
+    assert monitor.events[0]["route"] == "unknown"
+    assert monitor.events[0]["stack"] is None
+    assert monitor.top_sites() == []
+
+
+def test_stop_ends_sampling_and_watchdog():
+    async def scenario():
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        samples = monitor.stats["samples"]
+        await asyncio.sleep(0.03)
+        return samples
+
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    samples = asyncio.run(scenario())
+    assert samples >= 2
+    assert monitor.stats["samples"] == samples
+    assert monitor._watchdog is None
+    assert not monitor.get_stats()["running"]
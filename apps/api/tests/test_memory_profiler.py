@@ -0,0 +1,90 @@
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.memory_profiler import MemoryProfiler, current_rss
+
+
+class FakeRss:
+    def __init__(self, value=100 * 1024 * 1024):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+
+def allocate_blocks():
+    return [bytearray(10_000) for _ in range(50)]
+
+
+def test_sampled_request_records_allocation_sites_per_route():
+    profiler = MemoryProfiler(sample_rate=1.0, rss_reader=FakeRss())
+    assert profiler.should_sample()
+
+    sample = profiler.begin_sample()
+    assert tracemalloc.is_tracing()
+    kept = allocate_blocks()
+    profiler.end_sample(sample, "/api/v1/realtime/data")
+    assert not tracemalloc.is_tracing()
+
+    top = profiler.top_allocations("/api/v1/realtime/data")["/api/v1/realtime/data"]
+    assert top[0]["site"].endswith("test_memory_profiler.py:" + str(allocate_blocks.__code__.co_firstlineno + 1))
+    assert top[0]["avg_bytes"] >= 500_000
+    assert profiler.stats["sampled_requests"] == 1
+    del kept
+
+
+def test_only_one_request_sampled_at_a_time():
+    profiler = MemoryProfiler(sample_rate=1.0, rss_reader=FakeRss())
+    first = profiler.begin_sample()
+    assert profiler.begin_sample() is None
+    assert profiler.stats["skipped_samples"] == 1
+    profiler.end_sample(first, "/a")
+    assert profiler.begin_sample() is not None
+    tracemalloc.stop()
+
+
+def test_sample_rate_zero_never_samples():
+    profiler = MemoryProfiler(sample_rate=0.0, rss_reader=FakeRss())
+    assert not any(profiler.should_sample() for _ in range(100))
+
+
+def test_gen2_pauses_recorded_via_gc_callbacks():
+    profiler = MemoryProfiler(rss_reader=FakeRss())
+    gc.callbacks.append(profiler._gc_callback)
+    try:
+        gc.collect(0)
+        gc.collect()
+    finally:
+        gc.callbacks.remove(profiler._gc_callback)
+
+    assert profiler.stats["gen2_collections"] == 1
+    pauses = profiler.get_stats()["gc"]["gen2_pauses"]
+    assert pauses["count"] == 1
+    assert pauses["last_ms"] > 0
+
+
+def test_tick_collects_on_rss_growth_and_schedule():
+    rss = FakeRss()
+    profiler = MemoryProfiler(rss_reader=rss, gc_interval=0, gc_rss_growth=50 * 1024 * 1024)
+    profiler._rss_at_collect = rss.value
+
+    profiler.tick()
+    assert profiler.stats["threshold_collections"] == 0
+    rss.value += 60 * 1024 * 1024
+    profiler.tick()
+    assert profiler.stats["threshold_collections"] == 1
+    assert [mb for _, mb in profiler.get_stats()["rss_history_mb"]] == [100.0, 160.0]
+
+    profiler.gc_interval = 1
+    profiler._last_full_collect -= 2
+    profiler.tick()
+    assert profiler.stats["scheduled_collections"] == 1
+
+
+def test_current_rss_reads_process_memory():
+    assert current_rss() > 0
@@ -0,0 +1,139 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from app.core.metrics import MetricsRegistry, merge_snapshots, render_openmetrics
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def set(self, key, value, ex=None):
+        self.ops.append(lambda: self.redis.data.__setitem__(key, value))
+
+    def sadd(self, key, *members):
+        self.ops.append(lambda: self.redis.sets.setdefault(key, set()).update(members))
+
+    async def execute(self):
+        for op in self.ops:
+            op()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.sets = {}
+        self.closed = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def smembers(self, key):
+        return {member.encode() for member in self.sets.get(key, set())}
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(members)
+
+    async def close(self):
+        self.closed += 1
+
+
+def factory_for(redis):
+    async def factory():
+        return redis
+    return factory
+
+
+def test_counter_gauge_histogram_render_openmetrics():
+    registry = MetricsRegistry()
+    requests = registry.counter("app_requests_total", "Requests", ("route",))
+    requests.labels("/a").inc()
+    requests.labels(route="/a").inc(2)
+    registry.gauge("app_connections", "Verbindungen", mode="sum").set(7)
+    latency = registry.histogram("app_latency_seconds", "Latenz", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# HELP app_requests Requests\n# TYPE app_requests counter\n" in text
+    assert 'app_requests_total{route="/a"} 3' in text
+    assert "app_connections 7" in text
+    assert 'app_latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'app_latency_seconds_bucket{le="1.0"} 3' in text
+    assert 'app_latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "app_latency_seconds_count 4" in text
+    assert "app_latency_seconds_sum 3.65" in text
+    assert text.endswith("# EOF\n")
+
+
+def test_duplicate_registration_returns_existing_or_raises():
+    registry = MetricsRegistry()
+    first = registry.counter("dup_total", "x", ("a",))
+    assert registry.counter("dup_total", "x", ("a",)) is first
+    with pytest.raises(ValueError):
+        registry.gauge("dup_total", "x")
+    with pytest.raises(ValueError):
+        first.labels("a", "b")
+
+
+def test_stats_collector_reads_dict_at_scrape_time():
+    registry = MetricsRegistry()
+    stats = {"hits": 1, "connections": 3, "enabled": True, "name": "x"}
+    registry.register_stats("svc", lambda: stats, "Service", gauges={"connections": "sum"})
+    stats["hits"] = 5
+
+    families = registry.collect()
+    assert families["svc_hits"]["type"] == "counter"
+    assert families["svc_hits"]["samples"] == [[[], 5]]
+    assert families["svc_connections"]["type"] == "gauge"
+    assert "svc_enabled" not in families and "svc_name" not in families
+
+
+def test_merge_snapshots_aggregates_by_type_and_mode():
+    def snapshot(count, gauge, buckets):
+        return {
+            "c": {"type": "counter", "help": "", "labels": [], "samples": [[[], count]]},
+            "g_sum": {"type": "gauge", "help": "", "labels": [], "mode": "sum", "samples": [[[], gauge]]},
+            "g_max": {"type": "gauge", "help": "", "labels": [], "mode": "max", "samples": [[[], gauge]]},
+            "g_all": {"type": "gauge", "help": "", "labels": [], "mode": "all", "samples": [[[], gauge]]},
+            "h": {"type": "histogram", "help": "", "labels": [], "buckets": [1.0],
+                  "samples": [[[], [buckets, float(sum(buckets))]]]},
+        }
+
+    merged = merge_snapshots([("w1", snapshot(2, 4, [1, 0])), ("w2", snapshot(3, 9, [2, 1]))])
+    assert merged["c"]["samples"] == [[[], 5]]
+    assert merged["g_sum"]["samples"] == [[[], 13]]
+    assert merged["g_max"]["samples"] == [[[], 9]]
+    assert merged["g_all"]["labels"] == ["worker"]
+    assert merged["g_all"]["samples"] == [[["w1"], 4], [["w2"], 9]]
+    assert merged["h"]["samples"] == [[[], [[3, 1], 4.0]]]
+    assert 'g_all{worker="w2"} 9' in render_openmetrics(merged)
+
+
+def test_fleet_render_includes_published_peers_and_prunes_expired():
+    redis = FakeRedis()
+    worker_a, worker_b = MetricsRegistry(), MetricsRegistry()
+    for registry in (worker_a, worker_b):
+        registry._connection_factory = factory_for(redis)
+        registry.counter("jobs_total", "Jobs").inc(2)
+
+    async def scenario():
+        await worker_b.publish()
+        redis.sets["metrics:workers"].add("gone")
+        return await worker_a.render_fleet()
+
+    text = asyncio.run(scenario())
+    assert "jobs_total 4" in text
+    assert redis.sets["metrics:workers"] == {worker_b.worker_id}
+    assert worker_b.stats["publishes"] == 1
+    assert redis.closed == 2
@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.core.gcra_limiter import RateLimiter
+from app.middleware import performance
+from app.middleware.performance import PerformanceMiddleware, ResponseCachePolicy
+
+ORIGIN = "https://agentland.saarland"
+
+
+class FakeCache:
+    def __init__(self):
+        self.data = {}
+        self.stored = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ttl=None, tags=None):
+        self.data[key] = value
+        self.stored.append((key, ttl, tags))
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    fake = FakeCache()
+    monkeypatch.setattr(performance, "cache", fake)
+    monkeypatch.setattr(performance, "limiter", RateLimiter(mode="local"))
+    return fake
+
+
+class CountingRoute:
+    """Endpoint mit Aufrufzähler und frei wählbaren Response-Headern"""
+
+    def __init__(self, body=b'{"value": 1}', headers=None):
+        self.body = body
+        self.headers = headers or {}
+        self.calls = 0
+
+    async def handle(self, request):
+        self.calls += 1
+        return Response(self.body, media_type="application/json", headers=self.headers)
+
+
+def build_app(routes, policies, **kwargs):
+    """Reihenfolge wie in app.main: PerformanceMiddleware innerhalb von CORS"""
+    app = Starlette(routes=[Route(path, endpoint.handle) for path, endpoint in routes.items()])
+    app.add_middleware(PerformanceMiddleware, policies=policies, admission=None, **kwargs)
+    app.add_middleware(CORSMiddleware, allow_origins=[ORIGIN], allow_credentials=True)
+    return app
+
+
+def client_for(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_origin_request_after_cached_entry_gets_cors_headers(fake_cache):
+    route = CountingRoute()
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60)})
+
+    async def scenario():
+        async with client_for(app) as client:
+            plain = await client.get("/data")
+            browser = await client.get("/data", headers={"Origin": ORIGIN})
+            other = await client.get("/data", headers={"Origin": "https://evil.example"})
+        return plain, browser, other
+
+    plain, browser, other = asyncio.run(scenario())
+    assert plain.headers["x-cache-status"] == "MISS"
+    assert "access-control-allow-origin" not in plain.headers
+
+    assert browser.headers["x-cache-status"] == "HIT"
+    assert browser.headers["access-control-allow-origin"] == ORIGIN
+    assert "origin" in browser.headers["vary"].lower()
+    assert browser.content == plain.content
+
+    assert other.headers["x-cache-status"] == "HIT"
+    assert "access-control-allow-origin" not in other.headers
+    assert route.calls == 1
+    assert len(fake_cache.stored) == 1
+
+
+def test_vary_outside_policy_is_not_stored(fake_cache):
+    route = CountingRoute(headers={"Vary": "Accept-Language"})
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60)})
+
+    async def scenario():
+        async with client_for(app) as client:
+            return [await client.get("/data", headers={"Accept-Language": lang}) for lang in ("de", "fr")]
+
+    first, second = asyncio.run(scenario())
+    assert first.headers["x-cache-status"] == "BYPASS"
+    assert second.headers["x-cache-status"] == "BYPASS"
+    assert route.calls == 2
+    assert fake_cache.stored == []
+
+
+def test_vary_listed_in_policy_partitions_cache_key(fake_cache):
+    route = CountingRoute(headers={"Vary": "Accept-Language"})
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60, vary=("Accept-Language",))})
+
+    async def scenario():
+        async with client_for(app) as client:
+            return [
+                await client.get("/data", headers={"Accept-Language": lang})
+                for lang in ("de", "fr", "de")
+            ]
+
+    de, fr, de_again = asyncio.run(scenario())
+    assert [r.headers["x-cache-status"] for r in (de, fr, de_again)] == ["MISS", "MISS", "HIT"]
+    assert route.calls == 2
+    assert len({key for key, _, _ in fake_cache.stored}) == 2
+
+
+def test_response_cache_control_decides_storability_and_ttl(fake_cache):
+    routes = {
+        "/private": CountingRoute(headers={"Cache-Control": "private, max-age=60"}),
+        "/no-store": CountingRoute(headers={"Cache-Control": "no-store"}),
+        "/cookie": CountingRoute(headers={"Set-Cookie": "session=1"}),
+        "/short": CountingRoute(headers={"Cache-Control": "public, max-age=5"}),
+        "/shared": CountingRoute(headers={"Cache-Control": "public, max-age=60, s-maxage=7"}),
+    }
+    app = build_app(routes, {path: ResponseCachePolicy(300) for path in routes})
+
+    async def scenario():
+        async with client_for(app) as client:
+            return {path: await client.get(path) for path in routes}
+
+    responses = asyncio.run(scenario())
+    for path in ("/private", "/no-store", "/cookie"):
+        assert responses[path].headers["x-cache-status"] == "BYPASS"
+    assert [ttl for _, ttl, _ in fake_cache.stored] == [5, 7]
+    assert PerformanceMiddleware.current.stats["uncacheable_responses"] == 3
+
+
+def test_route_policy_sets_ttl_tag_and_default_cache_control(fake_cache):
+    route = CountingRoute()
+    app = build_app({"/items/{item_id}": route}, {"/items/{item_id}": ResponseCachePolicy(120)})
+
+    async def scenario():
+        async with client_for(app) as client:
+            return await client.get("/items/7"), await client.get("/items/7?")
+
+    miss, hit = asyncio.run(scenario())
+    assert miss.headers["cache-control"] == "public, max-age=120"
+    assert hit.headers["x-cache-status"] == "HIT"
+    assert "age" in hit.headers
+    (_, ttl, tags), = fake_cache.stored
+    assert ttl == 120
+    assert tags == ["route:/items/{item_id}"]
+
+
+def test_strong_etag_and_304_without_calling_route(fake_cache, monkeypatch):
+    body = b'{"value": 42}'
+    recorded = []
+    original = PerformanceMiddleware._record_metrics
+
+    def record_metrics(self, scope, response_time, from_cache, status):
+        recorded.append((from_cache, status))
+        original(self, scope, response_time, from_cache, status)
+
+    monkeypatch.setattr(PerformanceMiddleware, "_record_metrics", record_metrics)
+    route = CountingRoute(body=body)
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60)})
+
+    async def scenario():
+        async with client_for(app) as client:
+            first = await client.get("/data")
+            etag = first.headers["etag"]
+            revalidated = await client.get("/data", headers={"If-None-Match": etag})
+            weak = await client.get("/data", headers={"If-None-Match": f'"other", W/{etag}'})
+            changed = await client.get("/data", headers={"If-None-Match": '"other"'})
+        return first, revalidated, weak, changed
+
+    first, revalidated, weak, changed = asyncio.run(scenario())
+    assert first.headers["etag"] == '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    for response in (revalidated, weak):
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == first.headers["etag"]
+        assert "content-type" not in response.headers
+    assert changed.status_code == 200 and changed.content == body
+    assert route.calls == 1
+    assert PerformanceMiddleware.current.stats["not_modified"] == 2
+    # Metriken sehen den tatsächlich gesendeten Status
+    assert recorded == [(False, 200), (True, 304), (True, 304), (True, 200)]
+
+
+def test_request_no_cache_skips_lookup_and_no_store_skips_store(fake_cache):
+    route = CountingRoute()
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60)})
+
+    async def scenario():
+        async with client_for(app) as client:
+            await client.get("/data")
+            fresh = await client.get("/data", headers={"Cache-Control": "no-cache"})
+            private = await client.get("/data", headers={"Cache-Control": "no-store"})
+        return fresh, private
+
+    fresh, private = asyncio.run(scenario())
+    assert fresh.headers["x-cache-status"] == "MISS"
+    assert private.headers["x-cache-status"] == "MISS"
+    assert route.calls == 3
+    # Erstes GET und no-cache speichern, no-store nicht
+    assert len(fake_cache.stored) == 2
+
+
+class BlockingRoute(CountingRoute):
+    """Erster Aufruf wartet auf release(); weitere antworten sofort"""
+
+    def __init__(self, body=b'{"value": 1}', headers=None):
+        super().__init__(body, headers)
+        self.released = None
+
+    async def handle(self, request):
+        self.calls += 1
+        if self.calls == 1:
+            self.released = asyncio.Event()
+            await self.released.wait()
+        return Response(self.body, media_type="application/json", headers=self.headers)
+
+
+async def until(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "Bedingung nicht erreicht"
+        await asyncio.sleep(0.001)
+
+
+def run_coalesced(app, route, followers, ready):
+    """Leader blockiert in der Route, bis ready(middleware) für die followers gilt"""
+    async def scenario():
+        async with client_for(app) as client:
+            leader = asyncio.create_task(client.get("/data"))
+            await until(lambda: route.released is not None)
+            others = [asyncio.create_task(client.get("/data")) for _ in range(followers)]
+            await until(lambda: ready(PerformanceMiddleware.current))
+            route.released.set()
+            return await leader, await asyncio.gather(*others)
+
+    return asyncio.run(scenario())
+
+
+def waiters(middleware):
+    return sum(inflight.waiters for inflight in middleware._inflight.values())
+
+
+def test_identical_gets_coalesce_onto_leader(fake_cache):
+    route = BlockingRoute()
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60)})
+
+    leader, followers = run_coalesced(app, route, 5, lambda m: waiters(m) == 5)
+    assert leader.headers["x-cache-status"] == "MISS"
+    assert [r.headers["x-cache-status"] for r in followers] == ["COALESCED"] * 5
+    assert all(r.content == leader.content for r in followers)
+    assert all(r.headers["etag"] == leader.headers["etag"] for r in followers)
+    assert route.calls == 1
+    stats = PerformanceMiddleware.current.stats
+    assert (stats["coalesce_leaders"], stats["coalesced_requests"]) == (1, 5)
+    assert PerformanceMiddleware.current._inflight == {}
+
+
+def test_waiter_cap_lets_overflow_run_themselves(fake_cache):
+    route = BlockingRoute()
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60)}, coalesce_max_waiters=2)
+
+    leader, followers = run_coalesced(
+        app, route, 3, lambda m: waiters(m) == 2 and m.stats["coalesce_overflow"] == 1 and route.calls == 2
+    )
+    # Der dritte wartet nicht, sondern ruft die Route selbst auf
+    statuses = sorted(r.headers["x-cache-status"] for r in followers)
+    assert statuses == ["COALESCED", "COALESCED", "MISS"]
+    assert route.calls == 2
+    assert PerformanceMiddleware.current.stats["coalesced_requests"] == 2
+
+
+def test_waiter_timeout_falls_back_to_own_request(fake_cache):
+    route = BlockingRoute()
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60)}, coalesce_timeout=0.01)
+
+    leader, (follower,) = run_coalesced(
+        app, route, 1, lambda m: m.stats["coalesce_timeouts"] == 1 and route.calls == 2
+    )
+    assert follower.status_code == 200
+    assert follower.headers["x-cache-status"] == "MISS"
+    assert leader.headers["x-cache-status"] == "MISS"
+    assert PerformanceMiddleware.current.stats["coalesced_requests"] == 0
+
+
+def test_unshareable_leader_response_releases_waiters(fake_cache):
+    route = BlockingRoute(headers={"Cache-Control": "private"})
+    app = build_app({"/data": route}, {"/data": ResponseCachePolicy(60)})
+
+    leader, followers = run_coalesced(app, route, 3, lambda m: waiters(m) == 3)
+    assert leader.headers["x-cache-status"] == "BYPASS"
+    assert [r.headers["x-cache-status"] for r in followers] == ["BYPASS"] * 3
+    assert all(r.status_code == 200 for r in followers)
+    assert route.calls == 4
+    stats = PerformanceMiddleware.current.stats
+    assert (stats["coalesce_fallbacks"], stats["coalesced_requests"]) == (3, 0)
+    assert fake_cache.stored == []
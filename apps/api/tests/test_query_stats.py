@@ -0,0 +1,94 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.query_stats import QueryStatsCollector, normalize_statement
+
+
+def test_normalize_statement_collapses_literals_and_params():
+    assert normalize_statement("SELECT *  FROM users\n WHERE id = 42 AND name = 'O''Neil'") == (
+        "SELECT * FROM users WHERE id = ? AND name = ?"
+    )
+    assert normalize_statement("SELECT * FROM agents WHERE id = $1") == "SELECT * FROM agents WHERE id = ?"
+    assert normalize_statement("SELECT * FROM t WHERE id IN ($1, $2, $3)") == (
+        "SELECT * FROM t WHERE id IN (?...)"
+    )
+    assert normalize_statement("SELECT * FROM t WHERE id IN (1, 2)") == normalize_statement(
+        "SELECT * FROM t WHERE id IN (7, 8, 9, 10)"
+    )
+    assert normalize_statement("SELECT * FROM table1") == "SELECT * FROM table1"
+
+
+def test_request_accounting_and_server_timing():
+    collector = QueryStatsCollector()
+    request = collector.begin_request()
+    collector.record_pool_wait(0.002)
+    collector.record_query("SELECT 1", 0.010)
+    collector.record_query("SELECT 2", 0.005)
+
+    assert request.queries == 2
+    assert request.server_timing() == 'db;dur=15.0;desc="2 queries", db-pool;dur=2.0'
+
+    collector.end_request(request, "/api/users/{id}")
+    assert collector.current() is None
+    stats = collector.get_stats()
+    assert stats["queries"] == 2
+    route = stats["top_routes_by_db_time"][0]
+    assert route["route"] == "/api/users/{id}"
+    assert route["requests"] == 1 and route["max_queries"] == 2
+    assert route["pool_wait_ms"] == 2.0
+
+
+def test_queries_outside_requests_are_untracked():
+    collector = QueryStatsCollector()
+    collector.record_query("SELECT 1", 0.001)
+    assert collector.stats["untracked_queries"] == 1
+    assert collector.get_stats()["top_routes_by_db_time"] == []
+
+
+def test_slow_query_log():
+    collector = QueryStatsCollector(slow_query_threshold=0.5)
+    request = collector.begin_request("/slow")
+    collector.record_query("SELECT * FROM big WHERE x = 5", 0.8)
+    collector.record_query("SELECT 1", 0.1)
+    collector.end_request(request)
+
+    slow = collector.get_stats()["slow_queries"]
+    assert len(slow) == 1
+    assert slow[0]["statement"] == "SELECT * FROM big WHERE x = ?"
+    assert slow[0]["duration_ms"] == 800.0
+    assert slow[0]["route"] == "/slow"
+
+
+def test_detects_n_plus_one():
+    collector = QueryStatsCollector(n_plus_one_threshold=5)
+    request = collector.begin_request()
+    collector.record_query("SELECT * FROM agents", 0.001)
+    for i in range(6):
+        collector.record_query(f"SELECT * FROM feedback WHERE agent_id = {i}", 0.001)
+    collector.end_request(request, "/api/agents")
+
+    assert collector.stats["n_plus_one_requests"] == 1
+    found = collector.get_stats()["n_plus_one"][0]
+    assert found["route"] == "/api/agents"
+    assert found["statements"] == [{"statement": "SELECT * FROM feedback WHERE agent_id = ?", "count": 6}]
+    assert collector.routes["/api/agents"]["n_plus_one"] == 1
+
+
+def test_concurrent_requests_are_isolated():
+    collector = QueryStatsCollector()
+
+    async def handle(queries):
+        request = collector.begin_request()
+        for _ in range(queries):
+            collector.record_query("SELECT 1", 0.001)
+            await asyncio.sleep(0)
+        return request.queries
+
+    async def scenario():
+        return await asyncio.gather(handle(1), handle(3), handle(5))
+
+    assert asyncio.run(scenario()) == [1, 3, 5]
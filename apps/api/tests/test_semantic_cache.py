@@ -0,0 +1,340 @@
+import asyncio
+import itertools
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from app.core import semantic_cache
+from app.core.semantic_cache import (
+    RedisSemanticStore,
+    SemanticCache,
+    SemanticPartition,
+    normalize_prompt,
+    prompt_fingerprint,
+)
+
+DIM = 4
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+# Deterministische Embeddings statt MiniLM: Cosinus zur Wetterfrage steht im Kommentar
+EMBEDDINGS = {
+    "wie wird das wetter in saarbrücken?": unit(1, 0, 0, 0),
+    "wetter saarbrücken heute?": unit(0.95, np.sqrt(1 - 0.95 ** 2), 0, 0),  # 0.95
+    "regnet es morgen in saarlouis?": unit(0.85, np.sqrt(1 - 0.85 ** 2), 0, 0),  # 0.85
+    "öffnungszeiten rathaus saarbrücken": unit(0, 0, 1, 0),  # 0.0
+}
+
+
+class Embedder:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, text):
+        self.calls.append(text)
+        return EMBEDDINGS.get(text, unit(0, 0, 0, 1))
+
+
+def make_cache(threshold=0.9, **kwargs):
+    embedder = Embedder()
+    return SemanticCache(embedder=embedder, similarity_threshold=threshold, dim=DIM, **kwargs), embedder
+
+
+def test_exact_hit_uses_normalized_prompt_without_embedding():
+    cache = SemanticCache(embedder=None, dim=DIM)
+
+    async def scenario():
+        await cache.store_response("de", "Wie wird das Wetter in Saarbrücken?", "Sonnig")
+        exact = await cache.lookup("de", "  wie wird das   WETTER in saarbrücken? ")
+        paraphrase = await cache.lookup("de", "Wetter Saarbrücken heute?")
+        return exact, paraphrase
+
+    exact, paraphrase = asyncio.run(scenario())
+    assert exact == "Sonnig"
+    # Ohne Modell keine semantischen Treffer
+    assert paraphrase is None
+    assert (cache.stats["exact_hits"], cache.stats["misses"]) == (1, 1)
+
+
+def test_semantic_hit_respects_cosine_threshold():
+    cache, embedder = make_cache(threshold=0.9)
+
+    async def scenario():
+        await cache.store_response("de", "Wie wird das Wetter in Saarbrücken?", "Sonnig, 18 Grad")
+        embedder.calls.clear()
+        return [
+            await cache.lookup("de", prompt)
+            for prompt in (
+                "Wetter Saarbrücken heute?",
+                "Regnet es morgen in Saarlouis?",
+                "Öffnungszeiten Rathaus Saarbrücken",
+            )
+        ]
+
+    close, below, unrelated = asyncio.run(scenario())
+    assert close == "Sonnig, 18 Grad"
+    assert below is None and unrelated is None
+    assert cache.stats["semantic_hits"] == 1
+    assert cache.stats["misses"] == 2
+    assert embedder.calls == [normalize_prompt(p) for p in (
+        "Wetter Saarbrücken heute?", "Regnet es morgen in Saarlouis?", "Öffnungszeiten Rathaus Saarbrücken"
+    )]
+
+
+def test_lower_threshold_accepts_looser_paraphrase():
+    cache, _ = make_cache(threshold=0.8)
+
+    async def scenario():
+        await cache.store_response("de", "Wie wird das Wetter in Saarbrücken?", "Sonnig")
+        return await cache.lookup("de", "Regnet es morgen in Saarlouis?")
+
+    assert asyncio.run(scenario()) == "Sonnig"
+
+
+def test_contexts_are_separate_partitions():
+    cache, _ = make_cache()
+
+    async def scenario():
+        await cache.store_response("de", "Wie wird das Wetter in Saarbrücken?", "Sonnig")
+        return await cache.lookup("fr", "Wie wird das Wetter in Saarbrücken?")
+
+    assert asyncio.run(scenario()) is None
+    assert cache.get_stats()["partitions"] == 2
+
+
+def test_partition_evicts_least_recently_used_row():
+    partition = SemanticPartition(dim=DIM, capacity=2)
+    partition.add("a", unit(1, 0, 0, 0), "A")
+    partition.add("b", unit(0, 1, 0, 0), "B")
+    partition.touch(partition.lookup_exact("a"))
+
+    evicted = partition.add("c", unit(0, 0, 1, 0), "C")
+
+    assert evicted == "b"
+    assert len(partition) == 2
+    row, score = partition.search(unit(0, 0, 1, 0))
+    assert partition.keys[row] == "c" and score > 0.99
+    assert partition.lookup_exact("b") == -1
+
+
+def test_partition_remove_keeps_matrix_contiguous():
+    partition = SemanticPartition(dim=DIM, capacity=4)
+    for key, vector in (("a", unit(1, 0, 0, 0)), ("b", unit(0, 1, 0, 0)), ("c", unit(0, 0, 1, 0))):
+        partition.add(key, vector, key.upper())
+
+    assert partition.remove("a")
+    assert not partition.remove("a")
+    assert len(partition) == 2
+    row, _ = partition.search(unit(0, 0, 1, 0))
+    assert partition.keys[row] == "c" and partition.responses[row] == "C"
+    assert partition.search(unit(1, 0, 0, 0))[1] < 0.01
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def hget(self, key, field):
+        self.ops.append(lambda: self.redis.hashes.get(key, {}).get(field))
+
+    def zadd(self, key, mapping, xx=False, incr=False):
+        self.ops.append(lambda: self.redis.zadd(key, mapping, xx, incr))
+
+    async def execute(self):
+        return [op() for op in self.ops]
+
+
+class FakeRedis:
+    """Hashes/ZSETs plus Nachbildung von _STORE_ENTRY_SCRIPT (Eviction nach Score)"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.zsets = {}
+
+    def zadd(self, key, mapping, xx=False, incr=False):
+        zset = self.zsets.setdefault(key, {})
+        for member, score in mapping.items():
+            if xx and member not in zset:
+                continue
+            zset[member] = zset.get(member, 0) + score if incr else score
+
+    def ordered(self, key):
+        zset = self.zsets.get(key, {})
+        return sorted(zset, key=lambda member: (zset[member], member))
+
+    async def eval(self, script, numkeys, responses_key, vectors_key, index_key,
+                   fid, response, embedding, mode, now, capacity, ttl):
+        self.hashes.setdefault(responses_key, {})[fid] = response
+        self.hashes.setdefault(vectors_key, {})[fid] = embedding
+        self.zadd(index_key, {fid: 1 if mode == "lfu" else now}, incr=mode == "lfu")
+        excess = len(self.zsets[index_key]) - capacity
+        evicted = []
+        if excess > 0:
+            evicted = [victim for victim in self.ordered(index_key)[:excess + 1] if victim != fid][:excess]
+            for victim in evicted:
+                del self.zsets[index_key][victim]
+                del self.hashes[responses_key][victim]
+                del self.hashes[vectors_key][victim]
+        return evicted
+
+    async def zrange(self, key, start, stop):
+        return self.ordered(key)
+
+    async def hmget(self, key, fields):
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def flushall(self):
+        self.hashes.clear()
+        self.zsets.clear()
+
+    async def close(self):
+        pass
+
+
+class FakePersistent:
+    """L3ResultCache-Ausschnitt: put (Write-Behind) und scan_prefix"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def put(self, key, value, ttl, tags=None):
+        self.rows[key] = (value, ttl)
+
+    async def scan_prefix(self, prefix, limit):
+        return [(key, value, ttl) for key, (value, ttl) in self.rows.items() if key.startswith(prefix)][:limit]
+
+
+def make_store(redis, **kwargs):
+    async def connection():
+        return redis
+
+    return RedisSemanticStore(connection, prefix="ai_semantic", **kwargs)
+
+
+def fid_of(prompt):
+    return prompt_fingerprint(normalize_prompt(prompt))
+
+
+def test_store_evicts_least_recently_used_entry(monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: next(clock))
+    redis = FakeRedis()
+    store = make_store(redis, eviction="lru", capacity=2)
+
+    async def scenario():
+        await store.store("de", "a", "A", b"a", 60)
+        await store.store("de", "b", "B", b"b", 60)
+        assert await store.fetch("de", "a") == "A"
+        evicted = await store.store("de", "c", "C", b"c", 60)
+        return evicted, await store.index("de")
+
+    evicted, index = asyncio.run(scenario())
+    assert evicted == ["b"]
+    assert sorted(index) == ["a", "c"]
+    assert "b" not in redis.hashes["ai_semantic:de:r"]
+    assert store.stats["evictions"] == 1
+
+
+def test_store_evicts_least_frequently_used_but_never_the_new_entry():
+    redis = FakeRedis()
+    store = make_store(redis, eviction="lfu", capacity=2)
+
+    async def scenario():
+        await store.store("de", "a", "A", b"a", 60)
+        await store.store("de", "b", "B", b"b", 60)
+        for _ in range(3):
+            await store.fetch("de", "b")
+        # Neuer Eintrag hat Score 1 wie "a" - verdrängt wird trotzdem "a"
+        return await store.store("de", "c", "C", b"c", 60)
+
+    assert asyncio.run(scenario()) == ["a"]
+    assert redis.zsets["ai_semantic:de:u"] == {"b": 4, "c": 1}
+
+
+def test_touch_does_not_revive_evicted_entries():
+    redis = FakeRedis()
+    store = make_store(redis, eviction="lru", capacity=1)
+
+    async def scenario():
+        await store.store("de", "a", "A", b"a", 60)
+        await store.store("de", "b", "B", b"b", 60)
+        await store.touch("de", "a")
+        return await store.index("de"), await store.fetch("de", "a")
+
+    index, fetched = asyncio.run(scenario())
+    assert index == ["b"]
+    assert fetched is None
+
+
+def test_concurrent_writers_keep_each_others_entries():
+    redis = FakeRedis()
+    workers = [SemanticCache(embedder=Embedder(), dim=DIM, store=make_store(redis)) for _ in range(2)]
+    prompts = [f"Frage {i}" for i in range(10)]
+
+    async def scenario():
+        await asyncio.gather(*(
+            workers[i % 2].store_response("de", prompt, f"Antwort {i}")
+            for i, prompt in enumerate(prompts)
+        ))
+        return await workers[0].store.index("de")
+
+    assert sorted(asyncio.run(scenario())) == sorted(fid_of(prompt) for prompt in prompts)
+
+
+def test_index_sync_loads_peer_entries_and_drops_evicted_ones():
+    redis = FakeRedis()
+    writer = SemanticCache(embedder=Embedder(), dim=DIM, store=make_store(redis, capacity=2), sync_interval=0)
+    reader = SemanticCache(embedder=Embedder(), dim=DIM, store=make_store(redis, capacity=2), sync_interval=0)
+
+    async def scenario():
+        await writer.store_response("de", "Wie wird das Wetter in Saarbrücken?", "Sonnig")
+        # Paraphrase trifft über Index-Abgleich + Embedding aus Redis, Response per HGET
+        first = await reader.lookup("de", "Wetter Saarbrücken heute?")
+        await writer.store_response("de", "Öffnungszeiten Rathaus Saarbrücken", "8-16 Uhr")
+        await writer.store_response("de", "Regnet es morgen in Saarlouis?", "Nein")
+        second = await reader.lookup("de", "Wie wird das Wetter in Saarbrücken?")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == "Sonnig"
+    # Die Wetterfrage wurde vom Writer verdrängt; der Abgleich entfernt sie beim Reader
+    assert second is None
+    partition = reader.partitions["de"]
+    assert partition.lookup_exact(fid_of("Wie wird das Wetter in Saarbrücken?")) == -1
+    assert len(partition) == 2
+    assert reader.store.stats["embeddings_loaded"] == 3
+
+
+def test_empty_redis_index_is_rehydrated_from_persistent_tier():
+    redis = FakeRedis()
+    persistent = FakePersistent()
+    writer = SemanticCache(embedder=Embedder(), dim=DIM, store=make_store(redis, persistent=persistent))
+
+    async def scenario():
+        await writer.store_response("de", "Wie wird das Wetter in Saarbrücken?", "Sonnig")
+        redis.flushall()
+        # Neuer Worker nach Redis-Neustart
+        reader = SemanticCache(embedder=Embedder(), dim=DIM, store=make_store(redis, persistent=persistent))
+        hit = await reader.lookup("de", "Wetter Saarbrücken heute?")
+        return reader, hit
+
+    reader, hit = asyncio.run(scenario())
+    assert hit == "Sonnig"
+    assert writer.store.stats["persisted"] == 1
+    assert reader.store.stats["rehydrated"] == 1
+    assert redis.hashes["ai_semantic:de:r"] == {fid_of("Wie wird das Wetter in Saarbrücken?"): "Sonnig"}
+    # Rehydrierte Einträge werden nicht erneut nach L3 geschrieben
+    assert reader.store.stats["persisted"] == 0
@@ -0,0 +1,76 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.system_sampler import SystemSampler, _minimal_reader
+
+
+class FakeReader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"cpu_percent": 10.0 * self.calls, "memory_percent": 42.0}
+
+
+def test_ring_buffers_keep_fixed_history():
+    sampler = SystemSampler(history=3, reader=FakeReader())
+    for i in range(5):
+        sampler.record({"cpu_percent": float(i)}, timestamp=1000.0 + i)
+
+    assert sampler.get_series("cpu_percent") == [(1002.0, 2.0), (1003.0, 3.0), (1004.0, 4.0)]
+    assert sampler.get_series("cpu_percent", 2) == [(1003.0, 3.0), (1004.0, 4.0)]
+    assert sampler.get("cpu_percent") == 4.0
+    assert sampler.get("unknown", -1.0) == -1.0
+    assert sampler.get_series("unknown") == []
+
+
+def test_sample_once_reads_in_thread_and_records_loop_lag():
+    reader = FakeReader()
+    sampler = SystemSampler(reader=reader)
+    asyncio.run(sampler.sample_once(loop_lag=0.025))
+
+    assert reader.calls == 1
+    assert sampler.get("cpu_percent") == 10.0
+    assert sampler.get("event_loop_lag_ms") == 25.0
+    snapshot = sampler.snapshot()
+    assert snapshot["samples"] == 1
+    assert snapshot["latest"]["memory_percent"] == 42.0
+    assert set(snapshot["series"]) == {"cpu_percent", "event_loop_lag_ms", "memory_percent"}
+
+
+def test_reader_errors_are_counted_not_raised():
+    def broken():
+        raise RuntimeError("boom")
+
+    sampler = SystemSampler(reader=broken)
+    asyncio.run(sampler.sample_once(loop_lag=0.0))
+    assert sampler.errors == 1
+    assert sampler.get("event_loop_lag_ms") == 0.0
+
+
+def test_background_loop_samples_until_stopped():
+    async def scenario():
+        reader = FakeReader()
+        sampler = SystemSampler(interval=0.01, reader=reader)
+        await sampler.start()
+        await asyncio.sleep(0.05)
+        await sampler.stop()
+        calls = reader.calls
+        await asyncio.sleep(0.03)
+        return calls, reader.calls, sampler
+
+    calls, later_calls, sampler = asyncio.run(scenario())
+    assert calls >= 3
+    assert later_calls == calls
+    assert len(sampler.get_series("event_loop_lag_ms")) == calls - 1
+
+
+def test_minimal_reader_without_psutil():
+    sample = _minimal_reader()
+    assert sample["open_fds"] > 0
+    assert "load_1m" in sample
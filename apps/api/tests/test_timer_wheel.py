@@ -0,0 +1,134 @@
+import itertools
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings
+from app.core.timer_wheel import HashedTimerWheel
+from app.core.ws_heartbeat import HeartbeatScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_wheel_expires_only_due_timers_after_their_tick():
+    clock = FakeClock()
+    wheel = HashedTimerWheel(tick=1.0, slots=8, clock=clock)
+    wheel.schedule("a", 1002.5)
+    wheel.schedule("b", 1005.0)
+    assert wheel.advance(1002.9) == []
+    assert wheel.advance(1003.0) == ["a"]
+    assert "a" not in wheel and len(wheel) == 1
+    assert wheel.advance(1006.0) == ["b"]
+
+
+def test_reschedule_and_cancel_are_constant_time_replacements():
+    clock = FakeClock()
+    wheel = HashedTimerWheel(tick=1.0, slots=8, clock=clock)
+    wheel.schedule("a", 1001.0)
+    wheel.schedule("a", 1004.0)
+    wheel.schedule("b", 1002.0)
+    assert wheel.cancel("b") and not wheel.cancel("b")
+    assert wheel.advance(1003.0) == []
+    assert wheel.advance(1005.0) == ["a"]
+
+
+def test_timers_beyond_one_rotation_wait_for_their_round():
+    clock = FakeClock()
+    wheel = HashedTimerWheel(tick=1.0, slots=4, clock=clock)
+    wheel.schedule("late", 1009.0)
+    wheel.schedule("past", 900.0)
+    assert wheel.advance(1001.0) == ["past"]
+    assert wheel.advance(1009.0) == []
+    # Langer Stillstand: eine Umdrehung genügt
+    assert wheel.advance(1100.0) == ["late"]
+
+
+def scheduler(clock, **kwargs):
+    options = dict(ping_interval=10.0, pong_timeout=5.0, idle_timeout=60.0, jitter=0.0, clock=clock)
+    options.update(kwargs)
+    return HeartbeatScheduler(**options)
+
+
+def test_heartbeat_pings_then_evicts_missing_pong():
+    clock = FakeClock()
+    heartbeat = scheduler(clock)
+    heartbeat.add("alive")
+    heartbeat.add("dead")
+
+    clock.now = 1011.0
+    to_ping, to_evict = heartbeat.poll()
+    assert sorted(to_ping) == ["alive", "dead"] and to_evict == []
+    assert heartbeat.get_stats()["awaiting_pong"] == 2
+
+    clock.now = 1012.0
+    heartbeat.activity("alive", pong=True)
+    clock.now = 1017.0
+    assert heartbeat.poll() == ([], [("dead", "pong_timeout")])
+
+    stats = heartbeat.get_stats()
+    assert stats["connections"] == 1 and stats["awaiting_pong"] == 0
+    assert stats["pongs_received"] == 1 and stats["pong_timeouts"] == 1
+    assert stats["timers"] == 2  # nächster Ping + Idle von "alive"
+
+
+def test_activity_defers_ping_and_idle_without_pong_enforcement():
+    clock = FakeClock()
+    heartbeat = scheduler(clock, pong_timeout=0, idle_timeout=30.0)
+    heartbeat.add("quiet")
+    heartbeat.add("chatty")
+    for now in range(1005, 1040, 5):
+        clock.now = float(now)
+        heartbeat.activity("chatty")
+        _, to_evict = heartbeat.poll()
+        assert "chatty" not in [connection for connection, _ in to_evict]
+
+    assert heartbeat.stats["idle_timeouts"] == 1
+    assert len(heartbeat) == 1
+    heartbeat.remove("chatty")
+    heartbeat.remove("chatty")
+    assert len(heartbeat.wheel) == 0
+
+
+def test_jitter_spreads_first_pings():
+    clock = FakeClock()
+    values = itertools.cycle([0.0, 1.0])
+    heartbeat = scheduler(clock, jitter=0.2, rng=lambda: next(values))
+    heartbeat.add("early")
+    heartbeat.add("late")
+    clock.now = 1009.0
+    assert heartbeat.poll()[0] == ["early"]
+    clock.now = 1013.0
+    assert heartbeat.poll()[0] == ["late"]
+
+
+def test_default_settings_keep_listen_only_connections_open():
+    # Endpoints leiten eingehende Frames noch nicht über record_activity
+    clock = FakeClock()
+    heartbeat = HeartbeatScheduler(
+        ping_interval=settings.WEBSOCKET_PING_INTERVAL,
+        pong_timeout=settings.WEBSOCKET_PONG_TIMEOUT,
+        idle_timeout=settings.WEBSOCKET_IDLE_TIMEOUT,
+        jitter=0.0,
+        clock=clock,
+    )
+    heartbeat.add("listener")
+
+    pings = 0
+    for _ in range(40):
+        clock.now += settings.WEBSOCKET_PING_INTERVAL + 1
+        to_ping, to_evict = heartbeat.poll()
+        pings += len(to_ping)
+        assert to_evict == []
+
+    assert clock.now - 1000.0 > 300.0
+    assert pings == 40
+    assert len(heartbeat) == 1
+    assert heartbeat.stats["idle_timeouts"] == heartbeat.stats["pong_timeouts"] == 0
@@ -0,0 +1,142 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.ws_fanout import ClusterFanout
+
+
+class FakeBroker:
+    def __init__(self):
+        self.pubsubs = []
+        self.published = []
+
+
+class FakePubSub:
+    def __init__(self, broker):
+        self.broker = broker
+        self.channels = set()
+        self.queue = asyncio.Queue()
+        broker.pubsubs.append(self)
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.pubsubs.remove(self)
+
+
+class FakeRedis:
+    def __init__(self, broker):
+        self.broker = broker
+
+    def pubsub(self):
+        return FakePubSub(self.broker)
+
+    async def publish(self, channel, data):
+        self.broker.published.append(channel)
+        receivers = [pubsub for pubsub in self.broker.pubsubs if channel in pubsub.channels]
+        for pubsub in receivers:
+            pubsub.queue.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(receivers)
+
+
+class Instance:
+    def __init__(self, broker, name):
+        self.received = []
+        self.fanout = ClusterFanout(FakeRedis(broker), self.deliver, instance_id=name)
+
+    async def deliver(self, channel, message, state_key):
+        self.received.append((channel, message, state_key))
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_broadcast_reaches_only_occupied_instances_without_echo():
+    async def scenario():
+        broker = FakeBroker()
+        a, b, c = Instance(broker, "a"), Instance(broker, "b"), Instance(broker, "c")
+        for instance in (a, b, c):
+            await instance.fanout.start()
+        await a.fanout.join("analytics")
+        await b.fanout.join("analytics")
+
+        await a.fanout.publish("analytics", '{"type": "update"}')
+        await settle()
+        for instance in (a, b, c):
+            await instance.fanout.stop()
+        return broker, a, b, c
+
+    broker, a, b, c = asyncio.run(scenario())
+    assert broker.published == ["ws:fanout:analytics"]
+    assert b.received == [("analytics", '{"type": "update"}', None)]
+    assert a.received == [] and a.fanout.stats["echo_dropped"] == 1
+    assert c.received == [] and c.fanout.stats["received"] == 0
+
+
+def test_global_broadcast_and_unsubscribe_on_last_leave():
+    async def scenario():
+        broker = FakeBroker()
+        a, b = Instance(broker, "a"), Instance(broker, "b")
+        await a.fanout.start()
+        await b.fanout.start()
+        await b.fanout.join("traffic")
+        await b.fanout.leave("traffic")
+
+        await a.fanout.publish("traffic", "dropped")
+        await a.fanout.publish(None, "hello|all", state_key="user_count")
+        await settle()
+        subscribed = set(broker.pubsubs[1].channels)
+        await a.fanout.stop()
+        await b.fanout.stop()
+        return b, subscribed
+
+    b, subscribed = asyncio.run(scenario())
+    assert subscribed == {"ws:fanout:__all__"}
+    assert b.received == [(None, "hello|all", "user_count")]
+    assert b.fanout.stats["subscribes"] == 2
+    assert b.fanout.stats["unsubscribes"] == 1
+
+
+def test_join_before_start_is_subscribed_on_start():
+    async def scenario():
+        broker = FakeBroker()
+        a = Instance(broker, "a")
+        await a.fanout.join("weather")
+        await a.fanout.start()
+        channels = set(broker.pubsubs[0].channels)
+        stats = a.fanout.get_stats()
+        await a.fanout.stop()
+        return channels, stats
+
+    channels, stats = asyncio.run(scenario())
+    assert channels == {"ws:fanout:weather", "ws:fanout:__all__"}
+    assert stats["subscribed_channels"] == 2
+    assert stats["running"]
+
+
+def test_publish_errors_are_counted():
+    class BrokenRedis(FakeRedis):
+        async def publish(self, channel, data):
+            raise ConnectionError("down")
+
+    async def deliver(channel, message, state_key):
+        pass
+
+    fanout = ClusterFanout(BrokenRedis(FakeBroker()), deliver)
+    assert asyncio.run(fanout.publish("x", "m")) is False
+    assert fanout.stats["publish_errors"] == 1
@@ -0,0 +1,206 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# ensure package path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from app.core.ws_outbox import ConnectionWriter, Frame, collapse_state_updates, new_send_stats
+
+
+class FakeSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.messages = []
+        self.evicted = []
+
+    async def send(self, message):
+        if self.fail:
+            raise ConnectionError("closed")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages.append(message)
+
+    async def on_evict(self, reason):
+        self.evicted.append(reason)
+
+
+def writer_for(socket, **kwargs):
+    return ConnectionWriter(socket.send, socket.on_evict, **kwargs)
+
+
+def test_frame_is_shared_between_connections():
+    async def scenario():
+        sockets = [FakeSocket() for _ in range(3)]
+        writers = [writer_for(socket) for socket in sockets]
+        frame = Frame('{"type": "update"}')
+        for writer in writers:
+            writer.start()
+            assert writer.enqueue(frame)
+        await asyncio.sleep(0.01)
+        for writer in writers:
+            await writer.stop()
+        return sockets, frame
+
+    sockets, frame = asyncio.run(scenario())
+    assert all(socket.messages == [frame.message] for socket in sockets)
+    assert all(socket.messages[0] is frame.message for socket in sockets)
+    assert frame.message == {"type": "websocket.send", "text": '{"type": "update"}'}
+
+
+def test_slow_consumer_does_not_delay_others():
+    async def scenario():
+        slow, fast = FakeSocket(delay=0.5), FakeSocket()
+        writers = [writer_for(slow), writer_for(fast)]
+        for writer in writers:
+            writer.start()
+        for i in range(5):
+            frame = Frame(str(i))
+            for writer in writers:
+                writer.enqueue(frame)
+        await asyncio.sleep(0.02)
+        delivered = (len(slow.messages), len(fast.messages))
+        for writer in writers:
+            await writer.stop()
+        return delivered
+
+    assert asyncio.run(scenario()) == (0, 5)
+
+
+def test_drop_oldest_policy_keeps_newest_frames():
+    async def scenario():
+        socket = FakeSocket()
+        stats = new_send_stats()
+        writer = writer_for(socket, maxsize=2, policy="drop_oldest", stats=stats)
+        for i in range(4):
+            assert writer.enqueue(Frame(str(i)))
+        writer.start()
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return socket, writer, stats
+
+    socket, writer, stats = asyncio.run(scenario())
+    assert [message["text"] for message in socket.messages] == ["2", "3"]
+    assert writer.dropped == 2
+    assert stats["frames_dropped"] == 2
+    assert stats["frames_sent"] == 2
+
+
+def test_coalesce_policy_replaces_same_key():
+    async def scenario():
+        socket = FakeSocket()
+        stats = new_send_stats()
+        writer = writer_for(socket, maxsize=2, policy="coalesce", stats=stats)
+        writer.enqueue(Frame("weather-1", key="weather"))
+        writer.enqueue(Frame("traffic-1", key="traffic"))
+        writer.enqueue(Frame("weather-2", key="weather"))
+        writer.start()
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return socket, stats
+
+    socket, stats = asyncio.run(scenario())
+    assert [message["text"] for message in socket.messages] == ["traffic-1", "weather-2"]
+    assert stats["frames_coalesced"] == 1
+    assert stats["frames_dropped"] == 0
+
+
+def test_disconnect_policy_rejects_when_full():
+    async def scenario():
+        socket = FakeSocket()
+        writer = writer_for(socket, maxsize=1, policy="disconnect")
+        assert writer.enqueue(Frame("a"))
+        assert not writer.enqueue(Frame("b"))
+        await writer.evict("queue_full")
+        assert not writer.enqueue(Frame("c"))
+        return socket, writer
+
+    socket, writer = asyncio.run(scenario())
+    assert socket.evicted == ["queue_full"]
+    assert writer.stats["slow_consumer_evictions"] == 1
+    assert writer.depth == 0
+
+
+def test_send_timeout_and_errors_evict_once():
+    async def scenario():
+        stuck, broken = FakeSocket(delay=1.0), FakeSocket(fail=True)
+        writers = [writer_for(stuck, send_timeout=0.02), writer_for(broken)]
+        for writer in writers:
+            writer.start()
+            writer.enqueue(Frame("x"))
+            writer.enqueue(Frame("y"))
+        await asyncio.sleep(0.1)
+        for writer in writers:
+            await writer.stop()
+        return stuck, broken, writers
+
+    stuck, broken, writers = asyncio.run(scenario())
+    assert stuck.evicted == ["send_timeout"]
+    assert broken.evicted == ["send_error"]
+    assert writers[1].stats["send_errors"] == 1
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        ConnectionWriter(FakeSocket().send, FakeSocket().on_evict, policy="block")
+    with pytest.raises(ValueError):
+        Frame("x", state=True)
+
+
+def test_state_frames_keep_only_latest_pending_value():
+    async def scenario():
+        socket = FakeSocket()
+        writer = writer_for(socket)
+        writer.enqueue(Frame("analytics-1", key="analytics", state=True))
+        writer.enqueue(Frame("event-1", key="events"))
+        writer.enqueue(Frame("analytics-2", key="analytics", state=True))
+        writer.enqueue(Frame("event-2", key="events"))
+        writer.enqueue(Frame("analytics-3", key="analytics", state=True))
+        depth = writer.depth
+        writer.start()
+        await asyncio.sleep(0.01)
+        writer.enqueue(Frame("analytics-4", key="analytics", state=True))
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return socket, writer, depth
+
+    socket, writer, depth = asyncio.run(scenario())
+    assert depth == 3
+    assert [message["text"] for message in socket.messages] == [
+        "analytics-3", "event-1", "event-2", "analytics-4",
+    ]
+    assert writer.stats["frames_superseded"] == 2
+
+
+def test_dropped_state_slot_does_not_resurrect():
+    async def scenario():
+        socket = FakeSocket()
+        writer = writer_for(socket, maxsize=1)
+        writer.enqueue(Frame("state-1", key="s", state=True))
+        writer.enqueue(Frame("event", key="e"))
+        writer.enqueue(Frame("state-2", key="s", state=True))
+        writer.start()
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return socket
+
+    assert [message["text"] for message in asyncio.run(scenario()).messages] == ["state-2"]
+
+
+def test_collapse_state_updates_within_batch():
+    messages = [
+        {"channel": "analytics", "state_key": "analytics", "message": "a1"},
+        {"channel": "chat", "state_key": None, "message": "c1"},
+        {"channel": "analytics", "state_key": "analytics", "message": "a2"},
+        {"channel": None, "state_key": "user_count", "message": "u1"},
+        {"channel": "chat", "state_key": None, "message": "c2"},
+        {"channel": None, "state_key": "user_count", "message": "u2"},
+    ]
+    kept, collapsed = collapse_state_updates(messages)
+    assert [message["message"] for message in kept] == ["c1", "a2", "c2", "u2"]
+    assert collapsed == 2
+    events = [{"channel": "chat", "message": "x"}]
+    assert collapse_state_updates(events) == (events, 0)